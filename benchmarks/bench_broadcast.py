@@ -0,0 +1,58 @@
+"""
+Compares broadcasting a message to WebSocket connections one at a time, over
+a new connection each, as a loop of post_to_connection calls with a fresh
+client does, against ManagementApiClient.broadcast, which sends them
+concurrently over pooled connections. The local management API adds a fixed
+latency to each request, to stand in for the round trip to API Gateway.
+
+    python -m benchmarks.bench_broadcast --connections 200 --latency 0.005
+"""
+import argparse
+import time
+
+from benchmarks.common import print_table
+from pyrazine.clients import ClientRegistry, HttpClient
+from pyrazine.testing.websocket_api import LocalManagementApi
+from pyrazine.websocket import ManagementApiClient
+
+
+MESSAGE = {'type': 'price', 'symbol': 'ABC', 'value': 12.5}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--connections', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.005)
+    args = parser.parse_args()
+
+    connection_ids = [f'connection-{i}=' for i in range(args.connections)]
+
+    rows = []
+    with LocalManagementApi(latency=args.latency) as api:
+        for connection_id in connection_ids:
+            api.connect(connection_id)
+
+        start = time.perf_counter()
+        for connection_id in connection_ids:
+            client = HttpClient(api.endpoint, trace=False)
+            client.post(f'/{api.stage}/@connections/{connection_id}', json_body=MESSAGE)
+            client.close()
+        rows.append(['sequential, new connections', f'{time.perf_counter() - start:.3f}'])
+
+        for max_workers in (1, 8, 32):
+            clients = ClientRegistry(trace=False)
+            management_api = ManagementApiClient(api.endpoint, clients=clients, sign=False,
+                                                 max_workers=max_workers)
+            start = time.perf_counter()
+            result = management_api.broadcast(connection_ids, MESSAGE)
+            elapsed = time.perf_counter() - start
+            assert len(result.sent) == len(connection_ids), result
+            rows.append([f'broadcast, {max_workers} workers', f'{elapsed:.3f}'])
+            management_api.close()
+            clients.close()
+
+    print_table(rows, ['method', 'seconds'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Measures the throughput of the same route table when it is invoked through
+LambdaHandler.handle_request with an API Gateway event, and through the WSGI
+and ASGI container adapters, using several worker processes.
+
+    python -m benchmarks.bench_container --workers 4 --duration 3
+"""
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+
+from benchmarks.common import make_http_event, print_table, run_workers, time_calls
+from benchmarks.sample_app import asgi_app, handler, wsgi_app
+
+
+_POST_BODY = json.dumps({'name': 'item', 'tags': ['a', 'b', 'c'], 'price': 10}).encode()
+
+
+def _lambda_worker(duration: float) -> int:
+    event = make_http_event('POST', '/items', body=json.loads(_POST_BODY))
+    return time_calls(lambda: handler.handle_request(event, None), duration)
+
+
+def _wsgi_worker(duration: float) -> int:
+
+    def start_response(status, headers):
+        pass
+
+    def call():
+        environ = {
+            'REQUEST_METHOD': 'POST',
+            'PATH_INFO': '/items',
+            'QUERY_STRING': '',
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(_POST_BODY)),
+            'REMOTE_ADDR': '127.0.0.1',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'wsgi.input': io.BytesIO(_POST_BODY),
+        }
+        return wsgi_app(environ, start_response)
+
+    return time_calls(call, duration)
+
+
+def _asgi_worker(duration: float) -> int:
+
+    scope = {
+        'type': 'http',
+        'method': 'POST',
+        'path': '/items',
+        'query_string': b'',
+        'http_version': '1.1',
+        'headers': [(b'content-type', b'application/json')],
+        'client': ('127.0.0.1', 50000),
+    }
+    message = {'type': 'http.request', 'body': _POST_BODY, 'more_body': False}
+
+    async def receive():
+        return message
+
+    async def send(_):
+        pass
+
+    async def time_calls_async(seconds):
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + seconds
+        calls = 0
+        while loop.time() < deadline:
+            for _ in range(100):
+                await asgi_app(scope, receive, send)
+            calls += 100
+        return calls
+
+    return asyncio.run(time_calls_async(duration))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--duration', type=float, default=3.0)
+    args = parser.parse_args()
+
+    rows = []
+    for name, target in (('lambda event', _lambda_worker),
+                         ('wsgi adapter', _wsgi_worker),
+                         ('asgi adapter', _asgi_worker)):
+        throughput = run_workers(target, args.workers, args.duration)
+        rows.append([name, args.workers, f'{throughput:,.0f}'])
+
+    print_table(rows, ['path', 'workers', 'requests/s'])
+
+
+if __name__ == '__main__':
+    main()
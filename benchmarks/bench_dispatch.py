@@ -0,0 +1,264 @@
+"""
+Benchmark suite for the request dispatch hot path: drives
+LambdaHandler.handle_request with synthetic API Gateway HTTP API (v2) events,
+through the full response path, over a matrix of route counts, body sizes,
+JWT claim sets and tracing on and off, with a recorder that does not send
+anything.
+
+Results can be written as JSON and compared against a baseline written by a
+previous run, in which case the exit status is 1 if any case got slower than
+the threshold allows:
+
+    python -m benchmarks.bench_dispatch --output baseline.json
+    python -m benchmarks.bench_dispatch --baseline baseline.json --threshold 0.1
+"""
+import argparse
+import contextlib
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.common import make_http_event, print_table
+from pyrazine.handlers import LambdaHandler
+from pyrazine.log import StructuredLogger
+from pyrazine.response import HttpResponse
+
+
+FORMAT_VERSION = 1
+
+ROUTE_COUNTS = (1, 20, 200)
+
+BODY_SIZES = {
+    'empty': 0,
+    '1kb': 1024,
+    '64kb': 64 * 1024,
+}
+
+CLAIM_SETS = {
+    'none': None,
+    'minimal': {
+        'iss': 'https://cognito-idp.us-east-1.amazonaws.com/us-east-1_D4KLyfcX7',
+        'sub': '8f0a5d2e-6c1b-4a8e-9f3d-2b7c1e4a9d6f',
+    },
+    'cognito': {
+        'iss': 'https://cognito-idp.us-east-1.amazonaws.com/us-east-1_D4KLyfcX7',
+        'sub': '8f0a5d2e-6c1b-4a8e-9f3d-2b7c1e4a9d6f',
+        'aud': '6pq2rn0odk3fb1k9h3bjk7f2qm',
+        'token_use': 'id',
+        'auth_time': '1583817383',
+        'exp': '1583820983',
+        'iat': '1583817383',
+        'email': 'user@example.com',
+        'email_verified': 'true',
+        'cognito:username': 'user',
+        'cognito:groups': '[admins editors readers]',
+        'scope': 'openid profile email items/read items/write',
+        'custom:tenant': 'tenant-42',
+    },
+}
+
+
+class _NullSubsegment(object):
+
+    def put_annotation(self, key, value):
+        pass
+
+    def put_metadata(self, key, value, namespace='default'):
+        pass
+
+
+class NullRecorder(object):
+    """
+    Stand-in for the X-Ray recorder that opens subsegments that are never
+    sent, so that tracing can be measured without a daemon.
+    """
+
+    @contextlib.contextmanager
+    def in_subsegment(self, name=None, **kwargs):
+        yield _NullSubsegment()
+
+
+def _make_body(size: int) -> Optional[Dict[str, object]]:
+    if not size:
+        return None
+    # Records of about 100 bytes once serialized.
+    record = {'id': 0, 'name': 'item name', 'price': 12.5, 'tags': ['a', 'b', 'c'],
+              'active': True, 'notes': 'x' * 20}
+    count = max(1, size // 100)
+    return {'items': [dict(record, id=i) for i in range(count)]}
+
+
+def _build_case(routes: int, body_size: int, claims: Optional[Dict[str, str]],
+                trace: bool) -> Callable[[], Dict[str, object]]:
+
+    handler = LambdaHandler(
+        service_name='benchmark', trace=False, recorder=NullRecorder(),
+        logger=StructuredLogger(level='WARNING', stream=open(os.devnull, 'w')))
+
+    def echo(token, body):
+        return HttpResponse(200, body={'received': len(body)})
+
+    # Half of the routes have path parameters, like a typical API. The
+    # request goes to the last route with parameters, which is the slowest
+    # to find.
+    for index in range(routes):
+        path = f'/resource{index}/{{item_id}}' if index % 2 else f'/resource{index}'
+        handler.route(echo, path=path, methods=('GET', 'POST'), trace=trace or None)
+
+    last = max(range(routes), key=lambda index: (index % 2, index))
+    path = f'/resource{last}/42' if last % 2 else f'/resource{last}'
+
+    body = _make_body(body_size)
+    event = make_http_event('POST' if body is not None else 'GET', path, body=body,
+                            claims=claims)
+
+    response = handler.handle_request(event, None)
+    if response['statusCode'] != 200:
+        raise RuntimeError(f'Benchmark request failed: {response}')
+
+    return lambda: handler.handle_request(event, None)
+
+
+def build_cases(quick: bool = False) -> Dict[str, Callable[[], object]]:
+    """
+    Builds the cases of the suite, indexed by name. Each dimension is varied
+    on its own, from a baseline of 20 routes, a 1 KB body and minimal claims
+    without tracing, so that the suite stays small.
+    """
+
+    default = {'routes': 20, 'body': '1kb', 'claims': 'minimal', 'trace': False}
+    variants = [dict(default)]
+    variants += [dict(default, routes=routes) for routes in ROUTE_COUNTS if routes != 20]
+    variants += [dict(default, body=body) for body in BODY_SIZES if body != '1kb']
+    variants += [dict(default, claims=claims) for claims in CLAIM_SETS if claims != 'minimal']
+    variants += [dict(default, trace=True)]
+    if quick:
+        variants = variants[:1]
+
+    cases = {}
+    for variant in variants:
+        name = (f'routes={variant["routes"]},body={variant["body"]},'
+                f'claims={variant["claims"]},trace={"on" if variant["trace"] else "off"}')
+        cases[name] = _build_case(variant['routes'], BODY_SIZES[variant['body']],
+                                  CLAIM_SETS[variant['claims']], variant['trace'])
+    return cases
+
+
+def measure(fn: Callable[[], object], min_time: float, repeats: int) -> Dict[str, float]:
+    """
+    Measures the duration of a call in microseconds: calls are timed in
+    batches that take at least min_time seconds, several times.
+    """
+
+    # Calibrate the size of the batches, which also warms up the caches.
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        iterations *= 2
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter() - start) / iterations * 1e6)
+
+    return {
+        'median_us': statistics.median(samples),
+        'min_us': min(samples),
+        'stdev_us': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'iterations': iterations,
+        'repeats': repeats,
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]],
+            baseline: Dict[str, Dict[str, float]],
+            threshold: float) -> Dict[str, Optional[float]]:
+    """
+    Returns the ratio of the median of each case to that in the baseline, or
+    None for cases that are not in it.
+    """
+    ratios = {}
+    for name, result in results.items():
+        previous = baseline.get(name)
+        ratios[name] = result['median_us'] / previous['median_us'] if previous else None
+    return ratios
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='The minimum seconds each batch of calls takes.')
+    parser.add_argument('--repeats', type=int, default=5,
+                        help='The number of batches measured per case.')
+    parser.add_argument('--filter', default='*',
+                        help='A glob pattern the names of the cases to run must match.')
+    parser.add_argument('--quick', action='store_true',
+                        help='Only run the default case, e.g. to check the suite works.')
+    parser.add_argument('--output', help='A file to write the results to, as JSON.')
+    parser.add_argument('--baseline', help='A file with the results of a previous run.')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='The slowdown over the baseline considered a regression.')
+    args = parser.parse_args(argv)
+
+    cases = {name: fn for name, fn in build_cases(args.quick).items()
+             if fnmatch.fnmatch(name, args.filter)}
+    results = {name: measure(fn, args.min_time, args.repeats) for name, fn in cases.items()}
+
+    document = {
+        'version': FORMAT_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(document, file, indent=2, sort_keys=True)
+
+    ratios = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get('version') != FORMAT_VERSION:
+            parser.error(f'Unsupported baseline version {baseline.get("version")}')
+        ratios = compare(results, baseline['results'], args.threshold)
+
+    rows = []
+    regressions = []
+    for name, result in results.items():
+        row = [name, f'{result["median_us"]:.2f}', f'{result["stdev_us"]:.2f}']
+        if args.baseline:
+            ratio = ratios[name]
+            if ratio is None:
+                row.append('new')
+            else:
+                regressed = ratio > 1 + args.threshold
+                row.append(f'{ratio:.2f}x' + (' REGRESSION' if regressed else ''))
+                if regressed:
+                    regressions.append(name)
+        rows.append(row)
+
+    headers = ['case', 'median us', 'stdev us'] + (['vs baseline'] if args.baseline else [])
+    print_table(rows, headers)
+
+    if regressions:
+        print(f'\n{len(regressions)} case(s) slower than the baseline by more than '
+              f'{args.threshold:.0%}.', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+Compares decoding a large array of records with json.loads against iterating
+over it with the incremental parser, in time and in peak memory allocated.
+
+    python -m benchmarks.bench_jsonstream --records 20000
+"""
+import argparse
+import base64
+import json
+import time
+import tracemalloc
+
+from benchmarks.common import print_table
+from pyrazine.events import RequestBody
+
+
+def _measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed * 1000, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=20000)
+    args = parser.parse_args()
+
+    records = [{
+        'id': i, 'name': f'record {i}', 'price': i * 0.25, 'tags': ['a', 'b', 'c'],
+        'attributes': {'color': 'blue', 'size': i % 5},
+    } for i in range(args.records)]
+    text = json.dumps({'records': records})
+    raw = base64.b64encode(text.encode('utf-8')).decode('ascii')
+    del records
+
+    def load():
+        return sum(1 for _ in RequestBody(raw, is_base64_encoded=True).json()['records'])
+
+    def stream():
+        body = RequestBody(raw, is_base64_encoded=True)
+        return sum(1 for _ in body.iter_json_array(key='records'))
+
+    rows = []
+    for name, fn in (('json.loads', load), ('iter_json_array', stream)):
+        count, elapsed_ms, peak_mb = _measure(fn)
+        assert count == args.records
+        rows.append([name, f'{elapsed_ms:.1f}', f'{peak_mb:.2f}'])
+
+    print_table(rows, [f'{len(raw) / (1024 * 1024):.1f} MB body', 'ms', 'peak MB'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Compares claim access and serialization of the slot-based JwtToken and
+CognitoJwtToken classes with the property-based classes they replaced.
+
+    python -m benchmarks.bench_jwt --iterations 200000
+"""
+import argparse
+import json
+
+from benchmarks.common import per_call_us, print_table
+from pyrazine.jwt import CognitoJwtToken, JwtTokenJsonEncoder
+
+
+CLAIMS = {
+    'aud': '5htisl6hrhisk6gdin4ua505pp',
+    'auth_time': 1608560298,
+    'cognito:username': '3a73340c-1826-4d33-b2e4-bd8c3437b5fe',
+    'email': 'info@example.com',
+    'email_verified': True,
+    'event_id': 'dfd736ab-cc63-4b63-b7ab-441fb9a96151',
+    'exp': 1608677394,
+    'iat': 1608673794,
+    'iss': 'https://cognito-idp.us-east-1.amazonaws.com/us-east-1_D4KLyfcX7',
+    'sub': '3a73340c-1826-4d33-b2e4-bd8c3437b5fe',
+    'token_use': 'id',
+}
+
+
+class LegacyCognitoJwtToken(object):
+    """
+    The property-based implementation, kept here as the baseline.
+    """
+
+    def __init__(self, token_object):
+        self._token_contents = token_object
+
+    def _str(self, key):
+        return str(self._token_contents[key]) if key in self._token_contents else None
+
+    def _int(self, key):
+        return int(self._token_contents[key]) if key in self._token_contents else None
+
+    aud = property(lambda self: self._str('aud'))
+    exp = property(lambda self: self._int('exp'))
+    iat = property(lambda self: self._int('iat'))
+    iss = property(lambda self: self._str('iss'))
+    jti = property(lambda self: self._str('jti'))
+    sub = property(lambda self: self._str('sub'))
+    auth_time = property(lambda self: self._int('auth_time'))
+    client_id = property(lambda self: self._str('client_id'))
+    cognito_username = property(lambda self: self._str('cognito:username'))
+    email = property(lambda self: self._str('email'))
+    email_verified = property(
+        lambda self: bool(self._token_contents['email_verified'])
+        if 'email_verified' in self._token_contents else False)
+    event_id = property(lambda self: self._str('event_id'))
+    family_name = property(lambda self: self._str('family_name'))
+    given_name = property(lambda self: self._str('given_name'))
+    scope = property(lambda self: self._str('scope'))
+    token_use = property(lambda self: self._str('token_use'))
+    username = property(lambda self: self._str('username'))
+
+    def as_dict(self):
+        return {
+            'aud': self.aud, 'exp': self.exp, 'iat': self.iat, 'iss': self.iss,
+            'jti': self.jti, 'sub': self.sub, 'auth_time': self.auth_time,
+            'client_id': self.client_id, 'cognito_username': self.cognito_username,
+            'email': self.email, 'email_verified': self.email_verified,
+            'event_id': self.event_id, 'family_name': self.family_name,
+            'given_name': self.given_name, 'scope': self.scope,
+            'token_use': self.token_use, 'username': self.username,
+        }
+
+
+class LegacyEncoder(json.JSONEncoder):
+    def default(self, o):
+        if isinstance(o, LegacyCognitoJwtToken):
+            return o.as_dict()
+        return super().default(o)
+
+
+def _cases(token_class, encoder):
+    token = token_class(token_object=CLAIMS) if token_class is CognitoJwtToken \
+        else token_class(CLAIMS)
+
+    def construct_and_read():
+        t = token_class(token_object=CLAIMS) if token_class is CognitoJwtToken \
+            else token_class(CLAIMS)
+        return t.sub, t.exp, t.email, t.token_use
+
+    def read_claims():
+        return token.sub, token.exp, token.email, token.token_use, token.iss
+
+    def as_dict():
+        return token.as_dict()
+
+    def encode():
+        return json.dumps(token, cls=encoder)
+
+    return {
+        'construct + 4 claims': construct_and_read,
+        '5 claims (warm)': read_claims,
+        'as_dict': as_dict,
+        'json encode': encode,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=100000)
+    args = parser.parse_args()
+
+    legacy = _cases(LegacyCognitoJwtToken, LegacyEncoder)
+    current = _cases(CognitoJwtToken, JwtTokenJsonEncoder)
+
+    rows = []
+    for name in legacy:
+        legacy_us = per_call_us(legacy[name], args.iterations)
+        current_us = per_call_us(current[name], args.iterations)
+        rows.append([name, f'{legacy_us:.3f}', f'{current_us:.3f}',
+                     f'{legacy_us / current_us:.1f}x'])
+
+    print_table(rows, ['case', 'legacy us', 'slots us', 'speedup'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Compares the cost of the logging done in a request with the structured logger
+against the previous per-module logger with f-strings: with debug records
+disabled, as in production, with and without a record logged by the handler,
+and with debug records enabled. Structured records are JSON entries with the
+fields of the invocation, while the previous ones were plain messages.
+
+    python -m benchmarks.bench_logging --iterations 20000
+"""
+import argparse
+import logging
+import os
+
+from benchmarks.common import per_call_us, print_table
+from pyrazine.log import StructuredLogger
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    method, path, handler_name = 'GET', '/items/{item_id}', 'get_item'
+
+    # Both write to a file, so that each write is a system call, as when
+    # writing to the standard output in Lambda.
+    devnull = open(os.devnull, 'w')
+
+    cases = ((logging.INFO, 0), (logging.INFO, 1), (logging.INFO, 5), (logging.DEBUG, 1))
+
+    rows = []
+    for level, handler_records in cases:
+        legacy = logging.getLogger(f'bench_logging.legacy.{level}.{handler_records}')
+        legacy.propagate = False
+        legacy.setLevel(level)
+        legacy.addHandler(logging.StreamHandler(devnull))
+
+        def legacy_request():
+            legacy.debug(f'Processing {method} route for path {path}')
+            legacy.debug(f'Starting handler {handler_name}')
+            legacy.debug(f'Returned successfully from handler {handler_name}')
+            for item_id in range(handler_records):
+                legacy.info(f'Fetched item {item_id}')
+
+        log = StructuredLogger(level=level, stream=devnull)
+
+        def structured_request():
+            log.begin_invocation(request_id='request-id')
+            log.debug('Processing %s route for path %s', method, path)
+            log.set_fields(method=method, route=path)
+            log.debug('Starting handler %s', handler_name)
+            log.debug('Returned successfully from handler %s', handler_name)
+            for item_id in range(handler_records):
+                log.info('Fetched item %s', item_id)
+            log.end_invocation()
+
+        legacy_us = per_call_us(legacy_request, args.iterations)
+        structured_us = per_call_us(structured_request, args.iterations)
+        rows.append([logging.getLevelName(level), handler_records,
+                     f'{legacy_us:.2f}', f'{structured_us:.2f}'])
+
+    print_table(rows, ['level', 'handler records', 'legacy us/request',
+                       'structured us/request'])
+
+
+if __name__ == '__main__':
+    main()
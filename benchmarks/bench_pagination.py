@@ -0,0 +1,63 @@
+"""
+Compares the peak memory and duration of returning a whole collection in a
+single response against returning a page of it with Paginator, for
+collections of growing size read from a generator, as rows of a database
+query would be.
+
+    python -m benchmarks.bench_pagination --limit 100
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.common import make_http_event, print_table
+from pyrazine.handlers import LambdaHandler
+from pyrazine.pagination import Paginator
+from pyrazine.response import HttpResponse
+from pyrazine.startup import StartupProfiler
+
+
+COLLECTION_SIZES = (1000, 10000, 100000)
+
+
+def _rows(count):
+    for i in range(count):
+        yield {'id': f'order-{i:08}', 'status': 'shipped', 'total': i * 1.5,
+               'lines': [{'sku': 'ABC-123', 'quantity': 2}]}
+
+
+def _measure(handler, event):
+    tracemalloc.start()
+    start = time.perf_counter()
+    handler.handle_request(event, None)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+
+    paginator = Paginator('benchmark', default_limit=args.limit)
+    sizes = {}
+
+    handler = LambdaHandler(trace=False, profiler=StartupProfiler(metrics=False))
+    handler.route(lambda: HttpResponse(200, body=list(_rows(sizes['items']))), path='/all')
+    handler.route(lambda event: paginator.paginate(event, _rows(sizes['items'])), path='/paged')
+
+    rows = []
+    for size in COLLECTION_SIZES:
+        sizes['items'] = size
+        all_elapsed, all_peak = _measure(handler, make_http_event(path='/all'))
+        paged_elapsed, paged_peak = _measure(handler, make_http_event(path='/paged'))
+        rows.append([size, f'{all_elapsed * 1000:.1f}', f'{all_peak / 2 ** 20:.2f}',
+                     f'{paged_elapsed * 1000:.1f}', f'{paged_peak / 2 ** 20:.2f}'])
+
+    print_table(rows, ['items', 'all ms', 'all peak MB', 'page ms', 'page peak MB'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Compares the cost of dispatching EventBridge events and S3 records with
+EventRouter against an if/elif chain over the same rules, as event-driven
+functions are usually written, for a growing number of rules. The event goes
+to the last rule, which is the worst case of the chain.
+
+    python -m benchmarks.bench_router --iterations 20000
+"""
+import argparse
+import os
+
+from benchmarks.common import per_call_us, print_table
+from pyrazine.log import StructuredLogger
+from pyrazine.router import EventRouter
+
+
+RULE_COUNTS = (5, 50, 500)
+
+
+def _build_chain(rules):
+
+    def handle_event(event, context=None):
+        if 'detail-type' in event:
+            for source, detail_type in rules:
+                if event['source'] == source and event['detail-type'] == detail_type:
+                    return source
+            return None
+        results = []
+        for record in event['Records']:
+            bucket = record['s3']['bucket']['name']
+            key = record['s3']['object']['key']
+            for prefix in rules:
+                if bucket == 'uploads' and key.startswith(prefix):
+                    results.append(prefix)
+                    break
+        return results
+
+    return handle_event
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    logger = StructuredLogger(level='WARNING', stream=open(os.devnull, 'w'))
+
+    rows = []
+    for count in RULE_COUNTS:
+        eventbridge_rules = [(f'com.example.service{i}', f'Event{i}') for i in range(count)]
+        s3_rules = [f'tenant{i}/uploads/' for i in range(count)]
+
+        router = EventRouter(trace=False, logger=logger)
+        for source, detail_type in eventbridge_rules:
+            router.on_eventbridge(lambda event: None, source=source, detail_type=detail_type)
+        for prefix in s3_rules:
+            router.on_s3(lambda record: None, bucket='uploads', prefix=prefix)
+
+        source, detail_type = eventbridge_rules[-1]
+        eventbridge_event = {'source': source, 'detail-type': detail_type, 'detail': {}}
+        s3_event = {'Records': [{
+            'eventSource': 'aws:s3',
+            'eventName': 'ObjectCreated:Put',
+            's3': {'bucket': {'name': 'uploads'},
+                   'object': {'key': f'{s3_rules[-1]}2024/01/01/file.json'}},
+        }]}
+
+        chain = _build_chain(eventbridge_rules)
+        s3_chain = _build_chain(s3_rules)
+        rows.append([
+            count,
+            f'{per_call_us(lambda: chain(eventbridge_event), args.iterations):.2f}',
+            f'{per_call_us(lambda: router.handle_event(eventbridge_event), args.iterations):.2f}',
+            f'{per_call_us(lambda: s3_chain(s3_event), args.iterations):.2f}',
+            f'{per_call_us(lambda: router.handle_event(s3_event), args.iterations):.2f}',
+        ])
+
+    print_table(rows, ['rules', 'eventbridge chain us', 'eventbridge router us',
+                       's3 chain us', 's3 router us'])
+
+
+if __name__ == '__main__':
+    main()
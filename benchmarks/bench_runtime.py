@@ -0,0 +1,77 @@
+"""
+Measures the per-invocation overhead of the pyrazine custom runtime against
+the AWS Lambda runtime interface client (awslambdaric, if installed), using
+the local Runtime API stand-in.
+
+    python -m benchmarks.bench_runtime --invocations 5000
+"""
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import make_http_event, print_table
+from pyrazine.testing.runtime_api import LocalRuntimeApi
+
+
+RUNTIMES = {
+    'pyrazine': ([sys.executable, '-m', 'pyrazine.runtime'],
+                 'benchmarks.sample_app.handler'),
+    'awslambdaric': ([sys.executable, '-m', 'awslambdaric', 'benchmarks.sample_app.lambda_handler'],
+                     'benchmarks.sample_app.lambda_handler'),
+}
+
+
+def _measure(command, handler_name: str, invocations: int) -> float:
+
+    with LocalRuntimeApi() as api:
+        env = dict(os.environ,
+                   AWS_LAMBDA_RUNTIME_API=api.endpoint,
+                   AWS_LAMBDA_FUNCTION_NAME='benchmark',
+                   AWS_LAMBDA_FUNCTION_MEMORY_SIZE='128',
+                   _HANDLER=handler_name)
+        process = subprocess.Popen(command, env=env)
+
+        try:
+            event = make_http_event('GET', '/')
+
+            # The first invocation pays for the imports, so it is left out.
+            api.wait_for_result(api.enqueue(event), timeout=30)
+
+            start = time.perf_counter()
+            request_ids = [api.enqueue(event) for _ in range(invocations)]
+            results = api.wait_for_results(request_ids, timeout=30)
+            elapsed = time.perf_counter() - start
+        finally:
+            process.kill()
+            process.wait()
+
+    failures = sum(1 for result in results if not result.success)
+    if failures:
+        raise RuntimeError(f'{failures} invocations failed.')
+
+    return elapsed / invocations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--invocations', type=int, default=2000)
+    args = parser.parse_args()
+
+    rows = []
+    for name, (command, handler_name) in RUNTIMES.items():
+        module_name = command[2]
+        if importlib.util.find_spec(module_name) is None:
+            rows.append([name, 'not installed', ''])
+            continue
+
+        per_invocation = _measure(command, handler_name, args.invocations)
+        rows.append([name, f'{per_invocation:.1f}', f'{1e6 / per_invocation:,.0f}'])
+
+    print_table(rows, ['runtime', 'us/invocation', 'invocations/s'])
+
+
+if __name__ == '__main__':
+    main()
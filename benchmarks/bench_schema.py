@@ -0,0 +1,143 @@
+"""
+Compares validating request bodies with compiled validators against walking
+the schema on every request, as hand-written or interpreted validation does.
+
+    python -m benchmarks.bench_schema --iterations 20000
+"""
+import argparse
+import dataclasses
+import typing
+from dataclasses import dataclass
+from typing import List, Optional
+
+from benchmarks.common import per_call_us, print_table
+from pyrazine.schema import SchemaCompiler
+
+
+ORDER_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'customer': {'type': 'string', 'minLength': 1},
+        'notes': {'type': ['string', 'null']},
+        'lines': {
+            'type': 'array',
+            'minItems': 1,
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'sku': {'type': 'string', 'pattern': '^[A-Z0-9-]+$'},
+                    'quantity': {'type': 'integer', 'minimum': 1},
+                    'price': {'type': 'number', 'minimum': 0},
+                },
+                'required': ['sku', 'quantity', 'price'],
+            },
+        },
+    },
+    'required': ['customer', 'lines'],
+}
+
+
+@dataclass
+class OrderLine:
+    sku: str
+    quantity: int
+    price: float
+
+
+@dataclass
+class Order:
+    customer: str
+    lines: List[OrderLine]
+    notes: Optional[str] = None
+
+
+BODY = {
+    'customer': 'c-42',
+    'notes': None,
+    'lines': [{'sku': f'SKU-{i}', 'quantity': i + 1, 'price': 9.99} for i in range(20)],
+}
+
+_TYPES = {
+    'string': str, 'integer': int, 'number': (int, float), 'boolean': bool,
+    'null': type(None), 'object': dict, 'array': list,
+}
+
+
+def naive_validate(schema, value):
+    """
+    Interprets the schema dictionary for every value, as a generic validator
+    does when schemas are not compiled.
+    """
+    import re
+
+    if 'type' in schema:
+        names = schema['type'] if isinstance(schema['type'], list) else [schema['type']]
+        if not any(isinstance(value, _TYPES[name]) and
+                   not (isinstance(value, bool) and name in ('integer', 'number'))
+                   for name in names):
+            raise ValueError('invalid type')
+    if 'minLength' in schema and len(value) < schema['minLength']:
+        raise ValueError('too short')
+    if 'pattern' in schema and not re.search(schema['pattern'], value):
+        raise ValueError('no match')
+    if 'minimum' in schema and value < schema['minimum']:
+        raise ValueError('too small')
+    if 'minItems' in schema and len(value) < schema['minItems']:
+        raise ValueError('too few items')
+    if isinstance(value, dict):
+        for name in schema.get('required', ()):
+            if name not in value:
+                raise ValueError('missing property')
+        for name, property_schema in schema.get('properties', {}).items():
+            if name in value:
+                naive_validate(property_schema, value[name])
+    if isinstance(value, list) and 'items' in schema:
+        for item in value:
+            naive_validate(schema['items'], item)
+    return value
+
+
+def naive_bind(cls, value):
+    """
+    Binds into a dataclass by inspecting its fields on every request.
+    """
+    hints = typing.get_type_hints(cls)
+    kwargs = {}
+    for f in dataclasses.fields(cls):
+        if f.name not in value:
+            continue
+        hint = hints[f.name]
+        item = value[f.name]
+        if typing.get_origin(hint) is list and dataclasses.is_dataclass(typing.get_args(hint)[0]):
+            item = [naive_bind(typing.get_args(hint)[0], i) for i in item]
+        kwargs[f.name] = item
+    return cls(**kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    compiler = SchemaCompiler()
+    cases = [
+        ('JSON Schema',
+         lambda: naive_validate(ORDER_SCHEMA, BODY),
+         lambda: compiler.compile(ORDER_SCHEMA)(BODY)),
+        ('dataclass',
+         lambda: naive_bind(Order, BODY),
+         lambda: compiler.compile(Order)(BODY)),
+    ]
+
+    rows = []
+    for name, naive, compiled in cases:
+        naive_us = per_call_us(naive, args.iterations)
+        compiled_us = per_call_us(compiled, args.iterations)
+        rows.append([name, f'{naive_us:.2f}', f'{compiled_us:.2f}',
+                     f'{naive_us / compiled_us:.1f}x'])
+
+    print_table(rows, ['schema', 'naive us', 'compiled us', 'speedup'])
+
+
+if __name__ == '__main__':
+    main()
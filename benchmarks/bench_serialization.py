@@ -0,0 +1,106 @@
+"""
+Compares serializing large query results with the serializer registry against
+the previous encoder, which created a JSONEncoder per response and fell back
+to generic isinstance checks.
+
+    python -m benchmarks.bench_serialization --items 1000 --iterations 50
+"""
+import argparse
+import dataclasses
+import datetime
+import decimal
+import json
+
+from benchmarks.common import per_call_us, print_table
+from pyrazine.serialization import DynamoDbItems, default_serializer_registry
+
+
+class LegacySerializer(json.JSONEncoder):
+    """
+    The previous HttpResponseSerializer, extended the way handlers had to
+    extend it for the other types.
+    """
+    def default(self, o):
+        if isinstance(o, decimal.Decimal):
+            return str(o)
+        if dataclasses.is_dataclass(o):
+            return dataclasses.asdict(o)
+        if isinstance(o, (datetime.datetime, datetime.date)):
+            return o.isoformat()
+        if isinstance(o, (set, frozenset)):
+            return list(o)
+        return super().default(o)
+
+
+@dataclasses.dataclass
+class Order:
+    pk: str
+    total: decimal.Decimal
+    created: datetime.datetime
+    tags: frozenset
+
+
+def _legacy_deserialize(value):
+    # Mirrors boto3's TypeDeserializer, which dispatches on the tag with
+    # getattr and builds a Decimal for each number.
+    (tag, content), = value.items()
+    if tag == 'N':
+        return decimal.Context(prec=38).create_decimal(content)
+    if tag == 'L':
+        return [_legacy_deserialize(item) for item in content]
+    if tag == 'M':
+        return {key: _legacy_deserialize(item) for key, item in content.items()}
+    if tag in ('SS', 'NS'):
+        return set(content)
+    return content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    items = [{
+        'pk': f'ORDER#{i}', 'sk': 'META', 'total': decimal.Decimal('129.95'),
+        'quantity': decimal.Decimal(i % 7 + 1), 'discount': decimal.Decimal('0.15'),
+        'created': decimal.Decimal(1700000000 + i), 'status': 'SHIPPED', 'gift': False,
+    } for i in range(args.items)]
+
+    orders = [Order(f'ORDER#{i}', decimal.Decimal('129.95'), datetime.datetime(2021, 1, 1),
+                    frozenset(['gift'])) for i in range(args.items)]
+
+    attribute_values = [{
+        'pk': {'S': f'ORDER#{i}'}, 'sk': {'S': 'META'}, 'total': {'N': '129.95'},
+        'quantity': {'N': str(i % 7 + 1)}, 'discount': {'N': '0.15'},
+        'created': {'N': str(1700000000 + i)}, 'status': {'S': 'SHIPPED'},
+        'lines': {'L': [{'M': {'sku': {'S': 'A-1'}, 'price': {'N': '9.99'}}}]},
+    } for i in range(args.items)]
+
+    registry = default_serializer_registry
+    cases = [
+        ('Decimal items',
+         lambda: json.dumps(items, cls=LegacySerializer),
+         lambda: registry.dumps(items)),
+        ('dataclasses',
+         lambda: json.dumps(orders, cls=LegacySerializer),
+         lambda: registry.dumps(orders)),
+        ('attribute values',
+         lambda: json.dumps([{k: _legacy_deserialize(v) for k, v in item.items()}
+                             for item in attribute_values], cls=LegacySerializer),
+         lambda: registry.dumps(DynamoDbItems(attribute_values))),
+    ]
+
+    rows = []
+    for name, legacy, current in cases:
+        assert json.loads(legacy()) == json.loads(current())
+        legacy_ms = per_call_us(legacy, args.iterations) / 1000
+        current_ms = per_call_us(current, args.iterations) / 1000
+        rows.append([name, f'{legacy_ms:.2f}', f'{current_ms:.2f}',
+                     f'{legacy_ms / current_ms:.1f}x'])
+
+    print_table(rows, [f'{args.items} items', 'legacy ms', 'registry ms', 'speedup'])
+
+
+if __name__ == '__main__':
+    main()
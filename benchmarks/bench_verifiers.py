@@ -0,0 +1,86 @@
+"""
+Measures JWT signature verifications per second with each verifier backend,
+compared with the python-jose calls CognitoAuthorizer used to make for every
+token (get_unverified_headers, jwk.construct, verify, get_unverified_claims).
+
+    python -m benchmarks.bench_verifiers --duration 2 --workers 4
+"""
+import argparse
+import functools
+
+from jose import jwk, jwt
+from jose.utils import base64url_decode
+
+from benchmarks.common import print_table, run_workers, time_calls
+from pyrazine.auth import verifiers
+from tests.test_verifiers import EC_JWK, RSA_JWK, sign_token
+
+
+CLAIMS = {
+    'sub': '3a73340c-1826-4d33-b2e4-bd8c3437b5fe',
+    'aud': '5htisl6hrhisk6gdin4ua505pp',
+    'exp': 1608677394,
+    'token_use': 'id',
+}
+
+KEYS = {'RS256': RSA_JWK, 'ES256': EC_JWK}
+
+
+def _legacy_verify(token, keys):
+    headers = jwt.get_unverified_headers(token)
+    key = keys[headers['kid']]
+    public_key = jwk.construct(key, headers['alg'])
+    message, encoded_signature = str(token).rsplit('.', 1)
+    if not public_key.verify(message.encode('utf8'),
+                             base64url_decode(encoded_signature.encode('utf-8'))):
+        raise ValueError('Invalid signature')
+    return jwt.get_unverified_claims(token)
+
+
+def _make_call(backend, alg):
+    jwk_ = KEYS[alg]
+    token = sign_token(CLAIMS, jwk_['kid'], alg)
+
+    if backend == 'legacy jose':
+        keys = {jwk_['kid']: jwk_}
+        return functools.partial(_legacy_verify, token, keys)
+
+    verifier = getattr(verifiers, backend)()
+    verifier.load_keys([jwk_])
+    return functools.partial(verifier.verify, token)
+
+
+def _worker(backend, alg, duration):
+    return time_calls(_make_call(backend, alg), duration)
+
+
+BACKENDS = ('legacy jose', 'JoseJwtVerifier', 'PyJwtVerifier', 'CryptographyJwtVerifier')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--duration', type=float, default=2.0)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    rows = []
+    for alg in KEYS:
+        for backend in BACKENDS:
+            try:
+                _make_call(backend, alg)
+            except ImportError:
+                rows.append([alg, backend, 'not installed'])
+                continue
+
+            target = functools.partial(_worker, backend, alg)
+            if args.workers > 1:
+                rate = run_workers(target, args.workers, args.duration)
+            else:
+                rate = target(args.duration) / args.duration
+            rows.append([alg, backend, f'{rate:,.0f}'])
+
+    print_table(rows, ['alg', 'backend', 'verifications/s'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Helpers shared by the benchmark scripts in this package.
+
+The scripts are meant to be run from the root of the repository, e.g.:
+
+    python -m benchmarks.bench_container --workers 4
+"""
+import copy
+import json
+import multiprocessing
+import time
+from typing import Callable, Dict, List
+
+
+BASE_HTTP_EVENT = {
+    'version': '2.0',
+    'routeKey': '$default',
+    'rawPath': '/',
+    'rawQueryString': '',
+    'cookies': [],
+    'headers': {
+        'accept': 'application/json',
+        'content-type': 'application/json',
+        'user-agent': 'pyrazine-benchmark',
+    },
+    'requestContext': {
+        'accountId': '123456789012',
+        'apiId': 'r3pmxmplak',
+        'domainName': 'r3pmxmplak.execute-api.us-east-2.amazonaws.com',
+        'domainPrefix': 'r3pmxmplak',
+        'http': {
+            'method': 'GET',
+            'path': '/',
+            'protocol': 'HTTP/1.1',
+            'sourceIp': '205.255.255.176',
+            'userAgent': 'pyrazine-benchmark',
+        },
+        'requestId': 'JKJaXmPLvHcESHA=',
+        'routeKey': '$default',
+        'stage': '$default',
+        'time': '10/Mar/2020:05:16:23 +0000',
+        'timeEpoch': 1583817383220,
+    },
+    'isBase64Encoded': False,
+}
+
+
+def make_http_event(method: str = 'GET',
+                    path: str = '/',
+                    body: object = None,
+                    claims: Dict[str, object] = None) -> Dict[str, object]:
+    """
+    Builds a synthetic API Gateway HTTP API (v2) event.
+
+    :param method: The HTTP method of the request.
+    :param path: The path of the request.
+    :param body: An object to serialize as the JSON body of the request.
+    :param claims: The JWT claims to add as if an authorizer had validated them.
+    :return: The event dictionary.
+    """
+    event = copy.deepcopy(BASE_HTTP_EVENT)
+    event['rawPath'] = path
+    event['requestContext']['http']['method'] = method
+    event['requestContext']['http']['path'] = path
+
+    if body is not None:
+        event['body'] = json.dumps(body)
+
+    if claims is not None:
+        event['requestContext']['authorizer'] = {
+            'jwt': {'claims': claims, 'scopes': None}
+        }
+
+    return event
+
+
+def time_calls(fn: Callable[[], object], duration: float) -> int:
+    """
+    Calls a function repeatedly for the given duration.
+
+    :param fn: The function to call.
+    :param duration: The duration, in seconds.
+    :return: The number of calls completed.
+    """
+    calls = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        # Check the clock every 100 calls only, to keep it out of the measure.
+        for _ in range(100):
+            fn()
+        calls += 100
+    return calls
+
+
+def run_workers(target: Callable[[float], int], workers: int, duration: float) -> float:
+    """
+    Runs the given target in several processes at the same time and returns
+    the aggregated throughput.
+
+    :param target: A picklable function that takes a duration in seconds and
+    returns the number of operations completed during that time.
+    :param workers: The number of worker processes.
+    :param duration: The duration of the run, in seconds.
+    :return: The number of operations per second across all workers.
+    """
+    with multiprocessing.Pool(workers) as pool:
+        counts = pool.map(target, [duration] * workers)
+    return sum(counts) / duration
+
+
+def per_call_us(fn: Callable[[], object], iterations: int) -> float:
+    """
+    Measures the average duration of a call in microseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def print_table(rows: List[List[object]], headers: List[str]) -> None:
+    widths = [
+        max(len(str(row[i])) for row in [headers] + rows)
+        for i in range(len(headers))
+    ]
+    for row in [headers] + rows:
+        print('  '.join(str(cell).ljust(width) for cell, width in zip(row, widths)))
@@ -0,0 +1,35 @@
+"""
+Sample application used by the benchmarks. It can also be used to benchmark
+the container adapters under real servers, e.g.:
+
+    gunicorn -w 4 benchmarks.sample_app:wsgi_app
+    uvicorn --workers 4 benchmarks.sample_app:asgi_app
+"""
+from pyrazine.container import AsgiAdapter, WsgiAdapter
+from pyrazine.handlers import LambdaHandler
+from pyrazine.response import HttpResponse
+
+
+handler = LambdaHandler(service_name='benchmark', trace=False)
+
+
+@handler.route(path='/', methods=('GET',))
+def index(token, body):
+    return HttpResponse(200, body={'hello': 'world'})
+
+
+@handler.route(path='/items', methods=('POST',))
+def create_item(token, body):
+    return HttpResponse(201, body=body)
+
+
+wsgi_app = WsgiAdapter(handler)
+asgi_app = AsgiAdapter(handler)
+
+
+def lambda_handler(event, context):
+    """
+    Plain Lambda handler function, for runtimes that cannot invoke a
+    LambdaHandler directly.
+    """
+    return handler.handle_request(event, context)
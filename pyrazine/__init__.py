@@ -1 +1,12 @@
+import os as _os
+import time as _time
+
 __version__ = "0.1.0"
+
+# When the package started being imported, the first phase measured by
+# pyrazine.startup.
+_import_started = _time.perf_counter()
+
+if _os.environ.get('PYRAZINE_TRACK_IMPORTS'):
+    from pyrazine.startup import startup_profiler as _startup_profiler
+    _startup_profiler.track_imports()
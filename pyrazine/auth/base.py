@@ -2,6 +2,22 @@ from abc import ABC
 from typing import Set
 
 
+class NotAuthorizedError(Exception):
+
+    def __init__(self, message: str = 'Not authorized', status_code: int = 403):
+        """
+        :param message: The message to return to the client.
+        :param status_code: The HTTP status code to return, 401 if the request
+        is not authenticated and 403 if it is but lacks permissions.
+        """
+        super().__init__(message)
+        self._status_code = status_code
+
+    @property
+    def status_code(self) -> int:
+        return self._status_code
+
+
 class BaseAuthorizer(ABC):
     pass
 
@@ -22,4 +38,3 @@ class BaseAuthStorage(ABC):
 
     def get_user_roles(self, user_id: str) -> Set[str]:
         pass
-
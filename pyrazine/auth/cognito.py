@@ -1,44 +1,34 @@
 import functools
+import inspect
 import json
 import os
 import time
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
-import urllib.request
-
-from jose import jwk, jwt
-from jose.utils import base64url_decode
 from pyrazine.auth.base import (
     BaseAuthorizer,
     BaseAuthStorage,
-    BaseUserProfile
+    NotAuthorizedError
+)
+from pyrazine.auth.spec import AuthSpec, ClaimPredicate
+from pyrazine.auth.verifiers import (
+    BaseJwtVerifier,
+    JwkNotFoundError,
+    JwtVerificationFailedError,
+    get_default_verifier
 )
+from pyrazine.clients import ClientRegistry, default_client_registry
 from pyrazine.handlers import HandlerCallable
-from pyrazine.jwt import JwtToken
+from pyrazine.jwt import JwtToken, parse_numeric_date
 from pyrazine.response import HttpResponse
 
 
-class JwkNotFoundError(Exception):
-    pass
-
-
-class JwtVerificationFailedError(Exception):
-
-    INVALID_SIGNATURE = 1
-    TOKEN_EXPIRED = 2
-    INVALID_AUDIENCE = 3
-
-    def __init__(self, error_code: int, message: str):
-        super().__init__(message)
-        self._error_code = error_code
-
-    @property
-    def error_code(self) -> int:
-        return self._error_code
-
-
-class NotAuthorizedError(Exception):
-    pass
+__all__ = [
+    'CognitoAuthorizer',
+    'JwkNotFoundError',
+    'JwtVerificationFailedError',
+    'NotAuthorizedError'
+]
 
 
 class CognitoAuthorizer(BaseAuthorizer):
@@ -47,101 +37,126 @@ class CognitoAuthorizer(BaseAuthorizer):
                  user_pool_id: str,
                  client_id: str,
                  region: str,
-                 auth_storage: BaseAuthStorage):
+                 auth_storage: BaseAuthStorage,
+                 verifier: BaseJwtVerifier = None,
+                 clients: ClientRegistry = None):
+        """
+
+        :param user_pool_id: The ID of the user pool. Defaults to the value of
+        the COGNITO_USER_POOL environment variable.
+        :param client_id: The ID of the app client tokens must be issued to.
+        :param region: The region of the user pool. Defaults to the value of
+        the COGNITO_REGION environment variable.
+        :param auth_storage: The storage to fetch user roles and profiles from.
+        :param verifier: The signature verifier to use. Defaults to one using
+        the fastest backend installed.
+        :param clients: The registry of the HTTP client used to fetch the
+        signing keys of the user pool. Defaults to the global one, so the
+        connection is shared with handlers calling the same host.
+        """
 
         self._client_id = client_id
         self._user_pool_id = user_pool_id if user_pool_id is not None else \
             os.environ.get('COGNITO_USER_POOL')
         self._region = region if region is not None else os.environ.get('COGNITO_REGION')
         self._auth_storage = auth_storage
+        self._verifier = verifier if verifier is not None else get_default_verifier()
+        self._clients = clients if clients is not None else default_client_registry
 
         self._initialize()
 
     def _initialize(self):
         keys_url = 'https://cognito-idp.{}.amazonaws.com/{}/.well-known/jwks.json' \
             . format(self._region, self._user_pool_id)
-        with urllib.request.urlopen(keys_url) as request:
-            response = request.read()
-        self._cognito_keys = json.loads(response.decode('utf-8'))['keys']
-
-    def _verify_jwt_token(self, token: str):
+        client, path = self._clients.for_url(keys_url)
+        response = client.get(path)
+        if response.status != 200:
+            raise ValueError(
+                f'Could not fetch the signing keys of the user pool: HTTP {response.status}')
+        self._cognito_keys = json.loads(response.body.decode('utf-8'))['keys']
+        self._verifier.load_keys(self._cognito_keys)
+
+    def _verify_jwt_token(self, token: str) -> Dict[str, object]:
         # https://github.com/awslabs/aws-support-tools/blob/master/Cognito/decode-verify-jwt/decode-verify-jwt.py
 
-        headers = jwt.get_unverified_headers(token)
-        kid = headers['kid']
-
-        key = next((k for k in self._cognito_keys if k['kid'] == kid), None)
-        if key is None:
-            raise JwkNotFoundError('')
-
-        public_key = jwk.construct(key)
-
-        # Get the last two sections of the token.
-        message, encoded_signature = str(token).rsplit('.', 1)
-
-        # Decode the signature.
-        decoded_signature = base64url_decode(encoded_signature.encode('utf-8'))
+        # The token is split and decoded only once, by the verifier.
+        claims = self._verifier.verify(token).claims
+        self._check_claims(claims)
+        return claims
 
-        if not public_key.verify(message.encode('utf8'), decoded_signature):
-            raise JwtVerificationFailedError(
-                JwtVerificationFailedError.INVALID_SIGNATURE,
-                'Invalid token signature'
-            )
+    def _check_claims(self, claims: Dict[str, object]) -> None:
 
-        claims = jwt.get_unverified_claims(token)
-        if time.time() > claims['exp']:
+        # REST API authorizers send exp as a date string.
+        exp = parse_numeric_date(claims.get('exp'))
+        if exp is None or time.time() > exp:
             # Token expired
             raise JwtVerificationFailedError(
                 JwtVerificationFailedError.TOKEN_EXPIRED,
                 'Token expired'
             )
 
-        if claims['aud'] != self._client_id:
+        # ID tokens carry the client ID in the audience claim, while access
+        # tokens carry it in the client_id claim.
+        audience = claims['aud'] if 'aud' in claims else claims.get('client_id')
+        if audience != self._client_id:
             # Token was not issued for this audience.
             raise JwtVerificationFailedError(
                 JwtVerificationFailedError.INVALID_AUDIENCE,
                 'Invalid audience'
             )
 
-        return claims
-
-    def _verify_roles(self,
-                      user_id: str,
-                      roles: List[str],
-                      fetch_full_profile: bool = False) -> BaseUserProfile:
-
-        # Fetch roles from database.
-        if fetch_full_profile:
-            profile = self._auth_storage.get_user_profile(user_id)
-            user_roles = profile.roles
-        else:
-            profile = None
-            user_roles = self._auth_storage.get_user_roles(user_id)
-
-        # Check that all needed roles are present in the set.
-        for role in roles:
-            if role not in user_roles:
-                raise NotAuthorizedError('Not authorized')
-
-        return profile
-
     def auth(self,
              handler: HandlerCallable,
-             roles: Optional[List[str], Tuple[str]],
-             fetch_full_profile: bool = False) -> HandlerCallable:
-
-        # TODO: Fetch user ID.
-        user_id = ''
+             roles: Optional[Union[List[str], Tuple[str]]],
+             fetch_full_profile: bool = False,
+             scopes: Iterable[str] = None,
+             groups: Iterable[str] = None,
+             claims: Dict[str, ClaimPredicate] = None) -> HandlerCallable:
+        """
+        Wraps a (token, body) handler so that it is only called for users that
+        meet the given requirements. See AuthSpec for their meaning. Handlers
+        that also take a profile parameter get the user profile, if it is
+        fetched.
+
+        Tokens are taken from the claims checked by the API Gateway authorizer,
+        which verified their signature, so only their expiry and audience are
+        checked again. The requirements are compiled once, here. The
+        authorization storage is only queried if roles are required or the
+        full profile is fetched.
+        """
+
+        authorize = AuthSpec(
+            scopes=scopes,
+            groups=groups,
+            claims=claims,
+            roles=roles,
+            fetch_full_profile=fetch_full_profile,
+            storage=self._auth_storage
+        ).compile()
+
+        try:
+            pass_profile = 'profile' in inspect.signature(handler).parameters
+        except (TypeError, ValueError):
+            pass_profile = False
 
         @functools.wraps(handler)
         def wrapper(token: JwtToken, body: Dict[str, object]) -> HttpResponse:
 
-            # TODO: Add raw token to JwtToken to be consumed here.
-            self._verify_jwt_token(token.raw)
-            profile = self._verify_roles(user_id, roles, fetch_full_profile)
-
-            # TODO: Pass the profile to the handler in a context object.
-            response = handler(token, body)
-            return response
-
+            try:
+                # Expired tokens are rejected before the storage is queried.
+                if token is not None:
+                    self._check_claims(token.claims)
+                profile = authorize(token)
+            except NotAuthorizedError as err:
+                return HttpResponse.build_error_response(err.status_code, message=str(err))
+            except JwtVerificationFailedError as err:
+                return HttpResponse.build_error_response(401, message=str(err))
+
+            if pass_profile:
+                return handler(token, body, profile=profile)
+            return handler(token, body)
+
+        # Routes bind parameters by the signature of the wrapper, not by that
+        # of the handler.
+        del wrapper.__wrapped__
         return wrapper
@@ -0,0 +1,157 @@
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Union
+
+from pyrazine.auth.base import BaseAuthStorage, BaseUserProfile, NotAuthorizedError
+from pyrazine.jwt import JwtToken
+
+
+AuthCallable = Callable[[Optional[JwtToken]], Optional[BaseUserProfile]]
+
+ClaimPredicate = Union[object, Callable[[object], bool]]
+
+# Claims that hold the scopes granted to a token: space-separated strings in
+# OAuth 2.0 access tokens and lists in Okta tokens.
+SCOPE_CLAIMS = ('scope', 'scp')
+
+GROUPS_CLAIM = 'cognito:groups'
+
+
+def claim_values(value: object) -> FrozenSet[str]:
+    """
+    Returns the set of values of a claim that can hold several of them, which
+    may be a list, a space-separated string, or the "[a b]" string HTTP API
+    JWT authorizers turn lists into.
+    """
+    if value is None:
+        return frozenset()
+
+    if isinstance(value, str):
+        if value.startswith('[') and value.endswith(']'):
+            value = value[1:-1]
+        return frozenset(value.split())
+
+    return frozenset(str(item) for item in value)
+
+
+class AuthSpec(object):
+    """
+    Declares the requirements a request must meet to reach a route handler.
+
+    Requirements on the claims of the token are checked first, without any
+    I/O. The authorization storage is only consulted if the spec requires
+    roles or the full user profile.
+    """
+
+    def __init__(self,
+                 scopes: Iterable[str] = None,
+                 groups: Iterable[str] = None,
+                 claims: Dict[str, ClaimPredicate] = None,
+                 roles: Iterable[str] = None,
+                 fetch_full_profile: bool = False,
+                 storage: BaseAuthStorage = None,
+                 groups_claim: str = GROUPS_CLAIM):
+        """
+
+        :param scopes: The scopes the token must have been granted, all of them.
+        Scopes, groups and roles are lists, or space-separated strings.
+        :param groups: The groups the user must belong to, at least one of them.
+        :param claims: Claims the token must have, indexed by name. Each value
+        is either the expected value of the claim, or a function that takes the
+        value (None if the claim is missing) and returns True if it is valid.
+        :param roles: The roles the user must have in the storage, all of them.
+        :param fetch_full_profile: True, if the user profile must be fetched
+        from the storage instead of the roles only.
+        :param storage: The storage to fetch user roles and profiles from.
+        Required if roles are set or the full profile is fetched.
+        :param groups_claim: The claim that lists the groups of the user.
+        """
+
+        self.scopes = scopes or ()
+        self.groups = groups or ()
+        self.claims = dict(claims or {})
+        self.roles = roles or ()
+        self.fetch_full_profile = fetch_full_profile
+        self.storage = storage
+        self.groups_claim = groups_claim
+
+    @property
+    def needs_storage(self) -> bool:
+        return bool(self.roles) or self.fetch_full_profile
+
+    def _compile_claim_checks(self) -> List[Callable[[Dict[str, object]], bool]]:
+
+        checks = []
+
+        for name, predicate in self.claims.items():
+            if callable(predicate):
+                checks.append(lambda claims, name=name, predicate=predicate:
+                              bool(predicate(claims.get(name))))
+            else:
+                checks.append(lambda claims, name=name, expected=predicate:
+                              claims.get(name) == expected)
+
+        # The required values are turned into sets once, here, and may be
+        # given as lists or as space-separated strings, like the claims.
+        if self.scopes:
+            required_scopes = claim_values(self.scopes)
+
+            def check_scopes(claims):
+                for scope_claim in SCOPE_CLAIMS:
+                    value = claims.get(scope_claim)
+                    if value is not None:
+                        return required_scopes <= claim_values(value)
+                return False
+
+            checks.append(check_scopes)
+
+        if self.groups:
+            allowed_groups = claim_values(self.groups)
+            groups_claim = self.groups_claim
+            checks.append(lambda claims: not allowed_groups.isdisjoint(
+                claim_values(claims.get(groups_claim))))
+
+        return checks
+
+    def compile(self) -> AuthCallable:
+        """
+        Builds the function that checks a token against the spec. It is meant
+        to be called once, when the route is registered.
+
+        The function returns the user profile if the spec fetches it, None
+        otherwise, and raises NotAuthorizedError with a 401 status code if
+        there is no token or a 403 one if the requirements are not met.
+        """
+
+        if self.needs_storage and self.storage is None:
+            raise ValueError('An authorization storage is required to check roles or profiles.')
+
+        checks = tuple(self._compile_claim_checks())
+        storage = self.storage if self.needs_storage else None
+        required_roles = claim_values(self.roles)
+        fetch_full_profile = self.fetch_full_profile
+
+        def authorize(token: Optional[JwtToken]) -> Optional[BaseUserProfile]:
+
+            if token is None:
+                raise NotAuthorizedError('Not authenticated', 401)
+
+            claims = token.claims
+            for check in checks:
+                if not check(claims):
+                    raise NotAuthorizedError()
+
+            if storage is None:
+                return None
+
+            if fetch_full_profile:
+                profile = storage.get_user_profile(token.sub)
+                user_roles = profile.roles if profile is not None else ()
+            else:
+                profile = None
+                user_roles = storage.get_user_roles(token.sub)
+
+            if not required_roles.issubset(user_roles or ()):
+                raise NotAuthorizedError()
+
+            return profile
+
+        return authorize
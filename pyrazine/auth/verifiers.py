@@ -0,0 +1,282 @@
+import base64
+import binascii
+import json
+from abc import ABC, abstractmethod
+from typing import Dict, FrozenSet, List
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa
+    from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+except ImportError:
+    ec = None
+
+try:
+    from jwt import algorithms as pyjwt_algorithms
+except ImportError:
+    pyjwt_algorithms = None
+
+try:
+    from jose import jwk as jose_jwk
+except ImportError:
+    jose_jwk = None
+
+
+class JwkNotFoundError(Exception):
+    pass
+
+
+class JwtVerificationFailedError(Exception):
+
+    INVALID_SIGNATURE = 1
+    TOKEN_EXPIRED = 2
+    INVALID_AUDIENCE = 3
+    MALFORMED_TOKEN = 4
+    UNSUPPORTED_ALGORITHM = 5
+    INVALID_KEY = 6
+
+    def __init__(self, error_code: int, message: str):
+        super().__init__(message)
+        self._error_code = error_code
+
+    @property
+    def error_code(self) -> int:
+        return self._error_code
+
+
+def _base64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _base64url_to_int(data: str) -> int:
+    return int.from_bytes(_base64url_decode(data), 'big')
+
+
+class CompactJws(object):
+    """
+    A JWT in JWS compact serialization, split and decoded once so that its
+    header, claims and signature can be used without parsing it again.
+    """
+
+    __slots__ = ('header', 'claims', 'signing_input', 'signature')
+
+    def __init__(self, token: str):
+        """
+        :param token: The encoded token.
+        :raises JwtVerificationFailedError: If the token is malformed.
+        """
+        try:
+            signing_input, encoded_signature = token.rsplit('.', 1)
+            encoded_header, encoded_claims = signing_input.split('.')
+
+            self.header: Dict[str, object] = json.loads(_base64url_decode(encoded_header))
+            self.claims: Dict[str, object] = json.loads(_base64url_decode(encoded_claims))
+            self.signing_input: bytes = signing_input.encode('ascii')
+            self.signature: bytes = _base64url_decode(encoded_signature)
+        except (ValueError, binascii.Error, UnicodeError) as err:
+            raise JwtVerificationFailedError(
+                JwtVerificationFailedError.MALFORMED_TOKEN, 'Malformed token') from err
+
+        if not isinstance(self.header, dict) or not isinstance(self.claims, dict):
+            raise JwtVerificationFailedError(
+                JwtVerificationFailedError.MALFORMED_TOKEN, 'Malformed token')
+
+
+# The key type and curve of the JWKs each algorithm can be used with.
+KEY_TYPES = {
+    'RS256': ('RSA', None),
+    'ES256': ('EC', 'P-256'),
+}
+
+
+def _check_key_type(jwk: Dict[str, object], algorithm: str) -> None:
+    """
+    Checks that a JWK can be used with the algorithm of a token, which comes
+    from the token itself, so it cannot be trusted to match the key.
+    """
+    key_type, curve = KEY_TYPES[algorithm]
+    if jwk.get('kty') != key_type or jwk.get('crv') != curve or \
+            jwk.get('alg', algorithm) != algorithm:
+        raise JwtVerificationFailedError(
+            JwtVerificationFailedError.INVALID_KEY,
+            f'Key {jwk.get("kid")} cannot be used with algorithm {algorithm}')
+
+
+class BaseJwtVerifier(ABC):
+    """
+    Verifies the signature of JWTs against a set of JSON Web Keys. Keys are
+    turned into the key objects of the backend the first time they are used,
+    and reused for every token signed with them afterwards.
+    """
+
+    ALGORITHMS: FrozenSet[str] = frozenset(['RS256', 'ES256'])
+
+    def __init__(self):
+        self._jwks = {}
+        self._keys = {}
+
+    def load_keys(self, jwks: List[Dict[str, object]]) -> None:
+        """
+        Sets the keys that tokens can be signed with, e.g. the keys from the
+        JWKS endpoint of a Cognito user pool.
+
+        :param jwks: The list of keys, as JWK dictionaries.
+        """
+        self._jwks = {key['kid']: key for key in jwks}
+        self._keys = {}
+
+    def _get_key(self, kid: str, algorithm: str) -> object:
+
+        key = self._keys.get((kid, algorithm))
+        if key is None:
+            jwk = self._jwks.get(kid)
+            if jwk is None:
+                raise JwkNotFoundError(f'No key found with ID {kid}')
+
+            _check_key_type(jwk, algorithm)
+            try:
+                key = self._load_key(jwk, algorithm)
+            except Exception as err:
+                # Backends raise their own errors for incomplete or invalid keys.
+                raise JwtVerificationFailedError(
+                    JwtVerificationFailedError.INVALID_KEY, f'Invalid key {kid}') from err
+            self._keys[(kid, algorithm)] = key
+
+        return key
+
+    @abstractmethod
+    def _load_key(self, jwk: Dict[str, object], algorithm: str) -> object:
+        """
+        Builds the key object of the backend from a JWK.
+        """
+        pass
+
+    @abstractmethod
+    def _verify_signature(self, key: object, algorithm: str, jws: CompactJws) -> bool:
+        """
+        Returns True if the signature of the token is valid for the key.
+        """
+        pass
+
+    def verify(self, token: str) -> CompactJws:
+        """
+        Parses a token and verifies its signature. Claims are not validated.
+
+        :param token: The encoded token.
+        :return: The parsed token.
+        :raises JwtVerificationFailedError: If the token is malformed, signed
+        with an unsupported algorithm or with one its key cannot be used with,
+        or the signature is invalid.
+        :raises JwkNotFoundError: If the token was signed with an unknown key.
+        """
+        jws = CompactJws(token)
+
+        algorithm = jws.header.get('alg')
+        if algorithm not in self.ALGORITHMS:
+            raise JwtVerificationFailedError(
+                JwtVerificationFailedError.UNSUPPORTED_ALGORITHM,
+                f'Unsupported algorithm {algorithm}')
+
+        key = self._get_key(jws.header.get('kid'), algorithm)
+        if not self._verify_signature(key, algorithm, jws):
+            raise JwtVerificationFailedError(
+                JwtVerificationFailedError.INVALID_SIGNATURE,
+                'Invalid token signature'
+            )
+
+        return jws
+
+
+class CryptographyJwtVerifier(BaseJwtVerifier):
+    """
+    Verifies signatures with the cryptography package.
+    """
+
+    def __init__(self):
+        if ec is None:
+            raise ImportError('The cryptography package is required by this verifier.')
+        super().__init__()
+
+    def _load_key(self, jwk: Dict[str, object], algorithm: str) -> object:
+        if algorithm == 'RS256':
+            return rsa.RSAPublicNumbers(
+                _base64url_to_int(jwk['e']),
+                _base64url_to_int(jwk['n'])).public_key()
+
+        return ec.EllipticCurvePublicNumbers(
+            _base64url_to_int(jwk['x']),
+            _base64url_to_int(jwk['y']),
+            ec.SECP256R1()).public_key()
+
+    def _verify_signature(self, key: object, algorithm: str, jws: CompactJws) -> bool:
+        try:
+            if algorithm == 'RS256':
+                key.verify(jws.signature, jws.signing_input, padding.PKCS1v15(), hashes.SHA256())
+            else:
+                # JWS signatures are the raw concatenation of r and s, while
+                # cryptography expects them DER-encoded.
+                if len(jws.signature) != 64:
+                    return False
+                signature = encode_dss_signature(
+                    int.from_bytes(jws.signature[:32], 'big'),
+                    int.from_bytes(jws.signature[32:], 'big'))
+                key.verify(signature, jws.signing_input, ec.ECDSA(hashes.SHA256()))
+        except InvalidSignature:
+            return False
+
+        return True
+
+
+class PyJwtVerifier(BaseJwtVerifier):
+    """
+    Verifies signatures with the algorithms of the PyJWT package.
+    """
+
+    def __init__(self):
+        # PyJWT only provides RSA and EC algorithms if cryptography is installed.
+        if pyjwt_algorithms is None or not getattr(pyjwt_algorithms, 'has_crypto', False):
+            raise ImportError('The PyJWT and cryptography packages are required by this verifier.')
+        super().__init__()
+
+        self._algorithms = {
+            'RS256': pyjwt_algorithms.RSAAlgorithm(pyjwt_algorithms.RSAAlgorithm.SHA256),
+            'ES256': pyjwt_algorithms.ECAlgorithm(pyjwt_algorithms.ECAlgorithm.SHA256),
+        }
+
+    def _load_key(self, jwk: Dict[str, object], algorithm: str) -> object:
+        return self._algorithms[algorithm].from_jwk(jwk)
+
+    def _verify_signature(self, key: object, algorithm: str, jws: CompactJws) -> bool:
+        return self._algorithms[algorithm].verify(jws.signing_input, key, jws.signature)
+
+
+class JoseJwtVerifier(BaseJwtVerifier):
+    """
+    Verifies signatures with python-jose, which may use pure-Python backends.
+    """
+
+    def __init__(self):
+        if jose_jwk is None:
+            raise ImportError('The python-jose package is required by this verifier.')
+        super().__init__()
+
+    def _load_key(self, jwk: Dict[str, object], algorithm: str) -> object:
+        return jose_jwk.construct(jwk, algorithm)
+
+    def _verify_signature(self, key: object, algorithm: str, jws: CompactJws) -> bool:
+        return key.verify(jws.signing_input, jws.signature)
+
+
+def get_default_verifier() -> BaseJwtVerifier:
+    """
+    Returns a verifier that uses the fastest backend installed: cryptography,
+    PyJWT or python-jose, in that order.
+    """
+    for verifier_class in (CryptographyJwtVerifier, PyJwtVerifier, JoseJwtVerifier):
+        try:
+            return verifier_class()
+        except ImportError:
+            pass
+
+    raise ImportError('No JWT signature verification backend is installed.')
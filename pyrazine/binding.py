@@ -0,0 +1,329 @@
+import inspect
+import re
+import typing
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Tuple, Union
+
+from pyrazine.auth.base import BaseUserProfile
+from pyrazine.events import BaseHttpEvent
+from pyrazine.jwt import JwtToken
+from pyrazine.response import HttpResponse
+from pyrazine.typing import LambdaContext
+
+
+# Calls a route handler with the parameters it declares, taken from the
+# request event, the decoded body, the Lambda context, the user profile
+# fetched by the authorization spec and the parameters of the path.
+HandlerCaller = Callable[
+    [Callable, BaseHttpEvent, object, Optional[LambdaContext], Optional[BaseUserProfile],
+     Dict[str, str]],
+    HttpResponse
+]
+
+
+class BindingError(ValueError):
+    """
+    Raised when a parameter declared by a handler cannot be taken from the
+    request, e.g. a required query parameter is missing.
+    """
+    pass
+
+
+# The expressions that produce each of the values handlers can ask for by
+# parameter name, evaluated only if the handler declares the parameter.
+NAMED_SOURCES = {
+    'token': 'event.jwt',
+    'jwt': 'event.jwt',
+    'body': 'body',
+    'context': 'context',
+    'event': 'event',
+    'request': 'event',
+    'headers': 'event.get_headers()',
+    'query': 'event.get_query_params()',
+    'query_params': 'event.get_query_params()',
+    'cookies': 'event.get_cookies()',
+    'profile': 'profile',
+    'path_params': 'path_params',
+}
+
+# The same values, asked for by annotation.
+ANNOTATED_SOURCES = (
+    (JwtToken, 'event.jwt'),
+    (BaseHttpEvent, 'event'),
+    (LambdaContext, 'context'),
+    (BaseUserProfile, 'profile'),
+)
+
+_PATH_PARAMETER = re.compile(r'{(\w+)(\+?)}')
+
+
+def compile_path_template(path: str) -> Optional[Tuple[Pattern, Tuple[str, ...]]]:
+    """
+    Compiles a path with parameters, like /items/{item_id} or /files/{key+},
+    into a regular expression that matches the paths of requests to it.
+
+    :param path: The path of the route.
+    :return: The compiled expression and the names of the parameters, or None
+    if the path has no parameters.
+    """
+
+    names = []
+    pattern = []
+    position = 0
+    for match in _PATH_PARAMETER.finditer(path):
+        name, greedy = match.groups()
+        names.append(name)
+        pattern.append(re.escape(path[position:match.start()]))
+        pattern.append(f'(?P<{name}>.+)' if greedy else f'(?P<{name}>[^/]+)')
+        position = match.end()
+
+    if not names:
+        return None
+
+    pattern.append(re.escape(path[position:]))
+    return re.compile(''.join(pattern)), tuple(names)
+
+
+def _to_bool(value: str) -> bool:
+    lowered = value.lower()
+    if lowered in ('true', '1', 'yes', 'on'):
+        return True
+    if lowered in ('false', '0', 'no', 'off', ''):
+        return False
+    raise ValueError(f'Invalid boolean {value}')
+
+
+_SCALAR_CONVERSIONS = {
+    str: None,
+    int: int,
+    float: float,
+    bool: _to_bool,
+}
+
+
+def _unwrap_optional(annotation: object) -> Tuple[object, bool]:
+    if typing.get_origin(annotation) is Union:
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0], True
+    return annotation, False
+
+
+def _build_converter(annotation: object,
+                     description: str) -> Tuple[Optional[Callable[[str], object]], bool]:
+    """
+    Returns the function that converts a string parameter to the type of its
+    annotation, None if no conversion is needed, and whether the parameter
+    takes all the values of the key instead of the first one.
+    """
+
+    annotation, _ = _unwrap_optional(annotation)
+
+    multiple = annotation is list or typing.get_origin(annotation) in (list, List)
+    if multiple:
+        args = typing.get_args(annotation)
+        annotation = args[0] if args else str
+
+    if annotation is inspect.Parameter.empty or annotation is typing.Any:
+        annotation = str
+
+    if annotation not in _SCALAR_CONVERSIONS:
+        raise TypeError(f'Unsupported annotation {annotation!r} for {description}')
+
+    conversion = _SCALAR_CONVERSIONS[annotation]
+    if conversion is None:
+        return None, multiple
+
+    def convert(value):
+        try:
+            return conversion(value)
+        except ValueError:
+            raise BindingError(f'Invalid {description}') from None
+
+    return convert, multiple
+
+
+def _build_query_getter(name: str, parameter: inspect.Parameter, annotation: object) -> Callable:
+
+    description = f'query parameter {name}'
+    convert, multiple = _build_converter(annotation, description)
+    _, optional = _unwrap_optional(annotation)
+
+    if parameter.default is not inspect.Parameter.empty:
+        required, default = False, parameter.default
+    else:
+        required, default = not optional, None
+
+    def get(event):
+        query_params = event.get_query_params()
+        if multiple:
+            values = query_params.getall(name)
+            if values is None:
+                if required:
+                    raise BindingError(f'Missing {description}')
+                return default
+            return [convert(value) for value in values] if convert is not None else values
+
+        value = query_params.get(name)
+        if value is None:
+            if required:
+                raise BindingError(f'Missing {description}')
+            return default
+        return convert(value) if convert is not None else value
+
+    return get
+
+
+def _get_annotations(function: Callable) -> Dict[str, object]:
+    try:
+        return typing.get_type_hints(function)
+    except Exception:
+        # Unresolvable forward references: fall back to the raw annotations.
+        return getattr(function, '__annotations__', {})
+
+
+def _resolve_source(parameter: inspect.Parameter,
+                    annotation: object,
+                    path_params: Iterable[str],
+                    body_type: Optional[type]) -> Optional[str]:
+    """
+    Returns the expression of the value a parameter asks for by annotation,
+    name or path parameter, or None if it does not ask for any of them.
+    """
+
+    if isinstance(annotation, type):
+        if body_type is not None and annotation is body_type:
+            return 'body'
+        for source_type, expression in ANNOTATED_SOURCES:
+            if issubclass(annotation, source_type):
+                return expression
+
+    if parameter.name in path_params:
+        return None
+
+    return NAMED_SOURCES.get(parameter.name)
+
+
+def _is_binding_annotation(annotation: object, body_type: Optional[type]) -> bool:
+    """
+    Returns True if an annotation asks for a value the handler would not get
+    as token or body: a query parameter type, or a value taken by annotation.
+    """
+
+    if isinstance(annotation, type) and annotation is not JwtToken and \
+            annotation is not body_type and \
+            any(issubclass(annotation, source_type) for source_type, _ in ANNOTATED_SOURCES):
+        return True
+
+    annotation, _ = _unwrap_optional(annotation)
+    if annotation is list or typing.get_origin(annotation) in (list, List):
+        return True
+    return annotation in _SCALAR_CONVERSIONS and annotation is not str
+
+
+def _is_legacy_signature(parameters: List[inspect.Parameter],
+                         annotations: Dict[str, object],
+                         path_params: Iterable[str],
+                         body_type: Optional[type]) -> bool:
+    """
+    Returns True if a handler is called as handler(token, body), like every
+    handler with two positional parameters was before parameters were bound
+    by signature, whatever their names.
+    """
+
+    if len(parameters) != 2:
+        return False
+
+    positional = (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+    for parameter in parameters:
+        annotation = annotations.get(parameter.name, parameter.annotation)
+        if parameter.name in path_params or parameter.kind not in positional or \
+                _is_binding_annotation(annotation, body_type):
+            return False
+    return True
+
+
+def build_handler_caller(function: Callable,
+                         path_params: Iterable[str] = (),
+                         body_type: type = None) -> HandlerCaller:
+    """
+    Inspects the signature of a handler and generates the function that calls
+    it with the parameters it declares. It is meant to be called once, when
+    the route is registered, so requests do not inspect the handler again.
+
+    Parameters are bound by annotation (JwtToken, BaseHttpEvent, LambdaContext,
+    BaseUserProfile, or the class the body is bound into), by name (token,
+    body, context, event, headers, query, cookies, profile, path_params), as
+    path parameters of the route, or else as query parameters, converted to
+    str, int, float, bool or lists of them. Values are only taken from the
+    event for the parameters the handler declares.
+
+    Handlers with exactly two positional parameters are called as
+    handler(token, body), whatever their names, unless they opt in to binding
+    with a path parameter or an annotation that asks for a query parameter or
+    another value, e.g. handler(limit: int, offset: int).
+
+    :param function: The handler function.
+    :param path_params: The names of the parameters in the path of the route.
+    :param body_type: The class the body is bound into, if any.
+    :return: The caller function.
+    :raises TypeError: If a parameter cannot be bound.
+    """
+
+    path_params = frozenset(path_params)
+
+    try:
+        signature = inspect.signature(function)
+    except (TypeError, ValueError):
+        signature = None
+
+    parameters = [
+        parameter for parameter in signature.parameters.values()
+        if parameter.kind not in (inspect.Parameter.VAR_POSITIONAL,
+                                  inspect.Parameter.VAR_KEYWORD)
+    ] if signature is not None else []
+
+    annotations = _get_annotations(function)
+    sources = [
+        _resolve_source(parameter, annotations.get(parameter.name, parameter.annotation),
+                        path_params, body_type)
+        for parameter in parameters
+    ]
+
+    namespace = {}
+    arguments = []
+    if signature is None or _is_legacy_signature(parameters, annotations, path_params, body_type):
+        arguments = ['event.jwt', 'body']
+    elif not parameters:
+        # Wrappers that take *args, like those of decorators, are assumed to
+        # forward them to a (token, body) handler.
+        if any(parameter.kind == inspect.Parameter.VAR_POSITIONAL
+               for parameter in signature.parameters.values()):
+            arguments = ['event.jwt', 'body']
+    else:
+        for parameter, source in zip(parameters, sources):
+            name = parameter.name
+            annotation = annotations.get(name, parameter.annotation)
+
+            if source is None and name in path_params:
+                convert, multiple = _build_converter(annotation, f'path parameter {name}')
+                if multiple:
+                    raise TypeError(f'Path parameter {name} cannot be a list')
+                source = f'path_params[{name!r}]'
+                if convert is not None:
+                    namespace[f'convert_{name}'] = convert
+                    source = f'convert_{name}({source})'
+            elif source is None:
+                namespace[f'get_{name}'] = _build_query_getter(name, parameter, annotation)
+                source = f'get_{name}(event)'
+
+            if parameter.kind == inspect.Parameter.POSITIONAL_ONLY:
+                arguments.append(source)
+            else:
+                arguments.append(f'{name}={source}')
+
+    code = (
+        'def call(handler, event, body, context, profile, path_params):\n'
+        f'    return handler({", ".join(arguments)})'
+    )
+    exec(code, namespace)
+    return namespace['call']
@@ -0,0 +1,504 @@
+import functools
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from pyrazine.typing import LambdaContext
+
+
+# Returned by the tiers for keys they do not hold, as None is a valid value.
+MISSING = object()
+
+KeyFunction = Callable[..., str]
+
+
+def _serialize(value: object) -> bytes:
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _deserialize(data: bytes) -> object:
+    return pickle.loads(data)
+
+
+class MemoryCache(object):
+    """
+    Least recently used cache kept in the memory of the process, bounded by
+    the total size of its values.
+
+    Values are kept as they are, without copying them, so callers must not
+    modify the values they get.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        :param max_bytes: The maximum total size of the values kept, as
+        measured by their serialized size.
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, now: float) -> object:
+        """
+        :return: The value of a key, or MISSING if it is not cached or has
+        expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+
+            value, expires_at, size = entry
+            if expires_at is not None and expires_at <= now:
+                del self._entries[key]
+                self.size -= size
+                return MISSING
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: object, expires_at: Optional[float], size: int) -> None:
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[2]
+
+            # Values larger than the whole budget would only evict everything
+            # else.
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, expires_at, size)
+            self.size += size
+            self._trim()
+
+    def _trim(self, target: int = None) -> None:
+        target = self.max_bytes if target is None else target
+        while self.size > target and self._entries:
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self.size -= size
+
+    def resize(self, max_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._trim()
+
+    def trim_memory(self, fraction: float) -> int:
+        """
+        Evicts the least recently used entries, until the size of the cache is
+        reduced by a fraction.
+
+        :return: The size of the entries evicted.
+        """
+        with self._lock:
+            size = self.size
+            self._trim(int(size * (1 - fraction)))
+            return size - self.size
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache(object):
+    """
+    Cache kept in a SQLite database, meant to be placed in /tmp, which
+    survives across the warm invocations of a Lambda container and is much
+    larger than what can be kept in memory. Values are stored serialized.
+
+    When the database grows over its budget, the least recently read entries
+    are removed first.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        """
+        :param path: The path of the database file, created if needed.
+        :param max_bytes: The maximum total size of the values stored.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+        connection = self._connect()
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS cache_entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+            'expires_at REAL, size INTEGER NOT NULL, accessed_at REAL NOT NULL)')
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS cache_entries_accessed_at ON cache_entries (accessed_at)')
+
+        # The size is tracked in the process after the first read, so writes
+        # only query the database when it has to be trimmed.
+        self._size = connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM cache_entries').fetchone()[0]
+        self._size_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+
+        # SQLite connections cannot be shared between threads, so each thread
+        # opens one and keeps it.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None)
+            # The cache can be rebuilt, so durability is traded for speed.
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            self._local.connection = connection
+        return connection
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, key: str, now: float) -> Tuple[object, Optional[float]]:
+        """
+        :return: The serialized value of a key and the time at which it
+        expires, or MISSING and None if it is not cached or has expired.
+        """
+        connection = self._connect()
+        row = connection.execute(
+            'SELECT value, expires_at FROM cache_entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return MISSING, None
+
+        data, expires_at = row
+        if expires_at is not None and expires_at <= now:
+            self.delete(key)
+            return MISSING, None
+
+        connection.execute('UPDATE cache_entries SET accessed_at = ? WHERE key = ?', (now, key))
+        return data, expires_at
+
+    def set(self, key: str, data: bytes, expires_at: Optional[float], now: float) -> None:
+
+        size = len(data)
+        if size > self.max_bytes:
+            self.delete(key)
+            return
+
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT size FROM cache_entries WHERE key = ?', (key,)).fetchone()
+            connection.execute(
+                'INSERT OR REPLACE INTO cache_entries (key, value, expires_at, size, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?)', (key, data, expires_at, size, now))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        with self._size_lock:
+            self._size += size - (row[0] if row is not None else 0)
+            over_budget = self._size > self.max_bytes
+
+        if over_budget:
+            self.trim(now)
+
+    def trim(self, now: float = None) -> None:
+        """
+        Removes expired entries, and then the least recently read ones until
+        the database is within its budget.
+        """
+        now = time.time() if now is None else now
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (now,))
+            size = connection.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM cache_entries').fetchone()[0]
+
+            if size > self.max_bytes:
+                # Make room for some more entries, so that the next writes do
+                # not have to trim again.
+                target = self.max_bytes * 0.9
+                rows = connection.execute(
+                    'SELECT key, size FROM cache_entries ORDER BY accessed_at')
+                evicted = []
+                for key, entry_size in rows:
+                    if size <= target:
+                        break
+                    evicted.append((key,))
+                    size -= entry_size
+                connection.executemany('DELETE FROM cache_entries WHERE key = ?', evicted)
+
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        with self._size_lock:
+            self._size = size
+
+    def resize(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        if self._size > max_bytes:
+            self.trim()
+
+    def delete(self, key: str) -> None:
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT size FROM cache_entries WHERE key = ?', (key,)).fetchone()
+            connection.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        if row is not None:
+            with self._size_lock:
+                self._size -= row[0]
+
+    def clear(self) -> None:
+        self._connect().execute('DELETE FROM cache_entries')
+        with self._size_lock:
+            self._size = 0
+
+
+class TieredCache(object):
+    """
+    Cache with an in-memory LRU tier over an optional disk tier in /tmp.
+    Values are looked up in memory first, then on disk, where they are copied
+    back to memory from.
+
+    The memory budget is a fraction of the memory of the function, taken from
+    the Lambda context once configure is called with it, or from the
+    AWS_LAMBDA_FUNCTION_MEMORY_SIZE environment variable until then.
+
+        cache = TieredCache(namespace='reference-data')
+
+        @cache.memoize(ttl=300)
+        def get_country(code: str) -> Dict[str, object]:
+            ...
+
+        def lambda_handler(event, context):
+            cache.configure(context)
+            return handler.handle_request(event, context)
+    """
+
+    # The fraction of the memory of the function the memory tier may take.
+    MEMORY_FRACTION = 0.1
+
+    # The memory of the function assumed when it is unknown, in megabytes.
+    DEFAULT_MEMORY_LIMIT_IN_MB = 128
+
+    # The maximum size of the disk tier, and the maximum fraction of the free
+    # space of its directory it may take when it is created.
+    MAX_DISK_BYTES = 256 * 1024 * 1024
+    DISK_FRACTION = 0.5
+
+    def __init__(self,
+                 namespace: str = 'default',
+                 default_ttl: float = None,
+                 memory_bytes: int = None,
+                 disk: bool = True,
+                 disk_bytes: int = None,
+                 directory: str = None):
+        """
+        :param namespace: The name of the cache, which names its database.
+        :param default_ttl: The seconds entries live for, unless set otherwise
+        when they are added. Forever by default.
+        :param memory_bytes: The budget of the memory tier. Defaults to a
+        fraction of the memory of the function, see MEMORY_FRACTION.
+        :param disk: False, to only keep entries in memory.
+        :param disk_bytes: The budget of the disk tier. Defaults to half of the
+        free space of the directory, up to MAX_DISK_BYTES.
+        :param directory: The directory of the database. Defaults to the
+        temporary directory, /tmp in AWS Lambda.
+        """
+
+        self.namespace = namespace
+        self.default_ttl = default_ttl
+        self._fixed_memory_bytes = memory_bytes is not None
+        self._configured = False
+
+        if memory_bytes is None:
+            memory_limit_in_mb = int(os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE') or
+                                     self.DEFAULT_MEMORY_LIMIT_IN_MB)
+            memory_bytes = self._get_memory_budget(memory_limit_in_mb)
+        self.memory = MemoryCache(memory_bytes)
+
+        self._disk_enabled = disk
+        self._disk_bytes = disk_bytes
+        self._directory = directory
+        self._disk: Optional[DiskCache] = None
+        self._disk_lock = threading.Lock()
+
+    def _get_memory_budget(self, memory_limit_in_mb: int) -> int:
+        return int(memory_limit_in_mb * 1024 * 1024 * self.MEMORY_FRACTION)
+
+    def configure(self, context: LambdaContext) -> None:
+        """
+        Sizes the memory tier after the memory of the function. Only the first
+        call has any effect, so it is meant to be made on every invocation.
+        """
+        if self._configured:
+            return
+        self._configured = True
+
+        memory_limit_in_mb = context.memory_limit_in_mb if context is not None else None
+        if memory_limit_in_mb and not self._fixed_memory_bytes:
+            self.memory.resize(self._get_memory_budget(int(memory_limit_in_mb)))
+
+    @property
+    def disk(self) -> Optional[DiskCache]:
+        """
+        The disk tier, opened the first time it is needed, so that caches can
+        be created at import time without touching the file system.
+        """
+        if self._disk is None and self._disk_enabled:
+            with self._disk_lock:
+                if self._disk is None:
+                    directory = self._directory or tempfile.gettempdir()
+                    max_bytes = self._disk_bytes
+                    if max_bytes is None:
+                        free = shutil.disk_usage(directory).free
+                        max_bytes = min(self.MAX_DISK_BYTES, int(free * self.DISK_FRACTION))
+                    path = os.path.join(directory, f'pyrazine-cache-{self.namespace}.sqlite3')
+                    self._disk = DiskCache(path, max_bytes)
+        return self._disk
+
+    def get(self, key: str, default: object = None) -> object:
+        """
+        :return: The value of a key, or the default value if it is not cached
+        or has expired.
+        """
+        now = time.time()
+        value = self.memory.get(key, now)
+        if value is not MISSING:
+            return value
+
+        disk = self.disk
+        if disk is None:
+            return default
+
+        data, expires_at = disk.get(key, now)
+        if data is MISSING:
+            return default
+
+        value = _deserialize(data)
+        self.memory.set(key, value, expires_at, len(data))
+        return value
+
+    def set(self, key: str, value: object, ttl: float = None) -> bool:
+        """
+        Caches the value of a key in both tiers. Values that cannot be pickled,
+        such as generators, locks or memory maps, are not cached, since they
+        could not be reused safely either.
+
+        :param ttl: The seconds the entry lives for. Defaults to the default
+        TTL of the cache.
+        :return: True, if the value was cached.
+        """
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = now + ttl if ttl is not None else None
+
+        # Values are serialized once, to measure them and to store them.
+        try:
+            data = _serialize(value)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return False
+        self.memory.set(key, value, expires_at, len(data))
+
+        disk = self.disk
+        if disk is not None:
+            disk.set(key, data, expires_at, now)
+        return True
+
+    def get_or_set(self, key: str, factory: Callable[[], object], ttl: float = None) -> object:
+        """
+        Returns the value of a key, computing and caching it with the factory
+        function if it is not cached.
+        """
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            value = factory()
+            self.set(key, value, ttl=ttl)
+        return value
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def trim_memory(self, fraction: float) -> int:
+        """
+        Evicts a fraction of the memory tier, see MemoryCache.trim_memory.
+        Evicted entries can still be found on disk. This is what a
+        MemoryGovernor calls when the function runs low on memory.
+        """
+        return self.memory.trim_memory(fraction)
+
+    def memoize(self, function: Callable = None, ttl: float = None, key: KeyFunction = None):
+        """
+        Decorates a function so that its results are cached, e.g. lookups of
+        reference data or configuration. Route handlers, which take tokens and
+        events, need a key function.
+
+        :param function: The function to decorate.
+        :param ttl: The seconds results live for. Defaults to the default TTL
+        of the cache.
+        :param key: A function that takes the same parameters and returns the
+        key of the result. Defaults to the representation of the parameters,
+        which only suits parameters like strings and numbers.
+        :return: The decorated function, with an invalidate function that takes
+        the same parameters and removes the result for them.
+        :raises TypeError: When called without a key function, if a parameter
+        is represented by its address, so its results would never be found.
+        """
+
+        if function is None:
+            return functools.partial(self.memoize, ttl=ttl, key=key)
+
+        prefix = f'{function.__module__}.{function.__qualname__}:'
+
+        if key is None:
+            def build_key(*args, **kwargs):
+                for arg in (*args, *kwargs.values()):
+                    if type(arg).__repr__ is object.__repr__:
+                        raise TypeError(
+                            f'{type(arg).__name__} parameters of {function.__qualname__} '
+                            f'cannot be part of the default key, pass a key function')
+                return prefix + repr((args, sorted(kwargs.items()))) if kwargs else \
+                    prefix + repr(args)
+        else:
+            def build_key(*args, **kwargs):
+                return prefix + key(*args, **kwargs)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            cache_key = build_key(*args, **kwargs)
+            value = self.get(cache_key, MISSING)
+            if value is MISSING:
+                value = function(*args, **kwargs)
+                self.set(cache_key, value, ttl=ttl)
+            return value
+
+        wrapper.invalidate = lambda *args, **kwargs: self.delete(build_key(*args, **kwargs))
+        return wrapper
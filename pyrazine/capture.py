@@ -0,0 +1,258 @@
+import base64
+import copy
+import hashlib
+import hmac
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from pyrazine.typing import LambdaContext
+
+
+REDACTED = '[REDACTED]'
+
+# Headers that carry credentials, which are always redacted.
+DEFAULT_REDACTED_HEADERS = frozenset((
+    'authorization', 'cookie', 'x-api-key', 'proxy-authorization',
+))
+
+# Query parameters that carry credentials, which are always redacted.
+DEFAULT_REDACTED_QUERY_PARAMS = frozenset((
+    'access_token', 'id_token', 'token', 'api_key', 'apikey', 'password', 'code',
+    'x-amz-credential', 'x-amz-security-token', 'x-amz-signature',
+))
+
+# Claims kept when all claims are redacted, because the JWT parser needs them.
+_STRUCTURAL_CLAIMS = frozenset(('iss', 'token_use'))
+
+# Claims replaced with a keyed hash when all claims are redacted, so that
+# requests of the same user, e.g. to a rate limit, can still be told apart.
+_HASHED_CLAIMS = frozenset(('sub',))
+
+# The attributes of the context that are captured.
+_CONTEXT_ATTRIBUTES = (
+    'function_name', 'function_version', 'invoked_function_arn', 'memory_limit_in_mb',
+    'aws_request_id', 'log_group_name', 'log_stream_name',
+)
+
+
+def _redact_json(value: object) -> object:
+    """
+    Replaces the strings of a JSON document with placeholders of the same
+    length, keeping its structure and size, so that replaying it costs the
+    same to parse.
+    """
+    if isinstance(value, str):
+        return 'x' * len(value)
+    if isinstance(value, dict):
+        return {key: _redact_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact_json(item) for item in value]
+    return value
+
+
+def _redact_body(body: Optional[str], is_base64_encoded: bool) -> Optional[str]:
+
+    if not body:
+        return body
+
+    try:
+        data = base64.b64decode(body, validate=True) if is_base64_encoded \
+            else body.encode('utf-8')
+    except ValueError:
+        # Not valid base64, so it is redacted as it is.
+        data = body.encode('utf-8')
+    try:
+        redacted = json.dumps(_redact_json(json.loads(data)), ensure_ascii=False)
+        redacted = redacted.encode('utf-8')
+    except ValueError:
+        redacted = b'x' * len(data)
+
+    return base64.b64encode(redacted).decode('ascii') if is_base64_encoded \
+        else redacted.decode('utf-8')
+
+
+class EventSanitizer(object):
+    """
+    Removes credentials and, optionally, personal data from events before
+    they are captured.
+    """
+
+    def __init__(self,
+                 redact_claims: Union[bool, Iterable[str]] = False,
+                 redact_body: bool = False,
+                 redact_headers: Iterable[str] = (),
+                 redact_query: Union[bool, Iterable[str]] = False):
+        """
+        :param redact_claims: True, to redact every JWT claim but the issuer
+        and token use, and to replace the subject with a hash that is the same
+        for the same subject, or the names of the claims to redact.
+        :param redact_body: True, to replace the strings of JSON bodies, and
+        the whole of other bodies, with placeholders of the same size.
+        :param redact_headers: Headers to redact, besides those carrying
+        credentials, which always are.
+        :param redact_query: True, to redact the values of every query
+        parameter, or the names of the parameters to redact, besides those
+        carrying credentials, which always are.
+        """
+        self._redact_all_claims = redact_claims is True
+        self._redacted_claims = frozenset(redact_claims) \
+            if redact_claims and redact_claims is not True else frozenset()
+        self._redact_body = redact_body
+        self._redacted_headers = DEFAULT_REDACTED_HEADERS | \
+            {header.lower() for header in redact_headers}
+        self._redact_all_query = redact_query is True
+        self._redacted_query = DEFAULT_REDACTED_QUERY_PARAMS | (
+            {name.lower() for name in redact_query}
+            if redact_query and redact_query is not True else frozenset())
+
+        # The key of the hashes of claims, which is never written, so that
+        # they cannot be reversed by hashing guessed values.
+        self._hash_key = os.urandom(32)
+
+    def _hash_claim(self, value: object) -> str:
+        digest = hmac.new(self._hash_key, str(value).encode('utf-8'), hashlib.sha256)
+        return digest.hexdigest()
+
+    def _redact_claims(self, claims: Dict[str, object]) -> Dict[str, object]:
+        if self._redact_all_claims:
+            return {key: value if key in _STRUCTURAL_CLAIMS else
+                    self._hash_claim(value) if key in _HASHED_CLAIMS else REDACTED
+                    for key, value in claims.items()}
+        return {key: REDACTED if key in self._redacted_claims else value
+                for key, value in claims.items()}
+
+    def _is_redacted_query_param(self, name: str) -> bool:
+        return self._redact_all_query or name.lower() in self._redacted_query
+
+    def _redact_query_string(self, query_string: str) -> str:
+        pairs = []
+        for pair in query_string.split('&'):
+            name, separator, _ = pair.partition('=')
+            if separator and self._is_redacted_query_param(urllib.parse.unquote_plus(name)):
+                pair = f'{name}={urllib.parse.quote(REDACTED)}'
+            pairs.append(pair)
+        return '&'.join(pairs)
+
+    def _redact_query_params(self, parameters: Dict[str, object]) -> Dict[str, object]:
+        return {
+            key: (REDACTED if not isinstance(value, list) else [REDACTED] * len(value))
+            if self._is_redacted_query_param(urllib.parse.unquote_plus(key)) else value
+            for key, value in parameters.items()
+        }
+
+    def _redact_headers(self, headers: Dict[str, object]) -> Dict[str, object]:
+        redacted_headers = self._redacted_headers
+        return {
+            key: (REDACTED if not isinstance(value, list) else [REDACTED] * len(value))
+            if key.lower() in redacted_headers else value
+            for key, value in headers.items()
+        }
+
+    def sanitize(self, event: Dict[str, object]) -> Dict[str, object]:
+        """
+        Returns a sanitized copy of an event. The event itself is not modified.
+        """
+
+        event = copy.deepcopy(event)
+
+        for key in ('headers', 'multiValueHeaders'):
+            if event.get(key):
+                event[key] = self._redact_headers(event[key])
+
+        if event.get('cookies'):
+            event['cookies'] = [REDACTED] * len(event['cookies'])
+
+        if event.get('rawQueryString'):
+            event['rawQueryString'] = self._redact_query_string(event['rawQueryString'])
+        for key in ('queryStringParameters', 'multiValueQueryStringParameters'):
+            if event.get(key):
+                event[key] = self._redact_query_params(event[key])
+
+        authorizer = (event.get('requestContext') or {}).get('authorizer')
+        if authorizer:
+            jwt = authorizer.get('jwt')
+            if jwt and jwt.get('claims'):
+                jwt['claims'] = self._redact_claims(jwt['claims'])
+            if authorizer.get('claims'):
+                authorizer['claims'] = self._redact_claims(authorizer['claims'])
+
+        if self._redact_body and event.get('body'):
+            event['body'] = _redact_body(event['body'], event.get('isBase64Encoded'))
+
+        return event
+
+
+class TrafficCapture(object):
+    """
+    Writes the events and contexts received by a LambdaHandler to a file, one
+    JSON object per line, after sanitizing them, so that the traffic can be
+    replayed later with pyrazine.testing.replay.
+
+        handler = LambdaHandler(capture=TrafficCapture('/tmp/traffic.ndjson',
+                                                       redact_claims=True))
+    """
+
+    def __init__(self,
+                 path: str,
+                 sample_rate: float = 1.0,
+                 sanitizer: EventSanitizer = None,
+                 **sanitizer_options):
+        """
+        :param path: The path of the file, which is appended to.
+        :param sample_rate: The fraction of the requests captured.
+        :param sanitizer: The sanitizer of the events. Defaults to one built
+        with the options given, see EventSanitizer.
+        """
+        self.path = path
+        self.sample_rate = sample_rate
+        self._sanitizer = sanitizer if sanitizer is not None \
+            else EventSanitizer(**sanitizer_options)
+        self._file = None
+        self._lock = threading.Lock()
+
+    def capture(self, event: Dict[str, object], context: Optional[LambdaContext]) -> None:
+        """
+        Writes an event and its context, if the request is sampled.
+        """
+
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+
+        line = json.dumps({
+            'captured_at': time.time(),
+            'event': self._sanitizer.sanitize(event),
+            'context': {
+                attribute: getattr(context, attribute, None)
+                for attribute in _CONTEXT_ATTRIBUTES
+            } if context is not None else None,
+        }, default=str)
+
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_capture(path: str) -> Iterator[Tuple[Dict[str, object], Optional[Dict[str, object]]]]:
+    """
+    Reads the events and contexts of a capture file.
+
+    :return: An iterator over pairs of event and context attributes.
+    """
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                yield record['event'], record.get('context')
@@ -0,0 +1,386 @@
+import http.client
+import json
+import ssl
+import threading
+import time
+import urllib.parse
+from typing import Dict, List, Optional, Tuple, Union
+
+import aws_xray_sdk.core
+from aws_xray_sdk.core.models import http as xray_http
+
+from pyrazine.tracer import Tracer
+from pyrazine.typing import LambdaContext
+
+
+# Errors raised when a kept-alive connection was closed by the server while
+# idle.
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+_IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'))
+
+
+class DeadlineExceededError(TimeoutError):
+    """
+    Raised when there is not enough time left in the invocation to make a
+    request.
+    """
+    pass
+
+
+class HttpClientResponse(object):
+    """
+    A response read in full from an HttpClient.
+    """
+
+    __slots__ = ('status', 'headers', 'body')
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> object:
+        return json.loads(self.body)
+
+    def __repr__(self) -> str:
+        return f'HttpClientResponse({self.status}, {len(self.body)} bytes)'
+
+
+class Deadline(object):
+    """
+    Keeps the time by which the current invocation must end, per thread, so
+    that outbound requests do not outlive it.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def set(self, context: Optional[LambdaContext]) -> None:
+        """
+        Sets the deadline from the time left in an invocation, or clears it if
+        there is no context, or it does not tell the time left.
+        """
+        get_remaining_time = getattr(context, 'get_remaining_time_in_millis', None)
+        if get_remaining_time is None:
+            self._local.deadline = None
+        else:
+            self._local.deadline = time.monotonic() + get_remaining_time() / 1000
+
+    def remaining(self) -> Optional[float]:
+        """
+        :return: The seconds left in the invocation, or None if unknown.
+        """
+        deadline = getattr(self._local, 'deadline', None)
+        return deadline - time.monotonic() if deadline is not None else None
+
+
+class HttpClient(object):
+    """
+    Client for a single host that keeps its connections alive between
+    requests, and between the warm invocations of a function, instead of
+    opening one per request.
+
+    Up to pool_size idle connections are kept. Requests made while all of them
+    are busy open new ones, which are closed afterwards if the pool is full.
+    """
+
+    def __init__(self,
+                 base_url: str,
+                 pool_size: int = 4,
+                 timeout: float = 10.0,
+                 deadline_margin: float = 0.5,
+                 headers: Dict[str, str] = None,
+                 deadline: Deadline = None,
+                 trace: bool = True,
+                 tracer: Tracer = None,
+                 ssl_context: ssl.SSLContext = None):
+        """
+        :param base_url: The scheme and host of the server, e.g.
+        https://cognito-idp.eu-west-1.amazonaws.com. Paths of requests are
+        relative to it.
+        :param pool_size: The maximum number of idle connections kept.
+        :param timeout: The maximum seconds a request may wait for the server,
+        to connect or for each read.
+        :param deadline_margin: The seconds to leave between the end of a
+        request and the end of the invocation, to build the response.
+        :param headers: Headers sent with every request.
+        :param deadline: The deadline of invocations, which shortens the
+        timeout as the invocation runs out of time.
+        :param trace: True, if requests should be traced in X-Ray subsegments.
+        :param tracer: The tracer to use. Defaults to one with the global
+        recorder.
+        :param ssl_context: The SSL context of HTTPS connections.
+        """
+
+        parsed = urllib.parse.urlsplit(base_url)
+        if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+            raise ValueError(f'Invalid base URL {base_url}')
+
+        self.base_url = f'{parsed.scheme}://{parsed.netloc}'
+        self.host = parsed.hostname
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.deadline_margin = deadline_margin
+        self.headers = dict(headers or {})
+
+        self._scheme = parsed.scheme
+        self._port = parsed.port
+        self._deadline = deadline
+        self._trace = trace
+        self._tracer = tracer if tracer is not None else Tracer() if trace else None
+        self._ssl_context = ssl_context if ssl_context is not None or parsed.scheme == 'http' \
+            else ssl.create_default_context()
+
+        self._idle: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def _new_connection(self, timeout: float) -> http.client.HTTPConnection:
+        if self._scheme == 'https':
+            return http.client.HTTPSConnection(
+                self.host, self._port, timeout=timeout, context=self._ssl_context)
+        return http.client.HTTPConnection(self.host, self._port, timeout=timeout)
+
+    def _acquire(self, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+
+        if connection is None:
+            return self._new_connection(timeout), False
+
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return connection, True
+
+    def _release(self, connection: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def get_timeout(self, timeout: float = None) -> float:
+        """
+        Returns the timeout of a request, shortened to the time left in the
+        invocation.
+
+        :raises DeadlineExceededError: If there is not enough time left.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        remaining = self._deadline.remaining() if self._deadline is not None else None
+        if remaining is not None:
+            remaining -= self.deadline_margin
+            if remaining <= 0:
+                raise DeadlineExceededError(
+                    f'Not enough time left in the invocation to call {self.host}')
+            timeout = min(timeout, remaining)
+        return timeout
+
+    def _send(self,
+              method: str,
+              path: str,
+              body: Optional[bytes],
+              headers: Dict[str, str],
+              timeout: float) -> HttpClientResponse:
+
+        connection, reused = self._acquire(timeout)
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            result = HttpClientResponse(
+                response.status,
+                {key.lower(): value for key, value in response.getheaders()},
+                response.read())
+        except _STALE_CONNECTION_ERRORS:
+            connection.close()
+            # An idle connection may have been closed by the server. Requests
+            # that are safe to repeat are retried on the next idle connection,
+            # or on a new one once there are none left.
+            if not reused or method not in _IDEMPOTENT_METHODS:
+                raise
+            return self._send(method, path, body, headers, self.get_timeout(timeout))
+        except BaseException:
+            connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(connection)
+
+        return result
+
+    def request(self,
+                method: str,
+                path: str = '/',
+                body: Union[bytes, str, None] = None,
+                json_body: object = None,
+                headers: Dict[str, str] = None,
+                timeout: float = None) -> HttpClientResponse:
+        """
+        Makes a request to the server, on an idle connection if there is one.
+
+        :param method: The HTTP method.
+        :param path: The path and query string of the request.
+        :param body: The body of the request.
+        :param json_body: An object to send as the JSON body of the request,
+        instead of body.
+        :param headers: Headers of the request, added to those of the client.
+        :param timeout: The timeout of the request. Defaults to that of the
+        client. Either is shortened to the time left in the invocation.
+        :return: The response, read in full.
+        :raises DeadlineExceededError: If there is not enough time left in the
+        invocation to make the request.
+        """
+
+        method = method.upper()
+        request_headers = dict(self.headers, **headers) if headers else dict(self.headers)
+        if json_body is not None:
+            body = json.dumps(json_body)
+            request_headers.setdefault('content-type', 'application/json')
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        timeout = self.get_timeout(timeout)
+
+        if not self._trace:
+            return self._send(method, path, body, request_headers, timeout)
+
+        with self._tracer.in_subsegment(name=self.host, namespace='remote') as subsegment:
+            if subsegment is not None:
+                subsegment.put_http_meta(xray_http.URL, self.base_url + path)
+                subsegment.put_http_meta(xray_http.METHOD, method)
+
+            response = self._send(method, path, body, request_headers, timeout)
+
+            if subsegment is not None:
+                subsegment.put_http_meta(xray_http.STATUS, response.status)
+            return response
+
+    def get(self, path: str = '/', **kwargs) -> HttpClientResponse:
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path: str = '/', **kwargs) -> HttpClientResponse:
+        return self.request('POST', path, **kwargs)
+
+    def put(self, path: str = '/', **kwargs) -> HttpClientResponse:
+        return self.request('PUT', path, **kwargs)
+
+    def delete(self, path: str = '/', **kwargs) -> HttpClientResponse:
+        return self.request('DELETE', path, **kwargs)
+
+    def close(self) -> None:
+        """
+        Closes the idle connections.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+class ClientRegistry(object):
+    """
+    Keeps the HTTP clients of a function, one per host, so that handlers and
+    pyrazine itself share connections instead of opening their own.
+
+    Clients are meant to be registered once, at initialization, and used by
+    name from handlers:
+
+        clients = default_client_registry
+        clients.register('payments', 'https://api.payments.example.com', pool_size=8)
+
+        @handler.route(path='/charges', methods=('POST',))
+        def create_charge(body):
+            response = clients['payments'].post('/v1/charges', json_body=body)
+            ...
+    """
+
+    def __init__(self,
+                 trace: bool = True,
+                 recorder: aws_xray_sdk.core.xray_recorder = None,
+                 **defaults):
+        """
+        :param trace: True, if requests should be traced by default.
+        :param recorder: The X-Ray recorder to use. Defaults to the global one.
+        :param defaults: The default options of the clients, see HttpClient.
+        """
+        self.deadline = Deadline()
+        self._trace = trace
+        self._tracer = Tracer(recorder=recorder)
+        self._defaults = defaults
+        self._clients: Dict[str, HttpClient] = {}
+        self._lock = threading.Lock()
+
+    def _create(self, base_url: str, options: Dict[str, object]) -> HttpClient:
+        options = dict(self._defaults, **options)
+        options.setdefault('trace', self._trace)
+        return HttpClient(base_url, deadline=self.deadline, tracer=self._tracer, **options)
+
+    def register(self, name: str, base_url: str, **options) -> HttpClient:
+        """
+        Creates the client of a server and registers it under a name.
+
+        :param name: The name of the client.
+        :param base_url: The scheme and host of the server.
+        :param options: The options of the client, see HttpClient.
+        :return: The client.
+        """
+        client = self._create(base_url, options)
+        with self._lock:
+            previous = self._clients.get(name)
+            self._clients[name] = client
+        if previous is not None:
+            previous.close()
+        return client
+
+    def __getitem__(self, name: str) -> HttpClient:
+        return self._clients[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._clients
+
+    def for_url(self, url: str, **options) -> Tuple[HttpClient, str]:
+        """
+        Returns the client of the host of a URL, creating it the first time.
+
+        :param url: The absolute URL.
+        :param options: The options of the client, if it is created.
+        :return: The client and the path of the URL, with its query string.
+        """
+        parsed = urllib.parse.urlsplit(url)
+        base_url = f'{parsed.scheme}://{parsed.netloc}'
+        path = parsed.path or '/'
+        if parsed.query:
+            path = f'{path}?{parsed.query}'
+
+        client = self._clients.get(base_url)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(base_url)
+                if client is None:
+                    client = self._clients[base_url] = self._create(base_url, options)
+
+        return client, path
+
+    def set_deadline(self, context: Optional[LambdaContext]) -> None:
+        """
+        Sets the deadline of the requests made by the current thread from the
+        time left in an invocation. LambdaHandler does it for every request.
+        """
+        self.deadline.set(context)
+
+    def close(self) -> None:
+        with self._lock:
+            clients = list(self._clients.values())
+        for client in clients:
+            client.close()
+
+
+default_client_registry = ClientRegistry()
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from pyrazine.events import BaseHttpEvent
+from pyrazine.handlers import LambdaHandler
+from pyrazine.response import HttpResponse, get_status_line
+from pyrazine.structures import CaseInsensitiveMultiDict
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsgiRequest(BaseHttpEvent):
+    """
+    Exposes an ASGI HTTP connection scope through the BaseHttpEvent interface,
+    so that it can be dispatched by a LambdaHandler. Values are read
+    from the scope on demand, instead of being copied into an event dictionary.
+    """
+
+    def __init__(self, scope: Dict[str, object], body: bytes):
+        self._scope = scope
+        self._headers = None
+
+        self.body = body or None
+        self.is_base64_encoded = False
+        self.jwt = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        if self._headers is None:
+            # ASGI servers already lowercase header names. Repeated headers
+            # are joined with commas, as WSGI servers and API Gateway do.
+            headers = {}
+            for name, value in self._scope['headers']:
+                name, value = name.decode('latin-1'), value.decode('latin-1')
+                headers[name] = f'{headers[name]},{value}' if name in headers else value
+            self._headers = headers
+        return self._headers
+
+    @property
+    def raw_query_string(self) -> str:
+        return self._scope['query_string'].decode('latin-1')
+
+    def _build_headers(self) -> CaseInsensitiveMultiDict:
+        # Unlike the headers property, this keeps repeated headers.
+        return CaseInsensitiveMultiDict(
+            (name.decode('latin-1'), value.decode('latin-1'))
+            for name, value in self._scope['headers'])
+
+    def get_http_method(self) -> str:
+        return self._scope['method']
+
+    def get_http_path(self) -> str:
+        return self._scope['path']
+
+    def get_http_protocol(self) -> str:
+        return 'HTTP/' + self._scope['http_version']
+
+    def get_http_source_ip(self) -> str:
+        client = self._scope.get('client')
+        return client[0] if client else None
+
+    def get_http_user_agent(self) -> str:
+        return self.headers.get('user-agent')
+
+    def get_path(self) -> str:
+        return self._scope['path']
+
+    def get_request_id(self) -> str:
+        return self.headers.get('x-request-id')
+
+
+class WsgiRequest(BaseHttpEvent):
+    """
+    Exposes a WSGI environment through the BaseHttpEvent interface, so that it
+    can be dispatched by a LambdaHandler. Values are read from the
+    environment on demand, instead of being copied into an event dictionary.
+    """
+
+    def __init__(self, environ: Dict[str, object]):
+        self._environ = environ
+        self._headers = None
+
+        try:
+            content_length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+
+        self.body = environ['wsgi.input'].read(content_length) if content_length > 0 else None
+        self.is_base64_encoded = False
+        self.jwt = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        if self._headers is None:
+            headers = {}
+            for key, value in self._environ.items():
+                if key.startswith('HTTP_'):
+                    headers[key[5:].replace('_', '-').lower()] = value
+
+            # These two are not prefixed with HTTP_ in the WSGI environment.
+            if self._environ.get('CONTENT_TYPE'):
+                headers['content-type'] = self._environ['CONTENT_TYPE']
+            if self._environ.get('CONTENT_LENGTH'):
+                headers['content-length'] = self._environ['CONTENT_LENGTH']
+
+            self._headers = headers
+        return self._headers
+
+    @property
+    def raw_query_string(self) -> str:
+        return self._environ.get('QUERY_STRING', '')
+
+    def get_http_method(self) -> str:
+        return self._environ['REQUEST_METHOD']
+
+    def get_http_path(self) -> str:
+        return self._environ.get('PATH_INFO') or '/'
+
+    def get_http_protocol(self) -> str:
+        return self._environ.get('SERVER_PROTOCOL')
+
+    def get_http_source_ip(self) -> str:
+        return self._environ.get('REMOTE_ADDR')
+
+    def get_http_user_agent(self) -> str:
+        return self._environ.get('HTTP_USER_AGENT')
+
+    def get_path(self) -> str:
+        return self.get_http_path()
+
+    def get_request_id(self) -> str:
+        return self._environ.get('HTTP_X_REQUEST_ID')
+
+
+class _BaseAdapter(object):
+
+    def __init__(self, handler: LambdaHandler):
+        self._handler = handler
+
+    def _dispatch(self, request) -> Tuple[int, List[Tuple[str, str]], bytes]:
+
+        try:
+            response = self._handler.dispatch(request)
+        except Exception:
+            logger.exception('Unhandled exception while dispatching request.')
+            response = HttpResponse.build_error_response(500, message='Internal server error')
+
+        status_code, headers, body = response.render()
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        elif not isinstance(body, bytes):
+            # Servers only accept bytes, so binary views have to be copied.
+            body = bytes(body)
+            response.close()
+
+        header_list = list(headers.items())
+        header_list.append(('content-length', str(len(body))))
+
+        return status_code, header_list, body
+
+
+class WsgiAdapter(_BaseAdapter):
+    """
+    Exposes a LambdaHandler as a WSGI application, so that the same route table
+    can be served by gunicorn or any other WSGI server.
+
+    Example::
+
+        handler = LambdaHandler(trace=False)
+        app = WsgiAdapter(handler)
+
+    Requests are mapped directly onto LambdaHandler.dispatch, without building
+    an API Gateway event for each one of them. Since there is no API Gateway
+    authorizer in front of the application, the token passed to the handlers
+    is always None.
+    """
+
+    def __call__(self,
+                 environ: Dict[str, object],
+                 start_response: Callable) -> Iterable[bytes]:
+
+        status_code, headers, body = self._dispatch(WsgiRequest(environ))
+        start_response(get_status_line(status_code), headers)
+        return [body]
+
+
+class AsgiAdapter(_BaseAdapter):
+    """
+    Exposes a LambdaHandler as an ASGI application, so that the same route table
+    can be served by uvicorn or any other ASGI server.
+
+    Example::
+
+        handler = LambdaHandler(trace=False)
+        app = AsgiAdapter(handler)
+
+    Route handlers are synchronous, so they are run inline in the event loop by
+    default, which is the fastest option for CPU-bound handlers. Handlers that
+    block on I/O should be given an executor, so they are run outside the
+    event loop instead. As with the WSGI adapter, the token passed to the
+    handlers is always None.
+    """
+
+    def __init__(self, handler: LambdaHandler, executor=None):
+        super().__init__(handler)
+        self._executor = executor
+
+    async def __call__(self, scope: Dict[str, object], receive: Callable, send: Callable):
+
+        scope_type = scope['type']
+        if scope_type == 'http':
+            await self._handle_http(scope, receive, send)
+        elif scope_type == 'lifespan':
+            await self._handle_lifespan(receive, send)
+        else:
+            raise ValueError(f'Unsupported ASGI scope type {scope_type}')
+
+    @staticmethod
+    async def _read_body(receive: Callable) -> bytes:
+
+        message = await receive()
+        body = message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+        chunks = [body]
+        while message.get('more_body'):
+            message = await receive()
+            chunks.append(message.get('body', b''))
+
+        return b''.join(chunks)
+
+    async def _handle_http(self, scope: Dict[str, object], receive: Callable, send: Callable):
+
+        request = AsgiRequest(scope, await self._read_body(receive))
+
+        if self._executor is None:
+            status_code, headers, body = self._dispatch(request)
+        else:
+            loop = asyncio.get_event_loop()
+            status_code, headers, body = await loop.run_in_executor(
+                self._executor, self._dispatch, request)
+
+        await send({
+            'type': 'http.response.start',
+            'status': status_code,
+            'headers': [(k.encode('latin-1'), v.encode('latin-1')) for k, v in headers],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': body,
+        })
+
+    @staticmethod
+    async def _handle_lifespan(receive: Callable, send: Callable):
+
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -0,0 +1,175 @@
+import re
+from typing import Dict, Iterable, Optional, Pattern, Tuple, Union
+
+from pyrazine.response import HttpResponse
+
+
+DEFAULT_ALLOW_HEADERS = (
+    'content-type', 'x-amz-date', 'authorization', 'x-api-key', 'x-amz-security-token',
+)
+
+# Origins allowed by a policy: '*' for any, exact origins, origins with
+# wildcards like https://*.example.com, or compiled regular expressions.
+OriginSpec = Union[str, Pattern]
+
+
+def _compile_wildcard(origin: str) -> Pattern:
+    # Wildcards match any part of the host, but never the scheme separator or
+    # a path.
+    return re.compile(re.escape(origin).replace(r'\*', '[^/]+'))
+
+
+class CorsPolicy(object):
+    """
+    Cross-origin resource sharing policy of a handler or route.
+
+    The headers sent to each origin are built once: those of exact origins
+    when the policy is created, and those of origins matching wildcards or
+    regular expressions the first time they are seen, so that responses only
+    cost a dictionary lookup.
+
+    Preflight requests are answered by the handler from its route table, with
+    the methods of the routes matching the path, and an
+    access-control-max-age header so that browsers cache the answer instead
+    of sending a preflight before every request.
+
+        handler = LambdaHandler(cors=CorsPolicy(
+            origins=['https://app.example.com', 'https://*.preview.example.com'],
+            max_age=3600))
+    """
+
+    # Maximum number of origins matched by patterns whose headers are cached.
+    # Origins come from requests, so the cache is bounded.
+    MAX_CACHED_ORIGINS = 1024
+
+    def __init__(self,
+                 origins: Iterable[OriginSpec] = ('*',),
+                 allow_headers: Iterable[str] = DEFAULT_ALLOW_HEADERS,
+                 expose_headers: Iterable[str] = (),
+                 allow_credentials: bool = False,
+                 max_age: int = 600):
+        """
+        :param origins: The origins allowed, exact, with wildcards like
+        https://*.example.com, or as compiled regular expressions. '*' allows
+        any origin.
+        :param allow_headers: The request headers allowed.
+        :param expose_headers: The response headers browsers let scripts read.
+        :param allow_credentials: True, to allow cookies and authorization
+        headers, for the origins named only.
+        :param max_age: The seconds browsers cache preflight responses for.
+        :raises ValueError: If credentials are allowed for any origin, which
+        would let any site make authenticated requests on behalf of users.
+        """
+
+        exact_origins = set()
+        patterns = []
+        self._any_origin = False
+        for origin in origins:
+            if isinstance(origin, str) and origin == '*':
+                self._any_origin = True
+            elif isinstance(origin, str) and '*' in origin:
+                patterns.append(_compile_wildcard(origin))
+            elif isinstance(origin, str):
+                exact_origins.add(origin)
+            else:
+                patterns.append(origin)
+        self._patterns: Tuple[Pattern, ...] = tuple(patterns)
+
+        if self._any_origin and allow_credentials:
+            raise ValueError('Credentials cannot be allowed for any origin.')
+
+        self.allow_headers = ','.join(allow_headers)
+        self.allow_credentials = allow_credentials
+        self.max_age = max_age
+
+        common = {}
+        if expose_headers:
+            common['access-control-expose-headers'] = ','.join(expose_headers)
+        if allow_credentials:
+            common['access-control-allow-credentials'] = 'true'
+        self._common_headers = common
+
+        # Any origin gets the same headers.
+        self._wildcard_headers = dict(common, **{'access-control-allow-origin': '*'}) \
+            if self._any_origin else None
+
+        self._exact_headers: Dict[str, Dict[str, str]] = {
+            origin: self._build_headers(origin) for origin in exact_origins
+        }
+        self._matched_headers: Dict[str, Optional[Dict[str, str]]] = {}
+        self._preflight_headers: Dict[Tuple[str, str], Dict[str, str]] = {}
+
+    def _build_headers(self, origin: str) -> Dict[str, str]:
+        # Caches must not serve the headers of an origin to another.
+        return dict(self._common_headers, **{
+            'access-control-allow-origin': origin,
+            'vary': 'origin',
+        })
+
+    def _match(self, origin: str) -> Optional[Dict[str, str]]:
+
+        if any(pattern.fullmatch(origin) for pattern in self._patterns):
+            return self._build_headers(origin)
+        return None
+
+    def get_headers(self, origin: Optional[str]) -> Optional[Dict[str, str]]:
+        """
+        Returns the headers of responses to an origin, or None if it is not
+        allowed.
+        """
+
+        if self._wildcard_headers is not None:
+            return self._wildcard_headers
+        if origin is None:
+            return None
+
+        headers = self._exact_headers.get(origin)
+        if headers is not None:
+            return headers
+
+        try:
+            return self._matched_headers[origin]
+        except KeyError:
+            headers = self._match(origin)
+            if len(self._matched_headers) >= self.MAX_CACHED_ORIGINS:
+                self._matched_headers.clear()
+            self._matched_headers[origin] = headers
+            return headers
+
+    def get_preflight_headers(self,
+                              origin: Optional[str],
+                              methods: str) -> Optional[Dict[str, str]]:
+        """
+        Returns the headers of preflight responses to an origin, for a
+        resource that accepts the methods given, or None if the origin is not
+        allowed.
+
+        :param methods: The methods accepted, separated by commas.
+        """
+
+        headers = self.get_headers(origin)
+        if headers is None:
+            return None
+
+        key = (headers['access-control-allow-origin'], methods)
+        preflight_headers = self._preflight_headers.get(key)
+        if preflight_headers is None:
+            preflight_headers = dict(headers, **{
+                'access-control-allow-methods': methods,
+                'access-control-allow-headers': self.allow_headers,
+                'access-control-max-age': str(self.max_age),
+            })
+            if len(self._preflight_headers) >= self.MAX_CACHED_ORIGINS:
+                self._preflight_headers.clear()
+            self._preflight_headers[key] = preflight_headers
+        return preflight_headers
+
+    def apply(self, response: HttpResponse, origin: Optional[str]) -> HttpResponse:
+        """
+        Returns the response with the headers of the policy for an origin,
+        instead of the default CORS headers. Disallowed origins get none.
+        Responses built with enable_cors=False are returned as they are.
+        """
+        if not response.enable_cors:
+            return response
+        return response.with_cors_headers(self.get_headers(origin) or {})
@@ -1,7 +1,267 @@
-from pyrazine.jwt import JwtTokenParser
+import base64
+import codecs
+import json
+import urllib.parse
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterator, List, Optional, Type, Union
 
+from pyrazine.jsonstream import DEFAULT_CHUNK_SIZE, iter_json_array
+from pyrazine.jwt import JwtToken, JwtTokenParser
+from pyrazine.response import get_status_line
+from pyrazine.structures import CaseInsensitiveMultiDict, MultiDict, parse_cookies
 
-class HttpEvent(object):
+
+class RequestBody(object):
+    """
+    Body of a request, which is decoded from base64 at most once, and only if
+    its contents are accessed.
+    """
+
+    __slots__ = ('_raw', '_is_base64_encoded', '_bytes')
+
+    def __init__(self, raw: Union[str, bytes, None], is_base64_encoded: bool = False):
+        """
+        :param raw: The body, as received in the event.
+        :param is_base64_encoded: True, if the body is a base64-encoded string.
+        """
+        self._raw = raw
+        self._is_base64_encoded = bool(is_base64_encoded)
+        self._bytes = None
+
+    def __bool__(self) -> bool:
+        return bool(self._raw)
+
+    @property
+    def is_base64_encoded(self) -> bool:
+        return self._is_base64_encoded
+
+    @property
+    def raw(self) -> Union[str, bytes, None]:
+        """
+        The body as received in the event, without decoding it.
+        """
+        return self._raw
+
+    @property
+    def size(self) -> int:
+        """
+        The size of the body in bytes, once decoded. It is computed without
+        decoding the body, except for text bodies with non-ASCII characters.
+        """
+        raw = self._raw
+        if not raw:
+            return 0
+        if self._bytes is not None:
+            return len(self._bytes)
+        if self._is_base64_encoded:
+            return len(raw) * 3 // 4 - raw[-2:].count('=' if isinstance(raw, str) else b'=')
+        if isinstance(raw, str):
+            # The length of ASCII strings is known without scanning them.
+            return len(raw) if raw.isascii() else len(raw.encode('utf-8'))
+        return len(raw)
+
+    def as_bytes(self) -> bytes:
+        """
+        Returns the body as bytes, decoding it from base64 if needed. The result
+        is cached, so later calls do not decode it again.
+        """
+        if self._bytes is None:
+            raw = self._raw
+            if not raw:
+                self._bytes = b''
+            elif self._is_base64_encoded:
+                self._bytes = base64.b64decode(raw)
+            elif isinstance(raw, str):
+                self._bytes = raw.encode('utf-8')
+            else:
+                self._bytes = bytes(raw)
+        return self._bytes
+
+    def as_memoryview(self) -> memoryview:
+        """
+        Returns a read-only view of the decoded body, which can be sliced
+        without copying it.
+        """
+        return memoryview(self.as_bytes())
+
+    def as_text(self, encoding: str = 'utf-8') -> str:
+        """
+        Returns the body as text. Bodies that were received as text and are not
+        base64-encoded are returned as they are.
+        """
+        if isinstance(self._raw, str) and not self._is_base64_encoded:
+            return self._raw
+        return self.as_bytes().decode(encoding)
+
+    def json(self) -> object:
+        """
+        Parses the body as JSON.
+
+        :raises ValueError: If the body is not valid JSON, UTF-8 or base64.
+        """
+        if isinstance(self._raw, str) and not self._is_base64_encoded:
+            return json.loads(self._raw)
+        return json.loads(self.as_bytes())
+
+    def _text_reader(self, chunk_size: int) -> Callable[[int], str]:
+
+        raw = self._raw
+        if isinstance(raw, str) and not self._is_base64_encoded:
+            chunks = (raw[start:start + chunk_size] for start in range(0, len(raw), chunk_size))
+        else:
+            chunks = self._iter_decoded_chunks(chunk_size)
+
+        # The reader returns chunks as they are decoded, whatever the size
+        # requested, which the parser handles.
+        return lambda size: next(chunks, '')
+
+    def _iter_decoded_chunks(self, chunk_size: int) -> Iterator[str]:
+
+        raw = self._raw or b''
+        decoder = codecs.getincrementaldecoder('utf-8')()
+
+        if self._is_base64_encoded and self._bytes is None:
+            # Decode base64 a few chunks at a time, in multiples of 4
+            # characters, instead of decoding the whole body at once.
+            step = chunk_size // 4 * 4 or 4
+            for start in range(0, len(raw), step):
+                yield decoder.decode(base64.b64decode(raw[start:start + step]))
+        else:
+            view = memoryview(self.as_bytes())
+            for start in range(0, len(view), chunk_size):
+                yield decoder.decode(view[start:start + chunk_size])
+
+        yield decoder.decode(b'', final=True)
+
+    def iter_json_array(self, key: str = None,
+                        chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[object]:
+        """
+        Parses the body as a JSON array incrementally, yielding its items one
+        by one instead of building the whole array. See
+        pyrazine.jsonstream.iter_json_array.
+
+        :param key: If set, the body is an object and the array is the value
+        of this key.
+        :param chunk_size: The number of characters parsed at once.
+        :raises JsonStreamError: While iterating, if the body is malformed.
+        """
+        return iter_json_array(self._text_reader(chunk_size), key=key, chunk_size=chunk_size)
+
+
+class BaseHttpEvent(ABC):
+    """
+    Common interface of the HTTP requests that a LambdaHandler can dispatch,
+    regardless of the service that sent them.
+
+    Subclasses keep a reference to the original event and read values from it,
+    instead of copying them into a normalized structure.
+    """
+
+    body: Optional[Union[str, bytes]] = None
+    is_base64_encoded: bool = False
+    headers: Dict[str, str] = None
+    jwt: Optional[JwtToken] = None
+    raw_query_string: str = None
+
+    # Views built on first access by get_body, get_headers,
+    # get_query_params and get_cookies.
+    _header_map: CaseInsensitiveMultiDict = None
+    _query_params: MultiDict = None
+    _cookies: MultiDict = None
+    _body: RequestBody = None
+
+    @classmethod
+    def matches(cls, event: Dict[str, object]) -> bool:
+        """
+        Returns True if the event passed has the format this class expects.
+        Only called when the format of the events received by the function
+        has not been detected yet.
+        """
+        return False
+
+    @abstractmethod
+    def get_http_method(self) -> str:
+        pass
+
+    @abstractmethod
+    def get_path(self) -> str:
+        pass
+
+    def get_http_path(self) -> str:
+        return self.get_path()
+
+    def get_http_protocol(self) -> str:
+        return None
+
+    def get_http_source_ip(self) -> str:
+        return None
+
+    def get_http_user_agent(self) -> str:
+        return self.headers.get('user-agent') if self.headers else None
+
+    def get_request_id(self) -> str:
+        return None
+
+    def get_body(self) -> RequestBody:
+        """
+        Returns the body of the request, which handles base64 decoding when the
+        event says it is encoded.
+        """
+        if self._body is None:
+            self._body = RequestBody(self.body, self.is_base64_encoded)
+        return self._body
+
+    def get_headers(self) -> CaseInsensitiveMultiDict:
+        """
+        Returns the headers of the request, which can be looked up regardless
+        of their case. The headers are indexed the first time this method is
+        called, and the same object is returned afterwards.
+        """
+        if self._header_map is None:
+            self._header_map = self._build_headers()
+        return self._header_map
+
+    def get_query_params(self) -> MultiDict:
+        """
+        Returns the decoded query string parameters of the request, keeping
+        every value of repeated parameters. The query string is parsed the
+        first time this method is called.
+        """
+        if self._query_params is None:
+            self._query_params = self._build_query_params()
+        return self._query_params
+
+    def get_cookies(self) -> MultiDict:
+        """
+        Returns the cookies sent with the request. They are parsed the first
+        time this method is called.
+        """
+        if self._cookies is None:
+            self._cookies = self._build_cookies()
+        return self._cookies
+
+    def _build_headers(self) -> CaseInsensitiveMultiDict:
+        return CaseInsensitiveMultiDict((self.headers or {}).items())
+
+    def _build_query_params(self) -> MultiDict:
+        return MultiDict(urllib.parse.parse_qsl(self.raw_query_string or '',
+                                                keep_blank_values=True))
+
+    def _build_cookies(self) -> MultiDict:
+        return parse_cookies(self.get_headers().getall('cookie', []))
+
+    def format_response(self, response: Dict[str, object]) -> Dict[str, object]:
+        """
+        Adapts a Lambda response object to the format expected by the service
+        that sent the event. The object passed may be modified in place.
+        """
+        return response
+
+
+class HttpEvent(BaseHttpEvent):
+    """
+    API Gateway HTTP API events (payload format version 2.0).
+    """
 
     def __init__(self, event):
 
@@ -10,6 +270,7 @@ class HttpEvent(object):
         self.raw_path = event.get('rawPath')
         self.raw_query_string = event.get('rawQueryString')
         self.headers = event.get('headers')
+        self.cookies = event.get('cookies')
         self.request_context = event.get('requestContext')
         if self.request_context is None:
             raise ValueError('Event does not contain request_context key.')
@@ -30,6 +291,15 @@ class HttpEvent(object):
         else:
             self.jwt = None
 
+    @classmethod
+    def matches(cls, event: Dict[str, object]) -> bool:
+        request_context = event.get('requestContext')
+        return request_context is not None and 'http' in request_context
+
+    def _build_cookies(self) -> MultiDict:
+        # Cookies are not sent as a header in this version of the payload.
+        return parse_cookies(self.cookies or ())
+
     def get_account_id(self) -> str:
         return str(self.request_context['accountId']) \
             if 'accountId' in self.request_context else None
@@ -90,3 +360,238 @@ class HttpEvent(object):
     def get_stage(self):
         return str(self.request_context['stage']) \
             if 'stage' in self.request_context else None
+
+
+class FunctionUrlEvent(HttpEvent):
+    """
+    Lambda function URL events, which share the payload format version 2.0
+    with HTTP APIs, but have no routes nor path parameters.
+    """
+
+    @classmethod
+    def matches(cls, event: Dict[str, object]) -> bool:
+        request_context = event.get('requestContext')
+        return request_context is not None and 'http' in request_context \
+            and '.lambda-url.' in str(request_context.get('domainName'))
+
+    def get_path(self) -> str:
+        return self.raw_path or self.get_http_path()
+
+
+class RestApiEvent(BaseHttpEvent):
+    """
+    API Gateway REST API proxy integration events (payload format version
+    1.0), which are also sent by HTTP APIs configured to use that version.
+    """
+
+    def __init__(self, event: Dict[str, object]):
+
+        self._event = event
+        self.request_context = event.get('requestContext')
+        if self.request_context is None:
+            raise ValueError('Event does not contain request_context key.')
+
+        self.http_method = event.get('httpMethod')
+        if self.http_method is None:
+            raise ValueError('Event does not contain httpMethod key.')
+
+        if 'elb' in self.request_context:
+            raise ValueError('Event was sent by a load balancer.')
+
+        self.headers = event.get('headers') or {}
+        self.path_parameters = event.get('pathParameters') or {}
+        self.body = event.get('body')
+        self.is_base64_encoded = event.get('isBase64Encoded')
+
+        # Claims are only present when a Cognito user pool authorizer is used.
+        authorizer = self.request_context.get('authorizer')
+        claims = authorizer.get('claims') if authorizer is not None else None
+        self.jwt = JwtTokenParser.parse_object(claims) if claims else None
+
+    @classmethod
+    def matches(cls, event: Dict[str, object]) -> bool:
+        request_context = event.get('requestContext')
+        return 'httpMethod' in event and request_context is not None \
+            and 'elb' not in request_context
+
+    @property
+    def raw_query_string(self) -> str:
+        return _join_query_string(self._event.get('multiValueQueryStringParameters'),
+                                  self._event.get('queryStringParameters'),
+                                  encode=True)
+
+    def _build_headers(self) -> CaseInsensitiveMultiDict:
+        multi_value_headers = self._event.get('multiValueHeaders')
+        if multi_value_headers is None:
+            return super()._build_headers()
+        return CaseInsensitiveMultiDict.from_lists(multi_value_headers)
+
+    def _build_query_params(self) -> MultiDict:
+        multi_value_parameters = self._event.get('multiValueQueryStringParameters')
+        if multi_value_parameters is not None:
+            return MultiDict.from_lists(multi_value_parameters)
+        return MultiDict((self._event.get('queryStringParameters') or {}).items())
+
+    def get_http_method(self) -> str:
+        return self.http_method
+
+    def get_http_path(self) -> str:
+        return self._event.get('path')
+
+    def get_http_protocol(self) -> str:
+        return self.request_context.get('protocol')
+
+    def get_http_source_ip(self) -> str:
+        identity = self.request_context.get('identity')
+        return identity.get('sourceIp') if identity is not None else None
+
+    def get_http_user_agent(self) -> str:
+        identity = self.request_context.get('identity')
+        return identity.get('userAgent') if identity is not None else None
+
+    def get_path(self) -> str:
+        result = self.path_parameters.get('proxy') or self._event.get('path')
+        return result if result is None else str(result)
+
+    def get_request_id(self) -> str:
+        return self.request_context.get('requestId')
+
+    def get_resource(self) -> str:
+        return self._event.get('resource')
+
+    def get_stage(self) -> str:
+        return self.request_context.get('stage')
+
+
+class AlbEvent(BaseHttpEvent):
+    """
+    Application Load Balancer target group events, with or without multi-value
+    headers enabled in the target group.
+    """
+
+    def __init__(self, event: Dict[str, object]):
+
+        self._event = event
+        self.request_context = event.get('requestContext')
+        if self.request_context is None or 'elb' not in self.request_context:
+            raise ValueError('Event does not contain ELB context information.')
+
+        self.http_method = event.get('httpMethod')
+        self.body = event.get('body')
+        self.is_base64_encoded = event.get('isBase64Encoded')
+
+        # When multi-value headers are enabled in the target group, the load
+        # balancer sends and expects them instead of the headers key.
+        self.multi_value_headers = event.get('multiValueHeaders')
+        self._headers = event.get('headers') if self.multi_value_headers is None else None
+
+    @classmethod
+    def matches(cls, event: Dict[str, object]) -> bool:
+        request_context = event.get('requestContext')
+        return request_context is not None and 'elb' in request_context
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        if self._headers is None:
+            # Keep the last value of each header, as the load balancer does
+            # when multi-value headers are disabled.
+            self._headers = {
+                key: values[-1]
+                for key, values in (self.multi_value_headers or {}).items()
+                if values
+            }
+        return self._headers
+
+    @property
+    def raw_query_string(self) -> str:
+        # Values are passed URL-encoded by the load balancer.
+        return _join_query_string(self._event.get('multiValueQueryStringParameters'),
+                                  self._event.get('queryStringParameters'),
+                                  encode=False)
+
+    def _build_headers(self) -> CaseInsensitiveMultiDict:
+        if self.multi_value_headers is None:
+            return super()._build_headers()
+        return CaseInsensitiveMultiDict.from_lists(self.multi_value_headers)
+
+    def get_http_method(self) -> str:
+        return self.http_method
+
+    def get_http_source_ip(self) -> str:
+        # The load balancer appends the address of the peer to the header,
+        # after any addresses sent by the client, which can be forged.
+        values = self.get_headers().getall('x-forwarded-for')
+        return values[-1].rsplit(',', 1)[-1].strip() if values else None
+
+    def get_path(self) -> str:
+        return self._event.get('path')
+
+    def get_request_id(self) -> str:
+        return self.headers.get('x-amzn-trace-id')
+
+    def get_target_group_arn(self) -> str:
+        return self.request_context['elb'].get('targetGroupArn')
+
+    def format_response(self, response: Dict[str, object]) -> Dict[str, object]:
+
+        response['statusDescription'] = get_status_line(response['statusCode'])
+
+        if self.multi_value_headers is not None:
+            headers = response.pop('headers', None) or {}
+            response['multiValueHeaders'] = {key: [value] for key, value in headers.items()}
+
+        return response
+
+
+def _join_query_string(multi_value_parameters: Dict[str, List[str]],
+                       parameters: Dict[str, str],
+                       encode: bool) -> str:
+
+    if multi_value_parameters is not None:
+        pairs = [(key, value) for key, values in multi_value_parameters.items()
+                 for value in values]
+    elif parameters is not None:
+        pairs = list(parameters.items())
+    else:
+        return ''
+
+    if encode:
+        return urllib.parse.urlencode(pairs)
+
+    return '&'.join(f'{key}={value}' for key, value in pairs)
+
+
+# Event classes in the order in which they are checked when detecting the
+# format of an event. More specific formats must come first.
+EVENT_CLASSES: List[Type[BaseHttpEvent]] = [
+    FunctionUrlEvent,
+    HttpEvent,
+    AlbEvent,
+    RestApiEvent,
+]
+
+
+def register_event_class(event_class: Type[BaseHttpEvent], index: int = 0) -> None:
+    """
+    Adds an event class to those considered when detecting the format of an
+    event. By default, it is checked before any of the built-in ones.
+
+    :param event_class: The class to add, which must override the matches
+    class method.
+    :param index: The position at which the class is checked.
+    """
+    EVENT_CLASSES.insert(index, event_class)
+
+
+def detect_event_class(event: Dict[str, object]) -> Type[BaseHttpEvent]:
+    """
+    Returns the first registered event class that matches the event passed.
+
+    :param event: The event object passed by AWS Lambda.
+    :return: The class to wrap the event with.
+    """
+    for event_class in EVENT_CLASSES:
+        if event_class.matches(event):
+            return event_class
+
+    raise ValueError('Unsupported event format.')
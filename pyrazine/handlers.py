@@ -1,27 +1,64 @@
 import functools
-import json
-import logging
-import os
-from typing import Callable, Dict, List, Tuple, Union
-
-from pyrazine.events import HttpEvent
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Type, Union
+
+from pyrazine.auth.base import NotAuthorizedError
+from pyrazine.auth.spec import AuthCallable, AuthSpec
+from pyrazine.binding import (
+    BindingError,
+    HandlerCaller,
+    build_handler_caller,
+    compile_path_template
+)
+from pyrazine.capture import TrafficCapture
+from pyrazine.clients import ClientRegistry, default_client_registry
+from pyrazine.cors import CorsPolicy
+from pyrazine.events import BaseHttpEvent, detect_event_class
+from pyrazine.jsonstream import JsonStreamError
 from pyrazine.jwt import JwtToken
+from pyrazine.log import StructuredLogger
+from pyrazine.memory import MemoryGovernor, default_memory_governor
+from pyrazine.ratelimit import RateLimit
+from pyrazine.schema import Schema, ValidationError, Validator, default_schema_compiler
 from pyrazine.response import HttpResponse
+from pyrazine.startup import STARTUP_ROUTE_PATH, StartupProfiler, startup_profiler
 from pyrazine.tracer import Tracer
 from pyrazine.typing import LambdaContext
 
 import aws_xray_sdk.core
 
+import pyrazine
 
-is_cold_start = True
 
 HandlerCallable = Callable[[JwtToken, Dict[str, object]], HttpResponse]
 
-ENVIRONMENT = os.environ.get('ENVIRONMENT') or 'DEV'
 
-logger = logging.getLogger(__name__)
-logger_level = logging.DEBUG if ENVIRONMENT == 'DEV' else logging.INFO
-logger.setLevel(logger_level)
+class RouteOptions(object):
+    """
+    The per-route settings of a handler, compiled when the route is
+    registered so that requests do not have to interpret them again.
+    """
+
+    __slots__ = ('call', 'authorize', 'rate_limit', 'validate_body', 'max_body_size',
+                 'stream', 'stream_key', 'cors')
+
+    def __init__(self,
+                 call: HandlerCaller,
+                 authorize: Optional[AuthCallable] = None,
+                 rate_limit: Optional[RateLimit] = None,
+                 validate_body: Optional[Validator] = None,
+                 max_body_size: Optional[int] = None,
+                 stream: bool = False,
+                 stream_key: Optional[str] = None,
+                 cors: Optional[CorsPolicy] = None):
+        self.call = call
+        self.authorize = authorize
+        self.rate_limit = rate_limit
+        self.validate_body = validate_body
+        self.max_body_size = max_body_size
+        self.stream = stream
+        self.stream_key = stream_key
+        self.cors = cors
 
 
 class LambdaHandler(object):
@@ -29,64 +66,334 @@ class LambdaHandler(object):
     def __init__(self,
                  service_name: str = 'unknown_service',
                  recorder: aws_xray_sdk.core.xray_recorder = None,
-                 trace: bool = True):
+                 trace: bool = True,
+                 event_class: Type[BaseHttpEvent] = None,
+                 max_body_size: int = None,
+                 clients: ClientRegistry = None,
+                 logger: StructuredLogger = None,
+                 capture: TrafficCapture = None,
+                 profiler: StartupProfiler = None,
+                 memory_governor: MemoryGovernor = None,
+                 cors: CorsPolicy = None):
+        """
+
+        :param service_name: The name of the service, used in traces.
+        :param recorder: The X-Ray recorder to use. Defaults to the global one.
+        :param trace: True, if route handlers should be traced by default.
+        :param event_class: The class to wrap events with. If not set, the
+        format is detected from the first event received, and the class is
+        reused for the following ones.
+        :param max_body_size: The maximum size of request bodies in bytes, for
+        the routes that do not set their own. Unlimited by default.
+        :param clients: The registry of the HTTP clients of the function, whose
+        deadline is set for each request. Defaults to the global one.
+        :param logger: The logger of the handler, which adds the request ID,
+        route and cold start to the records of each request, and writes them
+        once it is handled. Defaults to one with the default level.
+        :param capture: If set, the events received are written to a file to
+        be replayed later, see TrafficCapture.
+        :param profiler: The profiler the initialization of the handler is
+        recorded with, and which reports it on the first request. Defaults to
+        the global one.
+        :param memory_governor: The governor that samples the memory of the
+        function after requests, and trims the caches registered with it when
+        it gets close to the limit. Defaults to the global one.
+        :param cors: The CORS policy of the routes that do not set their own.
+        If neither is set, responses have the default CORS headers, which
+        allow any origin, and preflight requests get a generic response.
+        """
+        init_start = time.perf_counter()
+
         self._allowed_methods = ['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'OPTIONS']
         self._routes = {}
+        self._route_options = {}
+        self._path_templates = {}
+        self._event_class = event_class
+        self._max_body_size = max_body_size
+        self._clients = clients if clients is not None else default_client_registry
+        self._log = logger if logger is not None else StructuredLogger()
+        self._capture = capture
+        self._profiler = profiler if profiler is not None else startup_profiler
+        self._memory_governor = memory_governor if memory_governor is not None \
+            else default_memory_governor
+
+        self._cors = cors
+        self._cors_enabled = cors is not None
+        self._preflight_responses: Dict[Tuple[Optional[str], str], HttpResponse] = {}
 
         self._service_name = service_name
         self._trace = trace
         self._tracer = Tracer(recorder=recorder)
 
         if self._trace:
-            logging.debug('Patching modules for instrumentation.')
-            aws_xray_sdk.core.patch_all()
+            self._log.debug('Patching modules for instrumentation.')
+            with self._profiler.phase('patch_all'):
+                aws_xray_sdk.core.patch_all()
+
+        self._profiler.record_phase('handler_init', init_start, time.perf_counter())
+
+    @property
+    def clients(self) -> ClientRegistry:
+        """
+        The registry of the HTTP clients shared by the handlers.
+        """
+        return self._clients
+
+    @property
+    def logger(self) -> StructuredLogger:
+        """
+        The logger of the handler, also meant to be used by route handlers.
+        """
+        return self._log
+
+    @property
+    def memory_governor(self) -> MemoryGovernor:
+        """
+        The governor that caches shared by the handlers can register with.
+        """
+        return self._memory_governor
+
+    @property
+    def profiler(self) -> StartupProfiler:
+        """
+        The profiler of the initialization of the function.
+        """
+        return self._profiler
+
+    # Maximum number of preflight responses cached. They are cached by origin
+    # and path, which come from requests, so the cache is bounded.
+    MAX_CACHED_PREFLIGHTS = 1024
+
+    # The response to bodies over the limit does not depend on the request, so
+    # it is built once.
+    _body_too_large_response = HttpResponse.build_error_response(
+        413, message='Request body too large')
 
     @staticmethod
-    def _get_body_object(http_event: HttpEvent) -> Tuple[bool, Dict[str, object]]:
+    def _get_body_object(http_event: BaseHttpEvent) -> Tuple[bool, Dict[str, object]]:
 
         # It's okay to have a «bodyless» request, maybe the endpoint does not
         # require any data. Just make sure to return an empty object.
-        if http_event.body is None:
+        body = http_event.get_body()
+        if not body:
             return True, {}
 
         # If there is actually something, let's make sure it's valid data.
         # Only JSON is supported at the moment.
         try:
-            result = json.loads(http_event.body)
+            result = body.json()
             success = True
-        except json.decoder.JSONDecodeError:
+        except ValueError:
+            # Raised for malformed JSON, but also for invalid UTF-8 text and
+            # base64 encoding.
             result = HttpResponse.build_error_response(400, message='Malformed JSON input')
             success = False
 
         return success, result
 
-    def _handle_event(self, event: HttpEvent, path: str) -> Dict[str, object]:
+    def _parse_event(self, event: Dict[str, object]) -> BaseHttpEvent:
+
+        event_class = self._event_class
+        if event_class is None:
+            event_class = self._event_class = detect_event_class(event)
+
+        try:
+            return event_class(event)
+        except ValueError:
+            # The function is receiving events from more than one source.
+            # Detect the format again and keep the last one seen.
+            detected_class = detect_event_class(event)
+            if detected_class is event_class:
+                raise
+
+            self._log.debug('Event format changed to %s.', detected_class.__name__)
+            self._event_class = detected_class
+            return detected_class(event)
+
+    def _match_route(self,
+                     method_routes: Dict[str, HandlerCallable],
+                     method: str,
+                     path: str) -> Tuple[Optional[HandlerCallable], str, Dict[str, str]]:
+
+        handler = method_routes.get(path)
+        if handler is not None:
+            return handler, path, {}
+
+        # Paths with parameters are only tried if no path matches exactly.
+        for pattern, template in self._path_templates.get(method, ()):
+            match = pattern.fullmatch(path)
+            if match is not None:
+                return method_routes[template], template, match.groupdict()
+
+        return None, path, {}
+
+    def resolve_route(self, method: str, path: str) -> Optional[str]:
+        """
+        Returns the path of the route, e.g. /items/{item_id}, that a request
+        would be dispatched to, or None if there is none.
+        """
+        method_routes = self._routes.get(method.upper())
+        if method_routes is None:
+            return None
+        handler, template, _ = self._match_route(method_routes, method.upper(), path)
+        return template if handler is not None else None
+
+    def _handle_event(self,
+                      event: BaseHttpEvent,
+                      path: str,
+                      context: LambdaContext = None) -> HttpResponse:
 
         method = event.get_http_method().upper()
-        logger.debug(f'Processing {method} route for path {path}')
+        log = self._log
+        log.debug('Processing %s route for path %s', method, path)
 
         if method == 'OPTIONS':
+            if not self._cors_enabled:
+                return HttpResponse.build_success_response()
+            return self._handle_preflight(event, path)
+
+        method_routes = self._routes.get(method)
+        if method_routes is None:
+            log.error('No routes found for method %s', method)
+            return self._apply_cors(
+                HttpResponse.build_error_response(405, message='Method not allowed'),
+                event.get_headers().get('origin'))
+
+        handler, template, path_params = self._match_route(method_routes, method, path)
+        if handler is None:
+            log.error('No handler defined for method %s and path %s', method, path)
+            return self._apply_cors(
+                HttpResponse.build_error_response(404, message='Not found'),
+                event.get_headers().get('origin'))
+        path = template
+
+        options = self._route_options[method][path]
+        log.set_fields(method=method, route=path)
+
+        response = self._call_route(options, handler, event, context, path_params)
+        if options.cors is not None:
+            response = options.cors.apply(response, event.get_headers().get('origin'))
+        return response
+
+    def _apply_cors(self, response: HttpResponse, origin: Optional[str]) -> HttpResponse:
+        # Responses to requests that match no route follow the policy of the
+        # handler.
+        if self._cors is None:
+            return response
+        return self._cors.apply(response, origin)
+
+    def _handle_preflight(self, event: BaseHttpEvent, path: str) -> HttpResponse:
+
+        # Preflight responses only depend on the origin and the path, so they
+        # are built once for each, from the route table.
+        origin = event.get_headers().get('origin')
+        key = (origin, path)
+        response = self._preflight_responses.get(key)
+        if response is None:
+            response = self._build_preflight_response(origin, path)
+            if len(self._preflight_responses) >= self.MAX_CACHED_PREFLIGHTS:
+                self._preflight_responses.clear()
+            self._preflight_responses[key] = response
+        return response
+
+    def _build_preflight_response(self, origin: Optional[str], path: str) -> HttpResponse:
+
+        methods = []
+        policy = None
+        for method, method_routes in self._routes.items():
+            handler, template, _ = self._match_route(method_routes, method, path)
+            if handler is not None:
+                methods.append(method)
+                policy = policy or self._route_options[method][template].cors
+
+        if not methods:
+            return self._apply_cors(
+                HttpResponse.build_error_response(404, message='Not found'), origin)
+
+        # Routes without a policy keep answering preflights with the default
+        # CORS headers.
+        if policy is None:
             return HttpResponse.build_success_response()
 
+        headers = policy.get_preflight_headers(origin, ','.join(methods + ['OPTIONS']))
+        if headers is None:
+            return HttpResponse.build_error_response(403, message='Origin not allowed') \
+                .with_cors_headers({})
+        return HttpResponse(204).with_cors_headers(headers)
+
+    def _call_route(self,
+                    options: RouteOptions,
+                    handler: HandlerCallable,
+                    event: BaseHttpEvent,
+                    context: Optional[LambdaContext],
+                    path_params: Dict[str, str]) -> HttpResponse:
+
+        # Callers over the limit are rejected before any other work is done.
+        if options.rate_limit is not None:
+            rejection = options.rate_limit.check(event)
+            if rejection is not None:
+                return rejection
+
+        profile = None
+        if options.authorize is not None:
+            try:
+                profile = options.authorize(event.jwt)
+            except NotAuthorizedError as err:
+                return HttpResponse.build_error_response(err.status_code, message=str(err))
+
+        # The size of the body is known without decoding it, so bodies over
+        # the limit are rejected before allocating anything for them.
+        if options.max_body_size is not None:
+            request_body = event.get_body()
+            if request_body and request_body.size > options.max_body_size:
+                return self._body_too_large_response
+
+        if options.stream:
+            return self._call_streaming(options, handler, event, context, profile, path_params)
+
+        # The body is only decoded once the request is known to be routable
+        # and authorized.
         success, body = self._get_body_object(event)
-        if success:
-            method_routes = self._routes.get(method)
-            if method_routes is None:
-                error_msg = f'No routes found for method {method}'
-                logger.error(error_msg)
-                raise KeyError(error_msg)
-
-            handler = method_routes.get(path)
-            if handler is None:
-                error_msg = f'No handler defined for method {method} and path {path}'
-                logger.error(error_msg)
-                raise RuntimeError(error_msg)
-
-            response = handler(event.jwt, body)
-        else:
-            response = HttpResponse.build_error_response(404, message='Not found.')
+        if not success:
+            return body
 
-        return response
+        if options.validate_body is not None:
+            try:
+                body = options.validate_body(body)
+            except ValidationError as err:
+                return HttpResponse.build_error_response(
+                    400, message=f'Invalid request body: {err}')
+
+        try:
+            return options.call(handler, event, body, context, profile, path_params)
+        except BindingError as err:
+            return HttpResponse.build_error_response(400, message=str(err))
+
+    @staticmethod
+    def _call_streaming(options: RouteOptions,
+                        handler: HandlerCallable,
+                        event: BaseHttpEvent,
+                        context: Optional[LambdaContext],
+                        profile: object,
+                        path_params: Dict[str, str]) -> HttpResponse:
+
+        # The handler gets an iterator over the items of the array in the
+        # body, parsed as it consumes them, and validated one by one.
+        request_body = event.get_body()
+        body = request_body.iter_json_array(key=options.stream_key) if request_body else iter(())
+        if options.validate_body is not None:
+            body = map(options.validate_body, body)
+
+        # Malformed or invalid items are only found while the handler runs,
+        # so errors raised by the iterator are turned into responses here.
+        try:
+            return options.call(handler, event, body, context, profile, path_params)
+        except BindingError as err:
+            return HttpResponse.build_error_response(400, message=str(err))
+        except JsonStreamError as err:
+            return HttpResponse.build_error_response(400, message=f'Malformed JSON input: {err}')
+        except ValidationError as err:
+            return HttpResponse.build_error_response(400, message=f'Invalid request body: {err}')
 
     @functools.lru_cache
     def _tracer_wrap_handler(self,
@@ -102,50 +409,33 @@ class LambdaHandler(object):
         :return:
         """
 
-        handler_name = handler.__name__
-
-        @functools.wraps(handler)
-        def wrapper(token: JwtToken, body: Dict[str, object]) -> HttpResponse:
-            with self._tracer.in_subsegment(name=f"## {handler_name}") as subsegment:
-                global is_cold_start
-
-                if is_cold_start:
-                    subsegment.put_annotation(key='ColdStart', value=True)
-                    is_cold_start = False
-
-                try:
-                    logger.debug(f'Starting handler {handler_name}')
-                    response = handler(token, body)
-                    logger.debug(f'Returned successfully from handler {handler_name}')
-
-                    self._tracer.trace_route(
-                        handler_name=handler_name,
-                        persist_response=persist_response,
-                        response_data=response,
-                        subsegment=subsegment
-                    )
-                except Exception as err:
-                    logger.exception(f'Handler {handler_name} raised an exception.')
-                    self._tracer.trace_exception(
-                        handler_name=handler_name,
-                        exception=err,
-                        subsegment=subsegment)
-                    raise
-
-            return response
-
-        return wrapper
+        return self._tracer.wrap_handler(
+            handler, self._log, persist_response=persist_response)
 
     def _add_route(self,
                    method: str,
                    path: str,
                    handler: HandlerCallable,
                    trace: bool = None,
-                   persist_response: bool = False) -> None:
+                   persist_response: bool = False,
+                   auth: AuthSpec = None,
+                   rate_limit: RateLimit = None,
+                   schema: Schema = None,
+                   max_body_size: int = None,
+                   stream: Union[bool, str] = False,
+                   cors: CorsPolicy = None) -> None:
 
         if method not in self._allowed_methods:
             raise ValueError("Method {0} not among the allowed methods.".format(method))
 
+        # The signature of the handler is inspected once, here, to build the
+        # function that passes it the parameters it declares.
+        path_template = compile_path_template(path)
+        call = build_handler_caller(
+            handler,
+            path_params=path_template[1] if path_template is not None else (),
+            body_type=schema if isinstance(schema, type) else None)
+
         # Wrap handler with tracer, if tracing is enabled.
         if trace or (trace is None and self._trace):
             handler = self._tracer_wrap_handler(
@@ -158,42 +448,154 @@ class LambdaHandler(object):
         else:
             routes_by_method = self._routes[method]
 
+        if path_template is not None and path not in routes_by_method:
+            self._path_templates.setdefault(method, []).append((path_template[0], path))
+
         routes_by_method[path] = handler
+        self._route_options.setdefault(method, {})[path] = RouteOptions(
+            call=call,
+            authorize=auth.compile() if auth is not None else None,
+            rate_limit=rate_limit,
+            validate_body=default_schema_compiler.compile(schema) if schema is not None else None,
+            max_body_size=max_body_size if max_body_size is not None else self._max_body_size,
+            stream=bool(stream),
+            stream_key=stream if isinstance(stream, str) else None,
+            cors=cors if cors is not None else self._cors)
+
+        if cors is not None:
+            self._cors_enabled = True
+        self._preflight_responses.clear()
 
     def route(self,
               handler: HandlerCallable = None,
               path: str = None,
               methods: Union[List[str], Tuple[str]] = None,
               trace: bool = None,
-              persist_response: bool = False):
+              persist_response: bool = False,
+              auth: AuthSpec = None,
+              rate_limit: RateLimit = None,
+              schema: Schema = None,
+              max_body_size: int = None,
+              stream: Union[bool, str] = False,
+              cors: CorsPolicy = None):
         """
         Registers a function as a handler for a given combination of method and
         path.
 
         :param handler: The function to use for a given combination of method and
-        path.
-        :param path: The path to the resource.
+        path. It can declare the parameters it needs, see build_handler_caller,
+        or take the token and the body as its two positional parameters.
+        :param path: The path to the resource, which may contain parameters
+        like /items/{item_id}, or /files/{key+} to match several segments.
         :param methods: The methods that the resource accepts.
         :param trace: True, if calls to this function should be traced.
         :param persist_response: True, if traces should be persisted as metadata
         within a trace subsegment.
+        :param auth: The authorization requirements of the route, checked
+        before the request body is decoded. Requests without a token get a 401
+        response, and those that do not meet the requirements a 403 one.
+        :param rate_limit: The rate limit of the route, shared by all the
+        methods given. Callers over the limit get a 429 response.
+        :param schema: The schema the request body must match, as a JSON Schema
+        dictionary, a dataclass or a TypedDict. See SchemaCompiler. Requests
+        whose body does not match get a 400 response, and the handler receives
+        the validated body, bound into an instance if the schema is a dataclass.
+        :param max_body_size: The maximum size of the request body in bytes.
+        Defaults to that of the handler. Larger requests get a 413 response
+        before their body is decoded.
+        :param stream: True, if the body is a JSON array to be parsed
+        incrementally: the handler receives an iterator over its items instead
+        of the decoded body, and the schema, if any, applies to each item. If
+        it is a string, the body is an object, and the array is the value of
+        that key. Malformed items found while iterating produce a 400 response.
+        :param cors: The CORS policy of the route. Defaults to that of the
+        handler. Preflight requests to the path get the methods of all the
+        routes matching it, and the policy of the first one.
         :return:
         """
 
         if handler is None:
-            return functools.partial(self.route, path=path, methods=methods)
+            return functools.partial(self.route, path=path, methods=methods, trace=trace,
+                                     persist_response=persist_response, auth=auth,
+                                     rate_limit=rate_limit, schema=schema,
+                                     max_body_size=max_body_size, stream=stream, cors=cors)
 
         if methods is None:
             methods = ['GET']
         elif not isinstance(methods, list) and not isinstance(methods, tuple):
             raise TypeError('Allowed methods should be a list or tuple of strings.')
 
+        if rate_limit is not None and rate_limit.name is None:
+            rate_limit.name = path
+
+        start = time.perf_counter()
         for method in methods:
             self._add_route(method.upper(), path, handler,
-                            trace=trace, persist_response=persist_response)
+                            trace=trace, persist_response=persist_response, auth=auth,
+                            rate_limit=rate_limit, schema=schema,
+                            max_body_size=max_body_size, stream=stream, cors=cors)
+        self._profiler.record_phase('route_registration', start, time.perf_counter())
 
         return handler
 
+    def add_startup_route(self, path: str = STARTUP_ROUTE_PATH, auth: AuthSpec = None) -> None:
+        """
+        Adds a GET route that returns the report of the profiler, see
+        StartupProfiler.report. It is meant for debugging, and should be
+        protected with auth outside of development environments.
+
+        :param path: The path of the route.
+        :param auth: The authorization requirements of the route.
+        """
+
+        def get_startup_report():
+            return HttpResponse(200, body=self._profiler.report())
+
+        self.route(get_startup_report, path=path, methods=['GET'], trace=False, auth=auth)
+
+    def dispatch(self,
+                 http_event: BaseHttpEvent,
+                 context: LambdaContext = None) -> HttpResponse:
+        """
+        Routes an already parsed request to its handler and returns the
+        HttpResponse object produced, without converting it into a Lambda
+        response object.
+
+        Any implementation of BaseHttpEvent can be dispatched, which is what
+        allows the container adapters to reuse the route table without
+        building API Gateway events.
+
+        :param http_event: The request to dispatch.
+        :param context: The context object passed by AWS Lambda, if any.
+        :return: The response returned by the route handler, or an error
+        response if the request could not be routed.
+        """
+
+        method = http_event.get_http_method()
+        path = http_event.get_path()
+
+        # Records are buffered while the request is handled, and written at
+        # once when it is done.
+        log = self._log
+        log.begin_invocation(
+            request_id=getattr(context, 'aws_request_id', None) or http_event.get_request_id())
+
+        try:
+            if method is None or path is None:
+                method_present = 'not' if method is None else ''
+                path_present = 'not' if path is None else ''
+
+                log.error('Method %s present, path %s present.', method_present, path_present)
+                response = HttpResponse.build_error_response(400, message='Bad request')
+            elif method in self._allowed_methods:
+                response = self._handle_event(http_event, path, context)
+            else:
+                response = HttpResponse.build_error_response(405, message='Method not allowed')
+        finally:
+            log.end_invocation()
+
+        return response
+
     def handle_request(
             self,
             event: Dict[str, object],
@@ -207,25 +609,79 @@ class LambdaHandler(object):
         with an appropriate message and an HTTP 400 status code (Bad Request) is
         returned.
 
+        HTTP API, REST API, Application Load Balancer and function URL events
+        are supported. See LambdaHandler.__init__ on how the format is chosen.
+
         :param event: The event object passed by AWS Lambda.
         :param context: The context object passed by AWS Lambda.
         :return: A response object, as expected by AWS Lambda.
         """
 
-        http_event = HttpEvent(event)
-        method = http_event.get_http_method()
-        path = http_event.get_path()
+        if not self._profiler.invoked:
+            return self._handle_first_request(event, context)
+        return self._handle_request(event, context)
 
-        if method is None or path is None:
-            method_present = 'not' if method is None else ''
-            path_present = 'not' if path is None else ''
+    def _handle_first_request(self,
+                              event: Dict[str, object],
+                              context: LambdaContext) -> Dict[str, object]:
+
+        profiler = self._profiler
+        profiler.begin_first_invocation()
+        try:
+            return self._handle_request(event, context)
+        finally:
+            profiler.end_first_invocation()
+            try:
+                self._report_startup()
+            except Exception:
+                # Reporting must never fail the request.
+                self._log.exception('Failed to report the startup of the function.')
+
+    def _report_startup(self) -> None:
+
+        profiler = self._profiler
+        init_duration_ms = profiler.init_duration_ms
+
+        if profiler.over_budget:
+            self._log.warning('Initialization took %.1f ms, over the budget of %.1f ms.',
+                              init_duration_ms, profiler.budget_ms)
+
+        profiler.write_metrics(self._service_name)
+
+        if self._trace:
+            with self._tracer.in_subsegment(name='## startup') as subsegment:
+                subsegment.put_annotation(key='InitDurationMs', value=init_duration_ms)
+                subsegment.put_metadata(
+                    key='startup', value=profiler.report(), namespace=self._service_name)
+
+    def _handle_request(self,
+                        event: Dict[str, object],
+                        context: LambdaContext) -> Dict[str, object]:
+
+        # Outbound requests made by the handler must end before the
+        # invocation does.
+        self._clients.set_deadline(context)
+
+        if self._capture is not None:
+            try:
+                self._capture.capture(event, context)
+            except Exception:
+                # Capturing traffic must never fail the request.
+                self._log.exception('Failed to capture the request.')
+
+        http_event = self._parse_event(event)
+        response = self.dispatch(http_event, context)
+        response = http_event.format_response(response.get_response_object())
+
+        # Memory is checked once the request is handled, and only sampled
+        # every so often.
+        try:
+            self._memory_governor.check(context, self._service_name)
+        except Exception:
+            self._log.exception('Failed to check the memory of the function.')
+
+        return response
 
-            logger.error(
-                f"Method {method_present} present, path {path_present} present.")
-            response = HttpResponse.build_error_response(400, message='Bad request')
-        elif method in self._allowed_methods:
-            response = self._handle_event(http_event, path)
-        else:
-            response = HttpResponse.build_error_response(405, message='Method not allowed')
 
-        return response.get_response_object()
+# The rest of the package is imported along with this module.
+startup_profiler.record_phase('pyrazine_import', pyrazine._import_started, time.perf_counter())
@@ -0,0 +1,153 @@
+import json
+from typing import Callable, Iterator
+
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+
+_NUMBER_CONTINUATION = '.eE+-'
+
+_decoder = json.JSONDecoder()
+
+
+class JsonStreamError(ValueError):
+    """
+    Raised when a streamed JSON document is malformed, possibly after some of
+    its items have already been yielded.
+    """
+    pass
+
+
+class _Reader(object):
+    """
+    Keeps the part of a JSON document that has been read but not parsed yet.
+    """
+
+    def __init__(self, read: Callable[[int], str], chunk_size: int):
+        self._read = read
+        self._chunk_size = chunk_size
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """
+        Reads more of the document, dropping the part already parsed. Returns
+        False at the end of the document.
+        """
+        if self.eof:
+            return False
+
+        # Read at least as much as is pending, so that values larger than a
+        # chunk take a logarithmic number of attempts to parse.
+        chunk = self._read(max(self._chunk_size, len(self.buffer) - self.position))
+        if not chunk:
+            self.eof = True
+            return False
+
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self) -> str:
+        """
+        Skips whitespace and returns the next character, or an empty string at
+        the end of the document.
+        """
+        while True:
+            buffer = self.buffer
+            position = self.position
+            length = len(buffer)
+            while position < length and buffer[position] in _WHITESPACE:
+                position += 1
+            self.position = position
+
+            if position < length:
+                return buffer[position]
+            if not self.fill():
+                return ''
+
+    def expect(self, character: str) -> None:
+        found = self.peek()
+        if found != character:
+            raise JsonStreamError(
+                f'Expected {character!r}, found {found!r}' if found else
+                f'Expected {character!r}, found the end of the document')
+        self.position += 1
+
+    def decode_value(self) -> object:
+        if not self.peek():
+            raise JsonStreamError('Unexpected end of the document')
+
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError as err:
+                # The value may continue in the part not read yet.
+                if self.fill():
+                    continue
+                raise JsonStreamError(str(err)) from None
+
+            # A number that ends with the buffer, or before a fraction or an
+            # exponent that ends with it, may continue in the next chunk.
+            if type(value) in (int, float) and \
+                    (end == len(self.buffer) or self.buffer[end] in _NUMBER_CONTINUATION) and \
+                    self.fill():
+                continue
+
+            self.position = end
+            return value
+
+
+def iter_json_array(read: Callable[[int], str],
+                    key: str = None,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[object]:
+    """
+    Parses a JSON array incrementally, yielding its items one by one, so that
+    only one of them is held in memory at a time.
+
+    :param read: A function that takes a number of characters and returns at
+    most that many of the document, or an empty string at its end, like the
+    read method of a text stream.
+    :param key: If set, the document is an object, and the array to iterate
+    over is the value of this key. Values of other keys before it are parsed
+    and discarded, and those after it are not parsed.
+    :param chunk_size: The number of characters to read at once.
+    :return: An iterator over the items of the array.
+    :raises JsonStreamError: While iterating, if the document is malformed.
+    """
+
+    reader = _Reader(read, chunk_size)
+
+    if key is not None:
+        reader.expect('{')
+        if reader.peek() == '}':
+            raise JsonStreamError(f'Missing key {key}')
+
+        while True:
+            name = reader.decode_value()
+            if not isinstance(name, str):
+                raise JsonStreamError('Expected a property name')
+            reader.expect(':')
+            if name == key:
+                break
+
+            reader.decode_value()
+            if reader.peek() != ',':
+                raise JsonStreamError(f'Missing key {key}')
+            reader.position += 1
+
+    reader.expect('[')
+    if reader.peek() == ']':
+        return
+
+    while True:
+        yield reader.decode_value()
+
+        separator = reader.peek()
+        reader.position += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise JsonStreamError(f'Expected \',\' or \']\', found {separator!r}')
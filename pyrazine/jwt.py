@@ -1,14 +1,119 @@
+import calendar
 import json
-from typing import Dict, Union
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+from pyrazine.structures import PrefixTrie
+
+
+def _to_bool(value: object) -> bool:
+    # Some claims arrive as the strings "true" and "false" instead of booleans.
+    if isinstance(value, str):
+        return value.lower() == 'true'
+    return bool(value)
+
+
+# The format of the dates REST API Cognito authorizers send instead of
+# numbers, e.g. 'Wed Dec 23 00:49:54 UTC 2020'.
+_AUTHORIZER_DATE_FORMAT = '%a %b %d %H:%M:%S UTC %Y'
+
+
+def parse_numeric_date(value: object) -> Optional[float]:
+    """
+    Converts a date claim, such as exp or iat, to seconds since the epoch.
+    Takes numbers, numeric strings, and the date strings REST API Cognito
+    authorizers send.
+
+    :param value: The value of the claim.
+    :return: The seconds since the epoch, or None if the value is not a date.
+    """
+
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return float(calendar.timegm(time.strptime(value, _AUTHORIZER_DATE_FORMAT)))
+    except ValueError:
+        return None
+
+
+# Result types of the conversion functions used by the claims, so that values
+# that already have the right type are not converted again.
+_CONVERSION_TYPES = {str: str, int: int, _to_bool: bool}
+
+
+def _build_claim_decoder(claims: Tuple[Tuple[str, str, Callable, object], ...]) -> Callable:
+    """
+    Generates a function that converts all claims of a token class and stores
+    them in its slots with straight-line code, which is several times faster
+    than looping over the claim definitions for every token.
+    """
+
+    namespace = {}
+    lines = ['def decode(self, contents):', '    get = contents.get']
+    for index, (name, claim, convert, default) in enumerate(claims):
+        namespace[f'convert_{index}'] = convert
+        namespace[f'default_{index}'] = default
+        namespace[f'type_{index}'] = _CONVERSION_TYPES.get(convert)
+
+        lines.append(f'    value = get({claim!r})')
+        lines.append('    if value is None:')
+        lines.append(f'        self.{name} = default_{index}')
+        lines.append(f'    elif value.__class__ is type_{index}:')
+        lines.append(f'        self.{name} = value')
+        lines.append('    else:')
+        lines.append(f'        self.{name} = convert_{index}(value)')
+
+    exec('\n'.join(lines), namespace)
+    return namespace['decode']
+
+
+def _init_claim_model(cls: type) -> None:
+    cls._decode_all_claims = _build_claim_decoder(cls._CLAIMS)
 
 
 class JwtToken(object):
+    """
+    Provides read-only access to the standard claims of a JWT token:
+
+    - aud: Audience, the recipient(s) for which the token is intended.
+    - exp: Expiry, the time after which the token expires.
+    - iat: Issued at, the time at which the token was issued.
+    - iss: Issuer, the principal that issued the token.
+    - jti: JWT ID, the unique identifier of the token.
+    - sub: Subject, the principal that is the subject of the token.
+
+    Claims not present in the token are None. All claims are converted to
+    their types once, when the token is built, and stored in slots, so
+    accessing them is a plain attribute read.
+    """
+
+    # The claims exposed as attributes, as tuples of attribute name, claim
+    # name, conversion function and default value. Subclasses extend it.
+    _CLAIMS = (
+        ('aud', 'aud', str, None),
+        ('exp', 'exp', int, None),
+        ('iat', 'iat', int, None),
+        ('iss', 'iss', str, None),
+        ('jti', 'jti', str, None),
+        ('sub', 'sub', str, None),
+    )
+
+    __slots__ = ('_token_contents', '_dict', '_json') + tuple(claim[0] for claim in _CLAIMS)
 
     def __init__(self, token_object: Dict[str, object] = None, token_string: str = None):
         """
         Takes either a token object (a dictionary of objects indexed by strings), or a token
         string (a JSON-serialized token), and provides read-only access to the information contained
-        in either one through a series of properties.
+        in either one through a series of attributes.
 
         If both a token object and a token string are provided, the object takes precedence over
         the string.
@@ -24,221 +129,235 @@ class JwtToken(object):
         else:
             raise ValueError('Invalid token contents provided.')
 
-    @property
-    def aud(self) -> str:
-        """
-        Token audience - The recipient(s) for which the token is intended.
-
-        :return: The audience of the token, or None if the field is not present.
-        """
-        return str(self._token_contents['aud']) \
-            if 'aud' in self._token_contents else None
+        self._dict = None
+        self._json = None
+
+        try:
+            self._decode_all_claims(self._token_contents)
+        except (TypeError, ValueError):
+            self._decode_claims_one_by_one()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _init_claim_model(cls)
+
+    def _decode_claims_one_by_one(self) -> None:
+
+        # At least one claim does not have the expected format, such as dates
+        # sent as strings by REST API authorizers. Keep the value as received
+        # for the claims that cannot be converted.
+        contents = self._token_contents
+        for name, claim, convert, default in self._CLAIMS:
+            value = contents.get(claim)
+            if value is None:
+                value = default
+            else:
+                try:
+                    value = convert(value)
+                except (TypeError, ValueError):
+                    pass
+            setattr(self, name, value)
 
     @property
-    def exp(self) -> int:
+    def claims(self) -> Dict[str, object]:
         """
-        Expiry - The time after which the token expires.
-
-        :return: The date of expiration of the token, or None if the field is not present.
+        The claims of the token, as received.
         """
-        return int(self._token_contents['exp']) \
-            if 'exp' in self._token_contents else None
+        return self._token_contents
 
-    @property
-    def iat(self) -> int:
+    def as_dict(self) -> Dict[str, object]:
         """
-        Issued at - The time at which the token was issued.
+        Returns the token information as a dictionary of objects indexed by strings.
 
-        :return:
-        """
-        return int(self._token_contents['iat']) \
-            if 'iat' in self._token_contents else None
+        The dictionary is built once and shared by later calls, so it must not be modified.
 
-    @property
-    def iss(self) -> str:
+        :return: A dictionary of objects indexed by strings containing all fields in the token, and
+        their respective values.
         """
-        Issuer -
+        if self._dict is None:
+            self._dict = {name: getattr(self, name) for name, _, _, _ in self._CLAIMS}
+        return self._dict
 
-        :return:
+    def as_json(self) -> str:
         """
-        return str(self._token_contents['iss']) \
-            if 'iss' in self._token_contents else None
-
-    @property
-    def jti(self) -> str:
+        Returns the token information serialized as JSON. The string is built once and reused.
         """
-        JWT ID
+        if self._json is None:
+            self._json = json.dumps(self.as_dict())
+        return self._json
 
-        :return:
-        """
-        return str(self._token_contents['jti']) \
-            if 'jti' in self._token_contents else None
 
-    @property
-    def sub(self) -> str:
-        """
-        Subject -
+_init_claim_model(JwtToken)
 
-        :return:
-        """
-        return str(self._token_contents['sub']) \
-            if 'sub' in self._token_contents else None
 
-    def as_dict(self) -> Dict[str, object]:
-        return {
-            'aud': self.aud,
-            'exp': self.exp,
-            'iat': self.iat,
-            'iss': self.iss,
-            'jti': self.jti,
-            'sub': self.sub
-        }
+class CognitoJwtToken(JwtToken):
+    """
+    Provides read-only access to the claims of tokens issued by Amazon Cognito user pools, in
+    addition to the standard ones:
+
+    - auth_time: The time when the authentication occurred.
+    - client_id: The ID of the client for which this token is intended.
+    - cognito_username: The Cognito username of the user to which the token has been issued.
+    - email: The e-mail of the user, as stored in Amazon Cognito.
+    - email_verified: True, if the user has verified their e-mail. False if not, or if the
+      claim is not present.
+    - event_id: The ID of the event associated with this token.
+    - family_name: The family name of the user.
+    - given_name: The given name of the user.
+    - scope: The scopes of the token, separated by spaces.
+    - token_use: The use for which the token is intended.
+    - username: The username to which this token has been issued.
+    """
 
+    _CLAIMS = JwtToken._CLAIMS + (
+        ('auth_time', 'auth_time', int, None),
+        ('client_id', 'client_id', str, None),
+        ('cognito_username', 'cognito:username', str, None),
+        ('email', 'email', str, None),
+        ('email_verified', 'email_verified', _to_bool, False),
+        ('event_id', 'event_id', str, None),
+        ('family_name', 'family_name', str, None),
+        ('given_name', 'given_name', str, None),
+        ('scope', 'scope', str, None),
+        ('token_use', 'token_use', str, None),
+        ('username', 'username', str, None),
+    )
 
-class CognitoJwtToken(JwtToken):
+    __slots__ = tuple(claim[0] for claim in _CLAIMS[len(JwtToken._CLAIMS):])
 
-    def __init__(self, token_object: Dict[str, object] = None, token_string: str = None):
-        super().__init__(token_object, token_string)
 
-    @property
-    def auth_time(self) -> int:
-        """
-        The time when the authentication occurred.
+def _list_of_str(value: object) -> List[str]:
+    # List claims are sometimes sent as a single space-separated string.
+    if isinstance(value, str):
+        return value.split()
+    return [str(item) for item in value]
 
-        :return: Time of authentication as the number of seconds elapsed since 1970-01-01T0:0:0Z, if
-        the field is present in the token. Otherwise, None.
-        """
-        return int(self._token_contents['auth_time']) \
-            if 'auth_time' in self._token_contents else None
 
-    @property
-    def client_id(self) -> str:
-        """
-        Returns the client ID for which this token is intended.
+class Auth0JwtToken(JwtToken):
+    """
+    Provides read-only access to the claims of access tokens issued by Auth0, in addition to the
+    standard ones:
 
-        :return: The ID of the client for which this token is intended, if the field is present.
-        Otherwise, None.
-        """
-        return str(self._token_contents['client_id']) \
-            if 'client_id' in self._token_contents else None
+    - azp: The client ID of the application the token was issued to.
+    - gty: The grant type used to obtain the token, e.g. client-credentials.
+    - permissions: The permissions granted to the subject, if RBAC is enabled in the API.
+    - scope: The scopes of the token, separated by spaces.
+    """
 
-    @property
-    def cognito_username(self) -> str:
-        """
-        Returns the Cognito username associated to the user, to which this token has been issued.
+    _CLAIMS = JwtToken._CLAIMS + (
+        ('azp', 'azp', str, None),
+        ('gty', 'gty', str, None),
+        ('permissions', 'permissions', _list_of_str, None),
+        ('scope', 'scope', str, None),
+    )
 
-        :return: The Cognito username, if the field is present in the token. Otherwise, None.
-        """
-        return str(self._token_contents['cognito:username']) \
-            if 'cognito:username' in self._token_contents else None
+    __slots__ = tuple(claim[0] for claim in _CLAIMS[len(JwtToken._CLAIMS):])
 
-    @property
-    def email(self) -> str:
-        """
-        Returns the e-mail associated to the user, to which this token has been issued.
 
-        :return: The e-mail, as stored in Amazon Cognito, if the field is present. Otherwise, None.
-        """
-        return str(self._token_contents['email']) \
-            if 'email' in self._token_contents else None
+class OktaJwtToken(JwtToken):
+    """
+    Provides read-only access to the claims of access tokens issued by Okta, in addition to the
+    standard ones:
+
+    - auth_time: The time when the authentication occurred.
+    - cid: The client ID of the application the token was issued to.
+    - scp: The scopes of the token.
+    - uid: The Okta ID of the user.
+    - ver: The version of the token.
+    """
 
-    @property
-    def email_verified(self) -> bool:
-        """
-        Returns True if the user, to which this token has been issued, has verified their e-mail
-        in Amazon Cognito.
+    _CLAIMS = JwtToken._CLAIMS + (
+        ('auth_time', 'auth_time', int, None),
+        ('cid', 'cid', str, None),
+        ('scp', 'scp', _list_of_str, None),
+        ('uid', 'uid', str, None),
+        ('ver', 'ver', int, None),
+    )
 
-        :return: True, if the field is present, and the e-mail has been marked as verified in Amazon
-        Cognito. In any other case, it returns False.
-        """
-        return bool(self._token_contents['email_verified']) \
-            if 'email_verified' in self._token_contents else False
+    __slots__ = tuple(claim[0] for claim in _CLAIMS[len(JwtToken._CLAIMS):])
 
-    @property
-    def event_id(self) -> str:
-        """
-        Returns the ID of the event associated with this token.
 
-        :return: The ID of the event associated with this token, if the field is present.
-        Otherwise, None.
-        """
-        return str(self._token_contents['event_id']) \
-            if 'event_id' in self._token_contents else None
+class TokenRegistry(object):
+    """
+    Maps issuers to the token classes used to wrap their claims. Issuers can be registered either
+    exactly or by prefix, in which case the longest matching prefix wins.
 
-    @property
-    def family_name(self) -> str:
-        """
-        Returns the family name associated with the user to which this token has been issued.
+    The class resolved for an issuer is cached, so wrapping a token costs a single dictionary
+    lookup, whatever the number of registered providers.
+    """
 
-        :return: If the field is present, the family name of the user, as stored in Amazon Cognito.
-        Otherwise, None.
-        """
-        return str(self._token_contents['family_name']) \
-            if 'family_name' in self._token_contents else None
+    # Maximum number of issuers whose class is cached. Issuers come from tokens, so the cache is
+    # bounded in case they are not validated before being parsed.
+    MAX_CACHED_ISSUERS = 1024
 
-    @property
-    def given_name(self) -> str:
+    def __init__(self, default_class: Type[JwtToken] = JwtToken):
         """
-        Returns the given name associated with the user to which this token has been issued.
-
-        :return: If the field is present, the given name of the user, as stored in Amazon Cognito.
-        Otherwise, None.
+        :param default_class: The class used for issuers that have not been registered.
         """
-        return str(self._token_contents['given_name']) \
-            if 'given_name' in self._token_contents else None
+        self._default_class = default_class
+        self._exact = {}
+        self._prefixes = PrefixTrie()
+        self._cache = {}
 
-    @property
-    def scope(self) -> str:
+    def register(self,
+                 token_class: Type[JwtToken] = JwtToken,
+                 issuer: str = None,
+                 prefix: str = None,
+                 claims: Tuple[Tuple[str, str, Callable, object], ...] = None) -> Type[JwtToken]:
         """
-        Returns the scope.
+        Registers the class to use for the tokens of an issuer.
 
-        :return: The scope, if the field is present. Otherwise, None.
+        :param token_class: The class to wrap the tokens with.
+        :param issuer: The exact issuer of the tokens.
+        :param prefix: A prefix of the issuer of the tokens, e.g. the URL of an identity provider
+        followed by a tenant-specific path.
+        :param claims: Additional claims to expose as attributes, as tuples of attribute name,
+        claim name, conversion function and default value. A subclass of the token class is
+        created with them.
+        :return: The class that will be used for the issuer.
         """
-        return str(self._token_contents['scope']) if 'scope' in self._token_contents else None
+        if (issuer is None) == (prefix is None):
+            raise ValueError('Either an issuer or a prefix must be provided.')
 
-    @property
-    def token_use(self) -> str:
-        """
-        Returns the use for which the token is intended.
+        if claims:
+            token_class = type(token_class.__name__, (token_class,), {
+                '_CLAIMS': token_class._CLAIMS + tuple(claims),
+                '__slots__': tuple(claim[0] for claim in claims),
+            })
 
-        :return: The use for which the token is intended, if the field is present. Otherwise, None.
-        """
-        return str(self._token_contents['token_use']) \
-            if 'token_use' in self._token_contents else None
+        if issuer is not None:
+            self._exact[issuer] = token_class
+        else:
+            self._prefixes.insert(prefix, token_class)
 
-    @property
-    def username(self) -> str:
-        """
-        Returns the username to which this token has been issued.
+        self._cache.clear()
+        return token_class
 
-        :return: The username to which this token has been issued, if the field is present.
-        Otherwise, None.
+    def resolve(self, issuer: str) -> Type[JwtToken]:
         """
-        return str(self._token_contents['username']) \
-            if 'username' in self._token_contents else None
+        Returns the token class registered for an issuer.
 
-    def as_dict(self) -> Dict[str, object]:
+        :param issuer: The issuer of the token.
+        :return: The class registered either for the issuer or for its longest registered prefix,
+        or the default class if there is none.
         """
-        Returns the token information as a dictionary of objects indexed by strings.
+        token_class = self._cache.get(issuer)
+        if token_class is None:
+            token_class = self._exact.get(issuer) or \
+                self._prefixes.longest_match(issuer) or \
+                self._default_class
 
-        :return: A dictionary of objects indexed by strings containing all fields in the token, and
-        their respective values.
-        """
-        d = super().as_dict()
+            if len(self._cache) >= self.MAX_CACHED_ISSUERS:
+                self._cache.clear()
+            self._cache[issuer] = token_class
+
+        return token_class
 
-        d['auth_time'] = self.auth_time
-        d['client_id'] = self.client_id
-        d['cognito_username'] = self.cognito_username
-        d['email'] = self.email
-        d['email_verified'] = self.email_verified
-        d['event_id'] = self.event_id
-        d['family_name'] = self.family_name
-        d['given_name'] = self.given_name
-        d['scope'] = self.scope
-        d['token_use'] = self.token_use
-        d['username'] = self.username
 
-        return d
+# Registry used by JwtTokenParser unless told otherwise. Add other providers to it with
+# default_token_registry.register().
+default_token_registry = TokenRegistry()
+default_token_registry.register(CognitoJwtToken, prefix='https://cognito-idp.')
 
 
 class JwtTokenParser(object):
@@ -248,37 +367,37 @@ class JwtTokenParser(object):
     """
 
     @staticmethod
-    def parse_string(token_string: str) -> JwtToken:
+    def parse_string(token_string: str, registry: TokenRegistry = None) -> JwtToken:
         """
         Parses a JWT token that is serialized as a JSON string.
 
         :param token_string: The JSON string to parse.
+        :param registry: The registry to resolve the token class with. Defaults to
+        default_token_registry.
         :return: An object of type JwtToken with the contents of the token.
         """
         token_object = json.loads(token_string)
-        return JwtTokenParser.parse_object(token_object)
+        return JwtTokenParser.parse_object(token_object, registry)
 
     @staticmethod
-    def parse_object(token_object: Dict[str, object]) -> Union[JwtToken, CognitoJwtToken]:
+    def parse_object(token_object: Dict[str, object], registry: TokenRegistry = None) -> JwtToken:
         """
         Factory method that creates a token class based on the contents of the token dictionary
         provided.
 
         :param token_object: A dictionary of objects indexed by strings that contains the fields
         of the JWT token for which to build a container object.
-        :return: An object of either JwtToken or CognitoJwtToken type, depending on the contents
-        of the dictionary.
+        :param registry: The registry to resolve the token class with. Defaults to
+        default_token_registry.
+        :return: An object of the class registered for the issuer of the token, JwtToken if none
+        has been registered.
         """
-        if 'iss' not in token_object:
+        iss = token_object.get('iss')
+        if iss is None:
             raise ValueError('Invalid JWT token. No issuer.')
 
-        iss = str(token_object['iss'])
-        if iss.startswith('https://cognito-idp'):
-            jwt_token = CognitoJwtToken(token_object=token_object)
-        else:
-            jwt_token = JwtToken(token_object=token_object)
-
-        return jwt_token
+        token_class = (registry or default_token_registry).resolve(str(iss))
+        return token_class(token_object=token_object)
 
 
 class JwtTokenJsonEncoder(json.JSONEncoder):
@@ -287,6 +406,7 @@ class JwtTokenJsonEncoder(json.JSONEncoder):
     """
     def default(self, o):
         if isinstance(o, JwtToken):
+            # The dictionary is cached by the token, so it is only built once.
             return o.as_dict()
         else:
             return super().default(o)
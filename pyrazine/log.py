@@ -0,0 +1,392 @@
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, TextIO, Union
+
+
+ENVIRONMENT = os.environ.get('ENVIRONMENT')
+
+# The attributes every log record has, which are not copied into the entry
+# as fields.
+_RECORD_ATTRIBUTES = frozenset(
+    vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+_encode_json = json.JSONEncoder(default=str, ensure_ascii=False).encode
+
+
+class _InvocationLogRecord(logging.LogRecord):
+    """
+    Record of a StructuredLogger, which only sets the attributes formatters
+    use, instead of looking up the process, thread and source file of each
+    record like LogRecord does.
+    """
+
+    def __init__(self,
+                 name: str,
+                 level: int,
+                 message: str,
+                 args: tuple,
+                 exc_info: object,
+                 context: Optional[Dict[str, object]],
+                 fields: Dict[str, object]):
+        created = time.time()
+        self.name = name
+        self.msg = message
+        self.args = args
+        self.levelno = level
+        self.levelname = logging.getLevelName(level)
+        self.pathname = self.filename = self.module = ''
+        self.lineno = 0
+        self.funcName = None
+        self.created = created
+        self.msecs = int(created * 1000) % 1000
+        self.relativeCreated = 0
+        self.exc_info = exc_info
+        self.exc_text = None
+        self.stack_info = None
+        self.thread = self.threadName = None
+        self.process = self.processName = None
+        self.context = context
+        self.fields = fields
+
+
+# Level names accepted by Lambda's advanced logging controls that the logging
+# module does not define, or defines differently.
+LEVEL_ALIASES = {
+    'TRACE': logging.DEBUG,
+    'WARN': logging.WARNING,
+    'FATAL': logging.CRITICAL,
+}
+
+
+def parse_level(name: str) -> int:
+    """
+    Returns the level of a name, e.g. INFO, regardless of its case, including
+    the TRACE, WARN and FATAL names used by Lambda.
+
+    :raises ValueError: If the name is not the one of a level.
+    """
+    name = name.strip().upper()
+    level = LEVEL_ALIASES.get(name)
+    if level is None:
+        # getLevelName returns "Level X" for unknown names.
+        level = logging.getLevelName(name)
+        if not isinstance(level, int):
+            raise ValueError(f'Unknown log level {name}')
+    return level
+
+
+def get_default_level() -> int:
+    """
+    Returns the level set in the LOG_LEVEL or AWS_LAMBDA_LOG_LEVEL environment
+    variables, or DEBUG if the ENVIRONMENT variable is DEV and INFO otherwise,
+    so that debug records are not written unless asked for. Unknown levels in
+    the environment are ignored, so that they do not fail every request.
+    """
+    name = os.environ.get('LOG_LEVEL') or os.environ.get('AWS_LAMBDA_LOG_LEVEL')
+    if name:
+        try:
+            return parse_level(name)
+        except ValueError:
+            pass
+    return logging.DEBUG if ENVIRONMENT == 'DEV' else logging.INFO
+
+
+class _InvocationState(threading.local):
+    """
+    The level and fields of the invocation handled by a thread. The level is
+    None unless debug records were sampled for the invocation.
+    """
+    level: Optional[int] = None
+    context: Optional[Dict[str, object]] = None
+    context_shared: bool = False
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as single-line JSON objects, with the fields of the
+    invocation they were logged in and those passed to the log call.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._second = None
+        self._second_text = None
+
+    def _format_timestamp(self, created: float) -> str:
+
+        # Records of the same second share the costly part of the timestamp.
+        second = int(created)
+        if second != self._second:
+            self._second_text = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+            self._second = second
+        return f'{self._second_text}.{int(created * 1000) % 1000:03d}Z'
+
+    def format(self, record: logging.LogRecord) -> str:
+
+        entry = {
+            'timestamp': self._format_timestamp(record.created),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+
+        if isinstance(record, _InvocationLogRecord):
+            if record.context:
+                entry.update(record.context)
+            if record.fields:
+                entry.update(record.fields)
+        else:
+            # Fields passed as extra to standard loggers.
+            for key, value in record.__dict__.items():
+                if key not in _RECORD_ATTRIBUTES:
+                    entry[key] = value
+
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+
+        return _encode_json(entry)
+
+
+class InvocationLogHandler(logging.Handler):
+    """
+    Handler that keeps the records of an invocation, per thread, and writes
+    them all at once when it ends, instead of making a write per record.
+
+    Records at flush_level or above, and records that fill the buffer, flush
+    it right away, so that errors are not lost if the invocation is cut
+    short. Records logged outside invocations are written right away.
+    """
+
+    def __init__(self,
+                 stream: TextIO = None,
+                 capacity: int = 1000,
+                 flush_level: int = logging.ERROR):
+        """
+        :param stream: The stream to write to. Defaults to the standard output.
+        :param capacity: The maximum number of records kept.
+        :param flush_level: The level of the records that flush the buffer.
+        """
+        super().__init__()
+        self.stream = stream
+        self.capacity = capacity
+        self.flush_level = flush_level
+        self._local = threading.local()
+        self.setFormatter(JsonFormatter())
+
+    def start_buffering(self) -> None:
+        self._local.buffer = []
+
+    def stop_buffering(self) -> None:
+        self.flush()
+        self._local.buffer = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            self._write([record])
+            return
+
+        buffer.append(record)
+        if len(buffer) >= self.capacity or record.levelno >= self.flush_level:
+            self.flush()
+
+    def flush(self) -> None:
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer:
+            records = buffer[:]
+            buffer.clear()
+            self._write(records)
+
+    def _write(self, records: List[logging.LogRecord]) -> None:
+
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+
+        if not lines:
+            return
+
+        # The standard output is looked up on every write, so that it can be
+        # replaced, e.g. by test runners capturing it.
+        stream = self.stream if self.stream is not None else sys.stdout
+        with self.lock:
+            stream.write('\n'.join(lines) + '\n')
+            stream.flush()
+
+
+class StructuredLogger(object):
+    """
+    Logger that writes JSON entries with the request ID, route and cold start
+    of the invocation they are logged in, buffered until the invocation ends.
+
+    Messages are formatted with their arguments, like those of the standard
+    logging module, and only once a record is known to be enabled:
+
+        log.debug('Processing %s route for path %s', method, path)
+
+    Debug records can be enabled for a sample of the invocations, so that they
+    are available when investigating issues without paying for them on every
+    request.
+    """
+
+    def __init__(self,
+                 name: str = 'pyrazine',
+                 level: Union[int, str] = None,
+                 debug_sample_rate: float = 0.0,
+                 stream: TextIO = None,
+                 buffer: bool = True,
+                 capacity: int = 1000):
+        """
+        :param name: The name of the logger.
+        :param level: The minimum level of the records written, or its name,
+        see parse_level. Defaults to the one given by get_default_level.
+        :param debug_sample_rate: The fraction of invocations for which debug
+        records are written, whatever the level.
+        :param stream: The stream to write to. Defaults to the standard output.
+        :param buffer: False, to write records as they are logged.
+        :param capacity: The maximum number of records buffered.
+        :raises ValueError: If the name of the level is unknown.
+        """
+
+        if isinstance(level, str):
+            level = parse_level(level)
+        self.level = level if level is not None else get_default_level()
+        self.debug_sample_rate = debug_sample_rate
+
+        self.handler = InvocationLogHandler(stream=stream, capacity=capacity)
+        self._buffer = buffer
+
+        # The logger is not registered with the logging module, so records
+        # are not propagated to the handlers of the root logger, which the
+        # Lambda runtime sets up. Handlers can still be added to it.
+        self.logger = logging.Logger(name, logging.DEBUG)
+        self.logger.addHandler(self.handler)
+
+        self._state = _InvocationState()
+        self._cold_start = True
+
+    def begin_invocation(self, request_id: str = None, **fields) -> None:
+        """
+        Starts buffering the records of an invocation, which are written with
+        its request ID and the fields given.
+        """
+
+        cold_start, self._cold_start = self._cold_start, False
+
+        state = self._state
+        state.level = None
+        if self.debug_sample_rate and self.level > logging.DEBUG and \
+                random.random() < self.debug_sample_rate:
+            state.level = logging.DEBUG
+
+        fields['request_id'] = request_id
+        fields['cold_start'] = cold_start
+        state.context = fields
+        state.context_shared = False
+        if self._buffer:
+            self.handler.start_buffering()
+
+    def set_fields(self, **fields) -> None:
+        """
+        Adds fields to the records logged in the rest of the invocation.
+        """
+        state = self._state
+        if state.context is None:
+            state.context = fields
+        elif state.context_shared:
+            # Records already logged keep the fields they were logged with.
+            state.context = dict(state.context, **fields)
+            state.context_shared = False
+        else:
+            state.context.update(fields)
+
+    def end_invocation(self) -> None:
+        """
+        Writes the records of the invocation.
+        """
+        if self._buffer:
+            self.handler.stop_buffering()
+        state = self._state
+        state.level = None
+        state.context = None
+
+    def is_enabled_for(self, level: int) -> bool:
+        return level >= (self._state.level or self.level)
+
+    def _emit(self,
+              level: int,
+              message: str,
+              args: tuple,
+              exc_info: object,
+              fields: Dict[str, object]) -> None:
+
+        if exc_info is True:
+            exc_info = sys.exc_info()
+        elif isinstance(exc_info, BaseException):
+            exc_info = (type(exc_info), exc_info, exc_info.__traceback__)
+
+        state = self._state
+        state.context_shared = True
+
+        # The record is built directly, which skips looking up the caller in
+        # the stack the way Logger.log does.
+        self.logger.handle(_InvocationLogRecord(
+            self.logger.name, level, message, args, exc_info, state.context, fields))
+
+    def log(self,
+            level: int,
+            message: str,
+            *args,
+            exc_info: object = None,
+            **fields) -> None:
+        """
+        Logs a message, formatted with its arguments only if the level is
+        enabled.
+
+        :param level: The level of the message.
+        :param message: The message, with %-style placeholders for args.
+        :param args: The arguments of the message.
+        :param exc_info: True, or an exception, to add its traceback.
+        :param fields: Fields added to the entry.
+        """
+        if level >= (self._state.level or self.level):
+            self._emit(level, message, args, exc_info, fields)
+
+    # The level is checked before anything else, as most debug records are
+    # disabled.
+
+    def debug(self, message: str, *args, **fields) -> None:
+        if (self._state.level or self.level) <= logging.DEBUG:
+            self._emit(logging.DEBUG, message, args, None, fields)
+
+    def info(self, message: str, *args, **fields) -> None:
+        if (self._state.level or self.level) <= logging.INFO:
+            self._emit(logging.INFO, message, args, None, fields)
+
+    def warning(self, message: str, *args, **fields) -> None:
+        if (self._state.level or self.level) <= logging.WARNING:
+            self._emit(logging.WARNING, message, args, None, fields)
+
+    def error(self, message: str, *args, **fields) -> None:
+        if (self._state.level or self.level) <= logging.ERROR:
+            self._emit(logging.ERROR, message, args, None, fields)
+
+    def exception(self, message: str, *args, **fields) -> None:
+        if (self._state.level or self.level) <= logging.ERROR:
+            self._emit(logging.ERROR, message, args, True, fields)
+
+    @property
+    def context(self) -> Optional[Dict[str, object]]:
+        """
+        The fields of the current invocation, if any.
+        """
+        return self._state.context
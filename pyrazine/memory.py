@@ -0,0 +1,252 @@
+import gc
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, TextIO, Tuple
+
+from pyrazine.metrics import MetricValue, write_metrics
+from pyrazine.typing import LambdaContext
+
+
+# Trims a fraction of a cache, and returns the number of bytes it freed.
+TrimFunction = Callable[[float], int]
+
+
+class _RssReader(object):
+    """
+    Reads the resident set size of the process from /proc/self/statm, through
+    a descriptor kept open, which is cheaper than opening the file each time.
+    """
+
+    def __init__(self):
+        self._fd = None
+        self._pid = None
+        try:
+            self._page_size = os.sysconf('SC_PAGE_SIZE')
+        except (AttributeError, ValueError, OSError):
+            self._page_size = 4096
+
+    def __call__(self) -> Optional[int]:
+        try:
+            # /proc/self is resolved when the file is opened, so forked
+            # processes open it again.
+            if self._fd is None or self._pid != os.getpid():
+                self._fd = os.open('/proc/self/statm', os.O_RDONLY)
+                self._pid = os.getpid()
+            return int(os.pread(self._fd, 128, 0).split()[1]) * self._page_size
+        except (OSError, ValueError, IndexError):
+            return None
+
+
+read_rss_bytes = _RssReader()
+
+
+class MemoryGovernor(object):
+    """
+    Keeps the memory of a function under its limit, by trimming the caches
+    registered with it when the resident set size of the process gets close
+    to the limit.
+
+    Caches are trimmed in order of priority, those with the lowest first, and
+    only as many as needed to get back under the soft limit. Over the hard
+    limit, all of them are emptied and the garbage collector is run.
+
+        countries = TieredCache(namespace='countries')
+        default_memory_governor.register(countries, priority=10)
+
+    LambdaHandler samples the memory after each request, at most once per
+    sample_interval, so checking it costs a clock read most of the time.
+    """
+
+    def __init__(self,
+                 soft_limit: float = 0.8,
+                 hard_limit: float = 0.9,
+                 trim_fraction: float = 0.5,
+                 sample_interval: float = 1.0,
+                 metrics_interval: float = 60.0,
+                 namespace: str = 'Pyrazine',
+                 metrics: bool = True,
+                 stream: TextIO = None,
+                 rss_reader: Callable[[], Optional[int]] = None):
+        """
+        :param soft_limit: The fraction of the memory limit over which caches
+        are trimmed.
+        :param hard_limit: The fraction of the memory limit over which caches
+        are emptied.
+        :param trim_fraction: The fraction of each cache trimmed over the soft
+        limit.
+        :param sample_interval: The minimum seconds between two samples.
+        :param metrics_interval: The seconds between two headroom metrics,
+        which are also written whenever caches are trimmed.
+        :param namespace: The namespace of the metrics.
+        :param metrics: False, to not write metrics.
+        :param stream: The stream metrics are written to. Defaults to the
+        standard output.
+        :param rss_reader: The function that returns the resident set size of
+        the process, in bytes. Defaults to reading /proc/self/statm.
+        """
+
+        if not 0 < soft_limit <= hard_limit:
+            raise ValueError('The soft limit must be positive and not over the hard limit.')
+
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.trim_fraction = trim_fraction
+        self.sample_interval = sample_interval
+        self.metrics_interval = metrics_interval
+        self.namespace = namespace
+        self.metrics = metrics
+        self.stream = stream
+        self._read_rss = rss_reader if rss_reader is not None else read_rss_bytes
+
+        self._registrations: List[Tuple[int, int, str, TrimFunction]] = []
+        self._lock = threading.Lock()
+        self._next_sample = 0.0
+        self._next_metrics = 0.0
+        self._limit_bytes: Optional[int] = None
+
+        self.rss_bytes: Optional[int] = None
+        self.trims = 0
+        self.evicted_bytes = 0
+
+    def register(self, cache: object, priority: int = 0, name: str = None) -> None:
+        """
+        Registers a cache to be trimmed when memory runs low.
+
+        :param cache: An object with a trim_memory method, like TieredCache
+        and MemoryCache, or a function, which are called with the fraction of
+        the cache to evict and return the number of bytes they freed.
+        :param priority: The priority of the cache. Caches with lower
+        priorities are trimmed first.
+        :param name: The name of the cache, in stats.
+        """
+
+        trim = getattr(cache, 'trim_memory', cache)
+        if not callable(trim):
+            raise TypeError('Caches must have a trim_memory method or be callable.')
+        if name is None:
+            name = getattr(cache, 'namespace', None) or getattr(cache, '__name__', None) or \
+                type(cache).__name__
+
+        with self._lock:
+            self._registrations.append((priority, len(self._registrations), name, trim))
+            self._registrations.sort(key=lambda registration: registration[:2])
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._registrations = [registration for registration in self._registrations
+                                   if registration[2] != name]
+
+    def _get_limit_bytes(self, context: Optional[LambdaContext]) -> Optional[int]:
+
+        if self._limit_bytes is None:
+            memory_limit_in_mb = getattr(context, 'memory_limit_in_mb', None) or \
+                os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE')
+            if memory_limit_in_mb:
+                self._limit_bytes = int(memory_limit_in_mb) * 1024 * 1024
+        return self._limit_bytes
+
+    def check(self, context: Optional[LambdaContext] = None, service_name: str = None) -> None:
+        """
+        Samples the memory of the process, unless it was sampled less than
+        sample_interval seconds ago, and trims caches if needed.
+
+        :param context: The context of the invocation, which the memory limit
+        is taken from the first time.
+        :param service_name: The name of the service, the dimension of the
+        metrics.
+        """
+        now = time.monotonic()
+        if now < self._next_sample:
+            return
+        self._next_sample = now + self.sample_interval
+        self.sample(context, service_name, now)
+
+    def sample(self,
+               context: Optional[LambdaContext] = None,
+               service_name: str = None,
+               now: float = None) -> Optional[int]:
+        """
+        Samples the memory of the process and trims caches if it is over the
+        soft limit.
+
+        :return: The number of bytes freed, or None if the memory or its
+        limit are unknown, e.g. outside AWS Lambda.
+        """
+
+        limit_bytes = self._get_limit_bytes(context)
+        rss_bytes = self._read_rss()
+        if limit_bytes is None or rss_bytes is None:
+            return None
+        self.rss_bytes = rss_bytes
+
+        freed = 0
+        usage = rss_bytes / limit_bytes
+        if usage >= self.hard_limit:
+            freed = self.trim(everything=True)
+        elif usage >= self.soft_limit:
+            # Caches are trimmed to some way under the limit, so that they are
+            # not trimmed again as soon as they grow back.
+            freed = self.trim(rss_bytes - int(limit_bytes * self.soft_limit * 0.9))
+
+        now = time.monotonic() if now is None else now
+        if self.metrics and (usage >= self.soft_limit or now >= self._next_metrics):
+            self._next_metrics = now + self.metrics_interval
+            values: Dict[str, MetricValue] = {
+                'MemoryHeadroom': (limit_bytes - rss_bytes, 'Bytes'),
+                'MemoryUtilization': (usage * 100, 'Percent'),
+            }
+            if usage >= self.soft_limit:
+                values['CacheEvictedBytes'] = (freed, 'Bytes')
+                values['CacheTrims'] = (1, 'Count')
+            write_metrics(self.namespace, values, {'service': service_name or 'unknown_service'},
+                          stream=self.stream)
+
+        return freed
+
+    def trim(self, bytes_needed: int = 0, everything: bool = False) -> int:
+        """
+        Trims the registered caches, in order of priority, until the number of
+        bytes needed is freed, or empties them all.
+
+        :return: The number of bytes freed.
+        """
+
+        freed = 0
+        with self._lock:
+            registrations = list(self._registrations)
+
+        for _, _, _, trim in registrations:
+            if not everything and freed >= bytes_needed:
+                break
+            freed += trim(1.0 if everything else self.trim_fraction) or 0
+
+        if everything:
+            # Freed objects in reference cycles only go once collected.
+            gc.collect()
+
+        self.trims += 1
+        self.evicted_bytes += freed
+        return freed
+
+    @property
+    def limit_bytes(self) -> Optional[int]:
+        return self._limit_bytes
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Returns the last memory sampled, its limit, and the caches trimmed.
+        """
+        headroom = self._limit_bytes - self.rss_bytes \
+            if self._limit_bytes is not None and self.rss_bytes is not None else None
+        return {
+            'rss_bytes': self.rss_bytes,
+            'limit_bytes': self._limit_bytes,
+            'headroom_bytes': headroom,
+            'trims': self.trims,
+            'evicted_bytes': self.evicted_bytes,
+            'caches': [name for _, _, name, _ in self._registrations],
+        }
+
+
+default_memory_governor = MemoryGovernor()
@@ -0,0 +1,47 @@
+import json
+import sys
+import time
+from typing import Dict, TextIO, Tuple
+
+
+# A metric value and its CloudWatch unit, e.g. (12.5, 'Milliseconds').
+MetricValue = Tuple[float, str]
+
+
+def format_metrics(namespace: str,
+                   values: Dict[str, MetricValue],
+                   dimensions: Dict[str, str]) -> str:
+    """
+    Returns metrics as an entry of the CloudWatch embedded metric format,
+    which CloudWatch Logs turns into metrics when it is logged.
+
+    :param namespace: The namespace of the metrics.
+    :param values: The values of the metrics, and their units, by name.
+    :param dimensions: The dimensions of the metrics, and their values.
+    """
+    entry = {name: value for name, (value, _) in values.items()}
+    entry.update(dimensions)
+    entry['_aws'] = {
+        'Timestamp': int(time.time() * 1000),
+        'CloudWatchMetrics': [{
+            'Namespace': namespace,
+            'Dimensions': [list(dimensions)],
+            'Metrics': [{'Name': name, 'Unit': unit} for name, (_, unit) in values.items()],
+        }],
+    }
+    return json.dumps(entry)
+
+
+def write_metrics(namespace: str,
+                  values: Dict[str, MetricValue],
+                  dimensions: Dict[str, str],
+                  stream: TextIO = None) -> None:
+    """
+    Writes metrics in the embedded metric format, see format_metrics.
+
+    :param stream: The stream to write to. Defaults to the standard output,
+    which the Lambda runtime sends to CloudWatch Logs.
+    """
+    stream = stream if stream is not None else sys.stdout
+    stream.write(format_metrics(namespace, values, dimensions) + '\n')
+    stream.flush()
@@ -0,0 +1,415 @@
+import base64
+import binascii
+import collections.abc
+import decimal
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import time
+import urllib.parse
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from pyrazine.binding import BindingError
+from pyrazine.events import BaseHttpEvent
+from pyrazine.response import DEFAULT_CORS_HEADERS, BinaryBody, HttpResponse
+from pyrazine.serialization import SerializerRegistry, default_serializer_registry
+
+
+# Environment variable the default secret of cursors is read from.
+CURSOR_SECRET_VARIABLE = 'PYRAZINE_CURSOR_SECRET'
+
+# Bytes of the HMAC-SHA256 kept in cursors, enough to make forging one
+# impractical while keeping them short.
+SIGNATURE_SIZE = 16
+
+# Returns the items of a page and the position of the next one, or None if it
+# is the last page, given the position of the page, None for the first one,
+# and the maximum number of items.
+QueryFunction = Callable[[Optional[object], int], Tuple[Iterable[object], Optional[object]]]
+
+
+class InvalidCursorError(BindingError):
+    """
+    Raised for cursors that were not issued by the paginator, were issued for
+    another collection, or have expired. Handlers answer them with a 400.
+    """
+    pass
+
+
+def _encode_number(value: decimal.Decimal) -> Union[int, float]:
+    # JSON numbers cannot be written from a default function, so decimals
+    # with a fraction go through float, which keeps 15 significant digits.
+    return int(value) if value == value.to_integral_value() else float(value)
+
+
+class CursorCodec(object):
+    """
+    Turns positions in a collection into opaque cursors, and back. Positions
+    can be any object that can be serialized as JSON, e.g. an offset, the key
+    of the last item sent or the LastEvaluatedKey of a DynamoDB query.
+
+    Cursors are signed with HMAC-SHA256, so clients cannot make up positions,
+    e.g. to skip to an offset that would take long to reach. They are also
+    bound to a scope, usually the path of the collection, so that a cursor of
+    one collection is not accepted by another.
+
+    Decimal values, which boto3 returns for DynamoDB numbers, are kept as
+    numbers, and numbers with a fraction are decoded as Decimal, so that
+    positions can be passed back to boto3 as they are.
+    """
+
+    def __init__(self,
+                 secret: Union[str, bytes] = None,
+                 max_age: float = None,
+                 serializer: SerializerRegistry = None):
+        """
+        :param secret: The key cursors are signed with, which must be the same
+        in every instance of the function. Defaults to the value of the
+        PYRAZINE_CURSOR_SECRET environment variable.
+        :param max_age: The seconds after which cursors are rejected. Never, if
+        not set.
+        :param serializer: The registry of encoders of the values in positions
+        other than numbers. Defaults to default_serializer_registry.
+        :raises ValueError: If there is no secret.
+        """
+
+        if secret is None:
+            secret = os.environ.get(CURSOR_SECRET_VARIABLE)
+        if not secret:
+            raise ValueError(f'A secret is needed to sign cursors, either passed or set in '
+                             f'the {CURSOR_SECRET_VARIABLE} environment variable.')
+
+        self._key = secret.encode('utf-8') if isinstance(secret, str) else secret
+        self.max_age = max_age
+
+        default = (serializer or default_serializer_registry).default
+        self._encoder = json.JSONEncoder(default=lambda o: _encode_number(o) if isinstance(
+            o, decimal.Decimal) else default(o), separators=(',', ':'))
+
+    def _sign(self, scope: str, payload: bytes) -> bytes:
+        message = scope.encode('utf-8') + b'\0' + payload
+        return hmac.new(self._key, message, hashlib.sha256).digest()[:SIGNATURE_SIZE]
+
+    def encode(self, position: object, scope: str = '') -> str:
+        """
+        Returns the cursor of a position.
+
+        :param position: The position, which must be serializable as JSON.
+        :param scope: The scope of the cursor, e.g. the path of the collection.
+        """
+        payload = self._encoder.encode([int(time.time()), position]).encode('utf-8')
+        cursor = base64.urlsafe_b64encode(self._sign(scope, payload) + payload)
+        return cursor.rstrip(b'=').decode('ascii')
+
+    def decode(self, cursor: str, scope: str = '') -> object:
+        """
+        Returns the position of a cursor.
+
+        :param cursor: The cursor, as returned by encode.
+        :param scope: The scope the cursor must have been issued for.
+        :raises InvalidCursorError: If the cursor is not valid for the scope,
+        or has expired.
+        """
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        except (binascii.Error, ValueError):
+            raise InvalidCursorError('Invalid cursor.')
+
+        signature, payload = data[:SIGNATURE_SIZE], data[SIGNATURE_SIZE:]
+        if not hmac.compare_digest(signature, self._sign(scope, payload)):
+            raise InvalidCursorError('Invalid cursor.')
+
+        issued_at, position = json.loads(payload, parse_float=decimal.Decimal)
+        if self.max_age is not None and time.time() - issued_at > self.max_age:
+            raise InvalidCursorError('Expired cursor.')
+        return position
+
+
+# Marks the end of an iterator, which may yield None.
+_END = object()
+
+
+class _PageItems(object):
+    """
+    Iterates over up to limit items, and finds out whether there are more by
+    reading a single item ahead, once they have been iterated over.
+    """
+
+    __slots__ = ('_iterator', '_limit', 'count', 'last', 'has_more')
+
+    def __init__(self, items: Iterable[object], limit: int):
+        self._iterator = iter(items)
+        self._limit = limit
+        self.count = 0
+        self.last = None
+        self.has_more = False
+
+    def __iter__(self) -> Iterator[object]:
+        for item in itertools.islice(self._iterator, self._limit):
+            self.count += 1
+            self.last = item
+            yield item
+
+        if self.count == self._limit:
+            self.has_more = next(self._iterator, _END) is not _END
+
+
+class Page(HttpResponse):
+    """
+    Response with a page of a collection, as a JSON object with the items and
+    the cursor and link of the next page:
+
+        {"items": [...], "next_cursor": "...", "next": "/orders?cursor=..."}
+
+    The link is also sent in a Link header. Items are serialized one at a
+    time, as they are read from the iterator they are given, so they never
+    have to be in memory at the same time, e.g. when they come from a
+    generator over the pages of a database query.
+    """
+
+    def __init__(self,
+                 items: Iterable[object],
+                 next_cursor: Union[str, Callable[[], Optional[str]], None] = None,
+                 next_link: Callable[[str], str] = None,
+                 items_key: str = 'items',
+                 headers: Dict[str, str] = None,
+                 serializer: SerializerRegistry = None):
+        """
+        :param items: The items of the page.
+        :param next_cursor: The cursor of the next page, None if it is the
+        last one, or a function returning it that is called once the items
+        have been iterated over.
+        :param next_link: A function that returns the link to the page of a
+        cursor.
+        :param items_key: The key of the items in the object sent.
+        :param headers: Additional headers to send.
+        :param serializer: The registry of encoders to serialize the items
+        with. Defaults to default_serializer_registry.
+        """
+        super().__init__(200, headers=headers, serializer=serializer)
+        self.items = items
+        self.next_cursor = next_cursor
+        self.next_link = next_link
+        self.items_key = items_key
+        self._rendered: List[Tuple[Dict[str, str], str]] = []
+
+    def _serialize(self) -> Tuple[Dict[str, str], str]:
+
+        dumps = (self.serializer or default_serializer_registry).dumps
+
+        parts = [dumps(self.items_key), ':[']
+        for item in self.items:
+            parts.append(dumps(item))
+            parts.append(',')
+        if parts[-1] == ',':
+            parts.pop()
+        parts.append(']')
+
+        headers = {}
+        next_cursor = self.next_cursor() if callable(self.next_cursor) else self.next_cursor
+        next_link = None
+        if next_cursor is not None and self.next_link is not None:
+            next_link = self.next_link(next_cursor)
+            headers['link'] = f'<{next_link}>; rel="next"'
+
+        parts.append(f',"next_cursor":{dumps(next_cursor)},"next":{dumps(next_link)}}}')
+        return headers, '{' + ''.join(parts)
+
+    def render(self) -> Tuple[int, Dict[str, str], Union[str, BinaryBody]]:
+
+        # Items may come from an iterator, which can only be read once, while
+        # the response may be rendered more than once, or copied first, see
+        # with_cors_headers. The copies share the list.
+        if not self._rendered:
+            self._rendered.append(self._serialize())
+        page_headers, body = self._rendered[0]
+
+        headers = {'content-type': 'application/json'}
+        if self.enable_cors:
+            headers.update(DEFAULT_CORS_HEADERS if self.cors_headers is None
+                           else self.cors_headers)
+        headers.update(page_headers)
+        if self.headers is not None:
+            headers.update(self.headers)
+        return self.status_code, headers, body
+
+
+class Paginator(object):
+    """
+    Splits collections into pages, with cursors taken from and added to the
+    query string of requests:
+
+        paginator = Paginator(default_limit=50)
+
+        @handler.route(path='/orders')
+        def list_orders(event):
+            return paginator.paginate(event, lambda after: orders.scan(after_id=after),
+                                      key=lambda order: order.id)
+
+    Pages are read from:
+
+    - a function taking the key of the last item sent, None for the first
+      page, and returning an iterable of the items after it, with key, which
+      returns the key of an item. This is the cheapest option, as each page
+      starts where the previous one ended.
+    - an iterable, without key. The cursor holds the offset of the page: lists
+      and other sequences are sliced, while iterators are read from the start.
+    - a query function, with paginate_query, for stores that return their own
+      position, e.g. the LastEvaluatedKey of DynamoDB.
+
+    Limits are taken from the limit parameter of the query string, and
+    clamped to max_limit.
+    """
+
+    def __init__(self,
+                 secret: Union[str, bytes] = None,
+                 default_limit: int = 50,
+                 max_limit: int = 1000,
+                 max_age: float = None,
+                 cursor_param: str = 'cursor',
+                 limit_param: str = 'limit',
+                 items_key: str = 'items',
+                 serializer: SerializerRegistry = None,
+                 codec: CursorCodec = None):
+        """
+        :param secret: The key cursors are signed with, see CursorCodec.
+        :param default_limit: The number of items of pages, if requests do
+        not set it.
+        :param max_limit: The maximum number of items of pages.
+        :param max_age: The seconds after which cursors expire.
+        :param cursor_param: The query string parameter of the cursor.
+        :param limit_param: The query string parameter of the limit.
+        :param items_key: The key of the items in the pages sent.
+        :param serializer: The registry of encoders to serialize items with.
+        :param codec: The codec of cursors, instead of one built with secret,
+        max_age and serializer.
+        """
+        self.default_limit = default_limit
+        self.max_limit = max_limit
+        self.cursor_param = cursor_param
+        self.limit_param = limit_param
+        self.items_key = items_key
+        self.serializer = serializer
+        self.codec = codec if codec is not None else CursorCodec(secret, max_age, serializer)
+
+    def get_limit(self, event: BaseHttpEvent) -> int:
+        """
+        Returns the number of items of the page requested.
+
+        :raises BindingError: If the limit is not a positive integer.
+        """
+        value = event.get_query_params().get(self.limit_param)
+        if value is None:
+            return self.default_limit
+        try:
+            limit = int(value)
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            raise BindingError(f'Invalid value for query parameter {self.limit_param}.')
+        return min(limit, self.max_limit)
+
+    def get_position(self, event: BaseHttpEvent) -> Optional[object]:
+        """
+        Returns the position of the page requested, None for the first one.
+
+        :raises InvalidCursorError: If the cursor is not valid.
+        """
+        cursor = event.get_query_params().get(self.cursor_param)
+        return self.codec.decode(cursor, event.get_http_path()) if cursor else None
+
+    def _build_page(self,
+                    event: BaseHttpEvent,
+                    items: Iterable[object],
+                    next_cursor: Union[str, Callable[[], Optional[str]], None],
+                    headers: Optional[Dict[str, str]]) -> Page:
+
+        path = event.get_http_path()
+        cursor_param = self.cursor_param
+        # Other parameters of the request, e.g. filters, are kept in links.
+        params = [(key, value) for key, value in event.get_query_params().allitems()
+                  if key != cursor_param]
+
+        def next_link(cursor: str) -> str:
+            return f'{path}?{urllib.parse.urlencode(params + [(cursor_param, cursor)])}'
+
+        return Page(items, next_cursor, next_link, items_key=self.items_key, headers=headers,
+                    serializer=self.serializer)
+
+    def paginate(self,
+                 event: BaseHttpEvent,
+                 items: Union[Iterable[object], Callable[[Optional[object]], Iterable[object]]],
+                 key: Callable[[object], object] = None,
+                 headers: Dict[str, str] = None) -> Page:
+        """
+        Returns the page of a collection requested.
+
+        :param event: The request.
+        :param items: Either a function that returns the items after a key,
+        or the items, see Paginator.
+        :param key: The function that returns the key of an item, which must
+        be serializable as JSON. Required if items is a function.
+        :param headers: Additional headers to send.
+        :raises BindingError: If the limit or the cursor is not valid, which
+        handlers answer with a 400.
+        """
+
+        limit = self.get_limit(event)
+        position = self.get_position(event)
+        scope = event.get_http_path()
+
+        if callable(items):
+            if key is None:
+                raise ValueError('A key function is needed to paginate by key.')
+            page_items = _PageItems(items(position), limit)
+
+            def next_cursor():
+                if not page_items.has_more:
+                    return None
+                return self.codec.encode(key(page_items.last), scope)
+        else:
+            offset = position or 0
+            if not isinstance(offset, int) or offset < 0:
+                raise InvalidCursorError('Invalid cursor.')
+
+            if isinstance(items, collections.abc.Sequence):
+                items = items[offset:offset + limit + 1]
+            else:
+                items = itertools.islice(items, offset, None)
+            page_items = _PageItems(items, limit)
+
+            def next_cursor():
+                if not page_items.has_more:
+                    return None
+                return self.codec.encode(offset + limit, scope)
+
+        return self._build_page(event, page_items, next_cursor, headers)
+
+    def paginate_query(self,
+                       event: BaseHttpEvent,
+                       query: QueryFunction,
+                       headers: Dict[str, str] = None) -> Page:
+        """
+        Returns the page of a collection requested, read with a function that
+        returns the position of the next page along with its items:
+
+            def query(position, limit):
+                options = {'ExclusiveStartKey': position} if position else {}
+                response = table.query(Limit=limit, **options)
+                items = (deserialize_item(item) for item in response['Items'])
+                return items, response.get('LastEvaluatedKey')
+
+        :param event: The request.
+        :param query: The function, which takes the position of the page and
+        the maximum number of items.
+        :param headers: Additional headers to send.
+        :raises BindingError: If the limit or the cursor is not valid.
+        """
+
+        limit = self.get_limit(event)
+        items, next_position = query(self.get_position(event), limit)
+        next_cursor = None if next_position is None \
+            else self.codec.encode(next_position, event.get_http_path())
+        return self._build_page(event, items, next_cursor, headers)
@@ -0,0 +1,316 @@
+import math
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Union
+
+from pyrazine.events import BaseHttpEvent
+from pyrazine.response import HttpResponse
+
+
+KeyFunction = Callable[[BaseHttpEvent], Optional[str]]
+
+
+def _refill(tokens: float, updated_at: float, now: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + max(0.0, now - updated_at) * rate)
+
+
+def _take_token(tokens: float, rate: float):
+    """
+    Returns the tokens left after taking one and 0, if there is one to take,
+    or the tokens unchanged and the seconds until there will be one.
+    """
+    if tokens >= 1.0:
+        return tokens - 1.0, 0.0
+    return tokens, (1.0 - tokens) / rate
+
+
+class BaseRateLimitBackend(ABC):
+    """
+    Keeps token buckets in a store shared by several containers or processes,
+    so that a limit applies to all of them together.
+    """
+
+    @abstractmethod
+    def acquire(self, key: str, rate: float, burst: float, now: float) -> float:
+        """
+        Takes a token from the bucket of a key.
+
+        :param key: The key of the bucket.
+        :param rate: The number of tokens added to the bucket per second.
+        :param burst: The maximum number of tokens in the bucket.
+        :param now: The current time, as a UNIX timestamp.
+        :return: 0 if a token was taken, or the number of seconds until one
+        will be available otherwise.
+        """
+        pass
+
+
+class InMemoryRateLimitBackend(BaseRateLimitBackend):
+    """
+    Keeps buckets in the memory of the process. Meant as a stand-in for the
+    shared backends in tests and local development.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, rate: float, burst: float, now: float) -> float:
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens, wait = _take_token(_refill(tokens, updated_at, now, rate, burst), rate)
+            self._buckets[key] = (tokens, now)
+        return wait
+
+
+class SqliteRateLimitBackend(BaseRateLimitBackend):
+    """
+    Keeps buckets in a SQLite database, shared by the processes that can
+    reach the file, e.g. the workers of a container.
+    """
+
+    def __init__(self, path: str, timeout: float = 1.0):
+        """
+        :param path: The path of the database file, created if needed.
+        :param timeout: The seconds to wait for other processes to release
+        the database.
+        """
+        self._path = path
+        self._timeout = timeout
+        self._local = threading.local()
+
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit_buckets '
+                '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)')
+
+    def _connect(self) -> sqlite3.Connection:
+
+        # SQLite connections cannot be shared between threads, so each thread
+        # opens one and keeps it.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self._path, timeout=self._timeout,
+                                         isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def acquire(self, key: str, rate: float, burst: float, now: float) -> float:
+        connection = self._connect()
+
+        # BEGIN IMMEDIATE locks the database for writing before reading the
+        # bucket, so that concurrent processes cannot take the same token.
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?',
+                (key,)).fetchone()
+            tokens, updated_at = row if row is not None else (burst, now)
+            tokens, wait = _take_token(_refill(tokens, updated_at, now, rate, burst), rate)
+            connection.execute(
+                'INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at) '
+                'VALUES (?, ?, ?)', (key, tokens, now))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        return wait
+
+
+class DynamoDbRateLimitBackend(BaseRateLimitBackend):
+    """
+    Keeps buckets in a DynamoDB table with a string partition key, shared by
+    all containers of a function, or of several functions.
+
+    Buckets are updated with optimistic locking: the bucket is read, and
+    written back on the condition that nobody updated it in the meantime.
+    """
+
+    def __init__(self,
+                 table_name: str,
+                 client: object = None,
+                 key_attribute: str = 'pk',
+                 max_attempts: int = 3,
+                 ttl_attribute: str = None):
+        """
+        :param table_name: The name of the table.
+        :param client: The DynamoDB client to use. Defaults to a new boto3
+        client, which requires boto3 to be installed.
+        :param key_attribute: The name of the partition key of the table.
+        :param max_attempts: The number of times to try updating a bucket that
+        is being updated concurrently before rejecting the request.
+        :param ttl_attribute: If set, buckets are written with this attribute
+        set to the time at which they will be full again, so that a TTL on the
+        table can remove them.
+        """
+
+        if client is None:
+            import boto3
+            client = boto3.client('dynamodb')
+
+        self._client = client
+        self._table_name = table_name
+        self._key_attribute = key_attribute
+        self._max_attempts = max_attempts
+        self._ttl_attribute = ttl_attribute
+
+    def acquire(self, key: str, rate: float, burst: float, now: float) -> float:
+
+        client = self._client
+        item_key = {self._key_attribute: {'S': key}}
+
+        for _ in range(self._max_attempts):
+            item = client.get_item(
+                TableName=self._table_name, Key=item_key, ConsistentRead=True).get('Item')
+
+            if item is not None:
+                previous_update = item['updated_at']['N']
+                tokens = _refill(float(item['tokens']['N']), float(previous_update),
+                                 now, rate, burst)
+                condition = {
+                    'ConditionExpression': 'updated_at = :previous_update',
+                    'ExpressionAttributeValues': {':previous_update': {'N': previous_update}},
+                }
+            else:
+                tokens = burst
+                condition = {
+                    'ConditionExpression': 'attribute_not_exists(#key)',
+                    'ExpressionAttributeNames': {'#key': self._key_attribute},
+                }
+
+            tokens, wait = _take_token(tokens, rate)
+
+            new_item = dict(item_key, tokens={'N': repr(tokens)}, updated_at={'N': repr(now)})
+            if self._ttl_attribute is not None:
+                full_at = now + (burst - tokens) / rate
+                new_item[self._ttl_attribute] = {'N': str(math.ceil(full_at))}
+
+            try:
+                client.put_item(TableName=self._table_name, Item=new_item, **condition)
+                return wait
+            except client.exceptions.ConditionalCheckFailedException:
+                continue
+
+        # The bucket is too contended to update: the key is most likely being
+        # flooded with requests, so reject this one.
+        return 1.0 / rate
+
+
+class RateLimit(object):
+    """
+    Limits the rate of requests to a route per caller with a token bucket:
+    each caller can make up to burst requests at once, and then rate requests
+    per second.
+
+    Buckets are kept in the process first, so that callers over the limit
+    are rejected without any I/O. If a shared backend is set, requests that
+    pass the local bucket are then checked against it, so that the limit also
+    applies across containers.
+    """
+
+    KEY_SUB = 'sub'
+    KEY_IP = 'ip'
+    KEY_API_KEY = 'api_key'
+
+    API_KEY_HEADER = 'x-api-key'
+
+    # Maximum number of callers whose bucket is kept in the process. The least
+    # recently seen ones are dropped first.
+    MAX_LOCAL_BUCKETS = 10000
+
+    def __init__(self,
+                 rate: float,
+                 burst: float = None,
+                 key: Union[str, KeyFunction] = KEY_SUB,
+                 backend: BaseRateLimitBackend = None,
+                 name: str = None):
+        """
+        :param rate: The number of requests per second allowed per caller.
+        :param burst: The number of requests a caller can make at once.
+        Defaults to the rate, with a minimum of 1.
+        :param key: What identifies a caller: the subject of the JWT ('sub'),
+        the source IP ('ip'), the x-api-key header ('api_key'), or a function
+        that takes the request and returns the key. Requests without a key,
+        e.g. without a JWT, are limited by source IP.
+        :param backend: The shared backend to keep buckets in, if any.
+        :param name: The name that prefixes keys in the shared backend.
+        Defaults to the path of the first route the limit is registered for.
+        """
+
+        if rate <= 0:
+            raise ValueError('The rate must be greater than zero.')
+
+        self.rate = float(rate)
+        self.burst = float(burst) if burst is not None else max(1.0, self.rate)
+        self.backend = backend
+        self.name = name
+
+        self._get_key = self._compile_key_function(key)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._responses: Dict[int, HttpResponse] = {}
+
+    @classmethod
+    def _compile_key_function(cls, key: Union[str, KeyFunction]) -> KeyFunction:
+
+        if callable(key):
+            return key
+        elif key == cls.KEY_SUB:
+            return lambda event: event.jwt.sub if event.jwt is not None else None
+        elif key == cls.KEY_IP:
+            return lambda event: event.get_http_source_ip()
+        elif key == cls.KEY_API_KEY:
+            header = cls.API_KEY_HEADER
+            return lambda event: event.get_headers().get(header)
+
+        raise ValueError(f'Unknown rate limit key {key}')
+
+    def _acquire_local(self, key: str, now: float) -> float:
+
+        buckets = self._buckets
+        with self._lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                tokens = self.burst
+                if len(buckets) >= self.MAX_LOCAL_BUCKETS:
+                    buckets.popitem(last=False)
+            else:
+                tokens = _refill(bucket[0], bucket[1], now, self.rate, self.burst)
+                buckets.move_to_end(key)
+
+            tokens, wait = _take_token(tokens, self.rate)
+            buckets[key] = (tokens, now)
+
+        return wait
+
+    def _get_response(self, wait: float) -> HttpResponse:
+
+        # Responses are built once per number of seconds to wait, which is
+        # bounded by the time it takes to refill a single token.
+        retry_after = max(1, math.ceil(wait))
+        response = self._responses.get(retry_after)
+        if response is None:
+            response = self._responses[retry_after] = HttpResponse(
+                429, message='Too many requests', headers={'retry-after': str(retry_after)})
+        return response
+
+    def check(self, event: BaseHttpEvent) -> Optional[HttpResponse]:
+        """
+        Takes a token for the caller of a request.
+
+        :param event: The request.
+        :return: None if the request is allowed, or the 429 response to send
+        back otherwise.
+        """
+
+        key = self._get_key(event) or event.get_http_source_ip() or ''
+
+        wait = self._acquire_local(key, time.monotonic())
+        if wait == 0.0 and self.backend is not None:
+            wait = self.backend.acquire(f'{self.name}:{key}', self.rate, self.burst, time.time())
+
+        return self._get_response(wait) if wait > 0.0 else None
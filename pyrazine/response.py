@@ -1,18 +1,46 @@
-import decimal
+import base64
+import copy
+import http
 import json
-from typing import Dict
+import mmap
+from typing import Dict, Optional, Tuple, Union
+
+from pyrazine.serialization import SerializerRegistry, default_serializer_registry
+
+
+DEFAULT_CORS_HEADERS = {
+    'access-control-allow-headers':
+        'content-type,x-amz-date,authorization,x-api-key,x-amz-security-token',
+    'access-control-allow-origin': '*',
+    'access-control-allow-methods': 'GET,POST,PUT,DELETE,OPTIONS',
+}
+
+# Status lines are computed once so that responses do not have to look up the
+# reason phrase of the status code on every request.
+_STATUS_LINES = {status.value: f'{status.value} {status.phrase}' for status in http.HTTPStatus}
+
+
+def get_status_line(status_code: int) -> str:
+    """
+    Returns the status code followed by its reason phrase, e.g. "200 OK".
+    """
+    return _STATUS_LINES.get(status_code) or f'{status_code} Unknown'
+
+
+# Body types that are sent as they are, instead of being serialized as JSON.
+BINARY_TYPES = (bytes, bytearray, memoryview, mmap.mmap)
+
+BinaryBody = Union[bytes, bytearray, memoryview, mmap.mmap]
 
 
 class HttpResponseSerializer(json.JSONEncoder):
     """
     Class that implements serialization for types other than those supported
-    by JSONEncoder, and that may come up in JSON in Lambda functions.
+    by JSONEncoder, and that may come up in JSON in Lambda functions, using
+    the encoders of the default serializer registry.
     """
     def default(self, o):
-        if isinstance(o, decimal.Decimal):
-            return str(o)
-        else:
-            return super().default(o)
+        return default_serializer_registry.default(o)
 
 
 class HttpResponse(object):
@@ -21,65 +49,167 @@ class HttpResponse(object):
     with HTTP status code and an optional body and/or error message.
     """
 
+    # Files at least this large are memory-mapped by from_file instead of
+    # being read.
+    MMAP_THRESHOLD = 1024 * 1024
+
     def __init__(self,
                  status_code: int = 200,
                  body: object = None,
                  message: str = None,
-                 enable_cors: bool = True):
+                 enable_cors: bool = True,
+                 content_type: str = None,
+                 headers: Dict[str, str] = None,
+                 serializer: SerializerRegistry = None):
         """
 
         :param status_code: The HTTP status code to return.
 
         :param body: The contents of the body in the HTTP response to send back
-        to the client.
+        to the client. Bytes, bytearrays, memoryviews and mmap objects are sent
+        as binary data, and any other object is serialized as JSON.
 
         :param message: If the HTTP status code is an error code (4xx or 5xx),
         then the message is populate the message field of the error object
         returned.
 
         :param enable_cors: Adds CORS headers to the response. Enabled by default.
+
+        :param content_type: The content type of the body. Defaults to
+        application/json, or application/octet-stream for binary bodies.
+
+        :param headers: Additional headers to send, which take precedence over
+        those added by default.
+
+        :param serializer: The registry of encoders to serialize the body with.
+        Defaults to default_serializer_registry.
         """
 
         self.status_code = status_code
         self.body = body
         self.message = message
+        self.content_type = content_type
+        self.headers = headers
+        self.serializer = serializer
         self._enable_cors = enable_cors
 
+        # The CORS headers sent instead of the default ones, set by CorsPolicy.
+        self.cors_headers: Optional[Dict[str, str]] = None
+
+    @property
+    def enable_cors(self) -> bool:
+        return self._enable_cors
+
+    def with_cors_headers(self, cors_headers: Dict[str, str]) -> 'HttpResponse':
+        """
+        Returns a copy of the response, sent with the CORS headers given
+        instead of the default ones. The response itself is not modified, as
+        it may be shared by requests from several origins.
+        """
+        response = copy.copy(self)
+        response.cors_headers = cors_headers
+        return response
+
     @staticmethod
     def add_cors_headers(response):
 
         if 'headers' not in response:
             response['headers'] = {}
 
-        response['headers']['access-control-allow-headers'] = \
-            'content-type,x-amz-date,authorization,x-api-key,x-amz-security-token'
-        response['headers']['access-control-allow-origin'] = '*'
-        response['headers']['access-control-allow-methods'] = \
-            'GET,POST,PUT,DELETE,OPTIONS'
+        response['headers'].update(DEFAULT_CORS_HEADERS)
 
-    def get_response_object(self) -> Dict[str, object]:
+    def render(self) -> Tuple[int, Dict[str, str], Union[str, BinaryBody]]:
+        """
+        Renders the response into its status code, headers and serialized body,
+        so that it can be written either as a Lambda response object or
+        directly to a socket by a container adapter.
 
-        response = {
-            'statusCode': self.status_code,
-            'headers': {}
-        }
+        :return: A tuple with the status code, the headers and the body, which
+        is a string for JSON responses, or the original object for binary ones.
+        """
 
-        if 200 <= self.status_code < 400 and self.body is not None:
-            response['body'] = json.dumps(
-                self.body,
-                cls=HttpResponseSerializer)
-            response['headers']['content-type'] = 'application/json'
+        headers = {}
+
+        if self.status_code == 204:
+            # No Content responses must not have a body.
+            body = ''
+        elif 200 <= self.status_code < 400 and self.body is not None:
+            if isinstance(self.body, BINARY_TYPES):
+                body = self.body
+                headers['content-type'] = self.content_type or 'application/octet-stream'
+            else:
+                body = (self.serializer or default_serializer_registry).dumps(self.body)
+                headers['content-type'] = self.content_type or 'application/json'
         else:
-            response['body'] = json.dumps({
+            body = json.dumps({
                 'error': {
                     'message': self.message or 'Unknown error'
                 }
             })
 
         if self._enable_cors:
-            self.add_cors_headers(response)
+            headers.update(DEFAULT_CORS_HEADERS if self.cors_headers is None
+                           else self.cors_headers)
 
-        return response
+        if self.headers is not None:
+            headers.update(self.headers)
+
+        return self.status_code, headers, body
+
+    def get_response_object(self) -> Dict[str, object]:
+
+        status_code, headers, body = self.render()
+
+        # Lambda responses can only carry text, so binary bodies are encoded.
+        # b64encode reads from memoryviews and mmap objects without copying.
+        is_base64_encoded = not isinstance(body, str)
+        if is_base64_encoded:
+            body = base64.b64encode(body).decode('ascii')
+            self.close()
+
+        return {
+            'statusCode': status_code,
+            'headers': headers,
+            'body': body,
+            'isBase64Encoded': is_base64_encoded
+        }
+
+    @classmethod
+    def from_file(cls,
+                  path: str,
+                  content_type: str = None,
+                  status_code: int = 200,
+                  headers: Dict[str, str] = None) -> 'HttpResponse':
+        """
+        Builds a binary response with the contents of a file, e.g. one
+        generated in /tmp. Files of MMAP_THRESHOLD bytes or more are
+        memory-mapped instead of being read, so their contents are only copied
+        when the response is encoded, and the map is closed once it is. Such
+        responses can only be sent once.
+
+        :param path: The path to the file.
+        :param content_type: The content type of the file.
+        :param status_code: The HTTP status code to return.
+        :param headers: Additional headers to send.
+        :return: The response object.
+        """
+
+        with open(path, 'rb') as f:
+            if f.seek(0, 2) < cls.MMAP_THRESHOLD:
+                f.seek(0)
+                body = f.read()
+            else:
+                body = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return cls(status_code, body, content_type=content_type, headers=headers)
+
+    def close(self) -> None:
+        """
+        Closes the memory map the body is read from, if any, once the response
+        has been sent.
+        """
+        if isinstance(self.body, mmap.mmap):
+            self.body.close()
 
     @classmethod
     def build_error_response(cls, status_code: int, message: str = None):
@@ -0,0 +1,326 @@
+import functools
+import inspect
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote_plus
+
+from pyrazine.log import StructuredLogger
+from pyrazine.structures import PrefixTrie
+from pyrazine.tracer import Tracer
+from pyrazine.typing import LambdaContext
+
+import aws_xray_sdk.core
+
+
+EventCallable = Callable[..., object]
+
+EVENTBRIDGE = 'eventbridge'
+S3 = 'aws:s3'
+SNS = 'aws:sns'
+
+
+class NoRouteError(LookupError):
+    """
+    Raised for events no handler is registered for, by routers that do not
+    ignore them.
+    """
+
+
+class EventRoute(object):
+    """
+    A function events are routed to, called with the context only if it takes
+    it, which is found out once, see takes_context.
+    """
+
+    __slots__ = ('function', 'pass_context')
+
+    def __init__(self, function: EventCallable, pass_context: bool):
+        self.function = function
+        self.pass_context = pass_context
+
+    def __call__(self, event: Dict[str, object], context: Optional[LambdaContext]) -> object:
+        if self.pass_context:
+            return self.function(event, context)
+        return self.function(event)
+
+
+def takes_context(function: EventCallable) -> bool:
+    """
+    Returns True if a function takes a second positional parameter, for the
+    context of the invocation.
+    """
+    try:
+        parameters = inspect.signature(function).parameters.values()
+    except (TypeError, ValueError):
+        return False
+
+    positional = [parameter for parameter in parameters if parameter.kind in (
+        inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)]
+    return len(positional) >= 2 or any(
+        parameter.kind == inspect.Parameter.VAR_POSITIONAL for parameter in parameters)
+
+
+def detect_event_type(event: Dict[str, object]) -> str:
+    """
+    Returns the type of an event: EVENTBRIDGE, S3 or SNS. The records of an
+    S3 or SNS event all have the same source, so only the first is looked at.
+
+    :raises ValueError: If the event is not of a supported type.
+    """
+
+    if 'detail-type' in event and 'source' in event:
+        return EVENTBRIDGE
+
+    records = event.get('Records')
+    if records:
+        first = records[0]
+        # SNS records spell the key differently.
+        source = first.get('eventSource') or first.get('EventSource')
+        if source in (S3, SNS):
+            return source
+
+    raise ValueError('Unsupported event format.')
+
+
+class EventRouter(object):
+    """
+    Routes EventBridge, S3 and SNS events to the functions registered for
+    them, the way LambdaHandler routes HTTP requests.
+
+    Functions are indexed by EventBridge source and detail type, S3 bucket,
+    event type and key prefix, and SNS topic, so finding the one an event goes
+    to costs a few dictionary lookups, and a walk down the key for S3, however
+    many are registered. They are traced like the routes of LambdaHandler,
+    sharing the cold start annotation.
+
+        router = EventRouter(service_name='orders')
+
+        @router.on_eventbridge(source='com.example.orders', detail_type='OrderPlaced')
+        def on_order_placed(event):
+            ...
+
+        @router.on_s3(bucket='uploads', prefix='images/', events=['ObjectCreated'])
+        def on_image_uploaded(record, context):
+            ...
+
+        def lambda_handler(event, context):
+            return router.handle_event(event, context)
+
+    Functions receive the EventBridge event, or each S3 or SNS record, and
+    the context if they take a second parameter.
+    """
+
+    def __init__(self,
+                 service_name: str = 'unknown_service',
+                 recorder: aws_xray_sdk.core.xray_recorder = None,
+                 trace: bool = True,
+                 logger: StructuredLogger = None,
+                 ignore_unmatched: bool = True):
+        """
+        :param service_name: The name of the service, used in traces.
+        :param recorder: The X-Ray recorder to use. Defaults to the global one.
+        :param trace: True, if functions should be traced by default.
+        :param logger: The logger of the router. Defaults to one with the
+        default level.
+        :param ignore_unmatched: False, to raise NoRouteError for events no
+        function is registered for, instead of logging a warning.
+        """
+        self._service_name = service_name
+        self._trace = trace
+        self._tracer = Tracer(recorder=recorder, service_name=service_name)
+        self._log = logger if logger is not None else StructuredLogger()
+        self._ignore_unmatched = ignore_unmatched
+
+        # Keys left as None match any value.
+        self._eventbridge_routes: Dict[Tuple[Optional[str], Optional[str]], EventRoute] = {}
+        self._s3_routes: Dict[Tuple[Optional[str], Optional[str]], PrefixTrie] = {}
+        self._sns_routes: Dict[Optional[str], EventRoute] = {}
+
+        self._dispatchers = {
+            EVENTBRIDGE: self._dispatch_eventbridge,
+            S3: self._dispatch_s3,
+            SNS: self._dispatch_sns,
+        }
+
+    @property
+    def logger(self) -> StructuredLogger:
+        return self._log
+
+    def _build_route(self,
+                     function: EventCallable,
+                     trace: Optional[bool],
+                     persist_response: bool) -> EventRoute:
+
+        # The signature is inspected once, when the function is registered.
+        pass_context = takes_context(function)
+        if trace or (trace is None and self._trace):
+            function = self._tracer.wrap_handler(
+                function, self._log, persist_response=persist_response)
+        return EventRoute(function, pass_context)
+
+    def on_eventbridge(self,
+                       function: EventCallable = None,
+                       source: str = None,
+                       detail_type: str = None,
+                       trace: bool = None,
+                       persist_response: bool = False):
+        """
+        Registers a function for EventBridge events.
+
+        :param function: The function, which receives the event.
+        :param source: The source of the events. Any, if not set.
+        :param detail_type: The detail type of the events. Any, if not set.
+        Events go to the function registered for both their source and detail
+        type, then for their source, their detail type, and finally for any.
+        :param trace: True, if calls to the function should be traced.
+        :param persist_response: True, if responses should be added to traces.
+        """
+
+        if function is None:
+            return functools.partial(self.on_eventbridge, source=source,
+                                     detail_type=detail_type, trace=trace,
+                                     persist_response=persist_response)
+
+        self._eventbridge_routes[(source, detail_type)] = \
+            self._build_route(function, trace, persist_response)
+        return function
+
+    def on_s3(self,
+              function: EventCallable = None,
+              bucket: str = None,
+              prefix: str = '',
+              events: Iterable[str] = None,
+              trace: bool = None,
+              persist_response: bool = False):
+        """
+        Registers a function for S3 event notifications.
+
+        :param function: The function, which receives each record.
+        :param bucket: The name of the bucket. Any, if not set.
+        :param prefix: The prefix of the object keys. Records go to the
+        function with the longest prefix of their key, among those registered
+        for their bucket, or for any bucket if there are none.
+        :param events: The types of the events, e.g. ObjectCreated or
+        ObjectRemoved. Any, if not set.
+        :param trace: True, if calls to the function should be traced.
+        :param persist_response: True, if responses should be added to traces.
+        """
+
+        if function is None:
+            return functools.partial(self.on_s3, bucket=bucket, prefix=prefix, events=events,
+                                     trace=trace, persist_response=persist_response)
+
+        route = self._build_route(function, trace, persist_response)
+        for event_type in (events if events is not None else (None,)):
+            self._s3_routes.setdefault((bucket, event_type), PrefixTrie()).insert(prefix, route)
+        return function
+
+    def on_sns(self,
+               function: EventCallable = None,
+               topic: str = None,
+               trace: bool = None,
+               persist_response: bool = False):
+        """
+        Registers a function for SNS messages.
+
+        :param function: The function, which receives each record.
+        :param topic: The ARN or the name of the topic. Any, if not set.
+        :param trace: True, if calls to the function should be traced.
+        :param persist_response: True, if responses should be added to traces.
+        """
+
+        if function is None:
+            return functools.partial(self.on_sns, topic=topic, trace=trace,
+                                     persist_response=persist_response)
+
+        self._sns_routes[topic] = self._build_route(function, trace, persist_response)
+        return function
+
+    def _unmatched(self, event_type: str, key: object) -> None:
+        if not self._ignore_unmatched:
+            raise NoRouteError(f'No function registered for {event_type} event {key}.')
+        self._log.warning('No function registered for %s event %s.', event_type, key)
+
+    def _dispatch_eventbridge(self,
+                              event: Dict[str, object],
+                              context: Optional[LambdaContext]) -> object:
+
+        source, detail_type = event.get('source'), event.get('detail-type')
+        routes = self._eventbridge_routes
+        route = routes.get((source, detail_type)) or routes.get((source, None)) or \
+            routes.get((None, detail_type)) or routes.get((None, None))
+
+        if route is None:
+            return self._unmatched(EVENTBRIDGE, (source, detail_type))
+
+        self._log.set_fields(route=f'{source} {detail_type}')
+        return route(event, context)
+
+    def _find_s3_route(self, bucket: str, event_type: str, key: str) -> Optional[EventRoute]:
+
+        routes = self._s3_routes
+        for index_key in ((bucket, event_type), (bucket, None),
+                          (None, event_type), (None, None)):
+            trie = routes.get(index_key)
+            if trie is not None:
+                route = trie.longest_match(key)
+                if route is not None:
+                    return route
+        return None
+
+    def _dispatch_s3(self,
+                     event: Dict[str, object],
+                     context: Optional[LambdaContext]) -> List[object]:
+
+        results = []
+        for record in event['Records']:
+            s3 = record.get('s3') or {}
+            bucket = (s3.get('bucket') or {}).get('name')
+            # Keys are URL-encoded in notifications.
+            key = unquote_plus((s3.get('object') or {}).get('key') or '')
+            event_type = (record.get('eventName') or '').split(':', 1)[0]
+
+            route = self._find_s3_route(bucket, event_type, key)
+            if route is None:
+                results.append(self._unmatched(S3, f's3://{bucket}/{key}'))
+            else:
+                results.append(route(record, context))
+        return results
+
+    def _dispatch_sns(self,
+                      event: Dict[str, object],
+                      context: Optional[LambdaContext]) -> List[object]:
+
+        routes = self._sns_routes
+        results = []
+        for record in event['Records']:
+            topic_arn = (record.get('Sns') or {}).get('TopicArn') or ''
+            route = routes.get(topic_arn) or routes.get(topic_arn.rsplit(':', 1)[-1]) or \
+                routes.get(None)
+            if route is None:
+                results.append(self._unmatched(SNS, topic_arn))
+            else:
+                results.append(route(record, context))
+        return results
+
+    def handle_event(self,
+                     event: Dict[str, object],
+                     context: LambdaContext = None) -> object:
+        """
+        Passes an event to the function registered for it, or each of its
+        records to the functions registered for them.
+
+        :param event: The event object passed by AWS Lambda.
+        :param context: The context object passed by AWS Lambda.
+        :return: The value returned by the function for EventBridge events,
+        or the list of values returned for each record.
+        :raises ValueError: If the event is not of a supported type.
+        """
+
+        dispatch = self._dispatchers[detect_event_type(event)]
+
+        log = self._log
+        log.begin_invocation(request_id=getattr(context, 'aws_request_id', None))
+        try:
+            return dispatch(event, context)
+        finally:
+            log.end_invocation()
@@ -0,0 +1,263 @@
+"""
+Minimal custom runtime for provided.al2 deployments, which drives a
+LambdaHandler directly against the Lambda Runtime API, without going through
+the runtime interface client.
+
+To use it, set the handler of the function to ``module.attribute``, where the
+attribute is either a LambdaHandler instance or a regular Lambda handler
+function, and ship a ``bootstrap`` file such as the following one:
+
+    #!/bin/sh
+    exec python3 -m pyrazine.runtime
+"""
+import http.client
+import importlib
+import json
+import logging
+import os
+import sys
+import time
+import traceback
+from typing import Callable, Dict, Tuple
+
+from pyrazine.typing import LambdaContext
+from pyrazine.typing.lambda_client import LambdaClient
+from pyrazine.typing.lambda_client_context import LambdaClientContext
+from pyrazine.typing.lambda_cognito_identity import LambdaCognitoIdentity
+
+
+logger = logging.getLogger(__name__)
+
+RUNTIME_API_VERSION = '2018-06-01'
+
+LambdaFunction = Callable[[Dict[str, object], LambdaContext], object]
+
+
+class RuntimeLambdaContext(LambdaContext):
+    """
+    Context object built from the headers of an invocation returned by the
+    Runtime API.
+
+    The values that do not change between invocations are read from the
+    environment once per process and shared by all contexts, and the
+    identity and client context headers are only parsed if they are accessed.
+    """
+
+    _function_info = None
+
+    def __init__(self,
+                 aws_request_id: str,
+                 deadline_ms: int,
+                 invoked_function_arn: str,
+                 client_context: str = None,
+                 identity: str = None):
+        # The parent initializer is not called on purpose: it would store
+        # objects this class builds lazily.
+
+        if RuntimeLambdaContext._function_info is None:
+            RuntimeLambdaContext._function_info = (
+                os.environ.get('AWS_LAMBDA_FUNCTION_NAME'),
+                os.environ.get('AWS_LAMBDA_FUNCTION_VERSION'),
+                int(os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE') or 0),
+                os.environ.get('AWS_LAMBDA_LOG_GROUP_NAME'),
+                os.environ.get('AWS_LAMBDA_LOG_STREAM_NAME'),
+            )
+
+        (self._function_name,
+         self._function_version,
+         self._memory_limit_in_mb,
+         self._log_group_name,
+         self._log_stream_name) = RuntimeLambdaContext._function_info
+
+        self._aws_request_id = aws_request_id
+        self._deadline_ms = deadline_ms
+        self._invoked_function_arn = invoked_function_arn
+        self._raw_client_context = client_context
+        self._raw_identity = identity
+        self._client_context = None
+        self._identity = None
+
+    @property
+    def identity(self) -> LambdaCognitoIdentity:
+        if self._identity is None and self._raw_identity:
+            identity = json.loads(self._raw_identity)
+            self._identity = LambdaCognitoIdentity(
+                cognito_identity_id=identity.get('cognitoIdentityId'),
+                cognito_identity_pool_id=identity.get('cognitoIdentityPoolId'))
+        return self._identity
+
+    @property
+    def client_context(self) -> LambdaClientContext:
+        if self._client_context is None and self._raw_client_context:
+            client_context = json.loads(self._raw_client_context)
+            client = client_context.get('client') or {}
+            self._client_context = LambdaClientContext(
+                client=LambdaClient(
+                    installation_id=client.get('installation_id'),
+                    app_title=client.get('app_title'),
+                    app_version_name=client.get('app_version_name'),
+                    app_version_code=client.get('app_version_code'),
+                    app_package_name=client.get('app_package_name')),
+                custom=client_context.get('custom'),
+                env=client_context.get('env'))
+        return self._client_context
+
+    def get_remaining_time_in_millis(self) -> int:
+        """
+        Returns the number of milliseconds left before the execution times out.
+        """
+        return max(self._deadline_ms - int(time.time() * 1000), 0)
+
+
+class RuntimeApiClient(object):
+    """
+    Client of the Lambda Runtime API, which keeps a single HTTP connection
+    alive across invocations.
+    """
+
+    def __init__(self, endpoint: str = None):
+        """
+        :param endpoint: The host and port of the Runtime API. Defaults to the
+        value of the AWS_LAMBDA_RUNTIME_API environment variable.
+        """
+        endpoint = endpoint or os.environ['AWS_LAMBDA_RUNTIME_API']
+        self._connection = http.client.HTTPConnection(endpoint)
+        self._base_path = f'/{RUNTIME_API_VERSION}/runtime'
+
+    def _request(self,
+                 method: str,
+                 path: str,
+                 body: bytes = None,
+                 headers: Dict[str, str] = None) -> Tuple[bytes, http.client.HTTPMessage]:
+
+        for attempt in range(2):
+            try:
+                self._connection.request(method, self._base_path + path,
+                                         body=body, headers=headers or {})
+                response = self._connection.getresponse()
+                return response.read(), response.headers
+            except (http.client.HTTPException, ConnectionError):
+                # The connection was closed by the other end. Reopen it and
+                # try once more before giving up.
+                self._connection.close()
+                if attempt > 0:
+                    raise
+
+    def next_invocation(self) -> Tuple[bytes, http.client.HTTPMessage]:
+        """
+        Waits for the next invocation and returns its event and headers.
+        """
+        return self._request('GET', '/invocation/next')
+
+    def post_response(self, request_id: str, body: bytes) -> None:
+        self._request('POST', f'/invocation/{request_id}/response', body=body)
+
+    def post_error(self, request_id: str, error: Dict[str, object]) -> None:
+        self._request('POST', f'/invocation/{request_id}/error',
+                      body=json.dumps(error).encode('utf-8'),
+                      headers={'Lambda-Runtime-Function-Error-Type': 'Unhandled'})
+
+    def post_init_error(self, error: Dict[str, object]) -> None:
+        self._request('POST', '/init/error',
+                      body=json.dumps(error).encode('utf-8'),
+                      headers={'Lambda-Runtime-Function-Error-Type': 'Runtime.InitError'})
+
+
+def _build_error(err: Exception) -> Dict[str, object]:
+    return {
+        'errorMessage': str(err),
+        'errorType': type(err).__name__,
+        'stackTrace': traceback.format_tb(err.__traceback__),
+    }
+
+
+def run(function: LambdaFunction,
+        client: RuntimeApiClient = None,
+        max_invocations: int = None) -> None:
+    """
+    Runs the invocation loop, passing each event received from the Runtime API
+    to the given function, and posting back its result or the exception it
+    raised.
+
+    :param function: The Lambda handler function, e.g.
+    LambdaHandler.handle_request.
+    :param client: The Runtime API client to use. A new one is created if
+    none is given.
+    :param max_invocations: The number of invocations after which the loop
+    returns. The loop runs forever if not set.
+    """
+
+    client = client or RuntimeApiClient()
+    invocations = 0
+
+    while max_invocations is None or invocations < max_invocations:
+        event, headers = client.next_invocation()
+        request_id = headers['Lambda-Runtime-Aws-Request-Id']
+
+        trace_id = headers.get('Lambda-Runtime-Trace-Id')
+        if trace_id is not None:
+            os.environ['_X_AMZN_TRACE_ID'] = trace_id
+        else:
+            os.environ.pop('_X_AMZN_TRACE_ID', None)
+
+        context = RuntimeLambdaContext(
+            aws_request_id=request_id,
+            deadline_ms=int(headers['Lambda-Runtime-Deadline-Ms']),
+            invoked_function_arn=headers.get('Lambda-Runtime-Invoked-Function-Arn'),
+            client_context=headers.get('Lambda-Runtime-Client-Context'),
+            identity=headers.get('Lambda-Runtime-Cognito-Identity'))
+
+        try:
+            result = function(json.loads(event), context)
+            # Results that cannot be serialized, e.g. with Decimal values, fail
+            # the invocation instead of the runtime.
+            response = json.dumps(result).encode('utf-8')
+        except Exception as err:
+            logger.exception('Invocation %s failed.', request_id)
+            client.post_error(request_id, _build_error(err))
+        else:
+            client.post_response(request_id, response)
+
+        invocations += 1
+
+
+def load_function(handler_name: str) -> LambdaFunction:
+    """
+    Imports the handler named as ``module.attribute``. If the attribute is a
+    LambdaHandler, its handle_request method is returned.
+    """
+
+    # Imported here so that the runtime does not pull the X-Ray SDK in unless
+    # the function actually uses a LambdaHandler.
+    from pyrazine.handlers import LambdaHandler
+
+    module_name, attribute_name = handler_name.rsplit('.', 1)
+    module = importlib.import_module(module_name.replace('/', '.'))
+    function = getattr(module, attribute_name)
+
+    if isinstance(function, LambdaHandler):
+        function = function.handle_request
+
+    return function
+
+
+def main() -> None:
+
+    task_root = os.environ.get('LAMBDA_TASK_ROOT')
+    if task_root and task_root not in sys.path:
+        sys.path.insert(0, task_root)
+
+    client = RuntimeApiClient()
+
+    try:
+        function = load_function(os.environ['_HANDLER'])
+    except Exception as err:
+        logger.exception('Failed to load the function handler.')
+        client.post_init_error(_build_error(err))
+        sys.exit(1)
+
+    run(function, client)
+
+
+if __name__ == '__main__':
+    main()
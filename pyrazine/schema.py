@@ -0,0 +1,460 @@
+import dataclasses
+import json
+import re
+import threading
+import typing
+from typing import Any, Callable, Dict, List, Union
+
+
+Validator = Callable[[object], object]
+
+Schema = Union[Dict[str, object], type]
+
+
+class ValidationError(ValueError):
+    """
+    Raised when a value does not match a schema. The path to the offending
+    value is built while the error propagates, so valid values do not pay
+    for it.
+    """
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+        self.path: List[Union[str, int]] = []
+
+    def __str__(self) -> str:
+        location = '$' + ''.join(
+            f'[{item}]' if isinstance(item, int) else f'.{item}' for item in self.path)
+        return f'{location}: {self.message}'
+
+
+def _is_typed_dict(cls: object) -> bool:
+    is_typeddict = getattr(typing, 'is_typeddict', None)
+    if is_typeddict is not None:
+        return is_typeddict(cls)
+    return isinstance(cls, type) and issubclass(cls, dict) and hasattr(cls, '__total__')
+
+
+def _check_type(types: tuple, name: str) -> Validator:
+
+    def validate(value):
+        # bool is a subclass of int, but not a JSON number.
+        if type(value) not in types:
+            raise ValidationError(f'expected {name}')
+        return value
+
+    return validate
+
+
+_JSON_TYPES = {
+    'string': (str,),
+    'integer': (int,),
+    'number': (int, float),
+    'boolean': (bool,),
+    'null': (type(None),),
+    'object': (dict,),
+    'array': (list,),
+}
+
+_NUMBERS = frozenset([int, float])
+
+# Keywords that bound values, as tuples of keyword, types the keyword applies
+# to, template of the condition that rejects a value, and error message.
+_JSON_BOUNDS = (
+    ('minimum', _NUMBERS, 'value < {}', 'must be at least {}'),
+    ('maximum', _NUMBERS, 'value > {}', 'must be at most {}'),
+    ('exclusiveMinimum', _NUMBERS, 'value <= {}', 'must be greater than {}'),
+    ('exclusiveMaximum', _NUMBERS, 'value >= {}', 'must be less than {}'),
+    ('minLength', frozenset([str]), 'len(value) < {}', 'must have at least {} characters'),
+    ('maxLength', frozenset([str]), 'len(value) > {}', 'must have at most {} characters'),
+    ('minItems', frozenset([list]), 'len(value) < {}', 'must have at least {} items'),
+    ('maxItems', frozenset([list]), 'len(value) > {}', 'must have at most {} items'),
+)
+
+
+# The keywords compiled into validators, and those that only annotate schemas.
+# Schemas with any other keyword, e.g. anyOf or $ref, are rejected, since
+# ignoring it would accept values the schema does not allow.
+_SUPPORTED_KEYWORDS = frozenset(
+    ['type', 'enum', 'const', 'pattern', 'properties', 'required', 'additionalProperties',
+     'items'] + [bound[0] for bound in _JSON_BOUNDS])
+_ANNOTATION_KEYWORDS = frozenset(
+    ['$schema', '$id', '$comment', 'title', 'description', 'default', 'examples',
+     'readOnly', 'writeOnly', 'deprecated'])
+
+
+def _validate_items(item_validator: Validator, bind: bool = True) -> Validator:
+
+    if not bind:
+        def validate_in_place(value):
+            index = 0
+            try:
+                for index, item in enumerate(value):
+                    item_validator(item)
+            except ValidationError as err:
+                err.path.insert(0, index)
+                raise
+            return value
+
+        return validate_in_place
+
+    def validate(value):
+        if type(value) is not list:
+            raise ValidationError('expected array')
+
+        result = []
+        append = result.append
+        index = 0
+        try:
+            for index, item in enumerate(value):
+                append(item_validator(item))
+        except ValidationError as err:
+            err.path.insert(0, index)
+            raise
+        return result
+
+    return validate
+
+
+def _validate_properties(validators: Dict[str, Validator],
+                         required: frozenset,
+                         extra_validator: Validator = None,
+                         allow_extra: bool = True,
+                         factory: Callable = None,
+                         bind: bool = True) -> Validator:
+    """
+    Builds a validator for objects, which returns a new dict with the
+    validated properties, or the object built by the factory from them. If
+    bind is False, the object is validated in place and returned as is.
+    """
+
+    items = tuple(validators.items())
+    known = frozenset(validators)
+
+    if not bind:
+        def validate_in_place(value):
+            if type(value) is not dict:
+                raise ValidationError('expected object')
+
+            for name in required:
+                if name not in value:
+                    raise ValidationError(f'missing required property {name}')
+
+            name = None
+            try:
+                for name, validator in items:
+                    if name in value:
+                        validator(value[name])
+
+                if extra_validator is not None or not allow_extra:
+                    for name in value.keys() - known:
+                        if not allow_extra:
+                            raise ValidationError(f'unexpected property {name}')
+                        extra_validator(value[name])
+            except ValidationError as err:
+                err.path.insert(0, name)
+                raise
+
+            return value
+
+        return validate_in_place
+
+    def validate(value):
+        if type(value) is not dict:
+            raise ValidationError('expected object')
+
+        for name in required:
+            if name not in value:
+                raise ValidationError(f'missing required property {name}')
+
+        result = {}
+        name = None
+        try:
+            for name, validator in items:
+                if name in value:
+                    result[name] = validator(value[name])
+
+            if extra_validator is not None or not allow_extra:
+                for name in value.keys() - known:
+                    if not allow_extra:
+                        raise ValidationError(f'unexpected property {name}')
+                    result[name] = extra_validator(value[name])
+            elif factory is None:
+                for name in value.keys() - known:
+                    result[name] = value[name]
+        except ValidationError as err:
+            err.path.insert(0, name)
+            raise
+
+        return factory(**result) if factory is not None else result
+
+    return validate
+
+
+class SchemaCompiler(object):
+    """
+    Compiles schemas into validator functions that check a decoded JSON value
+    and return it converted, e.g. into dataclass instances.
+
+    The supported schemas are:
+
+    - JSON Schema dictionaries, limited to type, properties, required,
+      additionalProperties, items, enum, const, minimum, maximum,
+      exclusiveMinimum, exclusiveMaximum, minLength, maxLength, pattern,
+      minItems and maxItems.
+    - Dataclasses, whose fields may be annotated with str, int, float, bool,
+      None, Any, Optional, Union, Literal, List, Dict, other dataclasses and
+      TypedDicts. Values are bound into instances of the dataclass.
+    - TypedDicts, with the same annotations.
+
+    Validators are cached by schema, so compiling the same schema again is a
+    dictionary lookup.
+    """
+
+    def __init__(self):
+        self._cache: Dict[object, Validator] = {}
+        self._lock = threading.RLock()
+
+    def compile(self, schema: Schema) -> Validator:
+        """
+        Returns the validator of a schema, compiling it if needed.
+
+        :param schema: A JSON Schema dictionary, a dataclass or a TypedDict.
+        :return: A function that takes a decoded JSON value, and returns it
+        validated and converted, or raises ValidationError.
+        :raises TypeError: If the schema is not supported.
+        """
+
+        key = json.dumps(schema, sort_keys=True) if isinstance(schema, dict) else schema
+        validator = self._cache.get(key)
+        if validator is None:
+            with self._lock:
+                validator = self._cache.get(key)
+                if validator is None:
+                    validator = self._compile(schema, key)
+        return validator
+
+    def _compile(self, schema: Schema, key: object) -> Validator:
+
+        if isinstance(schema, dict):
+            validator = self._compile_json_schema(schema)
+        elif dataclasses.is_dataclass(schema) and isinstance(schema, type) or \
+                _is_typed_dict(schema):
+            # Classes may refer to themselves, so a forwarding validator is
+            # cached before their fields are compiled.
+            compiled = []
+            self._cache[key] = lambda value: compiled[0](value)
+            try:
+                compiled.append(self._compile_class(schema))
+            except BaseException:
+                del self._cache[key]
+                raise
+            validator = compiled[0]
+        else:
+            raise TypeError(f'Unsupported schema {schema!r}')
+
+        self._cache[key] = validator
+        return validator
+
+    def _compile_class(self, cls: type) -> Validator:
+
+        hints = typing.get_type_hints(cls)
+
+        if _is_typed_dict(cls):
+            required = frozenset(getattr(cls, '__required_keys__', hints if cls.__total__ else ()))
+            validators = {name: self._compile_annotation(hint) for name, hint in hints.items()}
+            return _validate_properties(validators, required)
+
+        validators = {}
+        required = set()
+        for field in dataclasses.fields(cls):
+            if not field.init:
+                continue
+            validators[field.name] = self._compile_annotation(hints[field.name])
+            if field.default is dataclasses.MISSING and \
+                    field.default_factory is dataclasses.MISSING:
+                required.add(field.name)
+
+        return _validate_properties(validators, frozenset(required), factory=cls)
+
+    def _compile_annotation(self, hint: object) -> Validator:
+
+        if hint is Any or hint is object:
+            return lambda value: value
+        if hint is type(None) or hint is None:
+            return _check_type((type(None),), 'null')
+        if hint is bool:
+            return _check_type((bool,), 'boolean')
+        if hint is int:
+            return _check_type((int,), 'integer')
+        if hint is str:
+            return _check_type((str,), 'string')
+        if hint is float:
+            check = _check_type((int, float), 'number')
+            return lambda value: float(check(value))
+        if hint is list:
+            return _check_type((list,), 'array')
+        if hint is dict:
+            return _check_type((dict,), 'object')
+
+        if isinstance(hint, type) and (dataclasses.is_dataclass(hint) or _is_typed_dict(hint)):
+            return self.compile(hint)
+
+        origin = typing.get_origin(hint)
+        args = typing.get_args(hint)
+
+        if origin is Union:
+            return self._compile_union(args)
+        if origin is typing.Literal:
+            return self._compile_json_schema({'enum': list(args)})
+        if origin is list:
+            item_validator = self._compile_annotation(args[0]) if args else None
+            if item_validator is None:
+                return _check_type((list,), 'array')
+            return _validate_items(item_validator)
+        if origin is dict:
+            if args and args[0] is not str:
+                raise TypeError(f'Unsupported annotation {hint!r}: keys must be strings')
+            value_validator = self._compile_annotation(args[1]) if args else None
+            if value_validator is None:
+                return _check_type((dict,), 'object')
+            return _validate_properties({}, frozenset(), extra_validator=value_validator)
+
+        raise TypeError(f'Unsupported annotation {hint!r}')
+
+    def _compile_union(self, args: tuple) -> Validator:
+
+        validators = tuple(self._compile_annotation(arg) for arg in args if arg is not type(None))
+        nullable = type(None) in args
+
+        if len(validators) == 1:
+            inner = validators[0]
+            if not nullable:
+                return inner
+            return lambda value: None if value is None else inner(value)
+
+        def validate(value):
+            if value is None and nullable:
+                return None
+            for validator in validators:
+                try:
+                    return validator(value)
+                except ValidationError:
+                    pass
+            raise ValidationError('value does not match any of the allowed types')
+
+        return validate
+
+    def _compile_json_schema(self, schema: Dict[str, object]) -> Validator:
+
+        # Subschemas can be lists, e.g. tuple validation with items, or
+        # booleans, neither of which are supported.
+        if not isinstance(schema, dict):
+            raise TypeError(f'Unsupported schema {schema!r}')
+
+        unsupported = schema.keys() - _SUPPORTED_KEYWORDS - _ANNOTATION_KEYWORDS
+        if unsupported:
+            raise TypeError(f'Unsupported JSON Schema keywords: {", ".join(sorted(unsupported))}')
+
+        # All keywords of a schema are checked by a single function, generated
+        # once, so that validating a value is a single call per schema node.
+        namespace = {'ValidationError': ValidationError}
+        lines = []
+
+        def check(condition: str, message: str) -> None:
+            message_name = f'message_{len(namespace)}'
+            namespace[message_name] = message
+            lines.append(f'    if {condition}: raise ValidationError({message_name})')
+
+        declared_types = None
+        schema_type = schema.get('type')
+        if schema_type is not None:
+            type_names = [schema_type] if isinstance(schema_type, str) else list(schema_type)
+            unknown = [name for name in type_names if name not in _JSON_TYPES]
+            if unknown:
+                raise TypeError(f'Unsupported JSON Schema types: {unknown!r}')
+            declared_types = frozenset(t for name in type_names for t in _JSON_TYPES[name])
+            namespace['declared_types'] = declared_types
+            check('value_type not in declared_types', f'expected {" or ".join(type_names)}')
+
+        if 'enum' in schema or 'const' in schema:
+            allowed = schema['enum'] if 'enum' in schema else [schema['const']]
+            namespace['check_enum'] = self._compile_enum(allowed)
+            lines.append('    check_enum(value)')
+
+        for keyword, applies_to, condition, message in _JSON_BOUNDS:
+            if keyword not in schema:
+                continue
+
+            limit = schema[keyword]
+            limit_name = f'limit_{len(namespace)}'
+            namespace[limit_name] = limit
+            condition = condition.format(limit_name)
+
+            # Keywords only apply to values of their type, which does not need
+            # to be checked again if the schema only allows that type.
+            if declared_types is None or not declared_types <= applies_to:
+                type_name = f'types_{len(namespace)}'
+                namespace[type_name] = applies_to
+                condition = f'value_type in {type_name} and {condition}'
+            check(condition, message.format(limit))
+
+        if 'pattern' in schema:
+            namespace['search'] = re.compile(schema['pattern']).search
+            check('value_type is str and search(value) is None', f'must match {schema["pattern"]}')
+
+        if 'properties' in schema or 'required' in schema or 'additionalProperties' in schema:
+            properties = {
+                name: self._compile_json_schema(property_schema)
+                for name, property_schema in schema.get('properties', {}).items()
+            }
+            additional = schema.get('additionalProperties', True)
+            namespace['validate_object'] = _validate_properties(
+                properties,
+                frozenset(schema.get('required', ())),
+                extra_validator=self._compile_json_schema(additional)
+                if isinstance(additional, dict) else None,
+                allow_extra=additional is not False,
+                bind=False)
+            lines.append('    if value_type is dict: validate_object(value)')
+
+        if 'items' in schema:
+            namespace['validate_items'] = _validate_items(
+                self._compile_json_schema(schema['items']), bind=False)
+            lines.append('    if value_type is list: validate_items(value)')
+
+        if not lines:
+            return lambda value: value
+
+        source = '\n'.join(['def validate(value):', '    value_type = type(value)'] + lines
+                           + ['    return value'])
+        exec(source, namespace)
+        return namespace['validate']
+
+    @staticmethod
+    def _compile_enum(allowed: List[object]) -> Validator:
+
+        # Compare with the type, so that True does not match 1.
+        allowed_values = [(type(value), value) for value in allowed]
+        try:
+            allowed_set = frozenset(allowed_values)
+        except TypeError:
+            allowed_set = None
+
+        def validate(value):
+            key = (type(value), value)
+            if allowed_set is not None:
+                try:
+                    if key in allowed_set:
+                        return value
+                except TypeError:
+                    pass
+            elif key in allowed_values:
+                return value
+            raise ValidationError(f'expected one of {allowed!r}')
+
+        return validate
+
+
+default_schema_compiler = SchemaCompiler()
@@ -0,0 +1,227 @@
+import base64
+import dataclasses
+import datetime
+import decimal
+import enum
+import json
+import threading
+import uuid
+from typing import Callable, Dict, List, Optional
+
+
+Encoder = Callable[[object], object]
+
+
+def _encode_bytes(value: bytes) -> str:
+    return base64.b64encode(value).decode('ascii')
+
+
+def _build_dataclass_encoder(cls: type) -> Encoder:
+    """
+    Generates a function that turns instances of a dataclass into a dict of
+    its fields, without the deep copy dataclasses.asdict makes. Nested
+    objects are left to the serializer.
+    """
+
+    names = [field.name for field in dataclasses.fields(cls)]
+    items = ', '.join(f'{name!r}: o.{name}' for name in names)
+    namespace = {}
+    exec(f'def encode(o):\n    return {{{items}}}', namespace)
+    return namespace['encode']
+
+
+class SerializerRegistry(object):
+    """
+    Holds the functions that turn objects the json module cannot serialize
+    into objects it can, indexed by their exact type.
+
+    Types without an encoder get one the first time they are serialized:
+    dataclasses get a generated one, and subclasses that of their closest
+    registered base class. It is then cached, so every later object of the
+    type costs a single dictionary lookup.
+    """
+
+    def __init__(self, encoders: Dict[type, Encoder] = None):
+        """
+        :param encoders: The encoders to register, indexed by type.
+        """
+        self._registered: Dict[type, Encoder] = dict(encoders or {})
+        self._encoders: Dict[type, Encoder] = dict(self._registered)
+        self._lock = threading.Lock()
+
+        # Encoding the same kind of body with a single encoder, instead of
+        # creating one per response, saves building it every time. Circular
+        # references are not checked: response bodies are trees.
+        self._json_encoder = json.JSONEncoder(default=self.default, check_circular=False)
+
+    def register(self, cls: type, encoder: Encoder) -> None:
+        """
+        Registers the encoder of a type, which is also used for its subclasses
+        that do not have their own.
+
+        :param cls: The type.
+        :param encoder: A function that takes an object of the type and
+        returns an object the json module can serialize.
+        """
+        with self._lock:
+            self._registered[cls] = encoder
+            # Subclasses may have resolved to a different base class before.
+            self._encoders = dict(self._registered)
+
+    def get_encoder(self, cls: type) -> Optional[Encoder]:
+        """
+        Returns the encoder of a type, building it if needed, or None if the
+        type cannot be serialized.
+        """
+        encoder = self._encoders.get(cls)
+        if encoder is None:
+            encoder = self._resolve_encoder(cls)
+            if encoder is not None:
+                with self._lock:
+                    self._encoders[cls] = encoder
+        return encoder
+
+    def _resolve_encoder(self, cls: type) -> Optional[Encoder]:
+
+        if dataclasses.is_dataclass(cls):
+            return _build_dataclass_encoder(cls)
+
+        for base in cls.__mro__[1:]:
+            encoder = self._registered.get(base)
+            if encoder is not None:
+                return encoder
+
+        return None
+
+    def default(self, o: object) -> object:
+        """
+        Encodes an object the json module cannot serialize. Meant to be used
+        as the default function of a JSONEncoder.
+        """
+        encoder = self._encoders.get(type(o)) or self.get_encoder(type(o))
+        if encoder is None:
+            raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+        return encoder(o)
+
+    def dumps(self, obj: object) -> str:
+        """
+        Serializes an object as JSON.
+        """
+        return self._json_encoder.encode(obj)
+
+
+def _deserialize_set(decode: Callable[[object], object]) -> Callable[[List[object]], set]:
+    return lambda values: {decode(value) for value in values}
+
+
+def _deserialize_list(values: List[Dict[str, object]]) -> List[object]:
+    return [deserialize_attribute_value(value) for value in values]
+
+
+def _deserialize_map(values: Dict[str, Dict[str, object]]) -> Dict[str, object]:
+    return {key: deserialize_attribute_value(value) for key, value in values.items()}
+
+
+_ATTRIBUTE_DECODERS = {
+    'S': str,
+    'N': decimal.Decimal,
+    'B': bytes,
+    'BOOL': bool,
+    'NULL': lambda value: None,
+    'L': _deserialize_list,
+    'M': _deserialize_map,
+    'SS': _deserialize_set(str),
+    'NS': _deserialize_set(decimal.Decimal),
+    'BS': _deserialize_set(bytes),
+}
+
+
+def deserialize_attribute_value(value: Dict[str, object]) -> object:
+    """
+    Converts a DynamoDB attribute value, like {"N": "1.5"}, into the Python
+    object the boto3 resource layer would return: numbers become Decimals and
+    sets Python sets.
+    """
+    for tag, content in value.items():
+        return _ATTRIBUTE_DECODERS[tag](content)
+    raise ValueError('Empty attribute value')
+
+
+def deserialize_item(item: Dict[str, Dict[str, object]]) -> Dict[str, object]:
+    """
+    Converts an item returned by the low-level DynamoDB client, a map of
+    attribute names to attribute values, into a dictionary of Python objects.
+    """
+    return {key: deserialize_attribute_value(value) for key, value in item.items()}
+
+
+def _json_list(values: List[Dict[str, object]]) -> List[object]:
+    return [_attribute_value_to_json(value) for value in values]
+
+
+def _json_map(values: Dict[str, Dict[str, object]]) -> Dict[str, object]:
+    return {key: _attribute_value_to_json(value) for key, value in values.items()}
+
+
+def _json_bytes_list(values: List[bytes]) -> List[str]:
+    return [_encode_bytes(value) for value in values]
+
+
+# Numbers are kept as the strings DynamoDB sends, which is what serializing
+# the Decimal they would be deserialized into produces, without building it.
+_JSON_ATTRIBUTE_DECODERS = {
+    'S': str,
+    'N': str,
+    'B': _encode_bytes,
+    'BOOL': bool,
+    'NULL': lambda value: None,
+    'L': _json_list,
+    'M': _json_map,
+    'SS': list,
+    'NS': list,
+    'BS': _json_bytes_list,
+}
+
+
+def _attribute_value_to_json(value: Dict[str, object]) -> object:
+    for tag, content in value.items():
+        return _JSON_ATTRIBUTE_DECODERS[tag](content)
+    raise ValueError('Empty attribute value')
+
+
+class DynamoDbItems(object):
+    """
+    Wraps the items returned by the low-level DynamoDB client, so that they
+    are serialized as if they had been deserialized first, but converting
+    attribute values straight into JSON-serializable objects in a single pass.
+
+        response = client.query(...)
+        return HttpResponse(200, body=DynamoDbItems(response['Items']))
+    """
+
+    __slots__ = ('items',)
+
+    def __init__(self, items: List[Dict[str, Dict[str, object]]]):
+        self.items = items
+
+    def to_json_object(self) -> List[Dict[str, object]]:
+        return [
+            {key: _attribute_value_to_json(value) for key, value in item.items()}
+            for item in self.items
+        ]
+
+
+default_serializer_registry = SerializerRegistry({
+    decimal.Decimal: str,
+    datetime.datetime: datetime.datetime.isoformat,
+    datetime.date: datetime.date.isoformat,
+    datetime.time: datetime.time.isoformat,
+    datetime.timedelta: datetime.timedelta.total_seconds,
+    set: list,
+    frozenset: list,
+    uuid.UUID: str,
+    enum.Enum: lambda value: value.value,
+    bytes: _encode_bytes,
+    bytearray: _encode_bytes,
+    DynamoDbItems: DynamoDbItems.to_json_object,
+})
@@ -0,0 +1,298 @@
+"""
+Measures the work done before a function handles its first request: the
+import of pyrazine, the construction of the LambdaHandler, the registration
+of its routes, the patching of libraries for tracing, the initialization
+hooks of the application and, optionally, the import of each module.
+
+Times are relative to the start of the process when it is known, which it is
+on Linux, and to the import of pyrazine otherwise.
+"""
+import builtins
+import contextlib
+import functools
+import importlib.util
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, TextIO
+
+import pyrazine
+from pyrazine.metrics import write_metrics
+
+
+# The path of the debug route added by LambdaHandler.add_startup_route.
+STARTUP_ROUTE_PATH = '/__pyrazine/startup'
+
+# The number of modules listed in reports, those slowest to import first.
+MAX_REPORTED_IMPORTS = 25
+
+
+def _get_process_age() -> Optional[float]:
+    """
+    Returns the seconds elapsed since the process started, from its start
+    time and the uptime of the system, or None if they are not available.
+    """
+    try:
+        with open('/proc/self/stat') as file:
+            # The name of the command, in parentheses, may contain spaces.
+            fields = file.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as file:
+            uptime = float(file.read().split()[0])
+        start_ticks = int(fields[19])
+        return max(0.0, uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _metric_name(phase: str) -> str:
+    return ''.join(part.title() for part in phase.split('_')) + 'Duration'
+
+
+class _ImportTracker(object):
+    """
+    Replaces builtins.__import__ to time the modules imported, as
+    -X importtime does. The time of a module includes that of the modules it
+    imports, which is subtracted to get the time spent in its own body.
+    """
+
+    def __init__(self):
+        self.timings: Dict[str, List[float]] = {}
+        self._original_import = None
+        self._local = threading.local()
+
+    def start(self) -> None:
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._import
+
+    def stop(self) -> None:
+        if self._original_import is not None:
+            if builtins.__import__ == self._import:
+                builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+
+        original_import = self._original_import
+        module_name = name
+        if level:
+            try:
+                module_name = importlib.util.resolve_name(
+                    '.' * level + name, (globals or {}).get('__package__'))
+            except (ImportError, ValueError):
+                return original_import(name, globals, locals, fromlist, level)
+
+        if module_name in sys.modules:
+            return original_import(name, globals, locals, fromlist, level)
+
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        # The time of the imports this one triggers.
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            if module_name in sys.modules:
+                self.timings[module_name] = [elapsed, elapsed - children]
+
+
+class StartupProfiler(object):
+    """
+    Records the phases of the initialization of a function, and reports them
+    once it handles its first request, as trace annotations, as CloudWatch
+    metrics in the embedded metric format, and through a debug route.
+
+    There is one profiler per process, startup_profiler, used by default by
+    every LambdaHandler.
+    """
+
+    def __init__(self,
+                 budget_ms: float = None,
+                 namespace: str = 'Pyrazine',
+                 metrics: bool = True,
+                 stream: TextIO = None):
+        """
+        :param budget_ms: The time initialization should take at most. Reports
+        tell whether it was exceeded, and handlers log a warning when it is.
+        Defaults to the PYRAZINE_INIT_BUDGET_MS environment variable, if set.
+        :param namespace: The namespace of the metrics.
+        :param metrics: False, to not write metrics on the first request.
+        :param stream: The stream metrics are written to. Defaults to the
+        standard output, which CloudWatch Logs reads them from.
+        """
+
+        if budget_ms is None and os.environ.get('PYRAZINE_INIT_BUDGET_MS'):
+            budget_ms = float(os.environ['PYRAZINE_INIT_BUDGET_MS'])
+        self.budget_ms = budget_ms
+        self.namespace = namespace
+        self.metrics = metrics
+        self.stream = stream
+
+        # Times are measured with perf_counter, from the start of the process
+        # if known, or else from the import of pyrazine.
+        process_age = _get_process_age()
+        self.process_start_known = process_age is not None
+        self._origin = time.perf_counter() - process_age if process_age is not None \
+            else pyrazine._import_started
+
+        self._phases: Dict[str, List[float]] = {}
+        self._hooks: List[Dict[str, object]] = []
+        self._imports = _ImportTracker()
+        self.invoked = False
+        self._first_invocation = None
+
+    def _to_ms(self, counter: float) -> float:
+        return (counter - self._origin) * 1000
+
+    def record_phase(self, name: str, start: float, end: float) -> None:
+        """
+        Records a phase from perf_counter values. Phases recorded more than
+        once, like the registration of routes, span from their first start
+        and last the sum of their durations.
+
+        Phases are only recorded until the first request is handled.
+        """
+        if self.invoked:
+            return
+        phase = self._phases.get(name)
+        if phase is None:
+            self._phases[name] = [start, end - start]
+        else:
+            phase[1] += end - start
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """
+        Records the time the body of a with statement takes as a phase.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, start, time.perf_counter())
+
+    def init_hook(self, function: Callable[[], object] = None, name: str = None):
+        """
+        Runs an initialization function right away, e.g. one that loads the
+        configuration or warms up connections, and records the time it takes.
+        Meant to be used as a decorator at module level, so that it runs in
+        the initialization phase of the function:
+
+            @startup_profiler.init_hook
+            def load_settings():
+                ...
+
+        Errors are recorded and raised. The function is returned as is.
+        """
+
+        if function is None:
+            return functools.partial(self.init_hook, name=name)
+
+        hook = {'name': name or function.__qualname__}
+        start = time.perf_counter()
+        try:
+            function()
+        except Exception as err:
+            hook['error'] = repr(err)
+            raise
+        finally:
+            end = time.perf_counter()
+            hook.update(start_ms=self._to_ms(start), duration_ms=(end - start) * 1000)
+            if not self.invoked:
+                self._hooks.append(hook)
+                self.record_phase('init_hooks', start, end)
+
+        return function
+
+    def track_imports(self) -> None:
+        """
+        Starts timing the import of each module, until the first request. Only
+        modules imported afterwards are timed, so this should be called as
+        early as possible, which setting the PYRAZINE_TRACK_IMPORTS
+        environment variable does when pyrazine is imported.
+        """
+        if not self.invoked:
+            self._imports.start()
+
+    def begin_first_invocation(self) -> None:
+        """
+        Ends initialization: stops recording phases and timing imports.
+        """
+        self._imports.stop()
+        self._first_invocation = time.perf_counter()
+        self._phases.setdefault('first_invocation', [self._first_invocation, 0.0])
+        self.invoked = True
+
+    def end_first_invocation(self) -> None:
+        if self._first_invocation is not None:
+            phase = self._phases['first_invocation']
+            phase[1] = time.perf_counter() - phase[0]
+
+    @property
+    def init_duration_ms(self) -> Optional[float]:
+        """
+        The time from the start of the process to the first request.
+        """
+        if self._first_invocation is None:
+            return None
+        return self._to_ms(self._first_invocation)
+
+    @property
+    def over_budget(self) -> bool:
+        init_duration_ms = self.init_duration_ms
+        return self.budget_ms is not None and init_duration_ms is not None \
+            and init_duration_ms > self.budget_ms
+
+    def report(self) -> Dict[str, object]:
+        """
+        Returns the phases, initialization hooks and slowest imports, with
+        their start and duration in milliseconds.
+        """
+
+        phases = [
+            {'name': name, 'start_ms': self._to_ms(start), 'duration_ms': duration * 1000}
+            for name, (start, duration) in sorted(self._phases.items(), key=lambda item: item[1])
+        ]
+
+        slowest = sorted(self._imports.timings.items(), key=lambda item: item[1][1],
+                         reverse=True)[:MAX_REPORTED_IMPORTS]
+        imports = [
+            {'module': module, 'self_ms': own * 1000, 'cumulative_ms': cumulative * 1000}
+            for module, (cumulative, own) in slowest
+        ]
+
+        return {
+            'process_start_known': self.process_start_known,
+            'init_duration_ms': self.init_duration_ms,
+            'budget_ms': self.budget_ms,
+            'over_budget': self.over_budget,
+            'phases': phases,
+            'hooks': list(self._hooks),
+            'imports': imports,
+        }
+
+    def write_metrics(self, service_name: str) -> None:
+        """
+        Writes the durations of the phases as CloudWatch metrics, with the
+        service as dimension.
+        """
+        if not self.metrics:
+            return
+
+        values = {_metric_name(name): (duration * 1000, 'Milliseconds')
+                  for name, (_, duration) in self._phases.items()}
+        if self.init_duration_ms is not None:
+            values['InitDuration'] = (self.init_duration_ms, 'Milliseconds')
+
+        write_metrics(self.namespace, values, {'service': service_name}, stream=self.stream)
+
+
+startup_profiler = StartupProfiler()
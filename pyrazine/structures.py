@@ -0,0 +1,142 @@
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class MultiDict(Mapping):
+    """
+    Read-only mapping that can hold several values per key, in the order in
+    which they were added.
+
+    Indexing a key returns its first value, while getall returns all of them.
+    Lookups are a single dictionary access.
+    """
+
+    __slots__ = ('_values',)
+
+    def __init__(self, items: Iterable[Tuple[str, str]] = ()):
+        """
+        :param items: The key and value pairs to add, which may contain the
+        same key more than once.
+        """
+
+        normalize_key = self._normalize_key
+        values = {}
+        for key, value in items:
+            key = normalize_key(key)
+            key_values = values.get(key)
+            if key_values is None:
+                values[key] = [value]
+            else:
+                key_values.append(value)
+
+        self._values: Dict[str, List[str]] = values
+
+    @classmethod
+    def from_lists(cls, lists: Dict[str, List[str]]) -> 'MultiDict':
+        """
+        Builds an instance from a dictionary of lists of values indexed by key,
+        like the multi-value headers and query string parameters of REST API
+        and ALB events.
+        """
+        return cls((key, value) for key, values in lists.items() for value in values)
+
+    @staticmethod
+    def _normalize_key(key: str) -> str:
+        return key
+
+    def __getitem__(self, key: str) -> str:
+        return self._values[self._normalize_key(key)][0]
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._normalize_key(key) in self._values
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({list(self.allitems())!r})'
+
+    def get(self, key: str, default: str = None) -> str:
+        values = self._values.get(self._normalize_key(key))
+        return values[0] if values is not None else default
+
+    def getall(self, key: str, default: List[str] = None) -> List[str]:
+        """
+        Returns all values of a key, or the default value if the key is not
+        present.
+        """
+        values = self._values.get(self._normalize_key(key))
+        return list(values) if values is not None else default
+
+    def allitems(self) -> Iterator[Tuple[str, str]]:
+        """
+        Iterates over all key and value pairs, including repeated keys.
+        """
+        for key, values in self._values.items():
+            for value in values:
+                yield key, value
+
+
+class CaseInsensitiveMultiDict(MultiDict):
+    """
+    MultiDict whose keys are compared regardless of their case, e.g. for HTTP
+    headers. Keys are stored in lowercase.
+    """
+
+    __slots__ = ()
+
+    _normalize_key = staticmethod(str.lower)
+
+
+def parse_cookies(cookie_strings: Iterable[str]) -> MultiDict:
+    """
+    Parses cookies in the "name=value" format, either one per string or
+    several of them separated by semicolons, as in the Cookie header.
+    """
+
+    def split_cookies():
+        for cookie_string in cookie_strings:
+            for cookie in cookie_string.split(';'):
+                name, separator, value = cookie.strip().partition('=')
+                if name:
+                    yield name, value
+
+    return MultiDict(split_cookies())
+
+
+class PrefixTrie(object):
+    """
+    Character trie of prefixes, which finds the longest registered prefix of a
+    key in a single pass over it, whatever the number of prefixes.
+    """
+
+    __slots__ = ('_root',)
+
+    # Key under which a node stores the value of the prefix that ends in it.
+    _VALUE = ''
+
+    def __init__(self):
+        self._root = {}
+
+    def insert(self, prefix: str, value: object) -> None:
+        node = self._root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[self._VALUE] = value
+
+    def longest_match(self, key: str) -> Optional[object]:
+        """
+        Returns the value of the longest prefix of the key, or None if no
+        prefix of it is registered.
+        """
+        node = self._root
+        match = node.get(self._VALUE)
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                break
+            match = node.get(self._VALUE, match)
+        return match
@@ -0,0 +1,279 @@
+"""
+Replays traffic captured with pyrazine.capture.TrafficCapture through the
+handle_request method of a LambdaHandler, in several processes, and reports
+the latency percentiles of each route, the throughput and the memory
+high-water mark of the workers:
+
+    python -m pyrazine.testing.replay traffic.ndjson --handler app.handler \\
+        --concurrency 4 --rate 200 --loops 10
+
+With a rate, requests are sent on a fixed schedule and latencies are measured
+from the time each request was due, so that a slow handler shows up as
+queueing instead of as a lower rate. Without one, each worker sends requests
+back to back.
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import resource
+import sys
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pyrazine.capture import read_capture
+from pyrazine.events import detect_event_class
+from pyrazine.typing import LambdaContext
+
+
+# An event, the attributes of its context and the route it goes to.
+ReplayRecord = Tuple[Dict[str, object], Optional[Dict[str, object]], str]
+
+PERCENTILES = (50, 90, 99)
+
+
+def load_handler(handler_name: str) -> object:
+    """
+    Imports a LambdaHandler, or a handler function, from its name, e.g.
+    app.handler.
+    """
+    module_name, attribute_name = handler_name.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), attribute_name)
+
+
+def _get_function(handler: object) -> Callable:
+    handle_request = getattr(handler, 'handle_request', None)
+    return handle_request if handle_request is not None else handler
+
+
+def _build_context(attributes: Optional[Dict[str, object]]) -> LambdaContext:
+    attributes = attributes or {}
+    return LambdaContext(
+        attributes.get('function_name') or 'replay',
+        attributes.get('function_version') or '$LATEST',
+        attributes.get('invoked_function_arn') or '',
+        attributes.get('memory_limit_in_mb') or 128,
+        str(uuid.uuid4()),
+        attributes.get('log_group_name') or '',
+        attributes.get('log_stream_name') or '',
+        None,
+        None)
+
+
+def load_records(path: str, handler: object) -> List[ReplayRecord]:
+    """
+    Reads a capture file, and finds the route each event goes to, so that
+    requests to paths with parameters are reported together.
+    """
+
+    resolve_route = getattr(handler, 'resolve_route', None)
+
+    records = []
+    for event, context in read_capture(path):
+        request = detect_event_class(event)(event)
+        method, path = request.get_http_method(), request.get_path()
+        route = resolve_route(method, path) if resolve_route is not None else None
+        records.append((event, context, f'{method} {route or path}'))
+    return records
+
+
+def _max_rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _replay_worker(task: Tuple[str, List[ReplayRecord], float, int, float]) -> Dict[str, object]:
+
+    handler_name, records, rate, loops, duration = task
+    function = _get_function(load_handler(handler_name))
+
+    latencies: Dict[str, List[float]] = {}
+    statuses: Dict[str, Dict[str, int]] = {}
+    rss_start_kb = _max_rss_kb()
+
+    interval = 1.0 / rate if rate else 0.0
+    start = time.perf_counter()
+    deadline = start + duration if duration else None
+    sent = 0
+
+    for _ in range(loops or sys.maxsize):
+        for event, context, route in records:
+            due = start + sent * interval
+            if interval:
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            request_start = due if interval else time.perf_counter()
+
+            try:
+                response = function(event, _build_context(context))
+                status = str(response.get('statusCode')) if isinstance(response, dict) else '200'
+            except Exception as err:
+                status = type(err).__name__
+
+            latencies.setdefault(route, []).append(time.perf_counter() - request_start)
+            route_statuses = statuses.setdefault(route, {})
+            route_statuses[status] = route_statuses.get(status, 0) + 1
+            sent += 1
+
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        else:
+            continue
+        break
+
+    return {
+        'latencies': latencies,
+        'statuses': statuses,
+        'elapsed': time.perf_counter() - start,
+        'requests': sent,
+        'rss_start_kb': rss_start_kb,
+        'max_rss_kb': _max_rss_kb(),
+    }
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """
+    Returns a percentile of sorted values, with the nearest-rank method.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _summarize(latencies: List[float], statuses: Dict[str, int]) -> Dict[str, object]:
+    latencies = sorted(latencies)
+    summary = {'requests': len(latencies), 'statuses': statuses}
+    for percent in PERCENTILES:
+        summary[f'p{percent}_ms'] = percentile(latencies, percent) * 1000
+    summary['max_ms'] = latencies[-1] * 1000 if latencies else 0.0
+    return summary
+
+
+def replay(handler_name: str,
+           records: List[ReplayRecord],
+           concurrency: int = 1,
+           rate: float = 0.0,
+           loops: int = 1,
+           duration: float = 0.0) -> Dict[str, object]:
+    """
+    Replays records through a handler in several processes.
+
+    :param handler_name: The name of the handler, imported by each worker.
+    :param records: The records to replay, split between the workers.
+    :param concurrency: The number of worker processes.
+    :param rate: The total number of requests per second, or 0 to send them
+    as fast as possible.
+    :param loops: The number of times each worker replays its records, or 0
+    to replay them until the duration is over.
+    :param duration: The maximum seconds to replay for, or 0 for no limit.
+    :return: The report, with the latency percentiles and statuses per route,
+    the throughput and the memory high-water marks of the workers.
+    """
+
+    if not records:
+        raise ValueError('There are no records to replay.')
+    if not loops and not duration:
+        raise ValueError('Either the number of loops or the duration must be set.')
+
+    # Workers with no records of their own replay all of them.
+    shares = [records[index::concurrency] or records for index in range(concurrency)]
+    worker_rate = rate / concurrency if rate else 0.0
+    tasks = [(handler_name, share, worker_rate, loops, duration) for share in shares]
+
+    if concurrency == 1:
+        results = [_replay_worker(tasks[0])]
+    else:
+        with multiprocessing.Pool(concurrency) as pool:
+            results = pool.map(_replay_worker, tasks)
+
+    latencies: Dict[str, List[float]] = {}
+    statuses: Dict[str, Dict[str, int]] = {}
+    for result in results:
+        for route, values in result['latencies'].items():
+            latencies.setdefault(route, []).extend(values)
+        for route, counts in result['statuses'].items():
+            route_statuses = statuses.setdefault(route, {})
+            for status, count in counts.items():
+                route_statuses[status] = route_statuses.get(status, 0) + count
+
+    all_statuses: Dict[str, int] = {}
+    for counts in statuses.values():
+        for status, count in counts.items():
+            all_statuses[status] = all_statuses.get(status, 0) + count
+
+    requests = sum(result['requests'] for result in results)
+    elapsed = max(result['elapsed'] for result in results)
+
+    return {
+        'routes': {route: _summarize(values, statuses[route])
+                   for route, values in sorted(latencies.items())},
+        'total': _summarize([value for values in latencies.values() for value in values],
+                            all_statuses),
+        'requests': requests,
+        'elapsed_s': elapsed,
+        'throughput_rps': requests / elapsed if elapsed else 0.0,
+        'workers': [{'rss_start_kb': result['rss_start_kb'],
+                     'max_rss_kb': result['max_rss_kb']} for result in results],
+        'max_rss_kb': max(result['max_rss_kb'] for result in results),
+    }
+
+
+def _print_report(report: Dict[str, object]) -> None:
+
+    headers = ['route', 'requests'] + [f'p{percent} ms' for percent in PERCENTILES] + \
+        ['max ms', 'statuses']
+    rows = []
+    for route, summary in list(report['routes'].items()) + [('total', report['total'])]:
+        statuses = ' '.join(f'{status}:{count}'
+                            for status, count in sorted(summary['statuses'].items()))
+        rows.append([route, summary['requests']] +
+                    [f'{summary[f"p{percent}_ms"]:.2f}' for percent in PERCENTILES] +
+                    [f'{summary["max_ms"]:.2f}', statuses])
+
+    widths = [max(len(str(row[i])) for row in [headers] + rows) for i in range(len(headers))]
+    for row in [headers] + rows:
+        print('  '.join(str(cell).ljust(width) for cell, width in zip(row, widths)))
+
+    print(f'\n{report["requests"]} requests in {report["elapsed_s"]:.2f} s, '
+          f'{report["throughput_rps"]:.1f} requests/s')
+    for index, worker in enumerate(report['workers']):
+        growth = worker['max_rss_kb'] - worker['rss_start_kb']
+        print(f'worker {index}: max RSS {worker["max_rss_kb"] / 1024:.1f} MB '
+              f'({growth / 1024:+.1f} MB while replaying)')
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('capture', help='The capture file to replay.')
+    parser.add_argument('--handler', required=True,
+                        help='The LambdaHandler or function to replay through, e.g. app.handler.')
+    parser.add_argument('--concurrency', type=int, default=multiprocessing.cpu_count(),
+                        help='The number of worker processes.')
+    parser.add_argument('--rate', type=float, default=0.0,
+                        help='The total requests per second. As fast as possible by default.')
+    parser.add_argument('--loops', type=int,
+                        help='The number of times each worker replays its share of the capture. '
+                             'Once by default, or until the duration is over if one is set.')
+    parser.add_argument('--duration', type=float, default=0.0,
+                        help='The maximum seconds to replay for.')
+    parser.add_argument('--output', help='A file to write the report to, as JSON.')
+    args = parser.parse_args(argv)
+    if args.loops is None:
+        args.loops = 0 if args.duration else 1
+
+    records = load_records(args.capture, load_handler(args.handler))
+    report = replay(args.handler, records, concurrency=args.concurrency, rate=args.rate,
+                    loops=args.loops, duration=args.duration)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    _print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import http.server
+import json
+import queue
+import threading
+import time
+import uuid
+from typing import Dict, List
+
+
+class InvocationResult(object):
+    """
+    Result of an invocation, as posted back to the Runtime API.
+    """
+
+    def __init__(self, request_id: str, success: bool, body: bytes, enqueued_at: float):
+        self.request_id = request_id
+        self.success = success
+        self.body = body
+        self.enqueued_at = enqueued_at
+        self.completed_at = time.perf_counter()
+
+    def json(self) -> object:
+        return json.loads(self.body)
+
+
+class _RuntimeApiRequestHandler(http.server.BaseHTTPRequestHandler):
+
+    # HTTP/1.1 keeps the connection alive between requests, like the real
+    # Runtime API does.
+    protocol_version = 'HTTP/1.1'
+
+    # Headers and body are written separately, so Nagle's algorithm would
+    # otherwise add the delayed ACK timeout to every invocation.
+    disable_nagle_algorithm = True
+
+    server: '_RuntimeApiServer'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes = b'', headers: Dict[str, str] = None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if not self.path.endswith('/runtime/invocation/next'):
+            self._send(404)
+            return
+
+        api = self.server.api
+        while True:
+            try:
+                request_id, event, deadline_ms = api._pending.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if api._stopping:
+                    self.close_connection = True
+                    self._send(503)
+                    return
+
+        self._send(200, event, {
+            'Lambda-Runtime-Aws-Request-Id': request_id,
+            'Lambda-Runtime-Deadline-Ms': str(deadline_ms),
+            'Lambda-Runtime-Invoked-Function-Arn': api.function_arn,
+            'Lambda-Runtime-Trace-Id': f'Root=1-00000000-{request_id[:24]};Sampled=0',
+        })
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        parts = self.path.split('/')
+
+        if parts[-2:] == ['init', 'error']:
+            self.server.api._init_error = body
+            self._send(202)
+            return
+
+        # /<version>/runtime/invocation/<request_id>/(response|error)
+        request_id, kind = parts[-2], parts[-1]
+        if kind not in ('response', 'error'):
+            self._send(404)
+            return
+
+        self.server.api._complete(request_id, kind == 'response', body)
+        self._send(202)
+
+
+class _RuntimeApiServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    api: 'LocalRuntimeApi'
+
+    def handle_error(self, request, client_address):
+        # Runtimes are usually killed while waiting for the next invocation,
+        # which is not worth reporting.
+        pass
+
+
+class LocalRuntimeApi(object):
+    """
+    Local stand-in for the Lambda Runtime API, to run and benchmark custom
+    runtimes without deploying them.
+
+    Example::
+
+        with LocalRuntimeApi() as api:
+            request_id = api.enqueue({'key': 'value'})
+            run(function, RuntimeApiClient(api.endpoint), max_invocations=1)
+            result = api.wait_for_result(request_id)
+    """
+
+    def __init__(self,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 function_arn: str = 'arn:aws:lambda:us-east-1:123456789012:function:local',
+                 timeout_ms: int = 3000):
+        self.function_arn = function_arn
+        self._timeout_ms = timeout_ms
+
+        self._pending = queue.Queue()
+        self._enqueued_at = {}
+        self._results = {}
+        self._results_lock = threading.Condition()
+        self._init_error = None
+        self._stopping = False
+
+        self._server = _RuntimeApiServer((host, port), _RuntimeApiRequestHandler)
+        self._server.api = self
+        self._thread = None
+
+    @property
+    def endpoint(self) -> str:
+        """
+        The value to use as AWS_LAMBDA_RUNTIME_API to reach this server.
+        """
+        host, port = self._server.server_address[:2]
+        return f'{host}:{port}'
+
+    @property
+    def init_error(self) -> object:
+        return None if self._init_error is None else json.loads(self._init_error)
+
+    def start(self) -> 'LocalRuntimeApi':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'LocalRuntimeApi':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def enqueue(self, event: object) -> str:
+        """
+        Queues an event to be returned by the next invocation request.
+
+        :param event: The event, which is serialized as JSON.
+        :return: The request ID assigned to the invocation.
+        """
+        request_id = str(uuid.uuid4())
+        deadline_ms = int(time.time() * 1000) + self._timeout_ms
+        self._enqueued_at[request_id] = time.perf_counter()
+        self._pending.put((request_id, json.dumps(event).encode('utf-8'), deadline_ms))
+        return request_id
+
+    def _complete(self, request_id: str, success: bool, body: bytes) -> None:
+        with self._results_lock:
+            self._results[request_id] = InvocationResult(
+                request_id, success, body, self._enqueued_at.pop(request_id, None))
+            self._results_lock.notify_all()
+
+    def wait_for_result(self, request_id: str, timeout: float = None) -> InvocationResult:
+        with self._results_lock:
+            if not self._results_lock.wait_for(lambda: request_id in self._results, timeout):
+                raise TimeoutError(f'No result posted for invocation {request_id}')
+            return self._results.pop(request_id)
+
+    def wait_for_results(self,
+                         request_ids: List[str],
+                         timeout: float = None) -> List[InvocationResult]:
+        return [self.wait_for_result(request_id, timeout) for request_id in request_ids]
@@ -0,0 +1,167 @@
+import http.server
+import json
+import threading
+import time
+import urllib.parse
+from typing import Dict, List
+
+
+class _ManagementApiRequestHandler(http.server.BaseHTTPRequestHandler):
+
+    # HTTP/1.1 keeps the connection alive between requests, like the real
+    # management API does.
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    server: '_ManagementApiServer'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes = b''):
+        self.send_response(status)
+        if body:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _get_connection_id(self):
+        # /<stage>/@connections/<connection_id>
+        path = urllib.parse.urlsplit(self.path).path
+        connection_id = path.rpartition('/@connections/')[2]
+        if not connection_id:
+            self._send(404)
+            return None
+        return urllib.parse.unquote(connection_id)
+
+    def _handle(self, method: str):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        connection_id = self._get_connection_id()
+        if connection_id is None:
+            return
+
+        api = self.server.api
+        api._record_request(method, connection_id, self.headers)
+        status, response = api._apply(method, connection_id, body)
+        self._send(status, response)
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+class _ManagementApiServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    api: 'LocalManagementApi'
+
+
+class LocalManagementApi(object):
+    """
+    Local stand-in for the management API of an API Gateway WebSocket API,
+    to test and benchmark functions that send messages to connections without
+    deploying them.
+
+    Connections are opened with connect, and the messages posted to them are
+    kept in order. Requests for connections that are not open get a 410, like
+    those for connections that are gone.
+
+    Example::
+
+        with LocalManagementApi() as api:
+            api.connect('abc=')
+            client = ManagementApiClient(api.endpoint, sign=False)
+            client.post_to_connection('abc=', {'text': 'hello'})
+            assert api.messages['abc='] == [b'{"text": "hello"}']
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, stage: str = 'local',
+                 latency: float = 0.0):
+        """
+        :param stage: The stage in the path of the endpoint.
+        :param latency: The seconds each request takes, to simulate the
+        round trip to the API.
+        """
+        self.stage = stage
+        self.latency = latency
+        self.messages: Dict[str, List[bytes]] = {}
+        self.requests: List[Dict[str, object]] = []
+
+        self._connected_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+        self._server = _ManagementApiServer((host, port), _ManagementApiRequestHandler)
+        self._server.api = self
+        self._thread = None
+
+    @property
+    def endpoint(self) -> str:
+        """
+        The URL of the management API, including the stage.
+        """
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/{self.stage}'
+
+    def start(self) -> 'LocalManagementApi':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'LocalManagementApi':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def connect(self, connection_id: str) -> None:
+        with self._lock:
+            self._connected_at[connection_id] = time.time()
+            self.messages.setdefault(connection_id, [])
+
+    def disconnect(self, connection_id: str) -> None:
+        with self._lock:
+            self._connected_at.pop(connection_id, None)
+
+    def is_connected(self, connection_id: str) -> bool:
+        return connection_id in self._connected_at
+
+    def _record_request(self, method: str, connection_id: str, headers) -> None:
+        with self._lock:
+            self.requests.append({
+                'method': method,
+                'connection_id': connection_id,
+                'signed': 'Authorization' in headers,
+            })
+
+    def _apply(self, method: str, connection_id: str, body: bytes):
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            connected_at = self._connected_at.get(connection_id)
+            if connected_at is None:
+                return 410, b''
+
+            if method == 'POST':
+                self.messages[connection_id].append(body)
+                return 200, b''
+            if method == 'DELETE':
+                del self._connected_at[connection_id]
+                return 204, b''
+
+        connected_at = time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(connected_at))
+        return 200, json.dumps({
+            'connectedAt': connected_at,
+            'identity': {'sourceIp': '127.0.0.1', 'userAgent': None},
+            'lastActiveAt': connected_at,
+        }).encode('utf-8')
@@ -1,9 +1,18 @@
+import functools
 from typing import Any, Dict, Callable
 
 import aws_xray_sdk
 import aws_xray_sdk.core
 from aws_xray_sdk.core.models import subsegment as xray_subsegment
 
+from pyrazine.log import StructuredLogger
+
+
+# Whether no traced handler has been called yet in the process, shared by the
+# HTTP and event handlers, so that only the first call of the process is
+# annotated as a cold start.
+is_cold_start = True
+
 
 class Tracer(object):
     """
@@ -54,6 +63,57 @@ class Tracer(object):
     def in_subsegment(self, name: str = None, **kwargs):
         return self._recorder.in_subsegment(name=name, **kwargs)
 
+    def wrap_handler(self,
+                     handler: Callable,
+                     log: StructuredLogger,
+                     persist_response: bool = False) -> Callable:
+        """
+        Wraps a handler function so that each call is traced in a subsegment,
+        annotated as a cold start if it is the first traced call of the
+        process, with the exception raised, if any, and optionally the
+        response, as metadata.
+
+        :param handler: The function to wrap.
+        :param log: The logger that calls and exceptions are logged with.
+        :param persist_response: True, if responses should be added to the
+        subsegment as metadata.
+        :return: The wrapped function.
+        """
+
+        handler_name = handler.__name__
+
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            with self.in_subsegment(name=f"## {handler_name}") as subsegment:
+                global is_cold_start
+
+                if is_cold_start:
+                    subsegment.put_annotation(key='ColdStart', value=True)
+                    is_cold_start = False
+
+                try:
+                    log.debug('Starting handler %s', handler_name)
+                    response = handler(*args, **kwargs)
+                    log.debug('Returned successfully from handler %s', handler_name)
+
+                    self.trace_route(
+                        handler_name=handler_name,
+                        persist_response=persist_response,
+                        response_data=response,
+                        subsegment=subsegment
+                    )
+                except Exception as err:
+                    log.exception('Handler %s raised an exception.', handler_name)
+                    self.trace_exception(
+                        handler_name=handler_name,
+                        exception=err,
+                        subsegment=subsegment)
+                    raise
+
+            return response
+
+        return wrapper
+
     @staticmethod
     def _disable_tracing():
         aws_xray_sdk.global_sdk_config.set_sdk_enabled(False)
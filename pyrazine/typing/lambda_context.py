@@ -124,4 +124,4 @@ class LambdaContext(object):
         (Mocked)
         """
         time_elapsed = time.time() - self._start_time
-        return int((self.MAX_EXEC_TIME_IN_MILLIS - time_elapsed) * 1000)
+        return self.MAX_EXEC_TIME_IN_MILLIS - int(time_elapsed * 1000)
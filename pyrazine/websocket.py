@@ -0,0 +1,568 @@
+"""
+Support for API Gateway WebSocket APIs: routing of their events by route
+key, a registry of the connections seen by the container, and a client of
+the management API that sends messages to connections, one at a time or to
+many of them concurrently.
+"""
+import concurrent.futures
+import functools
+import json
+import os
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from pyrazine.clients import ClientRegistry, HttpClientResponse, default_client_registry
+from pyrazine.jwt import JwtToken, JwtTokenParser
+from pyrazine.log import StructuredLogger
+from pyrazine.response import HttpResponse
+from pyrazine.router import EventRoute, takes_context
+from pyrazine.tracer import Tracer
+from pyrazine.typing import LambdaContext
+
+import aws_xray_sdk.core
+
+
+CONNECT = '$connect'
+DISCONNECT = '$disconnect'
+DEFAULT = '$default'
+
+# The maximum duration of a WebSocket connection in API Gateway.
+MAX_CONNECTION_SECONDS = 2 * 60 * 60
+
+
+class WebSocketEvent(object):
+    """
+    Wraps API Gateway WebSocket events, which have a route key and a
+    connection ID instead of a method and a path.
+    """
+
+    __slots__ = ('_event', 'request_context', 'route_key', 'event_type', 'connection_id',
+                 'domain_name', 'stage', '_jwt')
+
+    def __init__(self, event: Dict[str, object]):
+
+        request_context = event.get('requestContext')
+        if not request_context or 'connectionId' not in request_context:
+            raise ValueError('Not a WebSocket event.')
+
+        self._event = event
+        self.request_context: Dict[str, object] = request_context
+        self.route_key: str = request_context.get('routeKey') or DEFAULT
+        self.event_type: str = request_context.get('eventType')
+        self.connection_id: str = request_context['connectionId']
+        self.domain_name: str = request_context.get('domainName')
+        self.stage: str = request_context.get('stage')
+        self._jwt = None
+
+    @classmethod
+    def matches(cls, event: Dict[str, object]) -> bool:
+        request_context = event.get('requestContext')
+        return request_context is not None and 'connectionId' in request_context \
+            and 'http' not in request_context
+
+    @property
+    def event(self) -> Dict[str, object]:
+        return self._event
+
+    @property
+    def body(self) -> Optional[str]:
+        """
+        The message sent by the client, for messages.
+        """
+        return self._event.get('body')
+
+    def json(self) -> object:
+        """
+        The message sent by the client, decoded from JSON.
+
+        :raises ValueError: If it is not valid JSON.
+        """
+        return json.loads(self.body) if self.body else None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """
+        The headers of the upgrade request, only sent with $connect events.
+        """
+        return self._event.get('headers') or {}
+
+    @property
+    def query_params(self) -> Dict[str, str]:
+        return self._event.get('queryStringParameters') or {}
+
+    @property
+    def jwt(self) -> Optional[JwtToken]:
+        """
+        The claims of the token checked by the authorizer of the API, if any.
+        """
+        if self._jwt is None:
+            authorizer = self.request_context.get('authorizer') or {}
+            claims = (authorizer.get('jwt') or {}).get('claims') or authorizer.get('claims')
+            if claims:
+                self._jwt = JwtTokenParser.parse_object(claims)
+        return self._jwt
+
+    @property
+    def management_endpoint(self) -> str:
+        """
+        The URL of the management API of the stage, to send messages to its
+        connections.
+        """
+        return f'https://{self.domain_name}/{self.stage}'
+
+
+class Connection(object):
+    """
+    A connection seen by the container, with the data the application keeps
+    about it, e.g. the ID of the user.
+    """
+
+    __slots__ = ('connection_id', 'endpoint', 'connected_at', 'data')
+
+    def __init__(self,
+                 connection_id: str,
+                 endpoint: str = None,
+                 connected_at: float = None,
+                 data: Dict[str, object] = None):
+        self.connection_id = connection_id
+        self.endpoint = endpoint
+        self.connected_at = connected_at if connected_at is not None else time.time()
+        self.data = data if data is not None else {}
+
+    def __repr__(self) -> str:
+        return f'Connection({self.connection_id!r})'
+
+
+class ConnectionRegistry(object):
+    """
+    Keeps the connections whose $connect event was handled by the container,
+    until their $disconnect event, or until they are known to be gone.
+
+    Each container only sees the events of some of the connections of an
+    API, so the registry is a cache: broadcasting to all the clients of an API
+    needs a shared store, like a DynamoDB table, while the registry saves
+    looking up the connections handled by the container.
+    """
+
+    def __init__(self,
+                 max_connections: int = 10000,
+                 max_age: float = MAX_CONNECTION_SECONDS):
+        """
+        :param max_connections: The maximum number of connections kept. The
+        oldest are forgotten first.
+        :param max_age: The seconds after which connections are forgotten,
+        which defaults to the maximum duration of a connection.
+        """
+        self.max_connections = max_connections
+        self.max_age = max_age
+        self._connections: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, connection: Connection) -> None:
+        with self._lock:
+            self._connections.pop(connection.connection_id, None)
+            self._connections[connection.connection_id] = connection
+            while len(self._connections) > self.max_connections:
+                self._connections.popitem(last=False)
+
+    def remove(self, connection_id: str) -> Optional[Connection]:
+        with self._lock:
+            return self._connections.pop(connection_id, None)
+
+    def get(self, connection_id: str) -> Optional[Connection]:
+        connection = self._connections.get(connection_id)
+        if connection is not None and time.time() - connection.connected_at > self.max_age:
+            self.remove(connection_id)
+            return None
+        return connection
+
+    def _prune(self) -> None:
+        # Connections are kept in the order they were added, so the expired
+        # ones are the first.
+        expired_before = time.time() - self.max_age
+        with self._lock:
+            while self._connections:
+                connection = next(iter(self._connections.values()))
+                if connection.connected_at > expired_before:
+                    break
+                self._connections.popitem(last=False)
+
+    def __iter__(self) -> Iterator[Connection]:
+        self._prune()
+        with self._lock:
+            return iter(list(self._connections.values()))
+
+    def __len__(self) -> int:
+        self._prune()
+        return len(self._connections)
+
+    def __contains__(self, connection_id: str) -> bool:
+        return self.get(connection_id) is not None
+
+    def find(self, **data) -> List[Connection]:
+        """
+        Returns the connections whose data has the values given, e.g.
+        find(user_id='42').
+        """
+        return [connection for connection in self
+                if all(connection.data.get(key) == value for key, value in data.items())]
+
+
+class BroadcastResult(object):
+    """
+    The outcome of a broadcast: the connections the message was sent to,
+    those that are gone, and those the message could not be sent to.
+    """
+
+    def __init__(self):
+        self.sent: List[str] = []
+        self.gone: List[str] = []
+        self.failed: Dict[str, Union[int, str]] = {}
+
+    def __repr__(self) -> str:
+        return (f'BroadcastResult(sent={len(self.sent)}, gone={len(self.gone)}, '
+                f'failed={len(self.failed)})')
+
+
+class ManagementApiClient(object):
+    """
+    Client of the management API of a WebSocket API stage, over a pooled
+    keep-alive connection, see HttpClient. Requests are signed with the
+    credentials of the function, with botocore, which is only imported the
+    first time a request is made.
+
+        api = ManagementApiClient('https://abc123.execute-api.eu-west-1.amazonaws.com/prod')
+        api.broadcast(connection_ids, {'type': 'price', 'value': 12.5})
+    """
+
+    def __init__(self,
+                 endpoint: str,
+                 region: str = None,
+                 credentials: object = None,
+                 max_workers: int = 16,
+                 clients: ClientRegistry = None,
+                 sign: bool = True):
+        """
+        :param endpoint: The URL of the management API, including the stage,
+        e.g. https://{api-id}.execute-api.{region}.amazonaws.com/{stage}.
+        :param region: The region of the API. Defaults to the AWS_REGION
+        environment variable.
+        :param credentials: The botocore credentials to sign requests with.
+        Defaults to those of the function.
+        :param max_workers: The maximum number of messages sent at the same
+        time by broadcasts, which is also the number of connections kept.
+        :param clients: The registry of the HTTP client. Defaults to the
+        global one.
+        :param sign: False, to not sign requests, e.g. for local stand-ins.
+        """
+
+        self.endpoint = endpoint.rstrip('/')
+        self.region = region or os.environ.get('AWS_REGION') or 'us-east-1'
+        self.max_workers = max_workers
+        self._credentials = credentials
+        self._sign = sign
+
+        clients = clients if clients is not None else default_client_registry
+        self._client, self._base_path = clients.for_url(self.endpoint, pool_size=max_workers)
+        self._base_path = self._base_path.rstrip('/')
+
+        self._signer = None
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_signer(self):
+
+        if self._signer is None:
+            from botocore.auth import SigV4Auth
+            from botocore.session import get_session
+
+            credentials = self._credentials if self._credentials is not None \
+                else get_session().get_credentials()
+            if credentials is None:
+                raise RuntimeError('No AWS credentials found to sign requests with.')
+            self._signer = SigV4Auth(credentials, 'execute-api', self.region)
+        return self._signer
+
+    def _request(self, method: str, connection_id: str, body: bytes = None) -> HttpClientResponse:
+
+        path = f'{self._base_path}/@connections/{urllib.parse.quote(connection_id, safe="")}'
+        headers = {'content-type': 'application/json'} if body is not None else {}
+
+        if self._sign:
+            from botocore.awsrequest import AWSRequest
+
+            request = AWSRequest(method=method, url=self._client.base_url + path,
+                                 data=body or b'', headers=headers)
+            self._get_signer().add_auth(request)
+            headers = dict(request.headers.items())
+
+        return self._client.request(method, path, body=body, headers=headers)
+
+    @staticmethod
+    def _encode(data: Union[bytes, str, object]) -> bytes:
+        if isinstance(data, bytes):
+            return data
+        if isinstance(data, str):
+            return data.encode('utf-8')
+        return json.dumps(data).encode('utf-8')
+
+    def post_to_connection(self, connection_id: str, data: Union[bytes, str, object]) -> int:
+        """
+        Sends a message to a connection.
+
+        :param data: The message, sent as it is if it is text or bytes, and as
+        JSON otherwise.
+        :return: The status of the response: 200 if the message was sent, and
+        410 if the connection is gone.
+        """
+        return self._request('POST', connection_id, self._encode(data)).status
+
+    def get_connection(self, connection_id: str) -> Optional[Dict[str, object]]:
+        """
+        Returns the details of a connection, or None if it is gone.
+        """
+        response = self._request('GET', connection_id)
+        return response.json() if response.status == 200 else None
+
+    def delete_connection(self, connection_id: str) -> int:
+        """
+        Closes a connection.
+        """
+        return self._request('DELETE', connection_id).status
+
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix='pyrazine-broadcast')
+        return self._executor
+
+    def broadcast(self,
+                  connection_ids: Iterable[str],
+                  data: Union[bytes, str, object],
+                  registry: ConnectionRegistry = None) -> BroadcastResult:
+        """
+        Sends the same message to many connections, up to max_workers at the
+        same time. The message is serialized once.
+
+        :param connection_ids: The IDs of the connections.
+        :param data: The message, see post_to_connection.
+        :param registry: A registry to remove the connections that are gone
+        from.
+        :return: The connections the message was sent to, those that are
+        gone and those it failed for.
+        """
+
+        body = self._encode(data)
+
+        def send(connection_id: str) -> Union[int, str]:
+            try:
+                return self._request('POST', connection_id, body).status
+            except Exception as err:
+                return repr(err)
+
+        connection_ids = list(connection_ids)
+        if len(connection_ids) == 1:
+            statuses = [send(connection_ids[0])]
+        else:
+            statuses = self._get_executor().map(send, connection_ids)
+
+        result = BroadcastResult()
+        for connection_id, status in zip(connection_ids, statuses):
+            if status == 200:
+                result.sent.append(connection_id)
+            elif status == 410:
+                result.gone.append(connection_id)
+                if registry is not None:
+                    registry.remove(connection_id)
+            else:
+                result.failed[connection_id] = status
+        return result
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+WebSocketCallable = Callable[..., object]
+
+
+class WebSocketHandler(object):
+    """
+    Routes the events of an API Gateway WebSocket API by route key, the way
+    LambdaHandler routes HTTP requests by method and path, and keeps the
+    connections it sees in a registry.
+
+        handler = WebSocketHandler(service_name='chat')
+
+        @handler.route('$connect')
+        def connect(event):
+            return {'user_id': event.jwt.sub}
+
+        @handler.route('sendMessage')
+        def send_message(event):
+            connections = handler.connections.find(room=event.json()['room'])
+            handler.management_api(event).broadcast(
+                [connection.connection_id for connection in connections],
+                event.json(), registry=handler.connections)
+
+    Functions receive a WebSocketEvent, and the context if they take a second
+    parameter. They may return an HttpResponse, a body to send back to the
+    client, or nothing. On $connect, a dictionary returned is kept as the
+    data of the connection, and an HttpResponse with an error status rejects
+    the connection.
+    """
+
+    def __init__(self,
+                 service_name: str = 'unknown_service',
+                 recorder: aws_xray_sdk.core.xray_recorder = None,
+                 trace: bool = True,
+                 logger: StructuredLogger = None,
+                 connections: ConnectionRegistry = None,
+                 management_endpoint: str = None,
+                 clients: ClientRegistry = None):
+        """
+        :param service_name: The name of the service, used in traces.
+        :param recorder: The X-Ray recorder to use. Defaults to the global one.
+        :param trace: True, if functions should be traced by default.
+        :param logger: The logger of the handler. Defaults to one with the
+        default level.
+        :param connections: The registry of the connections. Defaults to a new
+        one.
+        :param management_endpoint: The URL of the management API. Defaults to
+        the one of the stage of each event, see WebSocketEvent.
+        :param clients: The registry of the HTTP clients of the function.
+        Defaults to the global one.
+        """
+        self._service_name = service_name
+        self._trace = trace
+        self._tracer = Tracer(recorder=recorder, service_name=service_name)
+        self._log = logger if logger is not None else StructuredLogger()
+        self._connections = connections if connections is not None else ConnectionRegistry()
+        self._management_endpoint = management_endpoint
+        self._clients = clients if clients is not None else default_client_registry
+        self._management_apis: Dict[str, ManagementApiClient] = {}
+        self._routes: Dict[str, EventRoute] = {}
+
+    @property
+    def connections(self) -> ConnectionRegistry:
+        return self._connections
+
+    @property
+    def logger(self) -> StructuredLogger:
+        return self._log
+
+    def management_api(self, event: WebSocketEvent = None, **options) -> ManagementApiClient:
+        """
+        Returns the client of the management API of the stage of an event, or
+        of the endpoint of the handler if it was given. Clients are created
+        once per endpoint.
+
+        :param options: The options of the client, if it is created. See
+        ManagementApiClient.
+        """
+        endpoint = self._management_endpoint or event.management_endpoint
+        client = self._management_apis.get(endpoint)
+        if client is None:
+            options.setdefault('clients', self._clients)
+            client = self._management_apis[endpoint] = ManagementApiClient(endpoint, **options)
+        return client
+
+    def route(self,
+              route_key: str,
+              function: WebSocketCallable = None,
+              trace: bool = None,
+              persist_response: bool = False):
+        """
+        Registers a function for a route key: $connect, $disconnect, $default,
+        or a custom one, which API Gateway takes from the messages.
+
+        :param route_key: The route key.
+        :param function: The function.
+        :param trace: True, if calls to the function should be traced.
+        :param persist_response: True, if responses should be added to traces.
+        :raises TypeError: If no route key is given, e.g. by decorating a
+        function with @route instead of @route('sendMessage').
+        """
+
+        if not isinstance(route_key, str):
+            raise TypeError('A route key is required, e.g. @route(\'$default\').')
+
+        if function is None:
+            return functools.partial(self.route, route_key, trace=trace,
+                                     persist_response=persist_response)
+
+        # The signature is inspected once, when the function is registered.
+        pass_context = takes_context(function)
+        handler = function
+        if trace or (trace is None and self._trace):
+            handler = self._tracer.wrap_handler(
+                function, self._log, persist_response=persist_response)
+        self._routes[route_key] = EventRoute(handler, pass_context)
+        return function
+
+    @staticmethod
+    def _build_response(result: object) -> Dict[str, object]:
+        if result is None:
+            return {'statusCode': 200}
+        if isinstance(result, HttpResponse):
+            return result.get_response_object()
+        return HttpResponse(200, body=result, enable_cors=False).get_response_object()
+
+    def handle_request(self,
+                       event: Dict[str, object],
+                       context: LambdaContext = None) -> Dict[str, object]:
+        """
+        Passes a WebSocket event to the function registered for its route key,
+        or for $default, and keeps track of the connections.
+
+        :param event: The event object passed by AWS Lambda.
+        :param context: The context object passed by AWS Lambda.
+        :return: A response object, as expected by AWS Lambda.
+        """
+
+        websocket_event = WebSocketEvent(event)
+        route_key = websocket_event.route_key
+        connection_id = websocket_event.connection_id
+
+        log = self._log
+        log.begin_invocation(
+            request_id=getattr(context, 'aws_request_id', None) or
+            websocket_event.request_context.get('requestId'),
+            route=route_key, connection_id=connection_id)
+
+        try:
+            route = self._routes.get(route_key)
+            if route is None and route_key not in (CONNECT, DISCONNECT):
+                route = self._routes.get(DEFAULT)
+
+            try:
+                if route is not None:
+                    result = route(websocket_event, context)
+                else:
+                    result = None
+                    if route_key not in (CONNECT, DISCONNECT):
+                        log.warning('No function registered for route %s.', route_key)
+                response = self._build_response(result)
+            except Exception:
+                log.exception('Unhandled exception in route %s.', route_key)
+                result = None
+                response = HttpResponse(500, message='Internal server error',
+                                        enable_cors=False).get_response_object()
+
+            if route_key == CONNECT and response['statusCode'] < 300:
+                self._connections.add(Connection(
+                    connection_id,
+                    endpoint=self._management_endpoint or websocket_event.management_endpoint,
+                    data=result if isinstance(result, dict) else None))
+            elif route_key == DISCONNECT:
+                self._connections.remove(connection_id)
+
+            return response
+        finally:
+            log.end_invocation()
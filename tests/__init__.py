@@ -0,0 +1,37 @@
+import copy
+import json
+from typing import Dict
+
+from tests import test_handlers
+
+
+def make_http_event(method: str = 'GET',
+                    path: str = '/',
+                    query: str = '',
+                    body: object = None,
+                    claims: Dict[str, object] = None,
+                    headers: Dict[str, str] = None) -> Dict[str, object]:
+    """
+    Builds an HTTP API event from the one of the handler tests.
+
+    :param body: The body of the request, serialized as JSON unless it is a
+    string.
+    :param claims: The JWT claims to add as if an authorizer had checked them.
+    :param headers: Headers to add to those of the event.
+    """
+    event = copy.deepcopy(test_handlers.TestLambdaHandler.TEST_HTTP_EVENT)
+    event['rawPath'] = event['requestContext']['http']['path'] = path
+    event['requestContext']['http']['method'] = method
+    event['rawQueryString'] = query
+
+    if body is not None:
+        event['body'] = body if isinstance(body, str) else json.dumps(body)
+        event['isBase64Encoded'] = False
+
+    if claims is not None:
+        event['requestContext']['authorizer'] = {'jwt': {'claims': claims, 'scopes': None}}
+
+    if headers:
+        event['headers'].update(headers)
+
+    return event
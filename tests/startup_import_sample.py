@@ -0,0 +1,2 @@
+# Imported by test_startup to check import timings.
+import colorsys  # noqa: F401
@@ -0,0 +1,103 @@
+import json
+import unittest
+from unittest.mock import Mock
+
+from pyrazine.auth.base import BaseAuthStorage, NotAuthorizedError
+from pyrazine.auth.spec import AuthSpec, claim_values
+from pyrazine.handlers import LambdaHandler
+from pyrazine.jwt import JwtToken
+from pyrazine.response import HttpResponse
+from tests import make_http_event
+
+
+CLAIMS = {
+    'iss': 'https://example.com/',
+    'sub': 'user-1',
+    'scope': 'items/read items/write',
+    'cognito:groups': '[admins editors]',
+    'email_verified': 'true',
+}
+
+
+class TestAuthSpec(unittest.TestCase):
+
+    def test_claim_values(self):
+        self.assertEqual(claim_values('a b'), {'a', 'b'})
+        self.assertEqual(claim_values('[a b]'), {'a', 'b'})
+        self.assertEqual(claim_values(['a', 'b']), {'a', 'b'})
+        self.assertEqual(claim_values(None), frozenset())
+
+    def test_claims_are_checked_without_storage(self):
+        storage = Mock(spec=BaseAuthStorage)
+        authorize = AuthSpec(
+            scopes=['items/read'],
+            groups=['admins', 'owners'],
+            claims={'email_verified': 'true', 'sub': lambda sub: sub.startswith('user-')},
+            storage=storage
+        ).compile()
+
+        self.assertIsNone(authorize(JwtToken(CLAIMS)))
+        storage.get_user_roles.assert_not_called()
+        storage.get_user_profile.assert_not_called()
+
+    def test_failures(self):
+        cases = (
+            AuthSpec(scopes=['items/delete']),
+            AuthSpec(groups=['owners']),
+            AuthSpec(claims={'email_verified': True}),
+        )
+
+        for spec in cases:
+            with self.assertRaises(NotAuthorizedError) as context:
+                spec.compile()(JwtToken(CLAIMS))
+            self.assertEqual(context.exception.status_code, 403)
+
+        with self.assertRaises(NotAuthorizedError) as context:
+            AuthSpec().compile()(None)
+        self.assertEqual(context.exception.status_code, 401)
+
+    def test_roles_are_fetched_from_storage(self):
+        storage = Mock(spec=BaseAuthStorage)
+        storage.get_user_roles.return_value = {'admin'}
+
+        AuthSpec(roles=['admin'], storage=storage).compile()(JwtToken(CLAIMS))
+        storage.get_user_roles.assert_called_once_with('user-1')
+
+        with self.assertRaises(NotAuthorizedError):
+            AuthSpec(roles=['owner'], storage=storage).compile()(JwtToken(CLAIMS))
+
+    def test_requirements_as_strings(self):
+        # Strings are split like the claims, not into characters.
+        self.assertIsNone(AuthSpec(scopes='items/read items/write').compile()(JwtToken(CLAIMS)))
+        with self.assertRaises(NotAuthorizedError):
+            AuthSpec(groups='owners').compile()(JwtToken(CLAIMS))
+
+    def test_storage_is_required_for_roles(self):
+        with self.assertRaises(ValueError):
+            AuthSpec(roles=['admin']).compile()
+
+
+class TestRouteAuth(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._handler = LambdaHandler(trace=False)
+        self._calls = 0
+
+        @self._handler.route(path='/', methods=['GET'], auth=AuthSpec(scopes=['items/read']))
+        def get_items(token, body):
+            self._calls += 1
+            return HttpResponse(200, {'sub': token.sub})
+
+    def test_authorized_request(self):
+        response = self._handler.handle_request(make_http_event(claims=CLAIMS), None)
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(json.loads(response['body']), {'sub': 'user-1'})
+
+    def test_unauthorized_requests(self):
+        response = self._handler.handle_request(make_http_event(), None)
+        self.assertEqual(response['statusCode'], 401)
+
+        event = make_http_event(claims=dict(CLAIMS, scope='other'))
+        response = self._handler.handle_request(event, None)
+        self.assertEqual(response['statusCode'], 403)
+        self.assertEqual(self._calls, 0)
@@ -0,0 +1,165 @@
+import json
+import unittest
+from dataclasses import dataclass
+from typing import List, Optional
+from unittest.mock import patch
+
+from pyrazine.binding import build_handler_caller, compile_path_template
+from pyrazine.events import BaseHttpEvent, HttpEvent
+from pyrazine.handlers import LambdaHandler
+from pyrazine.jwt import JwtToken
+from pyrazine.response import HttpResponse
+from pyrazine.typing import LambdaContext
+from tests import make_http_event
+
+
+CONTEXT = LambdaContext('function', '$LATEST', 'arn', 128, 'request-id', 'group', 'stream',
+                        None, None)
+
+
+@dataclass
+class NewItem:
+    name: str
+
+
+class TestPathTemplates(unittest.TestCase):
+
+    def test_compile(self):
+        self.assertIsNone(compile_path_template('/items'))
+
+        pattern, names = compile_path_template('/items/{item_id}/parts/{part}')
+        self.assertEqual(names, ('item_id', 'part'))
+        self.assertEqual(pattern.fullmatch('/items/1/parts/a.b').groupdict(),
+                         {'item_id': '1', 'part': 'a.b'})
+        self.assertIsNone(pattern.fullmatch('/items/1/2/parts/a'))
+
+        pattern, names = compile_path_template('/files/{key+}')
+        self.assertEqual(pattern.fullmatch('/files/a/b.txt').group('key'), 'a/b.txt')
+
+
+class TestHandlerCaller(unittest.TestCase):
+
+    def test_legacy_signatures(self):
+        event = HttpEvent(make_http_event())
+
+        def annotated(token, payload: dict):
+            return token, payload
+
+        for handler in (lambda token, body: (token, body),
+                        lambda jwt_token, payload: (jwt_token, payload),
+                        lambda token, data: (token, data),
+                        lambda limit, offset=None: (limit, offset),
+                        annotated):
+            call = build_handler_caller(handler)
+            self.assertEqual(call(handler, event, {'a': 1}, None, None, {}), (None, {'a': 1}))
+
+    def test_binding_annotations_opt_in(self):
+        def search(limit: int, offset: int):
+            return limit, offset
+
+        def page(event: BaseHttpEvent, limit):
+            return limit
+
+        event = HttpEvent(make_http_event(query='limit=5&offset=2'))
+        call = build_handler_caller(search)
+        self.assertEqual(call(search, event, {}, None, None, {}), (5, 2))
+        call = build_handler_caller(page)
+        self.assertEqual(call(page, event, {}, None, None, {}), '5')
+
+    def test_signature_is_inspected_once(self):
+        def handler(item_id: int, limit: int = 10):
+            return item_id, limit
+
+        with patch('inspect.signature', wraps=__import__('inspect').signature) as signature:
+            call = build_handler_caller(handler, path_params=['item_id'])
+            for _ in range(3):
+                call(handler, HttpEvent(make_http_event(query='limit=5')), {}, None, None,
+                     {'item_id': '7'})
+
+        self.assertEqual(signature.call_count, 1)
+
+    def test_values_are_only_taken_if_declared(self):
+        def handler(body):
+            return body
+
+        event = HttpEvent(make_http_event(query='a=1'))
+        build_handler_caller(handler)(handler, event, {}, None, None, {})
+        self.assertIsNone(event._query_params)
+        self.assertIsNone(event._header_map)
+
+
+class TestRouteBinding(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._handler = LambdaHandler(trace=False)
+        handler = self._handler
+
+        @handler.route(path='/items/{item_id}', methods=['GET'])
+        def get_item(item_id: int, tags: List[str] = None, verbose: bool = False,
+                     token: Optional[JwtToken] = None, ctx: LambdaContext = None,
+                     request: BaseHttpEvent = None):
+            return HttpResponse(200, {
+                'item_id': item_id, 'tags': tags, 'verbose': verbose,
+                'has_context': ctx is not None, 'path': request.get_path(),
+                'accept': request.get_headers()['accept-encoding'],
+            })
+
+        @handler.route(path='/items/{item_id}', methods=['PUT'], schema=NewItem)
+        def put_item(item: NewItem, item_id: str, page: int):
+            return HttpResponse(200, {'item_id': item_id, 'name': item.name, 'page': page})
+
+        @handler.route(path='/items/special', methods=['GET'])
+        def get_special(token, body):
+            return HttpResponse(200, {'special': True})
+
+    def _request(self, *args, **kwargs):
+        response = self._handler.handle_request(make_http_event(*args, **kwargs), CONTEXT)
+        return response['statusCode'], json.loads(response['body'])
+
+    def test_legacy_handler_with_any_names(self):
+
+        @self._handler.route(path='/legacy', methods=['POST'])
+        def legacy(token, data):
+            return HttpResponse(200, {'data': data})
+
+        status, body = self._request('POST', '/legacy', body={'name': 'pen'})
+        self.assertEqual(status, 200)
+        self.assertEqual(body, {'data': {'name': 'pen'}})
+
+    def test_two_annotated_query_parameters(self):
+
+        @self._handler.route(path='/search', methods=['GET'])
+        def search(limit: int, offset: int):
+            return HttpResponse(200, {'limit': limit, 'offset': offset})
+
+        status, body = self._request('GET', '/search', 'limit=5&offset=2')
+        self.assertEqual(status, 200)
+        self.assertEqual(body, {'limit': 5, 'offset': 2})
+
+    def test_parameters_are_bound(self):
+        status, body = self._request('GET', '/items/42', 'tags=a&tags=b&verbose=true')
+        self.assertEqual(status, 200)
+        self.assertEqual(body, {
+            'item_id': 42, 'tags': ['a', 'b'], 'verbose': True, 'has_context': True,
+            'path': '/items/42', 'accept': 'gzip, deflate, br',
+        })
+
+        status, body = self._request('PUT', '/items/abc', 'page=2', body={'name': 'pen'})
+        self.assertEqual(body, {'item_id': 'abc', 'name': 'pen', 'page': 2})
+
+    def test_exact_paths_take_precedence(self):
+        self.assertEqual(self._request('GET', '/items/special'), (200, {'special': True}))
+
+    def _error(self, *args, **kwargs):
+        status, body = self._request(*args, **kwargs)
+        return status, body['error']['message']
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self._error('GET', '/items/abc'),
+                         (400, 'Invalid path parameter item_id'))
+        self.assertEqual(self._error('PUT', '/items/abc', body={'name': 'pen'}),
+                         (400, 'Missing query parameter page'))
+        self.assertEqual(self._error('GET', '/items/1', 'verbose=maybe'),
+                         (400, 'Invalid query parameter verbose'))
+
+        self.assertEqual(self._request('GET', '/items/1/parts')[0], 404)
@@ -0,0 +1,170 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from pyrazine.cache import MISSING, DiskCache, MemoryCache, TieredCache
+from pyrazine.typing import LambdaContext
+
+
+class TestMemoryCache(unittest.TestCase):
+
+    def test_lru_eviction_by_size(self):
+        cache = MemoryCache(max_bytes=30)
+        cache.set('a', 'A', None, 10)
+        cache.set('b', 'B', None, 10)
+        cache.set('c', 'C', None, 10)
+
+        # Reading a makes b the least recently used.
+        self.assertEqual(cache.get('a', 0), 'A')
+        cache.set('d', 'D', None, 10)
+
+        self.assertIs(cache.get('b', 0), MISSING)
+        self.assertEqual([cache.get(key, 0) for key in 'acd'], ['A', 'C', 'D'])
+        self.assertEqual(cache.size, 30)
+
+        cache.set('e', 'E', None, 31)
+        self.assertIs(cache.get('e', 0), MISSING)
+        self.assertEqual(cache.size, 30)
+
+    def test_expiration(self):
+        cache = MemoryCache(max_bytes=100)
+        cache.set('a', None, 10.0, 1)
+        self.assertIsNone(cache.get('a', 9.0))
+        self.assertIs(cache.get('a', 10.0), MISSING)
+        self.assertEqual(cache.size, 0)
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, 'cache.sqlite3')
+
+    def tearDown(self) -> None:
+        self._directory.cleanup()
+
+    def test_persists_and_trims(self):
+        cache = DiskCache(self._path, max_bytes=100)
+        for index, key in enumerate('abcd'):
+            cache.set(key, key.encode() * 20, None, now=index)
+        self.assertEqual(cache.size, 80)
+
+        # Reading a makes b the least recently read.
+        self.assertEqual(cache.get('a', now=10)[0], b'a' * 20)
+        cache.set('e', b'e' * 30, None, now=11)
+
+        reopened = DiskCache(self._path, max_bytes=100)
+        self.assertIs(reopened.get('b', now=12)[0], MISSING)
+        self.assertEqual(reopened.get('c', now=12)[0], b'c' * 20)
+        self.assertEqual(reopened.get('e', now=12)[0], b'e' * 30)
+        self.assertEqual(reopened.size, 90)
+
+    def test_expiration(self):
+        cache = DiskCache(self._path, max_bytes=100)
+        cache.set('a', b'value', 5.0, now=0)
+        self.assertEqual(cache.get('a', now=4), (b'value', 5.0))
+        self.assertEqual(cache.get('a', now=5), (MISSING, None))
+        self.assertEqual(cache.size, 0)
+
+
+class TestTieredCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self._directory.cleanup()
+
+    def _create_cache(self, **kwargs) -> TieredCache:
+        return TieredCache(namespace='test', directory=self._directory.name, **kwargs)
+
+    def test_values_are_promoted_from_disk(self):
+        cache = self._create_cache(memory_bytes=1024 * 1024)
+        cache.set('config', {'flags': ['a', 'b'], 'limit': None})
+        cache.memory.clear()
+
+        self.assertEqual(cache.get('config'), {'flags': ['a', 'b'], 'limit': None})
+        self.assertEqual(len(cache.memory), 1)
+
+        # A new cache in the same directory, as after a cold start.
+        self.assertEqual(self._create_cache().get('config')['flags'], ['a', 'b'])
+        self.assertEqual(cache.get('missing', 'default'), 'default')
+
+    def test_ttl(self):
+        cache = self._create_cache(default_ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2, ttl=600)
+
+        with mock.patch('time.time', return_value=time.time() + 120):
+            self.assertIsNone(cache.get('a'))
+            self.assertEqual(cache.get('b'), 2)
+
+    def test_memoize(self):
+        cache = self._create_cache(disk=False)
+        calls = []
+
+        @cache.memoize(ttl=60)
+        def lookup(code, region=None):
+            calls.append(code)
+            return {'code': code, 'region': region}
+
+        self.assertEqual(lookup('es'), {'code': 'es', 'region': None})
+        self.assertEqual(lookup('es'), {'code': 'es', 'region': None})
+        self.assertEqual(lookup('es', region='eu'), {'code': 'es', 'region': 'eu'})
+        self.assertEqual(calls, ['es', 'es'])
+
+        lookup.invalidate('es')
+        lookup('es')
+        self.assertEqual(calls, ['es', 'es', 'es'])
+        self.assertIsNone(cache.disk)
+
+    def test_unpicklable_values_are_not_cached(self):
+        cache = self._create_cache()
+        calls = []
+
+        @cache.memoize
+        def get_lock(name):
+            calls.append(name)
+            return threading.Lock()
+
+        get_lock('a')
+        get_lock('a')
+        self.assertEqual(calls, ['a', 'a'])
+        self.assertFalse(cache.set('b', (i for i in range(3))))
+        self.assertIsNone(cache.get('b'))
+
+    def test_memoize_needs_a_key_for_objects(self):
+        cache = self._create_cache(disk=False)
+
+        @cache.memoize
+        def handler(token, body):
+            return body
+
+        with self.assertRaises(TypeError):
+            handler(object(), {})
+
+        keyed = cache.memoize(lambda token, body: body, key=lambda token, body: body['id'])
+        self.assertEqual(keyed(object(), {'id': 'a'}), {'id': 'a'})
+
+    def test_memory_budget_from_context(self):
+        with mock.patch.dict(os.environ, {'AWS_LAMBDA_FUNCTION_MEMORY_SIZE': '512'}):
+            cache = self._create_cache()
+        self.assertEqual(cache.memory.max_bytes,
+                         int(512 * 1024 * 1024 * TieredCache.MEMORY_FRACTION))
+
+        cache.configure(LambdaContext(
+            'function', '$LATEST', 'arn', 256, 'request-id', 'group', 'stream', None, None))
+        self.assertEqual(cache.memory.max_bytes,
+                         int(256 * 1024 * 1024 * TieredCache.MEMORY_FRACTION))
+
+        fixed = self._create_cache(memory_bytes=1000)
+        fixed.configure(LambdaContext(
+            'function', '$LATEST', 'arn', 256, 'request-id', 'group', 'stream', None, None))
+        self.assertEqual(fixed.memory.max_bytes, 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
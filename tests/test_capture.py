@@ -0,0 +1,154 @@
+import base64
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pyrazine.capture import REDACTED, EventSanitizer, TrafficCapture, read_capture
+from pyrazine.handlers import LambdaHandler
+from pyrazine.response import HttpResponse
+from pyrazine.testing import replay
+from tests import make_http_event
+
+
+# Imported by name by the replay workers.
+handler = LambdaHandler(trace=False)
+
+
+@handler.route(path='/items/{item_id}', methods=['GET'])
+def get_item(item_id: str):
+    return HttpResponse(200, body={'id': item_id})
+
+
+@handler.route(path='/items', methods=['POST'])
+def create_item(token, body):
+    return HttpResponse(201, body=body)
+
+
+def _make_event(method: str, path: str, body: object = None):
+    event = make_http_event(method, path, claims={
+        'iss': 'https://issuer.example.com', 'sub': 'user', 'email': 'user@example.com',
+    }, headers={'authorization': 'Bearer secret'})
+    if body is not None:
+        event['body'] = base64.b64encode(json.dumps(body).encode()).decode()
+        event['isBase64Encoded'] = True
+    return event
+
+
+class TestEventSanitizer(unittest.TestCase):
+
+    def test_credentials_are_always_redacted(self):
+        event = _make_event('GET', '/items/1')
+        sanitized = EventSanitizer().sanitize(event)
+
+        self.assertEqual(sanitized['headers']['authorization'], REDACTED)
+        self.assertEqual(event['headers']['authorization'], 'Bearer secret')
+        claims = sanitized['requestContext']['authorizer']['jwt']['claims']
+        self.assertEqual(claims['email'], 'user@example.com')
+
+    def test_claims_and_body(self):
+        event = _make_event('POST', '/items', body={'name': 'pen', 'price': 2})
+
+        claims = EventSanitizer(redact_claims=['email']).sanitize(event)[
+            'requestContext']['authorizer']['jwt']['claims']
+        self.assertEqual((claims['sub'], claims['email']), ('user', REDACTED))
+
+        sanitizer = EventSanitizer(redact_claims=True, redact_body=True)
+        sanitized = sanitizer.sanitize(event)
+        claims = sanitized['requestContext']['authorizer']['jwt']['claims']
+        # The subject is replaced with a hash, the same for the same subject.
+        self.assertNotIn('user', claims['sub'])
+        self.assertEqual(claims, {'iss': 'https://issuer.example.com', 'sub': claims['sub'],
+                                  'email': REDACTED})
+        self.assertEqual(sanitizer.sanitize(event), sanitized)
+        self.assertEqual(json.loads(base64.b64decode(sanitized['body'])),
+                         {'name': 'xxx', 'price': 2})
+
+    def test_query_parameters(self):
+        event = _make_event('GET', '/items/1')
+        event['rawQueryString'] = 'access_token=abc&q=shoes&email=a%40b.com'
+        event['queryStringParameters'] = {'access_token': 'abc', 'q': 'shoes',
+                                          'email': 'a@b.com'}
+
+        sanitized = EventSanitizer(redact_query=['email']).sanitize(event)
+        self.assertEqual(sanitized['rawQueryString'],
+                         'access_token=%5BREDACTED%5D&q=shoes&email=%5BREDACTED%5D')
+        self.assertEqual(sanitized['queryStringParameters'],
+                         {'access_token': REDACTED, 'q': 'shoes', 'email': REDACTED})
+
+        alb_event = {'multiValueQueryStringParameters': {'q': ['a', 'b'], 'token': ['c']}}
+        sanitized = EventSanitizer(redact_query=True).sanitize(alb_event)
+        self.assertEqual(sanitized['multiValueQueryStringParameters'],
+                         {'q': [REDACTED, REDACTED], 'token': [REDACTED]})
+
+    def test_invalid_base64_body(self):
+        event = _make_event('POST', '/items')
+        event['body'] = 'not base64!'
+        event['isBase64Encoded'] = True
+
+        sanitized = EventSanitizer(redact_body=True).sanitize(event)
+        self.assertEqual(base64.b64decode(sanitized['body']), b'x' * len('not base64!'))
+
+
+class TestCaptureAndReplay(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, 'traffic.ndjson')
+
+    def tearDown(self) -> None:
+        handler._capture = None
+        self._directory.cleanup()
+
+    def test_capture_and_replay(self):
+        capture = TrafficCapture(self._path, redact_claims=True)
+        handler._capture = capture
+
+        events = [_make_event('GET', f'/items/{i}') for i in range(3)]
+        events.append(_make_event('POST', '/items', body={'name': 'pen'}))
+        for event in events:
+            handler.handle_request(event, None)
+        capture.close()
+
+        captured = list(read_capture(self._path))
+        self.assertEqual(len(captured), 4)
+        self.assertEqual(captured[0][0]['headers']['authorization'], REDACTED)
+
+        records = replay.load_records(self._path, handler)
+        self.assertEqual([route for _, _, route in records],
+                         ['GET /items/{item_id}'] * 3 + ['POST /items'])
+
+        report = replay.replay('tests.test_capture.handler', records, concurrency=2, loops=5)
+        self.assertEqual(report['requests'], 20)
+        self.assertEqual(report['routes']['GET /items/{item_id}']['statuses'], {'200': 15})
+        self.assertEqual(report['routes']['POST /items']['statuses'], {'201': 5})
+        self.assertGreater(report['throughput_rps'], 0)
+        self.assertGreater(report['max_rss_kb'], 0)
+
+    def test_duration_replays_until_it_is_over(self):
+        with open(self._path, 'w'):
+            pass
+
+        with mock.patch.object(replay, 'replay') as replay_mock, \
+                mock.patch.object(replay, '_print_report'):
+            replay.main([self._path, '--handler', 'tests.test_capture.handler',
+                         '--duration', '60'])
+            self.assertEqual(replay_mock.call_args.kwargs['loops'], 0)
+
+            replay.main([self._path, '--handler', 'tests.test_capture.handler'])
+            self.assertEqual(replay_mock.call_args.kwargs['loops'], 1)
+
+            replay.main([self._path, '--handler', 'tests.test_capture.handler',
+                         '--duration', '60', '--loops', '3'])
+            self.assertEqual(replay_mock.call_args.kwargs['loops'], 3)
+
+    def test_percentile(self):
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual(replay.percentile(values, 50), 50.0)
+        self.assertEqual(replay.percentile(values, 99), 99.0)
+        self.assertEqual(replay.percentile([3.0], 90), 3.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import http.server
+import json
+import threading
+import unittest
+from unittest import mock
+
+from pyrazine.auth.cognito import CognitoAuthorizer
+from pyrazine.clients import ClientRegistry, DeadlineExceededError, HttpClientResponse
+from pyrazine.typing import LambdaContext
+from tests.test_verifiers import RSA_JWK
+
+
+class _EchoRequestHandler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self):
+        length = int(self.headers.get('content-length') or 0)
+        body = json.dumps({
+            'method': self.command,
+            'path': self.path,
+            'body': self.rfile.read(length).decode('utf-8'),
+            'client_port': self.client_address[1],
+        }).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+        # Closes the connection without telling the client, as servers do
+        # with idle connections.
+        if self.path == '/drop':
+            self.close_connection = True
+
+    do_GET = _respond
+    do_POST = _respond
+
+
+class TestHttpClient(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _EchoRequestHandler)
+        cls._thread = threading.Thread(target=cls._server.serve_forever, daemon=True)
+        cls._thread.start()
+        cls._base_url = f'http://127.0.0.1:{cls._server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._server.shutdown()
+        cls._server.server_close()
+
+    def setUp(self) -> None:
+        self._clients = ClientRegistry(trace=False)
+
+    def tearDown(self) -> None:
+        self._clients.close()
+
+    def test_connections_are_reused(self):
+        client = self._clients.register('echo', self._base_url)
+        responses = [client.get(f'/items/{i}').json() for i in range(3)]
+
+        self.assertEqual([response['path'] for response in responses],
+                         ['/items/0', '/items/1', '/items/2'])
+        self.assertEqual(len({response['client_port'] for response in responses}), 1)
+        self.assertIs(self._clients['echo'], client)
+
+    def test_for_url_shares_clients_per_host(self):
+        client, path = self._clients.for_url(f'{self._base_url}/keys.json?version=2')
+        self.assertEqual(path, '/keys.json?version=2')
+        self.assertIs(self._clients.for_url(f'{self._base_url}/other')[0], client)
+
+        response = client.post('/items', json_body={'name': 'pen'})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(json.loads(response.json()['body']), {'name': 'pen'})
+
+    def test_stale_connection_is_retried(self):
+        client = self._clients.register('echo', self._base_url)
+        first = client.get('/drop').json()
+        second = client.get('/items').json()
+
+        self.assertEqual(second['path'], '/items')
+        self.assertNotEqual(first['client_port'], second['client_port'])
+
+    def test_timeout_is_bound_by_deadline(self):
+        client = self._clients.register('echo', self._base_url, timeout=10.0,
+                                        deadline_margin=0.5)
+        context = mock.Mock(spec=LambdaContext)
+
+        context.get_remaining_time_in_millis.return_value = 3000
+        self._clients.set_deadline(context)
+        self.assertAlmostEqual(client.get_timeout(), 2.5, places=1)
+
+        context.get_remaining_time_in_millis.return_value = 400
+        self._clients.set_deadline(context)
+        self.assertRaises(DeadlineExceededError, client.get, '/items')
+
+        self._clients.set_deadline(None)
+        self.assertEqual(client.get_timeout(), 10.0)
+
+
+class TestCognitoAuthorizerKeys(unittest.TestCase):
+
+    def test_keys_are_fetched_through_the_registry(self):
+        clients = mock.Mock(spec=ClientRegistry)
+        client = mock.Mock()
+        client.get.return_value = HttpClientResponse(
+            200, {}, json.dumps({'keys': [RSA_JWK]}).encode('utf-8'))
+        clients.for_url.return_value = (client, '/us-east-1_D4KLyfcX7/.well-known/jwks.json')
+
+        authorizer = CognitoAuthorizer(
+            'us-east-1_D4KLyfcX7', 'client', 'us-east-1', None, clients=clients)
+
+        clients.for_url.assert_called_once_with(
+            'https://cognito-idp.us-east-1.amazonaws.com/us-east-1_D4KLyfcX7/.well-known/jwks.json')
+        client.get.assert_called_once_with('/us-east-1_D4KLyfcX7/.well-known/jwks.json')
+        self.assertEqual(authorizer._cognito_keys, [RSA_JWK])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import asyncio
+import io
+import json
+import unittest
+
+from pyrazine.container import AsgiAdapter, AsgiRequest, WsgiAdapter
+from pyrazine.handlers import LambdaHandler
+from pyrazine.response import HttpResponse
+
+
+def _build_handler() -> LambdaHandler:
+    handler = LambdaHandler(trace=False)
+
+    @handler.route(path='/items', methods=('POST',))
+    def create_item(token, body):
+        return HttpResponse(201, body={'received': body})
+
+    @handler.route(path='/fail', methods=('GET',))
+    def fail(token, body):
+        raise RuntimeError('Test error')
+
+    return handler
+
+
+class TestWsgiAdapter(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._app = WsgiAdapter(_build_handler())
+
+    def _call(self, method: str, path: str, body: bytes = b''):
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': '',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+        }
+        captured = {}
+
+        def start_response(status, headers):
+            captured['status'] = status
+            captured['headers'] = dict(headers)
+
+        result = b''.join(self._app(environ, start_response))
+        return captured['status'], captured['headers'], result
+
+    def test_request_is_routed(self):
+        status, headers, body = self._call('POST', '/items', b'{"name": "test"}')
+
+        self.assertEqual(status, '201 Created')
+        self.assertEqual(headers['content-type'], 'application/json')
+        self.assertEqual(headers['content-length'], str(len(body)))
+        self.assertEqual(json.loads(body), {'received': {'name': 'test'}})
+
+    def test_unknown_path(self):
+        status, _, _ = self._call('POST', '/unknown')
+        self.assertEqual(status, '404 Not Found')
+
+    def test_handler_exception(self):
+        status, _, body = self._call('GET', '/fail')
+        self.assertEqual(status, '500 Internal Server Error')
+        self.assertEqual(json.loads(body)['error']['message'], 'Internal server error')
+
+
+class TestAsgiAdapter(unittest.TestCase):
+
+    def test_request_is_routed(self):
+        app = AsgiAdapter(_build_handler())
+
+        scope = {
+            'type': 'http',
+            'method': 'POST',
+            'path': '/items',
+            'query_string': b'',
+            'http_version': '1.1',
+            'headers': [],
+        }
+        messages = [
+            {'type': 'http.request', 'body': b'{"name":', 'more_body': True},
+            {'type': 'http.request', 'body': b' "test"}', 'more_body': False},
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(app(scope, receive, send))
+
+        self.assertEqual(sent[0]['status'], 201)
+        self.assertIn((b'content-type', b'application/json'), sent[0]['headers'])
+        self.assertEqual(json.loads(sent[1]['body']), {'received': {'name': 'test'}})
+
+    def test_repeated_headers_are_joined(self):
+        request = AsgiRequest({'headers': [
+            (b'x-forwarded-for', b'192.0.2.1'),
+            (b'accept', b'application/json'),
+            (b'x-forwarded-for', b'198.51.100.1'),
+        ]}, b'')
+
+        self.assertEqual(request.headers['x-forwarded-for'], '192.0.2.1,198.51.100.1')
+        self.assertEqual(request.headers['accept'], 'application/json')
+        self.assertEqual(request.get_headers().getall('x-forwarded-for'),
+                         ['192.0.2.1', '198.51.100.1'])
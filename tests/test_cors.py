@@ -0,0 +1,143 @@
+import re
+import unittest
+
+from pyrazine.cors import CorsPolicy
+from pyrazine.handlers import LambdaHandler
+from pyrazine.response import DEFAULT_CORS_HEADERS, HttpResponse
+from tests import make_http_event
+
+
+def _make_event(method: str, path: str, origin: str = None):
+    return make_http_event(method, path, headers={'origin': origin} if origin else None)
+
+
+class TestCorsPolicy(unittest.TestCase):
+
+    def test_origins(self):
+
+        policy = CorsPolicy(origins=['https://app.example.com', 'https://*.example.org',
+                                     re.compile(r'http://localhost:\d+')])
+
+        headers = policy.get_headers('https://app.example.com')
+        self.assertEqual(headers['access-control-allow-origin'], 'https://app.example.com')
+        self.assertEqual(headers['vary'], 'origin')
+        # Headers are built once per origin.
+        self.assertIs(policy.get_headers('https://app.example.com'), headers)
+
+        self.assertIsNotNone(policy.get_headers('https://preview.example.org'))
+        self.assertIsNotNone(policy.get_headers('http://localhost:3000'))
+        self.assertIsNone(policy.get_headers('https://example.org'))
+        self.assertIsNone(policy.get_headers('https://evil.com/.example.org'))
+        self.assertIsNone(policy.get_headers('http://localhost:3000.evil.com'))
+        self.assertIsNone(policy.get_headers(None))
+
+    def test_any_origin(self):
+
+        headers = CorsPolicy().get_headers(None)
+        self.assertEqual(headers, {'access-control-allow-origin': '*'})
+
+        # Credentials cannot be allowed for any origin, as browsers do not
+        # send them to '*', and echoing the origin would allow any site.
+        with self.assertRaises(ValueError):
+            CorsPolicy(allow_credentials=True)
+        with self.assertRaises(ValueError):
+            CorsPolicy(origins=['https://app.example.com', '*'], allow_credentials=True)
+
+        policy = CorsPolicy(origins=['https://*.example.com'], allow_credentials=True,
+                            expose_headers=['x-request-id'])
+        self.assertIsNone(policy.get_headers('https://evil.com'))
+        self.assertEqual(policy.get_headers('https://app.example.com'), {
+            'access-control-allow-origin': 'https://app.example.com',
+            'access-control-allow-credentials': 'true',
+            'access-control-expose-headers': 'x-request-id',
+            'vary': 'origin',
+        })
+
+    def test_preflight_headers(self):
+
+        policy = CorsPolicy(origins=['https://app.example.com'], allow_headers=['content-type'],
+                            max_age=3600)
+        headers = policy.get_preflight_headers('https://app.example.com', 'GET,OPTIONS')
+        self.assertEqual(headers['access-control-allow-methods'], 'GET,OPTIONS')
+        self.assertEqual(headers['access-control-allow-headers'], 'content-type')
+        self.assertEqual(headers['access-control-max-age'], '3600')
+        self.assertIsNone(policy.get_preflight_headers('https://other.com', 'GET'))
+
+
+class TestHandlerCors(unittest.TestCase):
+
+    ORIGIN = 'https://app.example.com'
+
+    def setUp(self) -> None:
+
+        self.calls = []
+        self.handler = LambdaHandler(trace=False, cors=CorsPolicy(origins=[self.ORIGIN],
+                                                                  max_age=3600))
+
+        @self.handler.route(path='/items/{item_id}', methods=['GET', 'DELETE'])
+        def get_item(item_id: str):
+            self.calls.append(item_id)
+            return HttpResponse(200, body={'id': item_id})
+
+        @self.handler.route(path='/public', cors=CorsPolicy())
+        def get_public():
+            return HttpResponse(200, body={})
+
+    def test_preflight_is_answered_from_the_route_table(self):
+
+        response = self.handler.handle_request(
+            _make_event('OPTIONS', '/items/1', origin=self.ORIGIN), None)
+        self.assertEqual(response['statusCode'], 204)
+        self.assertEqual(response['body'], '')
+        headers = response['headers']
+        self.assertEqual(headers['access-control-allow-origin'], self.ORIGIN)
+        self.assertEqual(headers['access-control-allow-methods'], 'GET,DELETE,OPTIONS')
+        self.assertEqual(headers['access-control-max-age'], '3600')
+        self.assertEqual(self.calls, [])
+
+        response = self.handler.handle_request(
+            _make_event('OPTIONS', '/items/1', origin='https://evil.com'), None)
+        self.assertEqual(response['statusCode'], 403)
+        self.assertNotIn('access-control-allow-origin', response['headers'])
+
+        response = self.handler.handle_request(
+            _make_event('OPTIONS', '/missing', origin=self.ORIGIN), None)
+        self.assertEqual(response['statusCode'], 404)
+
+    def test_responses_follow_the_policy_of_the_route(self):
+
+        response = self.handler.handle_request(
+            _make_event('GET', '/items/1', origin=self.ORIGIN), None)
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(response['headers']['access-control-allow-origin'], self.ORIGIN)
+        self.assertNotIn('access-control-allow-methods', response['headers'])
+
+        response = self.handler.handle_request(
+            _make_event('GET', '/items/1', origin='https://evil.com'), None)
+        self.assertNotIn('access-control-allow-origin', response['headers'])
+
+        response = self.handler.handle_request(
+            _make_event('GET', '/public', origin='https://evil.com'), None)
+        self.assertEqual(response['headers']['access-control-allow-origin'], '*')
+
+        # Errors for unknown routes follow the policy of the handler.
+        response = self.handler.handle_request(
+            _make_event('GET', '/missing', origin=self.ORIGIN), None)
+        self.assertEqual(response['statusCode'], 404)
+        self.assertEqual(response['headers']['access-control-allow-origin'], self.ORIGIN)
+
+    def test_default_headers_without_a_policy(self):
+
+        handler = LambdaHandler(trace=False)
+        handler.route(lambda: HttpResponse(200), path='/items')
+
+        response = handler.handle_request(_make_event('OPTIONS', '/items'), None)
+        self.assertEqual(response['statusCode'], 200)
+
+        response = handler.handle_request(_make_event('GET', '/items'), None)
+        for key, value in DEFAULT_CORS_HEADERS.items():
+            self.assertEqual(response['headers'][key], value)
+
+
+if __name__ == '__main__':
+    unittest.main()
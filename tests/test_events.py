@@ -0,0 +1,221 @@
+import base64
+import copy
+import json
+import unittest
+from unittest.mock import patch
+
+from pyrazine import events
+from pyrazine.events import (
+    AlbEvent,
+    FunctionUrlEvent,
+    HttpEvent,
+    RequestBody,
+    RestApiEvent,
+    detect_event_class
+)
+from pyrazine.handlers import LambdaHandler
+from pyrazine.response import HttpResponse
+from tests import test_handlers
+
+
+HTTP_API_EVENT = test_handlers.TestLambdaHandler.TEST_HTTP_EVENT
+
+FUNCTION_URL_EVENT = dict(HTTP_API_EVENT, rawPath='/items', requestContext=dict(
+    HTTP_API_EVENT['requestContext'],
+    domainName='abcdefg.lambda-url.us-east-1.on.aws',
+    http=dict(HTTP_API_EVENT['requestContext']['http'], path='/items')))
+
+REST_API_EVENT = {
+    'resource': '/{proxy+}',
+    'path': '/items',
+    'httpMethod': 'POST',
+    'headers': {'content-type': 'application/json'},
+    'multiValueHeaders': {'content-type': ['application/json']},
+    'queryStringParameters': {'tag': 'b'},
+    'multiValueQueryStringParameters': {'tag': ['a', 'b']},
+    'pathParameters': None,
+    'requestContext': {
+        'accountId': '123456789012',
+        'apiId': 'id',
+        'authorizer': {
+            'claims': {
+                'iss': 'https://cognito-idp.us-east-1.amazonaws.com/us-east-1_D4KLyfcX7',
+                'sub': '3a73340c-1826-4d33-b2e4-bd8c3437b5fe',
+            },
+        },
+        'httpMethod': 'POST',
+        'identity': {'sourceIp': '192.0.2.1', 'userAgent': 'test-agent'},
+        'protocol': 'HTTP/1.1',
+        'requestId': 'c6af9ac6-7b61-11e6-9a41-93e8deadbeef',
+        'stage': 'prod',
+    },
+    'body': '{"name": "test"}',
+    'isBase64Encoded': False,
+}
+
+ALB_EVENT = {
+    'requestContext': {
+        'elb': {
+            'targetGroupArn': 'arn:aws:elasticloadbalancing:us-east-1:123456789012:'
+                              'targetgroup/lambda/0123456789abcdef',
+        },
+    },
+    'httpMethod': 'POST',
+    'path': '/items',
+    'multiValueQueryStringParameters': {'tag': ['a', 'b%20c']},
+    'multiValueHeaders': {
+        'content-type': ['application/json'],
+        'x-forwarded-for': ['10.0.0.1, 192.0.2.1'],
+        'accept': ['text/html', 'application/json'],
+    },
+    'body': '{"name": "test"}',
+    'isBase64Encoded': False,
+}
+
+
+class TestEventDetection(unittest.TestCase):
+
+    def test_formats_are_detected(self):
+        self.assertIs(detect_event_class(HTTP_API_EVENT), HttpEvent)
+        self.assertIs(detect_event_class(FUNCTION_URL_EVENT), FunctionUrlEvent)
+        self.assertIs(detect_event_class(REST_API_EVENT), RestApiEvent)
+        self.assertIs(detect_event_class(ALB_EVENT), AlbEvent)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            detect_event_class({'source': 'aws.events'})
+
+
+class TestHttpEvent(unittest.TestCase):
+
+    def test_lazy_views(self):
+        event = HttpEvent(dict(
+            HTTP_API_EVENT,
+            rawQueryString='tag=a&tag=b%20c&empty=',
+            cookies=['session=abc', 'theme=dark']))
+
+        self.assertIsNone(event._header_map)
+        self.assertEqual(event.get_headers()['Accept-Encoding'], 'gzip, deflate, br')
+        self.assertIs(event.get_headers(), event.get_headers())
+
+        self.assertEqual(event.get_query_params().getall('tag'), ['a', 'b c'])
+        self.assertEqual(event.get_query_params()['empty'], '')
+        self.assertEqual(event.get_cookies()['theme'], 'dark')
+
+
+class TestRequestBody(unittest.TestCase):
+
+    def test_base64_body_is_decoded_once(self):
+        body = RequestBody(base64.b64encode(b'{"a": 1}').decode('ascii'), True)
+
+        self.assertEqual(body.json(), {'a': 1})
+        self.assertIs(body.as_bytes(), body.as_bytes())
+        self.assertEqual(body.as_memoryview()[:4].tobytes(), b'{"a"')
+
+    def test_text_body_is_not_copied(self):
+        raw = '{"a": 1}'
+        body = RequestBody(raw)
+
+        self.assertIs(body.as_text(), raw)
+        self.assertEqual(body.json(), {'a': 1})
+
+    def test_base64_json_request(self):
+        handler = LambdaHandler(trace=False)
+
+        @handler.route(path='/', methods=('POST',))
+        def echo(token, body):
+            return HttpResponse(200, body)
+
+        event = copy.deepcopy(HTTP_API_EVENT)
+        event['requestContext']['http']['method'] = 'POST'
+        event['body'] = base64.b64encode(b'{"a": 1}').decode('ascii')
+        response = handler.handle_request(event, None)
+        self.assertEqual(json.loads(response['body']), {'a': 1})
+
+        event['body'] = '{"a": 1}'
+        response = handler.handle_request(event, None)
+        self.assertEqual(response['statusCode'], 400)
+
+
+class TestRestApiEvent(unittest.TestCase):
+
+    def test_fields(self):
+        event = RestApiEvent(REST_API_EVENT)
+
+        self.assertEqual(event.get_http_method(), 'POST')
+        self.assertEqual(event.get_path(), '/items')
+        self.assertEqual(event.get_http_source_ip(), '192.0.2.1')
+        self.assertEqual(event.get_http_user_agent(), 'test-agent')
+        self.assertEqual(event.raw_query_string, 'tag=a&tag=b')
+        self.assertEqual(event.jwt.sub, '3a73340c-1826-4d33-b2e4-bd8c3437b5fe')
+        self.assertEqual(event.get_query_params().getall('tag'), ['a', 'b'])
+        self.assertEqual(event.get_headers()['Content-Type'], 'application/json')
+
+
+class TestAlbEvent(unittest.TestCase):
+
+    def test_multi_value_headers(self):
+        event = AlbEvent(ALB_EVENT)
+
+        self.assertEqual(event.headers['accept'], 'application/json')
+        self.assertEqual(event.get_http_source_ip(), '192.0.2.1')
+        self.assertEqual(event.raw_query_string, 'tag=a&tag=b%20c')
+        self.assertEqual(event.get_query_params().getall('tag'), ['a', 'b c'])
+        self.assertEqual(event.get_headers().getall('Accept'), ['text/html', 'application/json'])
+
+        response = event.format_response({'statusCode': 200, 'headers': {'a': 'b'}})
+        self.assertEqual(response['statusDescription'], '200 OK')
+        self.assertEqual(response['multiValueHeaders'], {'a': ['b']})
+        self.assertNotIn('headers', response)
+
+    def test_single_value_headers(self):
+        alb_event = dict(ALB_EVENT, headers={'accept': 'application/json'})
+        del alb_event['multiValueHeaders']
+        event = AlbEvent(alb_event)
+
+        self.assertEqual(event.headers['accept'], 'application/json')
+        self.assertIsNone(event.get_http_source_ip())
+
+        response = event.format_response({'statusCode': 404, 'headers': {'a': 'b'}})
+        self.assertEqual(response['statusDescription'], '404 Not Found')
+        self.assertEqual(response['headers'], {'a': 'b'})
+
+    def test_forged_forwarded_for(self):
+        # The load balancer appends the address of the peer to the addresses
+        # sent by the client.
+        headers = dict(ALB_EVENT['multiValueHeaders'],
+                       **{'x-forwarded-for': ['203.0.113.9', '198.51.100.1, 192.0.2.7']})
+        event = AlbEvent(dict(ALB_EVENT, multiValueHeaders=headers))
+        self.assertEqual(event.get_http_source_ip(), '192.0.2.7')
+
+        alb_event = dict(ALB_EVENT, headers={'x-forwarded-for': '203.0.113.9, 192.0.2.7'})
+        del alb_event['multiValueHeaders']
+        self.assertEqual(AlbEvent(alb_event).get_http_source_ip(), '192.0.2.7')
+
+
+class TestEventFormatCaching(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._handler = LambdaHandler(trace=False)
+
+        @self._handler.route(path='/items', methods=('POST',))
+        def create_item(token, body):
+            return HttpResponse(201, body=body)
+
+    def test_format_is_detected_once(self):
+        with patch.object(events, 'detect_event_class',
+                          wraps=events.detect_event_class) as detect, \
+                patch('pyrazine.handlers.detect_event_class', detect):
+            for _ in range(3):
+                response = self._handler.handle_request(copy.deepcopy(ALB_EVENT), None)
+                self.assertEqual(response['statusCode'], 201)
+                self.assertEqual(json.loads(response['body']), {'name': 'test'})
+
+        self.assertEqual(detect.call_count, 1)
+
+    def test_format_is_detected_again_on_mismatch(self):
+        self._handler.handle_request(ALB_EVENT, None)
+        response = self._handler.handle_request(REST_API_EVENT, None)
+
+        self.assertEqual(response['statusCode'], 201)
+        self.assertNotIn('statusDescription', response)
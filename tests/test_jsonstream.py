@@ -0,0 +1,133 @@
+import base64
+import io
+import json
+import unittest
+
+from pyrazine.events import RequestBody
+from pyrazine.handlers import LambdaHandler
+from pyrazine.jsonstream import JsonStreamError, iter_json_array
+from pyrazine.response import HttpResponse
+from tests import make_http_event
+
+
+RECORDS = [
+    {'id': 1, 'name': 'café', 'tags': ['a', 'b'], 'price': 12.5},
+    {'id': 22, 'name': 'pen', 'tags': [], 'price': None},
+    [1, 2, {'nested': True}],
+    'text with , and ] inside',
+    123456789,
+    -0.25e3,
+    True,
+]
+
+
+class TestIterJsonArray(unittest.TestCase):
+
+    def _parse(self, document: str, chunk_size: int, **kwargs):
+        return list(iter_json_array(io.StringIO(document).read, chunk_size=chunk_size, **kwargs))
+
+    def test_chunk_boundaries(self):
+        document = json.dumps(RECORDS, indent=2)
+        for chunk_size in (1, 2, 3, 7, 64, len(document)):
+            self.assertEqual(self._parse(document, chunk_size), RECORDS, chunk_size)
+
+    def test_empty_array(self):
+        self.assertEqual(self._parse(' [ ] ', 1), [])
+
+    def test_key(self):
+        document = json.dumps({'meta': {'skip': [1, 2]}, 'records': RECORDS, 'after': 1})
+        self.assertEqual(self._parse(document, 5, key='records'), RECORDS)
+
+        with self.assertRaises(JsonStreamError):
+            self._parse(json.dumps({'other': []}), 5, key='records')
+
+    def test_malformed(self):
+        for document in ('{}', '[1, 2', '[1 2]', '[1, }', '[{"a": }]', ''):
+            with self.assertRaises(JsonStreamError, msg=document):
+                self._parse(document, 3)
+
+    def test_items_before_error_are_yielded(self):
+        items = iter_json_array(io.StringIO('[1, 2, x]').read, chunk_size=2)
+        self.assertEqual(next(items), 1)
+        self.assertEqual(next(items), 2)
+        self.assertRaises(JsonStreamError, next, items)
+
+
+class TestRequestBody(unittest.TestCase):
+
+    def test_size(self):
+        text = json.dumps(RECORDS, ensure_ascii=False)
+        encoded = text.encode('utf-8')
+
+        self.assertEqual(RequestBody(text).size, len(encoded))
+        self.assertEqual(RequestBody(encoded).size, len(encoded))
+        for length in range(len(encoded) - 3, len(encoded) + 1):
+            raw = base64.b64encode(encoded[:length]).decode('ascii')
+            self.assertEqual(RequestBody(raw, is_base64_encoded=True).size, length)
+        self.assertEqual(RequestBody(None).size, 0)
+
+    def test_iter_json_array(self):
+        text = json.dumps(RECORDS, ensure_ascii=False)
+        raw = base64.b64encode(text.encode('utf-8')).decode('ascii')
+
+        # Chunks split multi-byte characters and base64 quanta.
+        for chunk_size in (1, 5, 1024):
+            body = RequestBody(raw, is_base64_encoded=True)
+            self.assertEqual(list(body.iter_json_array(chunk_size=chunk_size)), RECORDS)
+            self.assertEqual(list(RequestBody(text).iter_json_array(chunk_size=chunk_size)),
+                             RECORDS)
+
+
+class TestRouteBodyLimits(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._handler = LambdaHandler(trace=False, max_body_size=64)
+        self._items = []
+
+        @self._handler.route(path='/', methods=['POST'])
+        def create(token, body):
+            return HttpResponse(201)
+
+        @self._handler.route(path='/bulk', methods=['POST'], max_body_size=1024,
+                             stream='records', schema={'type': 'object', 'required': ['id']})
+        def create_bulk(body):
+            count = 0
+            for item in body:
+                self._items.append(item)
+                count += 1
+            return HttpResponse(201, {'count': count})
+
+    def _post(self, path: str, body: str):
+        response = self._handler.handle_request(make_http_event('POST', path, body=body), None)
+        return response['statusCode'], json.loads(response['body']) if response['body'] else None
+
+    def test_handler_limit(self):
+        self.assertEqual(self._post('/', json.dumps({'a': 'b'}))[0], 201)
+
+        status, body = self._post('/', json.dumps({'a': 'b' * 64}))
+        self.assertEqual(status, 413)
+        self.assertEqual(body['error']['message'], 'Request body too large')
+
+    def test_route_limit_overrides_handler(self):
+        records = [{'id': i} for i in range(10)]
+        status, body = self._post('/bulk', json.dumps({'records': records}))
+        self.assertEqual(status, 201)
+        self.assertEqual(body, {'count': 10})
+        self.assertEqual(self._items, records)
+
+        records = [{'id': i} for i in range(200)]
+        self.assertEqual(self._post('/bulk', json.dumps({'records': records}))[0], 413)
+
+    def test_streaming_errors(self):
+        status, body = self._post('/bulk', '{"records": [{"id": 1}, {"id": 2},')
+        self.assertEqual(status, 400)
+        self.assertIn('Malformed JSON input', body['error']['message'])
+
+        status, body = self._post('/bulk', '{"records": [{"id": 1}, {"name": "x"}]}')
+        self.assertEqual(status, 400)
+        self.assertIn('Invalid request body', body['error']['message'])
+        self.assertEqual(self._items, [{'id': 1}, {'id': 2}, {'id': 1}])
+
+
+if __name__ == '__main__':
+    unittest.main()
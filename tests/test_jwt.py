@@ -2,7 +2,15 @@ import json
 import unittest
 from typing import Dict
 
-from pyrazine.jwt import JwtToken, CognitoJwtToken
+from pyrazine.jwt import (
+    Auth0JwtToken,
+    CognitoJwtToken,
+    JwtToken,
+    JwtTokenJsonEncoder,
+    JwtTokenParser,
+    TokenRegistry,
+    parse_numeric_date
+)
 
 COGNITO_ACCESS_TOKEN_FILE = 'tests/cognito_access_token.json'
 COGNITO_ID_TOKEN_FILE = 'tests/cognito_id_token.json'
@@ -204,8 +212,90 @@ class TestJwtTokenParser(unittest.TestCase):
             }
         }
 
+    def test_default_registry(self):
+        self.assertIsInstance(JwtTokenParser.parse_object(_load_id_token()), CognitoJwtToken)
+
+        token = JwtTokenParser.parse_object({'iss': 'https://example.com/', 'sub': 'a'})
+        self.assertIs(type(token), JwtToken)
+
+        with self.assertRaises(ValueError):
+            JwtTokenParser.parse_object({'sub': 'a'})
+
+    def test_registry_exact_and_prefix(self):
+        registry = TokenRegistry()
+        registry.register(Auth0JwtToken, prefix='https://tenant.auth0.com/')
+        okta_class = registry.register(
+            issuer='https://example.okta.com/oauth2/default',
+            claims=(('cid', 'cid', str, None),))
+
+        token = JwtTokenParser.parse_object(
+            {'iss': 'https://tenant.auth0.com/', 'permissions': ['read', 'write']}, registry)
+        self.assertIsInstance(token, Auth0JwtToken)
+        self.assertEqual(token.permissions, ['read', 'write'])
+
+        token = JwtTokenParser.parse_object(
+            {'iss': 'https://example.okta.com/oauth2/default', 'cid': 'client'}, registry)
+        self.assertIsInstance(token, okta_class)
+        self.assertEqual(token.cid, 'client')
+        self.assertEqual(token.as_dict()['cid'], 'client')
+
+        self.assertIs(registry.resolve('https://tenant.auth0.com/other'), Auth0JwtToken)
+        self.assertIs(registry.resolve('https://tenant.auth0.co'), JwtToken)
+
+    def test_longest_prefix_wins(self):
+        registry = TokenRegistry()
+        registry.register(JwtToken, prefix='https://')
+        registry.register(CognitoJwtToken, prefix='https://cognito-idp.')
+
+        self.assertIs(registry.resolve('https://cognito-idp.us-east-1.amazonaws.com/pool'),
+                      CognitoJwtToken)
+        self.assertIs(registry.resolve('https://example.com/'), JwtToken)
+
 
 class TestJwtTokenJsonEncoder(unittest.TestCase):
 
     def setUp(self) -> None:
-        pass
+        self._id_token = _load_id_token()
+
+    def test_token_is_encoded(self):
+        token = CognitoJwtToken(token_object=self._id_token)
+        encoded = json.loads(json.dumps({'token': token}, cls=JwtTokenJsonEncoder))
+
+        self.assertEqual(encoded['token'], token.as_dict())
+        self.assertEqual(json.loads(token.as_json()), token.as_dict())
+
+
+class TestJwtTokenClaimModel(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._id_token = _load_id_token()
+
+    def test_claims_are_decoded_once(self):
+        token = CognitoJwtToken(token_object=self._id_token)
+
+        # Claims are decoded when the token is built, and not read again afterwards.
+        self._id_token['sub'] = 'changed'
+        self.assertEqual(token.sub, '3a73340c-1826-4d33-b2e4-bd8c3437b5fe')
+
+        self.assertIs(token.as_dict(), token.as_dict())
+        self.assertIs(token.as_json(), token.as_json())
+
+    def test_claim_conversion(self):
+        token = CognitoJwtToken(token_object=dict(self._id_token, email_verified='false',
+                                                  exp='Wed Dec 23 00:49:54 UTC 2020'))
+
+        self.assertFalse(token.email_verified)
+        self.assertEqual(token.exp, 'Wed Dec 23 00:49:54 UTC 2020')
+
+    def test_parse_numeric_date(self):
+        self.assertEqual(parse_numeric_date(1608684594), 1608684594.0)
+        self.assertEqual(parse_numeric_date('1608684594'), 1608684594.0)
+        self.assertEqual(parse_numeric_date('Wed Dec 23 00:49:54 UTC 2020'), 1608684594.0)
+        for value in (None, True, 'tomorrow', {}):
+            self.assertIsNone(parse_numeric_date(value))
+
+    def test_unknown_attribute(self):
+        token = JwtToken(token_object=self._id_token)
+
+        with self.assertRaises(AttributeError):
+            token.email
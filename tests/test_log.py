@@ -0,0 +1,139 @@
+import io
+import json
+import logging
+import unittest
+from unittest import mock
+
+from pyrazine.handlers import LambdaHandler
+from pyrazine.log import StructuredLogger, get_default_level
+from pyrazine.response import HttpResponse
+from tests import make_http_event
+
+
+class _Counted(object):
+
+    def __init__(self):
+        self.count = 0
+
+    def __str__(self):
+        self.count += 1
+        return 'counted'
+
+
+class _CountingStream(io.StringIO):
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+    def entries(self):
+        return [json.loads(line) for line in self.getvalue().splitlines()]
+
+
+class TestStructuredLogger(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._stream = _CountingStream()
+        self._log = StructuredLogger(level='INFO', stream=self._stream)
+
+    def test_disabled_records_are_not_formatted(self):
+        argument = _Counted()
+        self._log.debug('Value %s', argument)
+        self.assertEqual(argument.count, 0)
+
+        self._log.info('Value %s', argument, item_id=3)
+        self.assertEqual(argument.count, 1)
+        entry, = self._stream.entries()
+        self.assertEqual((entry['level'], entry['message'], entry['item_id']),
+                         ('INFO', 'Value counted', 3))
+
+    def test_invocation_records_are_written_at_once(self):
+        self._log.begin_invocation(request_id='request-1')
+        self._log.info('First')
+        self._log.set_fields(route='/items')
+        self._log.warning('Second')
+        self.assertEqual(self._stream.writes, 0)
+
+        self._log.end_invocation()
+        self.assertEqual(self._stream.writes, 1)
+
+        first, second = self._stream.entries()
+        self.assertEqual((first['request_id'], first['cold_start']), ('request-1', True))
+        self.assertNotIn('route', first)
+        self.assertEqual(second['route'], '/items')
+
+        self._log.begin_invocation(request_id='request-2')
+        self._log.info('Third')
+        self._log.end_invocation()
+        self.assertFalse(self._stream.entries()[-1]['cold_start'])
+
+    def test_errors_flush_the_buffer(self):
+        self._log.begin_invocation(request_id='request-1')
+        self._log.info('Before')
+        try:
+            raise ValueError('Failed')
+        except ValueError:
+            self._log.exception('Handler failed')
+
+        before, error = self._stream.entries()
+        self.assertEqual(before['message'], 'Before')
+        self.assertIn('ValueError: Failed', error['exception'])
+        self._log.end_invocation()
+
+    def test_debug_sampling(self):
+        log = StructuredLogger(level=logging.INFO, debug_sample_rate=0.1, stream=self._stream)
+
+        for sample, expected in ((0.05, True), (0.5, False)):
+            with mock.patch('random.random', return_value=sample):
+                log.begin_invocation(request_id='request')
+            self.assertEqual(log.is_enabled_for(logging.DEBUG), expected)
+            log.end_invocation()
+
+        self.assertFalse(log.is_enabled_for(logging.DEBUG))
+
+    def test_lambda_level_names(self):
+
+        with mock.patch.dict('os.environ', {'AWS_LAMBDA_LOG_LEVEL': 'TRACE'}, clear=True):
+            log = StructuredLogger(stream=self._stream)
+        self.assertEqual(log.level, logging.DEBUG)
+        log.begin_invocation(request_id='request')
+        log.debug('Tracing %s', 'value')
+        log.end_invocation()
+        self.assertEqual(self._stream.entries()[-1]['message'], 'Tracing value')
+
+        self.assertEqual(StructuredLogger(level='warn').level, logging.WARNING)
+        self.assertEqual(StructuredLogger(level='FATAL').level, logging.CRITICAL)
+        with self.assertRaises(ValueError):
+            StructuredLogger(level='VERBOSE')
+
+        with mock.patch.dict('os.environ', {'LOG_LEVEL': 'VERBOSE'}, clear=True):
+            self.assertEqual(get_default_level(), logging.INFO)
+
+
+class TestHandlerLogging(unittest.TestCase):
+
+    def test_request_fields(self):
+        stream = _CountingStream()
+        handler = LambdaHandler(trace=False, logger=StructuredLogger(level='DEBUG', stream=stream))
+
+        @handler.route(path='/items/{item_id}', methods=['GET'])
+        def get_item(item_id: str):
+            handler.logger.info('Fetching item %s', item_id)
+            return HttpResponse(200)
+
+        event = make_http_event(path='/items/42')
+        self.assertEqual(handler.handle_request(event, None)['statusCode'], 200)
+
+        self.assertEqual(stream.writes, 1)
+        entry = stream.entries()[-1]
+        self.assertEqual(entry['message'], 'Fetching item 42')
+        self.assertEqual((entry['method'], entry['route']), ('GET', '/items/{item_id}'))
+        self.assertEqual(entry['request_id'], event['requestContext']['requestId'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import io
+import json
+import unittest
+
+from pyrazine.cache import MISSING, MemoryCache, TieredCache
+from pyrazine.handlers import LambdaHandler
+from pyrazine.memory import MemoryGovernor, read_rss_bytes
+from pyrazine.response import HttpResponse
+from pyrazine.typing import LambdaContext
+from tests import make_http_event
+
+
+MB = 1024 * 1024
+
+
+def _make_context(memory_limit_in_mb: int = 128) -> LambdaContext:
+    return LambdaContext('function', '$LATEST', 'arn', memory_limit_in_mb, 'request-id',
+                         'group', 'stream', None, None)
+
+
+def _fill(cache: MemoryCache, count: int, size: int = 100) -> None:
+    for index in range(count):
+        cache.set(str(index), index, None, size)
+
+
+class TestMemoryGovernor(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._rss = 0
+        self._stream = io.StringIO()
+        self._governor = MemoryGovernor(sample_interval=0, stream=self._stream,
+                                        rss_reader=lambda: self._rss)
+
+    def _metrics(self):
+        return [json.loads(line) for line in self._stream.getvalue().splitlines()]
+
+    def test_read_rss_bytes(self):
+        self.assertGreater(read_rss_bytes(), MB)
+
+    def test_caches_are_trimmed_in_order_of_priority(self):
+
+        trimmed = []
+
+        def trim_large_cache(fraction: float) -> int:
+            trimmed.append(fraction)
+            return 20 * MB
+
+        small, high = MemoryCache(10000), MemoryCache(10000)
+        _fill(small, 10)
+        _fill(high, 10)
+        self._governor.register(high, priority=10, name='high')
+        self._governor.register(trim_large_cache, priority=5)
+        self._governor.register(small, priority=0, name='small')
+
+        # Under the soft limit, nothing is trimmed, and headroom is reported.
+        self._rss = 64 * MB
+        self.assertEqual(self._governor.sample(_make_context()), 0)
+        self.assertEqual((len(small), len(high)), (10, 10))
+
+        # Caches are trimmed until enough is freed.
+        self._rss = 108 * MB
+        freed = self._governor.sample(_make_context(), now=0)
+        self.assertEqual(freed, 500 + 20 * MB)
+        self.assertEqual((len(small), trimmed, len(high)), (5, [0.5], 10))
+        # The least recently used entries go first.
+        self.assertIs(small.get('0', 0), MISSING)
+        self.assertEqual(small.get('9', 0), 9)
+
+        metrics = self._metrics()
+        self.assertEqual(len(metrics), 2)
+        self.assertEqual(metrics[0]['MemoryHeadroom'], 64 * MB)
+        self.assertEqual(metrics[1]['CacheEvictedBytes'], 500 + 20 * MB)
+        self.assertEqual(metrics[1]['_aws']['CloudWatchMetrics'][0]['Dimensions'], [['service']])
+
+    def test_everything_is_trimmed_over_the_hard_limit(self):
+
+        memory, tiered = MemoryCache(10000), TieredCache(memory_bytes=10000, disk=False)
+        _fill(memory, 10)
+        tiered.set('key', 'value')
+        self._governor.register(memory)
+        self._governor.register(tiered)
+        self.assertEqual(self._governor.stats()['caches'], ['MemoryCache', 'default'])
+
+        self._rss = 120 * MB
+        self._governor.sample(_make_context())
+        self.assertEqual((len(memory), len(tiered.memory)), (0, 0))
+        self.assertEqual(self._governor.stats()['trims'], 1)
+
+    def test_check_samples_at_most_once_per_interval(self):
+
+        samples = []
+        governor = MemoryGovernor(sample_interval=60, metrics=False,
+                                  rss_reader=lambda: samples.append(1) or MB)
+        for _ in range(3):
+            governor.check(_make_context())
+        self.assertEqual(len(samples), 1)
+        self.assertEqual(governor.stats()['headroom_bytes'], 127 * MB)
+
+    def test_unknown_limit(self):
+        self.assertIsNone(self._governor.sample(None))
+
+    def test_handler_checks_memory(self):
+
+        cache = MemoryCache(10000)
+        _fill(cache, 10)
+        self._governor.register(cache)
+        self._rss = 120 * MB
+
+        handler = LambdaHandler(trace=False, memory_governor=self._governor)
+        handler.route(lambda: HttpResponse(200), path='/items')
+
+        response = handler.handle_request(make_http_event(path='/items'), _make_context())
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+import decimal
+import json
+import time
+import unittest
+import urllib.parse
+from unittest import mock
+
+from pyrazine.handlers import LambdaHandler
+from pyrazine.pagination import CursorCodec, InvalidCursorError, Page, Paginator
+from tests import make_http_event
+
+
+def _next_query(page: dict) -> str:
+    return urllib.parse.urlsplit(page['next']).query
+
+
+class TestCursorCodec(unittest.TestCase):
+
+    def test_round_trip(self):
+
+        codec = CursorCodec('secret')
+        cursor = codec.encode({'pk': 'order#1', 'sk': 42}, '/orders')
+        self.assertEqual(codec.decode(cursor, '/orders'), {'pk': 'order#1', 'sk': 42})
+        # Cursors can be put in query strings as they are.
+        self.assertEqual(urllib.parse.quote(cursor), cursor)
+
+    def test_decimal_positions(self):
+
+        # boto3 returns DynamoDB numbers as Decimal, and expects them back.
+        codec = CursorCodec('secret')
+        position = {'pk': 'order#1', 'sk': decimal.Decimal('42'), 'score': decimal.Decimal('1.5')}
+        decoded = codec.decode(codec.encode(position))
+        self.assertEqual(decoded, position)
+        self.assertIsInstance(decoded['score'], decimal.Decimal)
+
+    def test_rejected_cursors(self):
+
+        codec = CursorCodec('secret')
+        cursor = codec.encode(10, '/orders')
+
+        with self.assertRaises(InvalidCursorError):
+            codec.decode(cursor, '/users')
+        with self.assertRaises(InvalidCursorError):
+            CursorCodec('other secret').decode(cursor, '/orders')
+        with self.assertRaises(InvalidCursorError):
+            codec.decode(cursor[:-2] + ('AA' if cursor[-2:] != 'AA' else 'BB'), '/orders')
+        with self.assertRaises(InvalidCursorError):
+            codec.decode('not a cursor!', '/orders')
+
+        expiring = CursorCodec('secret', max_age=60)
+        cursor = expiring.encode(10)
+        with mock.patch('time.time', return_value=time.time() + 120):
+            with self.assertRaises(InvalidCursorError):
+                expiring.decode(cursor)
+
+    def test_secret_from_the_environment(self):
+
+        with mock.patch.dict('os.environ', {'PYRAZINE_CURSOR_SECRET': 'secret'}):
+            cursor = CursorCodec().encode(1)
+        self.assertEqual(CursorCodec('secret').decode(cursor), 1)
+
+        with mock.patch.dict('os.environ', clear=True):
+            with self.assertRaises(ValueError):
+                CursorCodec()
+
+
+class TestPaginator(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.paginator = Paginator('secret', default_limit=3, max_limit=5)
+        self.handler = LambdaHandler(trace=False)
+
+    def _get(self, query: str = '', path: str = '/items'):
+        response = self.handler.handle_request(make_http_event(path=path, query=query), None)
+        body = json.loads(response['body'])
+        return response, body
+
+    def test_offsets_over_an_iterator(self):
+
+        consumed = []
+
+        def generate():
+            for i in range(7):
+                consumed.append(i)
+                yield {'id': i}
+
+        @self.handler.route(path='/items')
+        def list_items(event):
+            return self.paginator.paginate(event, generate())
+
+        response, page = self._get('status=open')
+        self.assertEqual(page['items'], [{'id': 0}, {'id': 1}, {'id': 2}])
+        # The iterator is read one item ahead, to know whether there are more.
+        self.assertEqual(consumed, [0, 1, 2, 3])
+        self.assertEqual(response['headers']['link'], f'<{page["next"]}>; rel="next"')
+        self.assertTrue(page['next'].startswith('/items?status=open&cursor='))
+
+        _, page = self._get(_next_query(page))
+        self.assertEqual([item['id'] for item in page['items']], [3, 4, 5])
+
+        response, page = self._get(_next_query(page))
+        self.assertEqual(page, {'items': [{'id': 6}], 'next_cursor': None, 'next': None})
+        self.assertNotIn('link', response['headers'])
+
+    def test_sequences_are_sliced(self):
+
+        @self.handler.route(path='/items')
+        def list_items(event):
+            return self.paginator.paginate(event, list(range(6)))
+
+        _, page = self._get('limit=10')
+        self.assertEqual(page['items'], [0, 1, 2, 3, 4])
+        self.assertIn('limit=10', page['next'])
+
+        _, page = self._get(_next_query(page))
+        self.assertEqual(page['items'], [5])
+        self.assertIsNone(page['next_cursor'])
+
+    def test_keys(self):
+
+        rows = [{'id': f'item-{i:02}'} for i in range(8)]
+        positions = []
+
+        def scan(after):
+            positions.append(after)
+            return (row for row in rows if after is None or row['id'] > after)
+
+        @self.handler.route(path='/items')
+        def list_items(event):
+            return self.paginator.paginate(event, scan, key=lambda row: row['id'])
+
+        _, page = self._get()
+        _, page = self._get(_next_query(page))
+        _, page = self._get(_next_query(page))
+        self.assertEqual(page['items'], [{'id': 'item-06'}, {'id': 'item-07'}])
+        self.assertIsNone(page['next'])
+        self.assertEqual(positions, [None, 'item-02', 'item-05'])
+
+    def test_query_functions(self):
+
+        def query(position, limit):
+            start = position['start'] if position else 0
+            end = min(start + limit, 5)
+            return range(start, end), {'start': end} if end < 5 else None
+
+        @self.handler.route(path='/items')
+        def list_items(event):
+            return self.paginator.paginate_query(event, query)
+
+        _, page = self._get()
+        self.assertEqual(page['items'], [0, 1, 2])
+        _, page = self._get(_next_query(page))
+        self.assertEqual(page, {'items': [3, 4], 'next_cursor': None, 'next': None})
+
+    def test_dynamodb_keys(self):
+
+        rows = [{'pk': 'item', 'sk': decimal.Decimal(i)} for i in range(5)]
+
+        def query(position, limit):
+            start = int(position['sk']) + 1 if position else 0
+            items = rows[start:start + limit]
+            last = items[-1] if start + limit < len(rows) else None
+            return items, last
+
+        @self.handler.route(path='/items')
+        def list_items(event):
+            return self.paginator.paginate_query(event, query)
+
+        @self.handler.route(path='/keys')
+        def list_keys(event):
+            return self.paginator.paginate(event, rows, key=lambda row: row['sk'])
+
+        for path in ('/items', '/keys'):
+            response, page = self._get(path=path)
+            self.assertEqual(response['statusCode'], 200)
+            response, page = self._get(_next_query(page), path=path)
+            self.assertEqual(response['statusCode'], 200)
+            self.assertEqual([item['sk'] for item in page['items']], ['3', '4'])
+
+    def test_invalid_requests(self):
+
+        @self.handler.route(path='/items')
+        def list_items(event):
+            return self.paginator.paginate(event, [])
+
+        @self.handler.route(path='/other')
+        def list_other(event):
+            return self.paginator.paginate(event, list(range(10)))
+
+        for query in ('limit=0', 'limit=abc', 'cursor=abc'):
+            event = make_http_event(path='/items', query=query)
+            response = self.handler.handle_request(event, None)
+            self.assertEqual(response['statusCode'], 400, query)
+
+        # Cursors of a collection are not accepted by another.
+        _, page = self._get(path='/other')
+        event = make_http_event(path='/items', query=_next_query(page))
+        response = self.handler.handle_request(event, None)
+        self.assertEqual(response['statusCode'], 400)
+
+    def test_page_is_rendered_once(self):
+
+        page = Page(iter([1, 2]), next_cursor='abc', next_link=lambda cursor: f'/x?c={cursor}')
+        _, headers, body = page.render()
+        self.assertEqual(json.loads(body), {'items': [1, 2], 'next_cursor': 'abc',
+                                            'next': '/x?c=abc'})
+        self.assertEqual(page.with_cors_headers({}).render()[2], body)
+
+
+if __name__ == '__main__':
+    unittest.main()
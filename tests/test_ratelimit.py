@@ -0,0 +1,154 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from pyrazine import ratelimit
+from pyrazine.handlers import LambdaHandler
+from pyrazine.ratelimit import (
+    DynamoDbRateLimitBackend,
+    InMemoryRateLimitBackend,
+    RateLimit,
+    SqliteRateLimitBackend
+)
+from pyrazine.response import HttpResponse
+from tests import make_http_event
+
+
+def make_event(source_ip='192.0.2.1', sub=None, api_key=None):
+    event = make_http_event(
+        claims={'iss': 'https://example.com/', 'sub': sub} if sub is not None else None,
+        headers={'X-Api-Key': api_key} if api_key is not None else None)
+    event['requestContext']['http']['sourceIp'] = source_ip
+    return event
+
+
+class FakeDynamoDbClient(object):
+    """
+    Implements the calls made by DynamoDbRateLimitBackend on a dictionary.
+    """
+
+    class exceptions(object):
+        class ConditionalCheckFailedException(Exception):
+            pass
+
+    def __init__(self):
+        self.items = {}
+
+    def get_item(self, TableName, Key, ConsistentRead):
+        item = self.items.get(Key['pk']['S'])
+        return {'Item': item} if item is not None else {}
+
+    def put_item(self, TableName, Item, ConditionExpression, ExpressionAttributeValues=None,
+                 ExpressionAttributeNames=None):
+        current = self.items.get(Item['pk']['S'])
+        if ExpressionAttributeValues is not None:
+            expected = ExpressionAttributeValues[':previous_update']
+            if current is None or current['updated_at'] != expected:
+                raise self.exceptions.ConditionalCheckFailedException()
+        elif current is not None:
+            raise self.exceptions.ConditionalCheckFailedException()
+        self.items[Item['pk']['S']] = Item
+
+
+class TestRateLimit(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._now = 1000.0
+        patcher = patch.object(ratelimit.time, 'monotonic', lambda: self._now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _check(self, limit, count, **kwargs):
+        handler = LambdaHandler(trace=False)
+        return [limit.check(handler._parse_event(make_event(**kwargs))) for _ in range(count)]
+
+    def test_burst_and_refill(self):
+        limit = RateLimit(rate=1, burst=2, key='ip')
+
+        first, second, third = self._check(limit, 3)
+        self.assertIsNone(first)
+        self.assertIsNone(second)
+        self.assertEqual(third.status_code, 429)
+        self.assertEqual(third.headers, {'retry-after': '1'})
+
+        # Rejections reuse the same precomputed response.
+        self.assertIs(self._check(limit, 1)[0], third)
+
+        self._now += 1.0
+        self.assertEqual(self._check(limit, 2), [None, third])
+
+    def test_keys(self):
+        limit = RateLimit(rate=1, key='sub')
+        self.assertIsNone(self._check(limit, 1, sub='a')[0])
+        self.assertIsNone(self._check(limit, 1, sub='b')[0])
+        self.assertIsNotNone(self._check(limit, 1, sub='a')[0])
+
+        # Requests without a token are limited by source IP.
+        self.assertIsNone(self._check(limit, 1, source_ip='192.0.2.2')[0])
+        self.assertIsNotNone(self._check(limit, 1, source_ip='192.0.2.2')[0])
+
+        limit = RateLimit(rate=1, key='api_key')
+        self.assertIsNone(self._check(limit, 1, api_key='k1')[0])
+        self.assertIsNotNone(self._check(limit, 1, api_key='k1')[0])
+
+    def test_local_buckets_are_bounded(self):
+        limit = RateLimit(rate=1, key='ip')
+        with patch.object(RateLimit, 'MAX_LOCAL_BUCKETS', 2):
+            for ip in ('192.0.2.1', '192.0.2.2', '192.0.2.3'):
+                self._check(limit, 1, source_ip=ip)
+        self.assertEqual(list(limit._buckets), ['192.0.2.2', '192.0.2.3'])
+
+
+class TestRateLimitBackends(unittest.TestCase):
+
+    def _assert_token_bucket(self, backend):
+        self.assertEqual(backend.acquire('route:a', 1.0, 2.0, 100.0), 0.0)
+        self.assertEqual(backend.acquire('route:a', 1.0, 2.0, 100.0), 0.0)
+        self.assertAlmostEqual(backend.acquire('route:a', 1.0, 2.0, 100.5), 0.5)
+        self.assertEqual(backend.acquire('route:a', 1.0, 2.0, 101.0), 0.0)
+        self.assertEqual(backend.acquire('route:b', 1.0, 2.0, 101.0), 0.0)
+
+    def test_in_memory(self):
+        self._assert_token_bucket(InMemoryRateLimitBackend())
+
+    def test_sqlite(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'buckets.db')
+            self._assert_token_bucket(SqliteRateLimitBackend(path))
+
+            # Buckets are shared with other connections to the same file.
+            self.assertGreater(SqliteRateLimitBackend(path).acquire('route:a', 1.0, 2.0, 101.0), 0)
+
+    def test_dynamodb(self):
+        client = FakeDynamoDbClient()
+        self._assert_token_bucket(DynamoDbRateLimitBackend('buckets', client=client))
+
+    def test_dynamodb_contention(self):
+        client = FakeDynamoDbClient()
+        backend = DynamoDbRateLimitBackend('buckets', client=client)
+
+        with patch.object(client, 'put_item',
+                          side_effect=client.exceptions.ConditionalCheckFailedException()):
+            self.assertEqual(backend.acquire('route:a', 2.0, 2.0, 100.0), 0.5)
+
+
+class TestRouteRateLimit(unittest.TestCase):
+
+    def test_shared_limit(self):
+        backend = InMemoryRateLimitBackend()
+        handlers = [LambdaHandler(trace=False) for _ in range(2)]
+
+        for handler in handlers:
+            @handler.route(path='/', methods=['GET'],
+                           rate_limit=RateLimit(rate=0.001, burst=1, key='ip', backend=backend))
+            def get_items(token, body):
+                return HttpResponse(200, {})
+
+        # Each handler stands for a container with its own local buckets.
+        self.assertEqual(handlers[0].handle_request(make_event(), None)['statusCode'], 200)
+
+        response = handlers[1].handle_request(make_event(), None)
+        self.assertEqual(response['statusCode'], 429)
+        self.assertEqual(response['headers']['retry-after'], '1000')
+        self.assertIn('/:192.0.2.1', backend._buckets)
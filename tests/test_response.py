@@ -0,0 +1,66 @@
+import base64
+import json
+import mmap
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pyrazine.response import HttpResponse
+
+
+class TestHttpResponse(unittest.TestCase):
+
+    def test_json_response(self):
+        response = HttpResponse(200, {'a': 1}, headers={'x-test': 'value'}).get_response_object()
+
+        self.assertFalse(response['isBase64Encoded'])
+        self.assertEqual(json.loads(response['body']), {'a': 1})
+        self.assertEqual(response['headers']['content-type'], 'application/json')
+        self.assertEqual(response['headers']['x-test'], 'value')
+
+    def test_binary_response(self):
+        data = bytes(range(256))
+
+        for body in (data, bytearray(data), memoryview(data)):
+            response = HttpResponse(200, body, content_type='image/png').get_response_object()
+
+            self.assertTrue(response['isBase64Encoded'])
+            self.assertEqual(base64.b64decode(response['body']), data)
+            self.assertEqual(response['headers']['content-type'], 'image/png')
+
+    def test_file_response(self):
+        data = os.urandom(4096)
+
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(data)
+            f.flush()
+
+            response = HttpResponse.from_file(f.name).get_response_object()
+
+        self.assertTrue(response['isBase64Encoded'])
+        self.assertEqual(base64.b64decode(response['body']), data)
+        self.assertEqual(response['headers']['content-type'], 'application/octet-stream')
+
+    def test_large_files_are_mapped_and_closed(self):
+        data = os.urandom(4096)
+
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(data)
+            f.flush()
+
+            self.assertIsInstance(HttpResponse.from_file(f.name).body, bytes)
+            with mock.patch.object(HttpResponse, 'MMAP_THRESHOLD', 1024):
+                response = HttpResponse.from_file(f.name)
+            self.assertIsInstance(response.body, mmap.mmap)
+
+            response_object = response.get_response_object()
+
+        self.assertEqual(base64.b64decode(response_object['body']), data)
+        self.assertTrue(response.body.closed)
+
+    def test_error_response_ignores_binary_body(self):
+        response = HttpResponse(500, b'data', message='Test error').get_response_object()
+
+        self.assertFalse(response['isBase64Encoded'])
+        self.assertEqual(json.loads(response['body'])['error']['message'], 'Test error')
@@ -0,0 +1,117 @@
+import unittest
+from unittest import mock
+
+from pyrazine import tracer
+from pyrazine.router import EventRouter, NoRouteError, detect_event_type
+
+
+def _eventbridge_event(source: str, detail_type: str):
+    return {'version': '0', 'id': 'id', 'source': source, 'detail-type': detail_type,
+            'account': '123456789012', 'region': 'us-east-1', 'detail': {'order_id': 1}}
+
+
+def _s3_event(*objects):
+    return {'Records': [{
+        'eventSource': 'aws:s3',
+        'eventName': event_name,
+        's3': {'bucket': {'name': bucket}, 'object': {'key': key, 'size': 1}},
+    } for bucket, key, event_name in objects]}
+
+
+def _sns_event(*topic_arns):
+    return {'Records': [{
+        'EventSource': 'aws:sns',
+        'Sns': {'TopicArn': topic_arn, 'Message': 'message'},
+    } for topic_arn in topic_arns]}
+
+
+class TestEventRouter(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.router = EventRouter(trace=False)
+
+    def test_detect_event_type(self):
+        self.assertEqual(detect_event_type(_eventbridge_event('a', 'b')), 'eventbridge')
+        self.assertEqual(detect_event_type(_s3_event(('b', 'k', 'ObjectCreated:Put'))),
+                         'aws:s3')
+        self.assertEqual(detect_event_type(_sns_event('arn')), 'aws:sns')
+        with self.assertRaises(ValueError):
+            detect_event_type({'Records': []})
+
+    def test_eventbridge(self):
+
+        router = self.router
+        router.on_eventbridge(lambda event: 'placed', source='orders', detail_type='Placed')
+        router.on_eventbridge(lambda event: 'orders', source='orders')
+        router.on_eventbridge(lambda event: 'any', detail_type='Deleted')
+
+        self.assertEqual(router.handle_event(_eventbridge_event('orders', 'Placed')), 'placed')
+        self.assertEqual(router.handle_event(_eventbridge_event('orders', 'Shipped')), 'orders')
+        self.assertEqual(router.handle_event(_eventbridge_event('users', 'Deleted')), 'any')
+        self.assertIsNone(router.handle_event(_eventbridge_event('users', 'Created')))
+
+    def test_s3_prefixes(self):
+
+        router = self.router
+
+        @router.on_s3(bucket='uploads', prefix='images/')
+        def on_image(record):
+            return 'image'
+
+        @router.on_s3(bucket='uploads', prefix='images/thumbnails/', events=['ObjectCreated'])
+        def on_thumbnail(record, context):
+            return f'thumbnail {context}'
+
+        @router.on_s3(prefix='')
+        def on_any(record):
+            return 'any'
+
+        results = router.handle_event(_s3_event(
+            ('uploads', 'images/cat.png', 'ObjectCreated:Put'),
+            ('uploads', 'images/thumbnails/cat+1.png', 'ObjectCreated:Put'),
+            ('uploads', 'images/thumbnails/cat.png', 'ObjectRemoved:Delete'),
+            ('uploads', 'documents/a.pdf', 'ObjectCreated:Put'),
+            ('other', 'images/cat.png', 'ObjectCreated:Put'),
+        ), 'context')
+        self.assertEqual(results, ['image', 'thumbnail context', 'image', 'any', 'any'])
+
+    def test_sns(self):
+
+        router = self.router
+        arn = 'arn:aws:sns:us-east-1:123456789012:orders'
+        router.on_sns(lambda record: 'by arn', topic=arn)
+        router.on_sns(lambda record: 'by name', topic='users')
+
+        results = router.handle_event(_sns_event(
+            arn, 'arn:aws:sns:us-east-1:123456789012:users',
+            'arn:aws:sns:us-east-1:123456789012:other'))
+        self.assertEqual(results, ['by arn', 'by name', None])
+
+    def test_unmatched_events_can_raise(self):
+
+        router = EventRouter(trace=False, ignore_unmatched=False)
+        with self.assertRaises(NoRouteError):
+            router.handle_event(_sns_event('arn:aws:sns:us-east-1:123456789012:orders'))
+
+    def test_tracing_shares_the_cold_start_annotation(self):
+
+        mock_subsegment = mock.MagicMock()
+        mock_recorder = mock.MagicMock()
+        mock_recorder.in_subsegment.return_value.__enter__.return_value = mock_subsegment
+
+        router = EventRouter(recorder=mock_recorder)
+
+        @router.on_eventbridge(source='orders')
+        def on_order(event):
+            return event['detail']['order_id']
+
+        with mock.patch.object(tracer, 'is_cold_start', True):
+            self.assertEqual(router.handle_event(_eventbridge_event('orders', 'Placed')), 1)
+            router.handle_event(_eventbridge_event('orders', 'Placed'))
+
+        mock_recorder.in_subsegment.assert_called_with(name='## on_order')
+        mock_subsegment.put_annotation.assert_called_once_with(key='ColdStart', value=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import decimal
+import json
+import unittest
+
+from pyrazine.handlers import LambdaHandler
+from pyrazine.response import HttpResponse
+from pyrazine.runtime import RuntimeApiClient, RuntimeLambdaContext, run
+from pyrazine.testing.runtime_api import LocalRuntimeApi
+from tests import test_handlers
+
+
+class TestRuntime(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._api = LocalRuntimeApi().start()
+        self._client = RuntimeApiClient(self._api.endpoint)
+
+    def tearDown(self) -> None:
+        self._api.stop()
+
+    def test_invocations_are_answered(self):
+        handler = LambdaHandler(trace=False)
+
+        @handler.route(path='/', methods=('GET',))
+        def test_handler(token, body):
+            return HttpResponse(200, {'test_key': 'test_value'})
+
+        event = test_handlers.TestLambdaHandler.TEST_HTTP_EVENT
+        request_ids = [self._api.enqueue(event) for _ in range(3)]
+        run(handler.handle_request, self._client, max_invocations=3)
+
+        for result in self._api.wait_for_results(request_ids, timeout=5):
+            self.assertTrue(result.success)
+            response = result.json()
+            self.assertEqual(response['statusCode'], 200)
+            self.assertEqual(json.loads(response['body']), {'test_key': 'test_value'})
+
+    def test_errors_are_reported(self):
+
+        def failing_function(event, context):
+            raise ValueError('Test error')
+
+        request_id = self._api.enqueue({})
+        run(failing_function, self._client, max_invocations=1)
+
+        result = self._api.wait_for_result(request_id, timeout=5)
+        self.assertFalse(result.success)
+        self.assertEqual(result.json()['errorType'], 'ValueError')
+        self.assertEqual(result.json()['errorMessage'], 'Test error')
+
+    def test_unserializable_results_are_reported(self):
+
+        def function(event, context):
+            return {'price': decimal.Decimal('1.5')}
+
+        request_ids = [self._api.enqueue({}) for _ in range(2)]
+        run(function, self._client, max_invocations=2)
+
+        # The runtime keeps answering invocations.
+        for result in self._api.wait_for_results(request_ids, timeout=5):
+            self.assertFalse(result.success)
+            self.assertEqual(result.json()['errorType'], 'TypeError')
+
+    def test_context_is_built_from_headers(self):
+        contexts = []
+
+        def function(event, context):
+            contexts.append(context)
+            return None
+
+        request_id = self._api.enqueue({})
+        run(function, self._client, max_invocations=1)
+        self._api.wait_for_result(request_id, timeout=5)
+
+        context = contexts[0]
+        self.assertIsInstance(context, RuntimeLambdaContext)
+        self.assertEqual(context.aws_request_id, request_id)
+        self.assertEqual(context.invoked_function_arn, self._api.function_arn)
+        self.assertIsNone(context.identity)
+        self.assertTrue(0 < context.get_remaining_time_in_millis() <= 3000)
@@ -0,0 +1,161 @@
+import copy
+import unittest
+from dataclasses import dataclass, field
+from typing import Dict, List, Literal, Optional, TypedDict
+
+from pyrazine.handlers import LambdaHandler
+from pyrazine.response import HttpResponse
+from pyrazine.schema import SchemaCompiler, ValidationError
+from tests import make_http_event
+
+
+ITEM_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'name': {'type': 'string', 'minLength': 1},
+        'price': {'type': 'number', 'minimum': 0},
+        'tags': {'type': 'array', 'items': {'type': 'string'}, 'maxItems': 3},
+        'status': {'enum': ['draft', 'published']},
+    },
+    'required': ['name', 'price'],
+    'additionalProperties': False,
+}
+
+
+@dataclass
+class Dimensions:
+    width: float
+    height: float
+
+
+@dataclass
+class Item:
+    name: str
+    price: float
+    tags: List[str] = field(default_factory=list)
+    dimensions: Optional[Dimensions] = None
+    status: Literal['draft', 'published'] = 'draft'
+
+
+class ItemDict(TypedDict):
+    name: str
+    stock: Dict[str, int]
+
+
+@dataclass
+class Category:
+    name: str
+    children: List['Category'] = field(default_factory=list)
+
+
+class TestSchemaCompiler(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._compiler = SchemaCompiler()
+
+    def assertInvalid(self, validator, value, message):
+        with self.assertRaises(ValidationError) as context:
+            validator(value)
+        self.assertEqual(str(context.exception), message)
+
+    def test_json_schema(self):
+        validate = self._compiler.compile(ITEM_SCHEMA)
+
+        item = {'name': 'pen', 'price': 2, 'tags': ['office'], 'status': 'draft'}
+        self.assertEqual(validate(item), item)
+
+        self.assertInvalid(validate, [], '$: expected object')
+        self.assertInvalid(validate, {'name': 'pen'}, '$: missing required property price')
+        self.assertInvalid(validate, {'name': '', 'price': 1},
+                           '$.name: must have at least 1 characters')
+        self.assertInvalid(validate, {'name': 'pen', 'price': True}, '$.price: expected number')
+        self.assertInvalid(validate, {'name': 'pen', 'price': 1, 'tags': ['a', 2]},
+                           '$.tags[1]: expected string')
+        self.assertInvalid(validate, {'name': 'pen', 'price': 1, 'status': 'deleted'},
+                           "$.status: expected one of ['draft', 'published']")
+        self.assertInvalid(validate, {'name': 'pen', 'price': 1, 'color': 'red'},
+                           '$.color: unexpected property color')
+
+    def test_validators_are_cached(self):
+        self.assertIs(self._compiler.compile(ITEM_SCHEMA),
+                      self._compiler.compile(copy.deepcopy(ITEM_SCHEMA)))
+        self.assertIs(self._compiler.compile(Item), self._compiler.compile(Item))
+
+    def test_dataclass_binding(self):
+        validate = self._compiler.compile(Item)
+
+        item = validate({'name': 'pen', 'price': 2, 'dimensions': {'width': 1, 'height': 2.5},
+                         'unknown': True})
+        self.assertEqual(item, Item('pen', 2.0, [], Dimensions(1.0, 2.5)))
+        self.assertIsInstance(item.price, float)
+
+        self.assertInvalid(validate, {'name': 'pen', 'price': 1, 'dimensions': {'width': 1}},
+                           '$.dimensions: missing required property height')
+        self.assertInvalid(validate, {'name': 'pen', 'price': 1, 'status': 'sold'},
+                           "$.status: expected one of ['draft', 'published']")
+
+    def test_typed_dict_and_recursion(self):
+        validate = self._compiler.compile(ItemDict)
+        self.assertEqual(validate({'name': 'pen', 'stock': {'madrid': 3}}),
+                         {'name': 'pen', 'stock': {'madrid': 3}})
+        self.assertInvalid(validate, {'name': 'pen', 'stock': {'madrid': '3'}},
+                           '$.stock.madrid: expected integer')
+
+        category = self._compiler.compile(Category)(
+            {'name': 'a', 'children': [{'name': 'b', 'children': [{'name': 'c'}]}]})
+        self.assertEqual(category.children[0].children[0], Category('c'))
+
+    def test_unsupported_annotation(self):
+        @dataclass
+        class WithSet:
+            values: set
+
+        with self.assertRaises(TypeError):
+            self._compiler.compile(WithSet)
+
+    def test_unsupported_keywords(self):
+        schemas = (
+            {'anyOf': [{'type': 'string'}, {'type': 'integer'}]},
+            {'type': 'string', 'format': 'email'},
+            {'type': 'object', 'properties': {'id': {'$ref': '#/definitions/id'}}},
+            {'type': 'array', 'items': {'not': {'type': 'null'}}},
+            {'type': 'array', 'items': [{'type': 'string'}, {'type': 'integer'}]},
+            {'type': 'object', 'properties': {'id': True}},
+            {'type': 'decimal'},
+            {'type': ['string', 'date']},
+        )
+        for schema in schemas:
+            with self.subTest(schema=schema):
+                with self.assertRaises(TypeError):
+                    self._compiler.compile(schema)
+
+        # Annotations do not change what is valid.
+        validate = self._compiler.compile({'type': 'string', 'title': 'Name',
+                                           'description': 'The name.'})
+        self.assertEqual(validate('a'), 'a')
+
+
+class TestRouteSchema(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._handler = LambdaHandler(trace=False)
+        self._bodies = []
+
+        @self._handler.route(path='/', methods=['POST'], schema=Item)
+        def create_item(token, body):
+            self._bodies.append(body)
+            return HttpResponse(201, {'name': body.name})
+
+    def _post(self, body):
+        return self._handler.handle_request(make_http_event('POST', body=body), None)
+
+    def test_valid_body_is_bound(self):
+        response = self._post({'name': 'pen', 'price': 1})
+        self.assertEqual(response['statusCode'], 201)
+        self.assertEqual(self._bodies, [Item('pen', 1.0)])
+
+    def test_invalid_body(self):
+        response = self._post({'name': 'pen'})
+        self.assertEqual(response['statusCode'], 400)
+        self.assertIn('missing required property price', response['body'])
+        self.assertEqual(self._bodies, [])
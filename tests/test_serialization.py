@@ -0,0 +1,122 @@
+import datetime
+import decimal
+import enum
+import json
+import unittest
+import uuid
+from dataclasses import dataclass, field
+from typing import List
+
+from pyrazine.response import HttpResponse, HttpResponseSerializer
+from pyrazine.serialization import (
+    DynamoDbItems,
+    SerializerRegistry,
+    default_serializer_registry,
+    deserialize_item
+)
+
+
+class Color(enum.Enum):
+    RED = 'red'
+
+
+@dataclass
+class Part:
+    name: str
+    price: decimal.Decimal
+
+
+@dataclass
+class Item:
+    name: str
+    created: datetime.datetime
+    tags: frozenset
+    parts: List[Part] = field(default_factory=list)
+
+
+ATTRIBUTE_VALUE_ITEM = {
+    'pk': {'S': 'ITEM#1'},
+    'price': {'N': '12.50'},
+    'active': {'BOOL': True},
+    'deleted': {'NULL': True},
+    'tags': {'SS': ['a']},
+    'sizes': {'NS': ['1', '2.5']},
+    'data': {'B': b'\x00\x01'},
+    'parts': {'L': [{'M': {'name': {'S': 'lid'}, 'qty': {'N': '3'}}}]},
+}
+
+
+class TestSerializerRegistry(unittest.TestCase):
+
+    def test_default_encoders(self):
+        value = {
+            'price': decimal.Decimal('12.50'),
+            'created': datetime.datetime(2021, 1, 2, 3, 4, 5),
+            'day': datetime.date(2021, 1, 2),
+            'id': uuid.UUID(int=1),
+            'color': Color.RED,
+            'tags': {'a'},
+            'data': b'\x00\x01',
+        }
+
+        self.assertEqual(json.loads(default_serializer_registry.dumps(value)), {
+            'price': '12.50',
+            'created': '2021-01-02T03:04:05',
+            'day': '2021-01-02',
+            'id': '00000000-0000-0000-0000-000000000001',
+            'color': 'red',
+            'tags': ['a'],
+            'data': 'AAE=',
+        })
+
+    def test_dataclasses(self):
+        item = Item('box', datetime.datetime(2021, 1, 2), frozenset(['a']),
+                    [Part('lid', decimal.Decimal('1.5'))])
+
+        self.assertEqual(json.loads(default_serializer_registry.dumps(item)), {
+            'name': 'box', 'created': '2021-01-02T00:00:00', 'tags': ['a'],
+            'parts': [{'name': 'lid', 'price': '1.5'}],
+        })
+
+        encoder = default_serializer_registry.get_encoder(Item)
+        self.assertIs(default_serializer_registry.get_encoder(Item), encoder)
+
+    def test_registration(self):
+        registry = SerializerRegistry({decimal.Decimal: str})
+        self.assertEqual(registry.dumps([decimal.Decimal('1.0')]), '["1.0"]')
+
+        registry.register(decimal.Decimal, float)
+        self.assertEqual(registry.dumps([decimal.Decimal('1.0')]), '[1.0]')
+
+        with self.assertRaises(TypeError):
+            registry.dumps(object())
+
+    def test_legacy_encoder(self):
+        self.assertEqual(json.dumps(decimal.Decimal('1.5'), cls=HttpResponseSerializer), '"1.5"')
+
+    def test_response_serializer(self):
+        registry = SerializerRegistry({decimal.Decimal: int})
+        response = HttpResponse(200, {'a': decimal.Decimal(1)}, serializer=registry)
+        self.assertEqual(response.get_response_object()['body'], '{"a": 1}')
+
+
+class TestDynamoDbItems(unittest.TestCase):
+
+    def test_deserialize_item(self):
+        self.assertEqual(deserialize_item(ATTRIBUTE_VALUE_ITEM), {
+            'pk': 'ITEM#1',
+            'price': decimal.Decimal('12.50'),
+            'active': True,
+            'deleted': None,
+            'tags': {'a'},
+            'sizes': {decimal.Decimal('1'), decimal.Decimal('2.5')},
+            'data': b'\x00\x01',
+            'parts': [{'name': 'lid', 'qty': decimal.Decimal(3)}],
+        })
+
+    def test_items_serialize_as_deserialized(self):
+        fast = default_serializer_registry.dumps(DynamoDbItems([ATTRIBUTE_VALUE_ITEM]))
+
+        item = deserialize_item(ATTRIBUTE_VALUE_ITEM)
+        item['sizes'] = sorted(item['sizes'])
+        self.assertEqual(fast, default_serializer_registry.dumps([item]))
@@ -0,0 +1,124 @@
+import io
+import json
+import sys
+import unittest
+from unittest import mock
+
+from pyrazine import tracer
+from pyrazine.handlers import LambdaHandler
+from pyrazine.response import HttpResponse
+from pyrazine.startup import STARTUP_ROUTE_PATH, StartupProfiler
+from tests import make_http_event
+
+
+class TestStartupProfiler(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._stream = io.StringIO()
+        self._profiler = StartupProfiler(stream=self._stream)
+
+    def test_handler_phases_and_report(self):
+
+        handler = LambdaHandler(trace=False, profiler=self._profiler)
+
+        @self._profiler.init_hook
+        def load_settings():
+            pass
+
+        @handler.route(path='/items')
+        def get_items():
+            return HttpResponse(200, body={'items': []})
+
+        handler.add_startup_route()
+
+        self.assertFalse(self._profiler.invoked)
+        response = handler.handle_request(make_http_event(path='/items'), None)
+        self.assertEqual(response['statusCode'], 200)
+        self.assertTrue(self._profiler.invoked)
+
+        response = handler.handle_request(make_http_event(path=STARTUP_ROUTE_PATH), None)
+        report = json.loads(response['body'])
+
+        phases = [phase['name'] for phase in report['phases']]
+        self.assertEqual(phases, ['handler_init', 'init_hooks', 'route_registration',
+                                  'first_invocation'])
+        self.assertEqual([hook['name'] for hook in report['hooks']],
+                         ['TestStartupProfiler.test_handler_phases_and_report.'
+                          '<locals>.load_settings'])
+        self.assertGreater(report['init_duration_ms'], 0)
+        self.assertFalse(report['over_budget'])
+
+        # Metrics are written once, on the first request.
+        entries = [json.loads(line) for line in self._stream.getvalue().splitlines()]
+        self.assertEqual(len(entries), 1)
+        metrics = entries[0]['_aws']['CloudWatchMetrics'][0]
+        self.assertEqual(metrics['Dimensions'], [['service']])
+        self.assertIn({'Name': 'InitDuration', 'Unit': 'Milliseconds'}, metrics['Metrics'])
+        self.assertIn('RouteRegistrationDuration', entries[0])
+
+    def test_startup_subsegment(self):
+
+        subsegments = {}
+        recorder = mock.MagicMock()
+        recorder.in_subsegment.side_effect = lambda name: mock.MagicMock(**{
+            '__enter__.return_value': subsegments.setdefault(name, mock.MagicMock())})
+
+        handler = LambdaHandler(recorder=recorder, profiler=self._profiler)
+        handler.route(lambda: HttpResponse(200), path='/', methods=['GET'])
+
+        with mock.patch.object(tracer, 'is_cold_start', True):
+            handler.handle_request(make_http_event(), None)
+
+        # The cold start is annotated once, on the subsegment of the handler.
+        startup = subsegments['## startup']
+        startup.put_annotation.assert_called_once_with(
+            key='InitDurationMs', value=self._profiler.init_duration_ms)
+        annotations = [call for subsegment in subsegments.values()
+                       for call in subsegment.put_annotation.call_args_list
+                       if call.kwargs['key'] == 'ColdStart']
+        self.assertEqual(len(annotations), 1)
+
+    def test_phases_are_not_recorded_after_the_first_request(self):
+
+        self._profiler.record_phase('route_registration', 1.0, 2.0)
+        self._profiler.begin_first_invocation()
+        self._profiler.record_phase('route_registration', 2.0, 3.0)
+        self._profiler.record_phase('late', 2.0, 3.0)
+
+        durations = {phase['name']: phase['duration_ms']
+                     for phase in self._profiler.report()['phases']}
+        self.assertEqual(durations['route_registration'], 1000.0)
+        self.assertNotIn('late', durations)
+
+    def test_budget(self):
+        profiler = StartupProfiler(budget_ms=0.001, metrics=False)
+        profiler.begin_first_invocation()
+        self.assertTrue(profiler.over_budget)
+
+    def test_failed_hooks_are_recorded(self):
+
+        def fail():
+            raise RuntimeError('No settings')
+
+        with self.assertRaises(RuntimeError):
+            self._profiler.init_hook(fail, name='settings')
+
+        hook, = self._profiler.report()['hooks']
+        self.assertEqual(hook['name'], 'settings')
+        self.assertIn('No settings', hook['error'])
+
+    def test_track_imports(self):
+
+        sys.modules.pop('tests.startup_import_sample', None)
+        self._profiler.track_imports()
+        try:
+            import tests.startup_import_sample  # noqa: F401
+        finally:
+            self._profiler.begin_first_invocation()
+
+        modules = [entry['module'] for entry in self._profiler.report()['imports']]
+        self.assertIn('tests.startup_import_sample', modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
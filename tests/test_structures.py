@@ -0,0 +1,39 @@
+import unittest
+
+from pyrazine.structures import CaseInsensitiveMultiDict, MultiDict, parse_cookies
+
+
+class TestMultiDict(unittest.TestCase):
+
+    def test_repeated_keys_are_kept(self):
+        d = MultiDict([('a', '1'), ('b', '2'), ('a', '3')])
+
+        self.assertEqual(d['a'], '1')
+        self.assertEqual(d.getall('a'), ['1', '3'])
+        self.assertEqual(len(d), 2)
+        self.assertEqual(list(d.allitems()), [('a', '1'), ('a', '3'), ('b', '2')])
+
+    def test_missing_keys(self):
+        d = MultiDict.from_lists({'a': ['1']})
+
+        self.assertNotIn('A', d)
+        self.assertIsNone(d.get('b'))
+        self.assertEqual(d.getall('b', []), [])
+        with self.assertRaises(KeyError):
+            d['b']
+
+    def test_case_insensitive_lookup(self):
+        d = CaseInsensitiveMultiDict([('Content-Type', 'text/plain'), ('X-Test', 'a'),
+                                      ('x-test', 'b')])
+
+        self.assertEqual(d['content-type'], 'text/plain')
+        self.assertIn('CONTENT-TYPE', d)
+        self.assertEqual(d.getall('X-TEST'), ['a', 'b'])
+        self.assertEqual(list(d), ['content-type', 'x-test'])
+
+    def test_parse_cookies(self):
+        cookies = parse_cookies(['a=1; b=2', 'a=3', 'c=x=y'])
+
+        self.assertEqual(cookies.getall('a'), ['1', '3'])
+        self.assertEqual(cookies['b'], '2')
+        self.assertEqual(cookies['c'], 'x=y')
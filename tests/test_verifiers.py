@@ -0,0 +1,234 @@
+import base64
+import copy
+import json
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa
+from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature
+
+from pyrazine.auth.base import BaseAuthStorage, BaseUserProfile
+from pyrazine.auth.cognito import CognitoAuthorizer
+from pyrazine.auth.verifiers import (
+    CryptographyJwtVerifier,
+    JoseJwtVerifier,
+    JwkNotFoundError,
+    JwtVerificationFailedError,
+    PyJwtVerifier
+)
+from pyrazine.handlers import LambdaHandler
+from pyrazine.response import HttpResponse
+from tests import make_http_event
+from tests.test_events import REST_API_EVENT
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _int_b64(value: int, length: int = None) -> str:
+    length = length if length is not None else (value.bit_length() + 7) // 8
+    return _b64(value.to_bytes(length, 'big'))
+
+
+RSA_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+EC_KEY = ec.generate_private_key(ec.SECP256R1())
+
+RSA_JWK = {
+    'kid': 'rsa-key', 'kty': 'RSA', 'alg': 'RS256', 'use': 'sig',
+    'n': _int_b64(RSA_KEY.public_key().public_numbers().n),
+    'e': _int_b64(RSA_KEY.public_key().public_numbers().e),
+}
+EC_JWK = {
+    'kid': 'ec-key', 'kty': 'EC', 'alg': 'ES256', 'use': 'sig', 'crv': 'P-256',
+    'x': _int_b64(EC_KEY.public_key().public_numbers().x, 32),
+    'y': _int_b64(EC_KEY.public_key().public_numbers().y, 32),
+}
+
+
+def sign_token(claims, kid='rsa-key', alg='RS256'):
+    header = _b64(json.dumps({'kid': kid, 'alg': alg}).encode('utf-8'))
+    payload = _b64(json.dumps(claims).encode('utf-8'))
+    signing_input = f'{header}.{payload}'.encode('ascii')
+
+    if alg == 'RS256':
+        signature = RSA_KEY.sign(signing_input, padding.PKCS1v15(), hashes.SHA256())
+    else:
+        r, s = decode_dss_signature(EC_KEY.sign(signing_input, ec.ECDSA(hashes.SHA256())))
+        signature = r.to_bytes(32, 'big') + s.to_bytes(32, 'big')
+
+    return f'{header}.{payload}.{_b64(signature)}'
+
+
+class TestJwtVerifiers(unittest.TestCase):
+
+    VERIFIER_CLASSES = (CryptographyJwtVerifier, PyJwtVerifier, JoseJwtVerifier)
+
+    def _verifiers(self):
+        for verifier_class in self.VERIFIER_CLASSES:
+            verifier = verifier_class()
+            verifier.load_keys([RSA_JWK, EC_JWK])
+            yield verifier
+
+    def test_valid_signatures(self):
+        for verifier in self._verifiers():
+            for kid, alg in (('rsa-key', 'RS256'), ('ec-key', 'ES256')):
+                with self.subTest(verifier=type(verifier).__name__, alg=alg):
+                    jws = verifier.verify(sign_token({'sub': 'user'}, kid, alg))
+                    self.assertEqual(jws.claims, {'sub': 'user'})
+                    self.assertEqual(jws.header['alg'], alg)
+
+    def test_invalid_signature(self):
+        header, payload, signature = sign_token({'sub': 'user'}).split('.')
+        tampered = '.'.join([header, _b64(b'{"sub": "admin"}'), signature])
+
+        for verifier in self._verifiers():
+            with self.subTest(verifier=type(verifier).__name__):
+                with self.assertRaises(JwtVerificationFailedError) as context:
+                    verifier.verify(tampered)
+                self.assertEqual(context.exception.error_code,
+                                 JwtVerificationFailedError.INVALID_SIGNATURE)
+
+    def test_malformed_token(self):
+        for verifier in self._verifiers():
+            for token in ('abc', 'a.b', 'a.b.c', _b64(b'[]') + '.' + _b64(b'{}') + '.sig'):
+                with self.assertRaises(JwtVerificationFailedError) as context:
+                    verifier.verify(token)
+                self.assertEqual(context.exception.error_code,
+                                 JwtVerificationFailedError.MALFORMED_TOKEN)
+
+    def test_unknown_key_and_algorithm(self):
+        verifier = CryptographyJwtVerifier()
+        verifier.load_keys([RSA_JWK])
+
+        with self.assertRaises(JwkNotFoundError):
+            verifier.verify(sign_token({'sub': 'user'}, kid='other-key'))
+
+        with self.assertRaises(JwtVerificationFailedError) as context:
+            verifier.verify(_b64(b'{"kid": "rsa-key", "alg": "none"}') + '.'
+                            + _b64(b'{"sub": "admin"}') + '.')
+        self.assertEqual(context.exception.error_code,
+                         JwtVerificationFailedError.UNSUPPORTED_ALGORITHM)
+
+    def test_keys_must_match_the_algorithm(self):
+
+        # Only the kid and alg of the header change, so the signature does not
+        # matter: the key must be rejected before it is used.
+        def forge(kid, alg):
+            _, payload, signature = sign_token({'sub': 'admin'}).split('.')
+            header = _b64(json.dumps({'kid': kid, 'alg': alg}).encode('utf-8'))
+            return f'{header}.{payload}.{signature}'
+
+        broken_jwk = {'kid': 'broken-key', 'kty': 'RSA', 'alg': 'RS256', 'n': RSA_JWK['n']}
+        rs384_jwk = dict(RSA_JWK, kid='rs384-key', alg='RS384')
+
+        for verifier in self._verifiers():
+            verifier.load_keys([RSA_JWK, EC_JWK, broken_jwk, rs384_jwk])
+            for kid, alg in (('rsa-key', 'ES256'), ('ec-key', 'RS256'),
+                             ('rs384-key', 'RS256'), ('broken-key', 'RS256')):
+                with self.subTest(verifier=type(verifier).__name__, kid=kid, alg=alg):
+                    with self.assertRaises(JwtVerificationFailedError) as context:
+                        verifier.verify(forge(kid, alg))
+                    self.assertEqual(context.exception.error_code,
+                                     JwtVerificationFailedError.INVALID_KEY)
+
+    def test_key_objects_are_reused(self):
+        verifier = CryptographyJwtVerifier()
+        verifier.load_keys([RSA_JWK])
+
+        with patch.object(verifier, '_load_key', wraps=verifier._load_key) as load_key:
+            for _ in range(3):
+                verifier.verify(sign_token({'sub': 'user'}))
+
+        self.assertEqual(load_key.call_count, 1)
+
+
+class TestCognitoAuthorizer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        with patch.object(CognitoAuthorizer, '_initialize'):
+            self._authorizer = CognitoAuthorizer(
+                'us-east-1_D4KLyfcX7', 'client', 'us-east-1', None)
+        self._authorizer._verifier.load_keys([RSA_JWK])
+
+    def test_id_and_access_tokens(self):
+        exp = int(time.time()) + 60
+
+        claims = self._authorizer._verify_jwt_token(sign_token({'aud': 'client', 'exp': exp}))
+        self.assertEqual(claims['aud'], 'client')
+
+        claims = self._authorizer._verify_jwt_token(
+            sign_token({'client_id': 'client', 'exp': exp}))
+        self.assertEqual(claims['client_id'], 'client')
+
+    def test_expired_token_and_invalid_audience(self):
+        cases = (
+            ({'aud': 'client', 'exp': int(time.time()) - 1},
+             JwtVerificationFailedError.TOKEN_EXPIRED),
+            ({'aud': 'other', 'exp': int(time.time()) + 60},
+             JwtVerificationFailedError.INVALID_AUDIENCE),
+        )
+
+        for claims, error_code in cases:
+            with self.assertRaises(JwtVerificationFailedError) as context:
+                self._authorizer._verify_jwt_token(sign_token(claims))
+            self.assertEqual(context.exception.error_code, error_code)
+
+    def test_auth_wrapper(self):
+
+        storage = Mock(spec=BaseAuthStorage)
+        storage.get_user_profile.return_value = Mock(spec=BaseUserProfile, roles={'admin'})
+        self._authorizer._auth_storage = storage
+
+        def get_items(token, body, profile=None):
+            return HttpResponse(200, {'sub': token.sub, 'has_profile': profile is not None})
+
+        wrapped = self._authorizer.auth(get_items, roles=['admin'], fetch_full_profile=True,
+                                        scopes='items/read', groups=['admins'])
+
+        handler = LambdaHandler(trace=False)
+        handler.route(wrapped, path='/', methods=['GET'])
+
+        exp = int(time.time()) + 60
+        claims = {'iss': 'https://cognito-idp.us-east-1.amazonaws.com/pool', 'sub': 'user',
+                  'aud': 'client', 'exp': exp, 'scope': 'items/read', 'cognito:groups': 'admins'}
+        cases = (
+            (claims, 200),
+            (dict(claims, scope='items/write'), 403),
+            (dict(claims, aud='other'), 401),
+            (dict(claims, exp=exp - 120), 401),
+            (None, 401),
+        )
+        for token_claims, status in cases:
+            with self.subTest(claims=token_claims):
+                response = handler.handle_request(make_http_event(claims=token_claims), None)
+                self.assertEqual(response['statusCode'], status)
+
+        response = handler.handle_request(make_http_event(claims=claims), None)
+        self.assertEqual(json.loads(response['body']), {'sub': 'user', 'has_profile': True})
+
+    def test_auth_wrapper_with_rest_api_dates(self):
+
+        def get_items(token, body):
+            return HttpResponse(200, {'sub': token.sub})
+
+        handler = LambdaHandler(trace=False)
+        handler.route(self._authorizer.auth(get_items, roles=None), path='/items',
+                      methods=['GET'])
+
+        # REST API authorizers send dates as strings.
+        claims = dict(REST_API_EVENT['requestContext']['authorizer']['claims'], aud='client')
+        for exp, status in (('Wed Dec 23 00:49:54 UTC 2099', 200),
+                            ('Wed Dec 23 00:49:54 UTC 2020', 401)):
+            with self.subTest(exp=exp):
+                event = copy.deepcopy(REST_API_EVENT)
+                event['httpMethod'] = event['requestContext']['httpMethod'] = 'GET'
+                event['requestContext']['authorizer']['claims'] = dict(claims, exp=exp)
+                response = handler.handle_request(event, None)
+                self.assertEqual(response['statusCode'], status)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+import json
+import time
+import unittest
+from unittest import mock
+
+from pyrazine.clients import ClientRegistry
+from pyrazine.response import HttpResponse
+from pyrazine.testing.websocket_api import LocalManagementApi
+from pyrazine.websocket import (Connection, ConnectionRegistry, ManagementApiClient,
+                                WebSocketEvent, WebSocketHandler)
+
+
+def _make_event(route_key: str, connection_id: str = 'abc=', body: object = None):
+    event_type = {'$connect': 'CONNECT', '$disconnect': 'DISCONNECT'}.get(route_key, 'MESSAGE')
+    event = {
+        'requestContext': {
+            'routeKey': route_key,
+            'eventType': event_type,
+            'connectionId': connection_id,
+            'domainName': 'abc123.execute-api.us-east-1.amazonaws.com',
+            'stage': 'prod',
+            'requestId': 'request-id',
+            'apiId': 'abc123',
+        },
+        'isBase64Encoded': False,
+    }
+    if route_key == '$connect':
+        event['headers'] = {'Host': 'abc123.execute-api.us-east-1.amazonaws.com'}
+        event['queryStringParameters'] = {'room': 'general'}
+    if body is not None:
+        event['body'] = json.dumps(body)
+    return event
+
+
+class TestConnectionRegistry(unittest.TestCase):
+
+    def test_bounded_and_expiring(self):
+
+        registry = ConnectionRegistry(max_connections=2, max_age=60)
+        registry.add(Connection('a', connected_at=time.time() - 120))
+        registry.add(Connection('b', data={'room': 'general'}))
+        registry.add(Connection('c', data={'room': 'general'}))
+
+        # 'a' was the oldest, and expired anyway.
+        self.assertNotIn('a', registry)
+        self.assertEqual(len(registry), 2)
+        self.assertEqual([c.connection_id for c in registry.find(room='general')], ['b', 'c'])
+
+        registry.add(Connection('d', connected_at=time.time() - 120))
+        self.assertIsNone(registry.get('d'))
+
+        self.assertEqual(registry.remove('c').connection_id, 'c')
+        self.assertIsNone(registry.remove('c'))
+
+
+class TestWebSocketHandler(unittest.TestCase):
+
+    def setUp(self) -> None:
+
+        self.handler = WebSocketHandler(trace=False)
+
+        @self.handler.route('$connect')
+        def connect(event: WebSocketEvent):
+            if event.query_params.get('room') == 'closed':
+                return HttpResponse(403)
+            return {'room': event.query_params.get('room')}
+
+        @self.handler.route('sendMessage')
+        def send_message(event: WebSocketEvent, context):
+            return {'echo': event.json(), 'context': context}
+
+        @self.handler.route('$default')
+        def default(event: WebSocketEvent):
+            return None
+
+    def test_routing_by_route_key(self):
+
+        response = self.handler.handle_request(
+            _make_event('sendMessage', body={'text': 'hi'}), 'context')
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(json.loads(response['body']),
+                         {'echo': {'text': 'hi'}, 'context': 'context'})
+
+        response = self.handler.handle_request(_make_event('unknown', body={}))
+        self.assertEqual(response, {'statusCode': 200})
+
+    def test_connections_are_registered(self):
+
+        connections = self.handler.connections
+
+        self.handler.handle_request(_make_event('$connect', 'abc='))
+        connection = connections.get('abc=')
+        self.assertEqual(connection.data, {'room': 'general'})
+        self.assertEqual(connection.endpoint,
+                         'https://abc123.execute-api.us-east-1.amazonaws.com/prod')
+
+        # Without a function for $disconnect, the connection is still removed.
+        self.handler.handle_request(_make_event('$disconnect', 'abc='))
+        self.assertNotIn('abc=', connections)
+
+        event = _make_event('$connect', 'def=')
+        event['queryStringParameters']['room'] = 'closed'
+        response = self.handler.handle_request(event)
+        self.assertEqual(response['statusCode'], 403)
+        self.assertNotIn('def=', connections)
+
+    def test_route_returns_the_function(self):
+
+        handler = WebSocketHandler()
+
+        def send_message(event: WebSocketEvent):
+            return None
+
+        self.assertIs(handler.route('sendMessage', send_message), send_message)
+        self.assertIs(handler.route('$default')(send_message), send_message)
+
+        with self.assertRaises(TypeError):
+            handler.route(send_message)
+
+    def test_unhandled_exceptions(self):
+
+        @self.handler.route('$connect')
+        def connect(event: WebSocketEvent):
+            raise RuntimeError('boom')
+
+        @self.handler.route('sendMessage')
+        def send_message(event: WebSocketEvent):
+            return {'not serializable': object()}
+
+        response = self.handler.handle_request(_make_event('$connect', 'abc='))
+        self.assertEqual(response['statusCode'], 500)
+        self.assertNotIn('abc=', self.handler.connections)
+
+        response = self.handler.handle_request(_make_event('sendMessage', body={}))
+        self.assertEqual(response['statusCode'], 500)
+        self.assertEqual(json.loads(response['body']),
+                         {'error': {'message': 'Internal server error'}})
+
+    def test_not_a_websocket_event(self):
+        with self.assertRaises(ValueError):
+            self.handler.handle_request({'requestContext': {'http': {}}})
+
+
+class TestManagementApiClient(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.api = LocalManagementApi().start()
+        self.clients = ClientRegistry(trace=False)
+
+    def tearDown(self) -> None:
+        self.clients.close()
+        self.api.stop()
+
+    def test_post_get_and_delete(self):
+
+        client = ManagementApiClient(self.api.endpoint, clients=self.clients, sign=False)
+        self.api.connect('abc/=')
+
+        self.assertEqual(client.post_to_connection('abc/=', {'text': 'hi'}), 200)
+        self.assertEqual(client.post_to_connection('abc/=', 'plain'), 200)
+        self.assertEqual(self.api.messages['abc/='], [b'{"text": "hi"}', b'plain'])
+        self.assertIn('connectedAt', client.get_connection('abc/='))
+
+        self.assertEqual(client.delete_connection('abc/='), 204)
+        self.assertEqual(client.post_to_connection('abc/=', 'gone'), 410)
+        self.assertIsNone(client.get_connection('abc/='))
+
+    def test_broadcast(self):
+
+        self.api.latency = 0.02
+        client = ManagementApiClient(self.api.endpoint, clients=self.clients, sign=False,
+                                     max_workers=8)
+        registry = ConnectionRegistry()
+        connection_ids = [f'connection-{i}' for i in range(16)]
+        for connection_id in connection_ids:
+            registry.add(Connection(connection_id))
+            if connection_id != 'connection-3':
+                self.api.connect(connection_id)
+
+        started = time.perf_counter()
+        result = client.broadcast(connection_ids, {'text': 'hi'}, registry=registry)
+        elapsed = time.perf_counter() - started
+        client.close()
+
+        self.assertEqual(len(result.sent), 15)
+        self.assertEqual(result.gone, ['connection-3'])
+        self.assertEqual(result.failed, {})
+        self.assertNotIn('connection-3', registry)
+        self.assertEqual(self.api.messages['connection-0'], [b'{"text": "hi"}'])
+        # Sent concurrently, not one after the other.
+        self.assertLess(elapsed, 16 * 0.02)
+
+    def test_requests_are_signed(self):
+
+        from botocore.credentials import Credentials
+
+        client = ManagementApiClient(self.api.endpoint, clients=self.clients, region='eu-west-1',
+                                     credentials=Credentials('AKIDEXAMPLE', 'secret'))
+        self.api.connect('abc=')
+        self.assertEqual(client.post_to_connection('abc=', 'hi'), 200)
+        self.assertTrue(self.api.requests[-1]['signed'])
+
+    def test_handler_reuses_clients_per_endpoint(self):
+
+        handler = WebSocketHandler(trace=False, clients=self.clients)
+        event = WebSocketEvent(_make_event('sendMessage'))
+        with mock.patch.dict('os.environ', {'AWS_REGION': 'eu-west-1'}):
+            client = handler.management_api(event, sign=False)
+        self.assertIs(handler.management_api(event), client)
+        self.assertEqual(client.region, 'eu-west-1')
+
+
+if __name__ == '__main__':
+    unittest.main()